@@ -26,6 +26,60 @@ pool.query('SELECT NOW()', (err) => {
   }
 });
 
+// ============================================================================
+// PRE-RENDERED RESPONSE CACHE
+// ============================================================================
+
+// Must match canonical_params() in apps/lake/etl_to_postgres.py
+const canonicalParams = (params: Record<string, string | number>): string =>
+  Object.keys(params)
+    .sort()
+    .map((key) => `${encodeURIComponent(key)}=${encodeURIComponent(String(params[key]))}`)
+    .join('&');
+
+// Answer from api_response_cache (rendered by the lake ETL) when an entry exists.
+// Returns false on a miss so the caller can fall back to a live query.
+async function sendCached(
+  req: Request,
+  res: Response,
+  endpoint: string,
+  params: Record<string, string | number> = {}
+): Promise<boolean> {
+  const gzip = Boolean(req.acceptsEncodings('gzip'));
+  let entry;
+  try {
+    const result = await pool.query(
+      `SELECT etag, content_type, ${gzip ? 'body_gzip' : 'body'} AS payload
+       FROM api_response_cache
+       WHERE endpoint = $1 AND params = $2`,
+      [endpoint, canonicalParams(params)]
+    );
+    entry = result.rows[0];
+  } catch (error) {
+    console.error('Error reading response cache:', error);
+    return false;
+  }
+  if (!entry) {
+    return false;
+  }
+
+  res.set('ETag', entry.etag);
+  res.set('Vary', 'Accept-Encoding');
+  res.set('Content-Type', entry.content_type);
+
+  const ifNoneMatch = req.headers['if-none-match'];
+  if (ifNoneMatch && ifNoneMatch.split(',').some((tag) => tag.trim() === entry.etag)) {
+    res.status(304).end();
+    return true;
+  }
+
+  if (gzip) {
+    res.set('Content-Encoding', 'gzip');
+  }
+  res.send(entry.payload);
+  return true;
+}
+
 // ============================================================================
 // HEALTH & META ENDPOINTS
 // ============================================================================
@@ -41,6 +95,7 @@ app.get('/', (_req: Request, res: Response) => {
       agencies: {
         list: '/api/agencies',
         detail: '/api/agencies/:slug',
+        rollup: '/api/agencies/:slug/rollup',
         topByCorrections: '/api/agencies/top/corrections',
         topByRVI: '/api/agencies/top/rvi'
       },
@@ -62,8 +117,10 @@ app.get('/health', (_req: Request, res: Response) => {
   res.json({ status: 'ok', timestamp: new Date().toISOString() });
 });
 
-app.get('/api/stats', async (_req: Request, res: Response) => {
+app.get('/api/stats', async (req: Request, res: Response) => {
   try {
+    if (await sendCached(req, res, '/api/stats')) return;
+
     const result = await pool.query(`
       SELECT 
         (SELECT COUNT(*) FROM agencies) as total_agencies,
@@ -123,9 +180,53 @@ app.get('/api/agencies/:slug', async (req: Request, res: Response) => {
   }
 });
 
+// The agency including all sub-agencies, plus each sub-agency's own rollup.
+// One lookup on agency_closure (materialized by lake ingestion), no recursion.
+app.get('/api/agencies/:slug/rollup', async (req: Request, res: Response) => {
+  try {
+    const { slug } = req.params;
+
+    const result = await pool.query(
+      `SELECT 
+        a.slug,
+        a.name,
+        a.short_name,
+        a.parent_slug,
+        ac.depth,
+        r.descendant_count,
+        r.max_depth,
+        r.cfr_reference_count,
+        r.total_corrections,
+        r.years_with_corrections,
+        r.first_correction_year,
+        r.last_correction_year,
+        r.avg_correction_lag_days,
+        r.rvi,
+        r.word_count_estimate
+      FROM agency_closure ac
+      INNER JOIN agencies a ON a.slug = ac.descendant_slug
+      INNER JOIN agency_rollups r ON r.slug = ac.descendant_slug
+      WHERE ac.ancestor_slug = $1
+      ORDER BY ac.depth, a.slug`,
+      [slug]
+    );
+
+    if (result.rows.length === 0) {
+      return res.status(404).json({ error: 'Agency not found' });
+    }
+
+    const [agency, ...subAgencies] = result.rows;
+    res.json({ ...agency, sub_agencies: subAgencies });
+  } catch (error) {
+    console.error('Error fetching agency rollup:', error);
+    res.status(500).json({ error: 'Failed to fetch agency rollup' });
+  }
+});
+
 app.get('/api/agencies/top/corrections', async (req: Request, res: Response) => {
   try {
     const limit = Number(req.query.limit) || 20;
+    if (await sendCached(req, res, '/api/agencies/top/corrections', { limit })) return;
     
     const result = await pool.query(
       `SELECT * FROM v_top_agencies_by_corrections LIMIT $1`,
@@ -142,6 +243,7 @@ app.get('/api/agencies/top/corrections', async (req: Request, res: Response) =>
 app.get('/api/agencies/top/rvi', async (req: Request, res: Response) => {
   try {
     const limit = Number(req.query.limit) || 20;
+    if (await sendCached(req, res, '/api/agencies/top/rvi', { limit })) return;
     
     const result = await pool.query(
       `SELECT * FROM v_top_agencies_by_rvi LIMIT $1`,
@@ -199,8 +301,10 @@ app.get('/api/corrections', async (req: Request, res: Response) => {
   }
 });
 
-app.get('/api/corrections/recent', async (_req: Request, res: Response) => {
+app.get('/api/corrections/recent', async (req: Request, res: Response) => {
   try {
+    if (await sendCached(req, res, '/api/corrections/recent')) return;
+
     const result = await pool.query(`SELECT * FROM v_recent_corrections`);
     res.json(result.rows);
   } catch (error) {
@@ -213,8 +317,10 @@ app.get('/api/corrections/recent', async (_req: Request, res: Response) => {
 // TRENDS & ANALYTICS ENDPOINTS
 // ============================================================================
 
-app.get('/api/trends/yearly', async (_req: Request, res: Response) => {
+app.get('/api/trends/yearly', async (req: Request, res: Response) => {
   try {
+    if (await sendCached(req, res, '/api/trends/yearly')) return;
+
     const result = await pool.query(`SELECT * FROM v_yearly_trends`);
     res.json(result.rows);
   } catch (error) {
@@ -226,6 +332,7 @@ app.get('/api/trends/yearly', async (_req: Request, res: Response) => {
 app.get('/api/trends/monthly', async (req: Request, res: Response) => {
   try {
     const year = req.query.year ? Number(req.query.year) : null;
+    if (!year && (await sendCached(req, res, '/api/trends/monthly'))) return;
     
     let query = `
       SELECT year, month, correction_count, avg_lag_days
@@ -248,8 +355,10 @@ app.get('/api/trends/monthly', async (req: Request, res: Response) => {
   }
 });
 
-app.get('/api/trends/titles', async (_req: Request, res: Response) => {
+app.get('/api/trends/titles', async (req: Request, res: Response) => {
   try {
+    if (await sendCached(req, res, '/api/trends/titles')) return;
+
     const result = await pool.query(`
       SELECT * FROM cfr_title_stats
       ORDER BY correction_count DESC
@@ -268,19 +377,20 @@ app.get('/api/trends/titles', async (_req: Request, res: Response) => {
 
 app.get('/api/reports/word-count', async (req: Request, res: Response) => {
   try {
+    if (await sendCached(req, res, '/api/reports/word-count')) return;
+
+    // Pre-computed by the lake ETL (report_word_count)
     const result = await pool.query(`
       SELECT 
-        a.slug,
-        a.name,
-        a.short_name,
-        am.word_count_estimate,
-        am.total_corrections,
-        am.rvi,
-        a.total_cfr_references
-      FROM agencies a
-      INNER JOIN agency_metrics am ON a.slug = am.agency_slug
-      WHERE am.word_count_estimate > 0
-      ORDER BY am.word_count_estimate DESC
+        slug,
+        name,
+        short_name,
+        word_count_estimate,
+        total_corrections,
+        rvi,
+        total_cfr_references
+      FROM report_word_count
+      ORDER BY word_count_estimate DESC
     `);
     
     res.json(result.rows);
@@ -292,53 +402,10 @@ app.get('/api/reports/word-count', async (req: Request, res: Response) => {
 
 app.get('/api/reports/scorecard', async (req: Request, res: Response) => {
   try {
-    // Calculate scorecard with multiple ranking dimensions
+    if (await sendCached(req, res, '/api/reports/scorecard')) return;
+
+    // Ranks and composite score are pre-computed by the lake ETL (report_scorecard)
     const result = await pool.query(`
-      WITH ranked_agencies AS (
-        SELECT 
-          a.slug,
-          a.name,
-          a.short_name,
-          am.total_corrections,
-          am.rvi,
-          am.word_count_estimate,
-          am.avg_correction_lag_days,
-          a.total_cfr_references,
-          -- Rank by corrections (more = higher rank)
-          RANK() OVER (ORDER BY am.total_corrections DESC) as corrections_rank,
-          -- Rank by RVI (higher = more volatile)
-          RANK() OVER (ORDER BY am.rvi DESC) as rvi_rank,
-          -- Rank by word count (more = larger regulatory footprint)
-          RANK() OVER (ORDER BY am.word_count_estimate DESC) as size_rank,
-          -- Rank by responsiveness (lower lag = better)
-          RANK() OVER (ORDER BY am.avg_correction_lag_days ASC) as responsiveness_rank,
-          -- Count total agencies for percentile calculation
-          COUNT(*) OVER () as total_agencies
-        FROM agencies a
-        INNER JOIN agency_metrics am ON a.slug = am.agency_slug
-        WHERE am.total_corrections > 0
-      ),
-      scored_agencies AS (
-        SELECT 
-          *,
-          -- Calculate composite score (lower is better)
-          -- Weight: corrections 30%, RVI 25%, size 20%, responsiveness 25%
-          (
-            (corrections_rank::float / total_agencies * 0.30) +
-            (rvi_rank::float / total_agencies * 0.25) +
-            (size_rank::float / total_agencies * 0.20) +
-            (responsiveness_rank::float / total_agencies * 0.25)
-          ) * 100 as composite_score,
-          -- Calculate grade based on percentiles
-          CASE 
-            WHEN corrections_rank::float / total_agencies <= 0.20 THEN 'A'
-            WHEN corrections_rank::float / total_agencies <= 0.40 THEN 'B'
-            WHEN corrections_rank::float / total_agencies <= 0.60 THEN 'C'
-            WHEN corrections_rank::float / total_agencies <= 0.80 THEN 'D'
-            ELSE 'F'
-          END as activity_grade
-        FROM ranked_agencies
-      )
       SELECT 
         slug,
         name,
@@ -352,9 +419,9 @@ app.get('/api/reports/scorecard', async (req: Request, res: Response) => {
         rvi_rank,
         size_rank,
         responsiveness_rank,
-        ROUND(composite_score::numeric, 2) as composite_score,
+        composite_score,
         activity_grade
-      FROM scored_agencies
+      FROM report_scorecard
       ORDER BY composite_score DESC
     `);
     
@@ -365,6 +432,20 @@ app.get('/api/reports/scorecard', async (req: Request, res: Response) => {
   }
 });
 
+app.get('/api/reports/departments', async (req: Request, res: Response) => {
+  try {
+    if (await sendCached(req, res, '/api/reports/departments')) return;
+
+    // Top-level agencies including their sub-agencies (agency_rollups)
+    const result = await pool.query(`SELECT * FROM v_department_rollups`);
+
+    res.json(result.rows);
+  } catch (error) {
+    console.error('Error fetching department report:', error);
+    res.status(500).json({ error: 'Failed to fetch department report' });
+  }
+});
+
 // ============================================================================
 // START SERVER
 // ============================================================================
@@ -376,6 +457,7 @@ app.listen(port, () => {
   console.log(`   GET /api/stats`);
   console.log(`   GET /api/agencies`);
   console.log(`   GET /api/agencies/:slug`);
+  console.log(`   GET /api/agencies/:slug/rollup`);
   console.log(`   GET /api/agencies/top/corrections`);
   console.log(`   GET /api/agencies/top/rvi`);
   console.log(`   GET /api/corrections`);
@@ -383,6 +465,7 @@ app.listen(port, () => {
   console.log(`   GET /api/trends/yearly`);
   console.log(`   GET /api/trends/monthly`);
   console.log(`   GET /api/trends/titles`);
+  console.log(`   GET /api/reports/departments`);
 });
 
 // Graceful shutdown
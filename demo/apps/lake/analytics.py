@@ -6,36 +6,211 @@ Computes metrics and analytics from DuckDB data:
 - Correction frequencies and trends
 - Regulatory Volatility Index (RVI)
 - Time series data for charting
+
+FederatedAnalytics runs the same getters across per-agency shards
+(see shards.py), querying them in parallel and merging partial aggregates.
+
+publish_results writes the result tables as memory-mappable Arrow files
+for the stages after analytics (see arrow_results.py).
 """
 
 import duckdb
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 import json
 
+from arrow_results import EXPORT_VIEWS, RESULT_QUERIES, ResultStore
+from generations import resolve
+from profiler import QueryProfiler
+from resources import MIN_MEMORY_LIMIT, ResourceProfile, connect, default_profile
+from shards import (
+    HyperLogLog, ShardCatalog, hll_registers_sql, is_shard_root, merge_groups, merged_average,
+)
+from telemetry import Tracer
+
+
+AGENCY_METRICS_COLUMNS = [
+    'slug', 'name', 'short_name', 'parent_slug',
+    'cfr_reference_count', 'child_count', 'total_corrections',
+    'years_with_corrections', 'first_correction_year',
+    'last_correction_year', 'avg_correction_lag_days', 'rvi'
+]
+
+AGENCY_METRICS_SELECT = """
+    SELECT 
+        slug,
+        name,
+        short_name,
+        parent_slug,
+        cfr_reference_count,
+        child_count,
+        total_corrections,
+        years_with_corrections,
+        first_correction_year,
+        last_correction_year,
+        ROUND(avg_correction_lag_days, 1) as avg_correction_lag_days,
+        rvi
+    FROM agency_metrics
+"""
+
+RVI_COLUMNS = ['slug', 'name', 'short_name', 'total_corrections', 
+               'cfr_reference_count', 'rvi']
+
+CORRECTIONS_FOR_AGENCY_QUERY = """
+    WITH agency_titles AS (
+        SELECT DISTINCT title 
+        FROM cfr_references 
+        WHERE agency_slug = ?
+    )
+    SELECT 
+        c.ecfr_id,
+        c.cfr_reference,
+        c.title,
+        c.corrective_action,
+        c.error_occurred,
+        c.error_corrected,
+        c.lag_days,
+        c.year
+    FROM corrections_parsed c
+    INNER JOIN agency_titles at ON c.title = at.title
+    ORDER BY c.year DESC, c.error_corrected DESC
+    LIMIT {limit}
+"""
+
+AGENCY_ROLLUP_COLUMNS = [
+    'slug', 'name', 'short_name', 'parent_slug', 'depth',
+    'descendant_count', 'max_depth', 'cfr_reference_count', 'total_corrections',
+    'years_with_corrections', 'first_correction_year', 'last_correction_year',
+    'avg_correction_lag_days', 'rvi', 'word_count_estimate'
+]
+
+# The agency and every sub-agency, each with its own subtree rollup
+AGENCY_ROLLUP_QUERY = """
+    SELECT 
+        a.slug,
+        a.name,
+        a.short_name,
+        a.parent_slug,
+        ac.depth,
+        r.descendant_count,
+        r.max_depth,
+        r.cfr_reference_count,
+        r.total_corrections,
+        r.years_with_corrections,
+        r.first_correction_year,
+        r.last_correction_year,
+        ROUND(r.avg_correction_lag_days, 1) as avg_correction_lag_days,
+        r.rvi,
+        r.word_count_estimate
+    FROM agency_closure ac
+    INNER JOIN agencies_parsed a ON a.slug = ac.descendant_slug
+    INNER JOIN agency_rollups r ON r.slug = ac.descendant_slug
+    WHERE ac.ancestor_slug = ?
+    ORDER BY ac.depth, a.slug
+"""
+
+CORRECTION_COLUMNS = ['ecfr_id', 'cfr_reference', 'title', 'corrective_action',
+                      'error_occurred', 'error_corrected', 'lag_days', 'year']
+
+# Per-shard results kept by FederatedAnalytics (oldest dropped first)
+MAX_CACHED_PARTIALS = 10000
+
+WORD_COUNT_QUERY = """
+    SELECT 
+        agency_slug,
+        title,
+        chapter,
+        part,
+        COUNT(*) as ref_count
+    FROM cfr_references
+    GROUP BY agency_slug, title, chapter, part
+"""
+
 
 class ECFRAnalytics:
     """Analytics engine for eCFR data."""
     
-    def __init__(self, db_path: str = 'ecfr_analytics.duckdb'):
+    def __init__(
+        self,
+        db_path: str = 'ecfr_analytics.duckdb',
+        tracer: Optional[Tracer] = None,
+        profiler: Optional[QueryProfiler] = None,
+        resources: Optional[ResourceProfile] = None
+    ):
         """
         Initialize analytics engine.
         
         Args:
             db_path: Path to DuckDB database
+            tracer: Records a span per query (a new 'analytics' tracer when None)
+            profiler: Records DuckDB profiles of every query (configured from
+                QUERY_PROFILE_DB when None; off when that is unset too)
+            resources: Memory, thread and spill settings (the process
+                default when None)
         """
         self.db_path = db_path
+        self.generation = None
         self.conn = None
+        self.tracer = tracer or Tracer('analytics')
+        self.profiler = profiler or QueryProfiler.from_env()
+        self.resources = resources or default_profile()
+        self._profile = None
     
     def connect(self):
-        """Connect to DuckDB."""
-        self.conn = duckdb.connect(self.db_path, read_only=True)
+        """Connect to the database generation db_path currently points to."""
+        self.generation = resolve(self.db_path)
+        self.conn = connect(self.generation, read_only=True, resources=self.resources)
+        if self.profiler:
+            self._profile = self.profiler.attach(self.conn, self.db_path)
         print(f"✅ Connected to DuckDB: {self.db_path}")
     
     def close(self):
         """Close connection."""
+        if self._profile:
+            self._profile.close()
+            self._profile = None
         if self.conn:
             self.conn.close()
+            self.conn = None
+    
+    def refresh(self) -> bool:
+        """
+        Reconnect if a newer database generation has been published.
+        
+        Returns:
+            True when the engine switched to a new generation
+        """
+        if self.conn is None or resolve(self.db_path) == self.generation:
+            return False
+        self.close()
+        self.connect()
+        return True
+    
+    def _run(self, name: str, query: str, params: Optional[List[Any]], fetch) -> Any:
+        """Execute a query and fetch its result, profiling it when enabled."""
+        if self._profile:
+            return self._profile.run(name, query, params, fetch)
+        return fetch(self.conn.execute(query, params or []))
+    
+    def _fetch(self, name: str, query: str, params: Optional[List[Any]] = None) -> List[tuple]:
+        """
+        Run one query inside a span and fetch all rows.
+        
+        Args:
+            name: Query name, recorded as span 'analytics.<name>'
+            query: SQL text
+            params: Bound parameters
+            
+        Returns:
+            List of result rows
+        """
+        with self.tracer.span(f'analytics.{name}') as span:
+            rows = self._run(name, query, params, lambda result: result.fetchall())
+            span.rows = len(rows)
+        return rows
     
     def get_agency_metrics(self, limit: int = None) -> List[Dict[str, Any]]:
         """
@@ -47,41 +222,18 @@ class ECFRAnalytics:
         Returns:
             List of agency metric dictionaries
         """
-        query = """
-            SELECT 
-                slug,
-                name,
-                short_name,
-                parent_slug,
-                cfr_reference_count,
-                child_count,
-                total_corrections,
-                years_with_corrections,
-                first_correction_year,
-                last_correction_year,
-                ROUND(avg_correction_lag_days, 1) as avg_correction_lag_days,
-                rvi
-            FROM agency_metrics
-            ORDER BY total_corrections DESC
-        """
+        query = AGENCY_METRICS_SELECT + " ORDER BY total_corrections DESC, slug"
         
         if limit:
             query += f" LIMIT {limit}"
         
-        results = self.conn.execute(query).fetchall()
+        results = self._fetch('get_agency_metrics', query)
         
-        columns = [
-            'slug', 'name', 'short_name', 'parent_slug', 
-            'cfr_reference_count', 'child_count', 'total_corrections',
-            'years_with_corrections', 'first_correction_year', 
-            'last_correction_year', 'avg_correction_lag_days', 'rvi'
-        ]
-        
-        return [dict(zip(columns, row)) for row in results]
+        return [dict(zip(AGENCY_METRICS_COLUMNS, row)) for row in results]
     
     def get_correction_trends_yearly(self) -> List[Dict[str, Any]]:
         """Get yearly correction trends."""
-        results = self.conn.execute("""
+        results = self._fetch('get_correction_trends_yearly', """
             SELECT 
                 year,
                 correction_count,
@@ -91,7 +243,7 @@ class ECFRAnalytics:
                 max_lag_days
             FROM correction_trends_yearly
             ORDER BY year
-        """).fetchall()
+        """)
         
         columns = ['year', 'correction_count', 'unique_titles', 
                    'avg_lag_days', 'min_lag_days', 'max_lag_days']
@@ -100,7 +252,7 @@ class ECFRAnalytics:
     
     def get_correction_trends_by_title(self, limit: int = 20) -> List[Dict[str, Any]]:
         """Get correction trends by CFR title."""
-        results = self.conn.execute(f"""
+        results = self._fetch('get_correction_trends_by_title', f"""
             SELECT 
                 title,
                 correction_count,
@@ -109,9 +261,9 @@ class ECFRAnalytics:
                 last_year,
                 ROUND(avg_lag_days, 1) as avg_lag_days
             FROM correction_trends_by_title
-            ORDER BY correction_count DESC
+            ORDER BY correction_count DESC, title
             LIMIT {limit}
-        """).fetchall()
+        """)
         
         columns = ['title', 'correction_count', 'years_active', 
                    'first_year', 'last_year', 'avg_lag_days']
@@ -120,7 +272,7 @@ class ECFRAnalytics:
     
     def get_time_series_data(self) -> List[Dict[str, Any]]:
         """Get monthly time series data for charting."""
-        results = self.conn.execute("""
+        results = self._fetch('get_time_series_data', """
             SELECT 
                 year,
                 month,
@@ -128,7 +280,7 @@ class ECFRAnalytics:
                 ROUND(avg_lag_days, 1) as avg_lag_days
             FROM correction_time_series
             ORDER BY year, month
-        """).fetchall()
+        """)
         
         columns = ['year', 'month', 'correction_count', 'avg_lag_days']
         
@@ -140,7 +292,7 @@ class ECFRAnalytics:
         
         High RVI indicates frequent changes relative to regulatory footprint.
         """
-        results = self.conn.execute(f"""
+        results = self._fetch('get_top_agencies_by_rvi', f"""
             SELECT 
                 slug,
                 name,
@@ -150,74 +302,50 @@ class ECFRAnalytics:
                 rvi
             FROM agency_metrics
             WHERE total_corrections > 0
-            ORDER BY rvi DESC
+            ORDER BY rvi DESC, slug
             LIMIT {limit}
-        """).fetchall()
+        """)
         
-        columns = ['slug', 'name', 'short_name', 'total_corrections', 
-                   'cfr_reference_count', 'rvi']
-        
-        return [dict(zip(columns, row)) for row in results]
+        return [dict(zip(RVI_COLUMNS, row)) for row in results]
     
     def get_agency_detail(self, slug: str) -> Dict[str, Any]:
         """Get detailed metrics for a specific agency."""
-        result = self.conn.execute("""
-            SELECT 
-                slug,
-                name,
-                short_name,
-                parent_slug,
-                cfr_reference_count,
-                child_count,
-                total_corrections,
-                years_with_corrections,
-                first_correction_year,
-                last_correction_year,
-                ROUND(avg_correction_lag_days, 1) as avg_correction_lag_days,
-                rvi
-            FROM agency_metrics
-            WHERE slug = ?
-        """, [slug]).fetchone()
+        rows = self._fetch('get_agency_detail', AGENCY_METRICS_SELECT + " WHERE slug = ?", [slug])
         
-        if not result:
+        if not rows:
             return None
         
-        columns = [
-            'slug', 'name', 'short_name', 'parent_slug', 
-            'cfr_reference_count', 'child_count', 'total_corrections',
-            'years_with_corrections', 'first_correction_year', 
-            'last_correction_year', 'avg_correction_lag_days', 'rvi'
-        ]
+        return dict(zip(AGENCY_METRICS_COLUMNS, rows[0]))
+    
+    @staticmethod
+    def _rollup(rows: List[tuple]) -> Optional[Dict[str, Any]]:
+        """Shape AGENCY_ROLLUP_QUERY rows as the agency with its sub_agencies."""
+        if not rows:
+            return None
+        
+        agency, *sub_agencies = [dict(zip(AGENCY_ROLLUP_COLUMNS, row)) for row in rows]
+        agency['sub_agencies'] = sub_agencies
+        return agency
+    
+    def get_agency_rollup(self, slug: str) -> Dict[str, Any]:
+        """
+        Get an agency's metrics including all of its sub-agencies.
+        
+        Read from the agency_closure and agency_rollups tables ingestion
+        materializes, so a department's totals need no recursive query.
         
-        return dict(zip(columns, result))
+        Returns:
+            The agency's subtree rollup with a 'sub_agencies' list holding
+            each sub-agency's own rollup and depth, or None if not found
+        """
+        return self._rollup(self._fetch('get_agency_rollup', AGENCY_ROLLUP_QUERY, [slug]))
     
     def get_corrections_for_agency(self, slug: str, limit: int = 100) -> List[Dict[str, Any]]:
         """Get corrections related to an agency's CFR titles."""
-        results = self.conn.execute(f"""
-            WITH agency_titles AS (
-                SELECT DISTINCT title 
-                FROM cfr_references 
-                WHERE agency_slug = ?
-            )
-            SELECT 
-                c.ecfr_id,
-                c.cfr_reference,
-                c.title,
-                c.corrective_action,
-                c.error_occurred,
-                c.error_corrected,
-                c.lag_days,
-                c.year
-            FROM corrections_parsed c
-            INNER JOIN agency_titles at ON c.title = at.title
-            ORDER BY c.year DESC, c.error_corrected DESC
-            LIMIT {limit}
-        """, [slug]).fetchall()
-        
-        columns = ['ecfr_id', 'cfr_reference', 'title', 'corrective_action',
-                   'error_occurred', 'error_corrected', 'lag_days', 'year']
+        results = self._fetch('get_corrections_for_agency',
+                              CORRECTIONS_FOR_AGENCY_QUERY.format(limit=limit), [slug])
         
-        return [dict(zip(columns, row)) for row in results]
+        return [dict(zip(CORRECTION_COLUMNS, row)) for row in results]
     
     def calculate_word_counts(self) -> Dict[str, int]:
         """
@@ -231,17 +359,11 @@ class ECFRAnalytics:
         
         This provides more accurate estimates than a flat rate.
         """
-        results = self.conn.execute("""
-            SELECT 
-                agency_slug,
-                title,
-                chapter,
-                part,
-                COUNT(*) as ref_count
-            FROM cfr_references
-            GROUP BY agency_slug, title, chapter, part
-        """).fetchall()
-        
+        return self._estimate_word_counts(self._fetch('calculate_word_counts', WORD_COUNT_QUERY))
+    
+    @staticmethod
+    def _estimate_word_counts(results: List[tuple]) -> Dict[str, int]:
+        """Apply the tiered estimate to (agency_slug, title, chapter, part, ref_count) rows."""
         word_counts = {}
         
         for slug, title, chapter, part, ref_count in results:
@@ -261,23 +383,57 @@ class ECFRAnalytics:
         
         return word_counts
     
-    def generate_summary_report(self) -> Dict[str, Any]:
-        """Generate a summary report of all analytics."""
+    def get_overview(self) -> Dict[str, Any]:
+        """Get headline record counts and the correction year range."""
         return {
-            'overview': {
-                'total_agencies': self.conn.execute("SELECT COUNT(*) FROM agencies_parsed").fetchone()[0],
-                'total_corrections': self.conn.execute("SELECT COUNT(*) FROM corrections_parsed").fetchone()[0],
-                'total_cfr_references': self.conn.execute("SELECT COUNT(*) FROM cfr_references").fetchone()[0],
-                'year_range': self.conn.execute("""
-                    SELECT MIN(year), MAX(year) FROM corrections_parsed
-                """).fetchone(),
-            },
-            'top_agencies_by_corrections': self.get_agency_metrics(limit=10),
-            'top_agencies_by_rvi': self.get_top_agencies_by_rvi(limit=10),
-            'yearly_trends': self.get_correction_trends_yearly(),
-            'top_titles': self.get_correction_trends_by_title(limit=10),
+            'total_agencies': self._fetch('count_agencies', "SELECT COUNT(*) FROM agencies_parsed")[0][0],
+            'total_corrections': self._fetch('count_corrections', "SELECT COUNT(*) FROM corrections_parsed")[0][0],
+            'total_cfr_references': self._fetch('count_cfr_references', "SELECT COUNT(*) FROM cfr_references")[0][0],
+            'cfr_titles': self._fetch('count_cfr_titles', "SELECT COUNT(DISTINCT title) FROM cfr_references")[0][0],
+            'year_range': self._fetch('year_range', """
+                SELECT MIN(year), MAX(year) FROM corrections_parsed
+            """)[0],
         }
     
+    def generate_summary_report(self) -> Dict[str, Any]:
+        """Generate a summary report of all analytics."""
+        with self.tracer.span('analytics.generate_summary_report'):
+            return {
+                'overview': self.get_overview(),
+                'top_agencies_by_corrections': self.get_agency_metrics(limit=10),
+                'top_agencies_by_rvi': self.get_top_agencies_by_rvi(limit=10),
+                'yearly_trends': self.get_correction_trends_yearly(),
+                'top_titles': self.get_correction_trends_by_title(limit=10),
+            }
+    
+    def _view_frame(self, view: str):
+        """Fetch one export view as a DataFrame."""
+        return self._run(view, f"SELECT * FROM {view}", None, lambda result: result.fetchdf())
+    
+    def _export_view(self, view: str, output_file: Path) -> int:
+        """Write one export view as a JSON records file; returns the row count."""
+        with self.tracer.span(f'analytics.{view}') as span:
+            df = self._view_frame(view)
+            df.to_json(output_file, orient='records', indent=2)
+            span.rows = len(df)
+            span.bytes = output_file.stat().st_size
+        return len(df)
+    
+    def result_tables(self):
+        """
+        Compute the published result tables.
+        
+        Yields:
+            (name, pyarrow.Table) for every RESULT_QUERIES entry and export view
+        """
+        queries = {**RESULT_QUERIES, **{view: f"SELECT * FROM {view}" for view in EXPORT_VIEWS}}
+        for name, query in queries.items():
+            with self.tracer.span(f'analytics.result.{name}') as span:
+                table = self._run(name, query, None, lambda result: result.fetch_arrow_table())
+                span.rows = table.num_rows
+                span.bytes = table.nbytes
+            yield name, table
+    
     def export_for_postgres(self, output_dir: Path):
         """
         Export analytics data as JSON files for PostgreSQL import.
@@ -289,31 +445,469 @@ class ECFRAnalytics:
         
         print(f"\n📤 Exporting analytics to {output_dir}")
         
-        # Export agencies
-        agencies = self.conn.execute("SELECT * FROM export_agencies").fetchdf()
-        agencies_file = output_dir / 'agencies.json'
-        agencies.to_json(agencies_file, orient='records', indent=2)
-        print(f"  ✅ Exported {len(agencies)} agencies")
-        
-        # Export corrections
-        corrections = self.conn.execute("SELECT * FROM export_corrections").fetchdf()
-        corrections_file = output_dir / 'corrections.json'
-        corrections.to_json(corrections_file, orient='records', indent=2)
-        print(f"  ✅ Exported {len(corrections)} corrections")
-        
-        # Export agency metrics
-        metrics = self.conn.execute("SELECT * FROM export_agency_metrics").fetchdf()
-        metrics_file = output_dir / 'agency_metrics.json'
-        metrics.to_json(metrics_file, orient='records', indent=2)
-        print(f"  ✅ Exported {len(metrics)} agency metrics")
-        
-        # Export time series
-        time_series = self.conn.execute("SELECT * FROM export_correction_time_series").fetchdf()
-        ts_file = output_dir / 'time_series.json'
-        time_series.to_json(ts_file, orient='records', indent=2)
-        print(f"  ✅ Exported {len(time_series)} time series records")
+        with self.tracer.span('analytics.export_for_postgres'):
+            # Export agencies
+            count = self._export_view('export_agencies', output_dir / 'agencies.json')
+            print(f"  ✅ Exported {count} agencies")
+            
+            # Export corrections
+            count = self._export_view('export_corrections', output_dir / 'corrections.json')
+            print(f"  ✅ Exported {count} corrections")
+            
+            # Export agency metrics
+            count = self._export_view('export_agency_metrics', output_dir / 'agency_metrics.json')
+            print(f"  ✅ Exported {count} agency metrics")
+            
+            # Export time series
+            count = self._export_view('export_correction_time_series', output_dir / 'time_series.json')
+            print(f"  ✅ Exported {count} time series records")
         
         print(f"\n✅ Export complete: {output_dir}")
+    
+    def publish_results(self, results_dir: Path) -> Dict[str, Any]:
+        """
+        Publish the result tables as a new Arrow IPC version.
+        
+        Args:
+            results_dir: Result store directory (see arrow_results.ResultStore)
+            
+        Returns:
+            The published manifest
+        """
+        print(f"\n📦 Publishing Arrow results to {results_dir}")
+        
+        with self.tracer.span('analytics.publish_results') as span:
+            manifest = ResultStore(str(results_dir)).publish(
+                self.result_tables(), self.generation or self.db_path
+            )
+            span.rows = sum(entry['rows'] for entry in manifest['tables'].values())
+            span.bytes = sum(entry['bytes'] for entry in manifest['tables'].values())
+        
+        print(f"  ✅ Published v{manifest['version']}: {len(manifest['tables'])} tables, "
+              f"{span.rows} rows, {span.bytes / 1024:,.1f} KiB")
+        return manifest
+
+
+class FederatedAnalytics(ECFRAnalytics):
+    """
+    Analytics over per-agency shards.
+    
+    Every getter fans out to the shards on a thread pool (one cursor per
+    shard query, so one engine can serve many threads) and merges the
+    partial results. Lookups for one agency go only to the shard holding
+    it. The catalog is re-read when it changes: new shards are opened and
+    rebuilt ones reopened, while queries already running finish on the
+    files they started with.
+    
+    A shard file never changes once written (a rebuild gets a new file),
+    so each shard's partial results are cached by file. Repeated queries
+    only merge, and after an agency is onboarded or rebuilt only its shard
+    is queried again, which keeps latency flat as shards are added.
+    """
+    
+    def __init__(
+        self,
+        shards_dir: str = 'shards',
+        tracer: Optional[Tracer] = None,
+        max_workers: Optional[int] = None,
+        resources: Optional[ResourceProfile] = None
+    ):
+        """
+        Initialize federated analytics engine.
+        
+        Args:
+            shards_dir: Shard directory written by shards.ShardedIngestion
+            tracer: Records a span per query and per shard query
+                (a new 'analytics' tracer when None)
+            max_workers: Shards queried concurrently (defaults to 4 per
+                CPU of the resource profile, at most 32; never more than
+                the budget gives each query DuckDB's minimum memory limit)
+            resources: Budget split across the concurrent shard queries
+                (the process default when None)
+        """
+        super().__init__(shards_dir, tracer=tracer, resources=resources)
+        # Profiles are per connection; shard queries are traced instead
+        self.profiler = None
+        self.catalog = ShardCatalog(shards_dir)
+        self.max_workers = max_workers or min(32, 4 * self.resources.threads)
+        # At most max_workers shards are queried at once, so each gets that
+        # share of the budget; more workers than the budget covers at the
+        # minimum limit would overcommit it
+        self.max_workers = max(1, min(self.max_workers, self.resources.memory_limit // MIN_MEMORY_LIMIT))
+        self.shard_resources = self.resources.share(self.max_workers)
+        self._pool = None
+        self._version = None
+        self._state = ({}, {}, {})
+        self._refresh_lock = threading.Lock()
+        self._partials: Dict[tuple, List[tuple]] = {}
+    
+    def connect(self):
+        """Open every shard in the catalog read-only."""
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='shard-query')
+        shards, _, _ = self._refresh()
+        print(f"✅ Connected to {len(shards)} DuckDB shards: {self.db_path}")
+    
+    def close(self):
+        """Stop the query pool and close shard connections."""
+        if self._pool:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        for conn, _ in self._state[0].values():
+            conn.close()
+        self._state = ({}, {}, {})
+        self._version = None
+    
+    def _refresh(self):
+        """
+        Pick up catalog changes.
+        
+        Returns:
+            Tuple of (shard name to (connection, file), catalog entries,
+            title owners), consistent with each other
+        """
+        version = self.catalog.version()
+        if version == self._version:
+            return self._state
+        with self._refresh_lock:
+            while version != self._version:
+                current = self._state[0]
+                entries = self.catalog.load()
+                shards = {}
+                try:
+                    for name, entry in entries.items():
+                        if name in current and current[name][1] == entry['file']:
+                            shards[name] = current[name]
+                        else:
+                            # A replaced shard's old connection is dropped, not closed,
+                            # so cursors still reading it can finish
+                            conn = connect(str(self.catalog.shard_path(entry)), read_only=True,
+                                           resources=self.shard_resources)
+                            shards[name] = (conn, entry['file'])
+                except duckdb.IOException:
+                    # A shard was rebuilt (and its old file removed) while reading
+                    if self.catalog.version() == version:
+                        raise
+                    version = self.catalog.version()
+                    continue
+                self._state = (shards, entries, ShardCatalog.title_owners(entries))
+                self._version = version
+                files = {shard_file for _, shard_file in shards.values()}
+                self._partials = {key: rows for key, rows in list(self._partials.items()) if key[0] in files}
+        return self._state
+    
+    def _owned_filter(self, owners: Dict[int, str]):
+        """
+        Function of a shard name returning its 'title IN (...)' condition.
+        
+        The titles are inlined (they are integers from the catalog): a bound
+        list parameter costs a statement preparation on every shard.
+        """
+        owned: Dict[str, List[int]] = {}
+        for title, shard in owners.items():
+            owned.setdefault(shard, []).append(int(title))
+        
+        def condition(shard: str) -> str:
+            titles = sorted(owned.get(shard, []))
+            return f"title IN ({', '.join(map(str, titles))})" if titles else "FALSE"
+        return condition
+    
+    def _query_shard(self, name: str, shard: str, conn, query: str, params: Any, fetch) -> Any:
+        with self.tracer.span('analytics.shard', shard=shard, query=name) as span:
+            cursor = conn.cursor()
+            try:
+                result = fetch(cursor.execute(query, params or []))
+            finally:
+                cursor.close()
+            span.rows = len(result)
+        return result
+    
+    def _scatter(self, name: str, query: Any, params: Optional[List[Any]] = None,
+                 shards: Optional[List[str]] = None, state=None, fetch=None) -> Dict[str, Any]:
+        """
+        Run one query on several shards in parallel.
+        
+        Args:
+            name: Query name, recorded as span 'analytics.<name>'
+            query: SQL text, or a function of the shard name returning it
+            params: Bound parameters
+            shards: Shard names to query (all when None)
+            state: Snapshot from _refresh() (a fresh one when None)
+            fetch: Turns a result into rows (fetchall, cached per shard
+                file, when None)
+            
+        Returns:
+            Shard name to its fetched result
+        """
+        connections = (state or self._refresh())[0]
+        targets = list(connections) if shards is None else shards
+        cached = fetch is None
+        fetch = fetch or (lambda result: result.fetchall())
+        
+        with self.tracer.span(f'analytics.{name}', shards=len(targets)) as span:
+            results, futures = {}, {}
+            for shard in targets:
+                conn, shard_file = connections[shard]
+                sql = query(shard) if callable(query) else query
+                key = (shard_file, sql, tuple(params or ()))
+                if cached and key in self._partials:
+                    results[shard] = self._partials[key]
+                else:
+                    futures[shard] = (key, self._pool.submit(
+                        self._query_shard, name, shard, conn, sql, params, fetch
+                    ))
+            for shard, (key, future) in futures.items():
+                results[shard] = future.result()
+                if cached:
+                    self._partials[key] = results[shard]
+                    if len(self._partials) > MAX_CACHED_PARTIALS:
+                        self._partials.pop(next(iter(self._partials)), None)
+            span.attributes['cached'] = len(targets) - len(futures)
+            span.rows = sum(len(rows) for rows in results.values())
+        return {shard: results[shard] for shard in targets}
+    
+    def _fetch(self, name: str, query: str, params: Optional[List[Any]] = None) -> List[tuple]:
+        """Rows from every shard; only for queries over rows no two shards share."""
+        return [row for rows in self._scatter(name, query, params).values() for row in rows]
+    
+    # ------------------------------------------------------------------
+    # Agency metrics: each agency lives in exactly one shard
+    # ------------------------------------------------------------------
+    
+    def get_agency_metrics(self, limit: int = None) -> List[Dict[str, Any]]:
+        """Get agency metrics, merging each shard's top rows."""
+        query = AGENCY_METRICS_SELECT + " ORDER BY total_corrections DESC, slug"
+        if limit:
+            query += f" LIMIT {limit}"
+        
+        rows = self._fetch('get_agency_metrics', query)
+        rows.sort(key=lambda row: (-row[6], row[0]))
+        
+        return [dict(zip(AGENCY_METRICS_COLUMNS, row)) for row in rows[:limit or None]]
+    
+    def get_top_agencies_by_rvi(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Get agencies with highest RVI, merging each shard's top rows."""
+        rows = self._fetch('get_top_agencies_by_rvi', f"""
+            SELECT {', '.join(RVI_COLUMNS)}
+            FROM agency_metrics
+            WHERE total_corrections > 0
+            ORDER BY rvi DESC, slug
+            LIMIT {limit}
+        """)
+        rows.sort(key=lambda row: (-row[5], row[0]))
+        
+        return [dict(zip(RVI_COLUMNS, row)) for row in rows[:limit]]
+    
+    def _routed(self, name: str, slug: str, query: str) -> List[tuple]:
+        """Run a single-agency query on the shard holding the agency."""
+        state = self._refresh()
+        shard = self.catalog.shard_for(slug, state[1])
+        if shard is None:
+            return []
+        return self._scatter(name, query, [slug], shards=[shard], state=state)[shard]
+    
+    def get_agency_detail(self, slug: str) -> Dict[str, Any]:
+        """Get detailed metrics for a specific agency from its shard."""
+        rows = self._routed('get_agency_detail', slug, AGENCY_METRICS_SELECT + " WHERE slug = ?")
+        
+        if not rows:
+            return None
+        
+        return dict(zip(AGENCY_METRICS_COLUMNS, rows[0]))
+    
+    def get_agency_rollup(self, slug: str) -> Dict[str, Any]:
+        """Get an agency's rollup from its shard, which holds its whole subtree."""
+        return self._rollup(self._routed('get_agency_rollup', slug, AGENCY_ROLLUP_QUERY))
+    
+    def get_corrections_for_agency(self, slug: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """Get corrections for an agency's CFR titles from its shard."""
+        rows = self._routed('get_corrections_for_agency', slug,
+                            CORRECTIONS_FOR_AGENCY_QUERY.format(limit=limit))
+        
+        return [dict(zip(CORRECTION_COLUMNS, row)) for row in rows]
+    
+    # ------------------------------------------------------------------
+    # Correction aggregates: each title counted only by its owner
+    # ------------------------------------------------------------------
+    
+    def _owned_partials(self, name: str, query: str) -> List[List[tuple]]:
+        """Run a partial aggregate with {owned} replaced by each shard's title condition."""
+        state = self._refresh()
+        owned = self._owned_filter(state[2])
+        return list(self._scatter(name, lambda shard: query.format(owned=owned(shard)), state=state).values())
+    
+    def get_correction_trends_yearly(self) -> List[Dict[str, Any]]:
+        """Get yearly correction trends from per-shard partial aggregates."""
+        # Titles are disjoint across owners, so distinct title counts add up
+        merged = merge_groups(self._owned_partials('get_correction_trends_yearly', """
+            SELECT 
+                year,
+                COUNT(*),
+                COUNT(DISTINCT title),
+                SUM(lag_days),
+                MIN(lag_days),
+                MAX(lag_days)
+            FROM corrections_parsed
+            WHERE lag_days IS NOT NULL AND {owned}
+            GROUP BY year
+        """), keys=1, kinds=['sum', 'sum', 'sum', 'min', 'max'])
+        
+        return [
+            {
+                'year': year,
+                'correction_count': count,
+                'unique_titles': titles,
+                'avg_lag_days': merged_average(lag_sum, count, digits=1),
+                'min_lag_days': min_lag,
+                'max_lag_days': max_lag,
+            }
+            for (year,), (count, titles, lag_sum, min_lag, max_lag) in sorted(merged.items())
+        ]
+    
+    def get_correction_trends_by_title(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Get correction trends by CFR title from the title owners."""
+        merged = merge_groups(self._owned_partials('get_correction_trends_by_title', """
+            SELECT 
+                title,
+                COUNT(*),
+                COUNT(DISTINCT year),
+                MIN(year),
+                MAX(year),
+                SUM(lag_days),
+                COUNT(lag_days)
+            FROM corrections_parsed
+            WHERE {owned}
+            GROUP BY title
+        """), keys=1, kinds=['sum', 'sum', 'min', 'max', 'sum', 'sum'])
+        
+        trends = [
+            {
+                'title': title,
+                'correction_count': count,
+                'years_active': years,
+                'first_year': first,
+                'last_year': last,
+                'avg_lag_days': merged_average(lag_sum, lag_count, digits=1),
+            }
+            for (title,), (count, years, first, last, lag_sum, lag_count) in merged.items()
+        ]
+        trends.sort(key=lambda trend: (-trend['correction_count'], trend['title']))
+        return trends[:limit]
+    
+    def get_time_series_data(self) -> List[Dict[str, Any]]:
+        """Get monthly time series data from per-shard partial aggregates."""
+        return self._time_series('get_time_series_data', digits=1)
+    
+    def _time_series(self, name: str, digits: Optional[int]) -> List[Dict[str, Any]]:
+        """Merge monthly partials, rounding averages to digits (not at all when None)."""
+        merged = merge_groups(self._owned_partials(name, """
+            SELECT 
+                year,
+                MONTH(error_corrected),
+                COUNT(*),
+                SUM(lag_days),
+                COUNT(lag_days)
+            FROM corrections_parsed
+            WHERE error_corrected IS NOT NULL AND {owned}
+            GROUP BY year, MONTH(error_corrected)
+        """), keys=2, kinds=['sum', 'sum', 'sum'])
+        
+        return [
+            {
+                'year': year,
+                'month': month,
+                'correction_count': count,
+                'avg_lag_days': merged_average(lag_sum, lag_count, digits=digits),
+            }
+            for (year, month), (count, lag_sum, lag_count) in sorted(merged.items())
+        ]
+    
+    def calculate_word_counts(self) -> Dict[str, int]:
+        """Calculate estimated word counts per agency across shards."""
+        return self._estimate_word_counts(self._fetch('calculate_word_counts', WORD_COUNT_QUERY))
+    
+    def count_distinct(self, table: str, column: str) -> int:
+        """
+        Estimate distinct values of a column across shards.
+        
+        Each shard returns its HyperLogLog registers; values present in
+        several shards are counted once.
+        """
+        sketch = HyperLogLog()
+        for rows in self._scatter(f'count_distinct.{table}.{column}', hll_registers_sql(table, column)).values():
+            sketch.add_registers(rows)
+        return sketch.estimate()
+    
+    def get_overview(self) -> Dict[str, Any]:
+        """Get headline counts merged across shards."""
+        merged = merge_groups(self._owned_partials('overview', """
+            WITH owned AS (
+                SELECT year FROM corrections_parsed WHERE {owned}
+            )
+            SELECT 
+                (SELECT COUNT(*) FROM agencies_parsed),
+                (SELECT COUNT(*) FROM owned),
+                (SELECT COUNT(*) FROM cfr_references),
+                (SELECT MIN(year) FROM owned),
+                (SELECT MAX(year) FROM owned)
+        """), keys=0, kinds=['sum', 'sum', 'sum', 'min', 'max'])
+        agencies, corrections, references, first, last = merged.get((), [0, 0, 0, None, None])
+        
+        return {
+            'total_agencies': agencies,
+            'total_corrections': corrections,
+            'total_cfr_references': references,
+            'cfr_titles': self.count_distinct('cfr_references', 'title'),
+            'year_range': (first, last),
+        }
+    
+    def _view_frame(self, view: str):
+        """Fetch one export view merged across shards, renumbering ids."""
+        import pandas as pd
+        
+        if view == 'export_correction_time_series':
+            return pd.DataFrame(self._time_series(view, digits=None),
+                                columns=['year', 'month', 'correction_count', 'avg_lag_days'])
+        
+        state = self._refresh()
+        owned = self._owned_filter(state[2])
+        query = f"SELECT * EXCLUDE (id) FROM {view}"
+        if view == 'export_corrections':
+            query += " WHERE {owned}"
+        frames = [
+            frame for frame in self._scatter(
+                view, lambda shard: query.format(owned=owned(shard)), state=state,
+                fetch=lambda result: result.fetchdf()
+            ).values()
+            if len(frame)
+        ]
+        order = {'export_corrections': 'ecfr_id', 'export_agency_metrics': 'agency_slug'}.get(view, 'slug')
+        df = pd.concat(frames, ignore_index=True).sort_values(order, ignore_index=True) if frames else pd.DataFrame()
+        df.insert(0, 'id', range(1, len(df) + 1))
+        return df
+    
+    def result_tables(self):
+        """
+        Compute the export views merged across shards.
+        
+        The RESULT_QUERIES tables rank and join across all agencies, so
+        they are published from the merged lake only; consumers of a
+        federated result set query the lake for them.
+        """
+        import pyarrow as pa
+        
+        for view in EXPORT_VIEWS:
+            with self.tracer.span(f'analytics.result.{view}') as span:
+                table = pa.Table.from_pandas(self._view_frame(view), preserve_index=False)
+                span.rows = table.num_rows
+                span.bytes = table.nbytes
+            yield view, table
+
+
+def open_analytics(path: str, tracer: Optional[Tracer] = None) -> ECFRAnalytics:
+    """Analytics over a DuckDB file, or federated over a shard directory."""
+    if is_shard_root(path):
+        return FederatedAnalytics(path, tracer=tracer)
+    return ECFRAnalytics(path, tracer=tracer)
 
 
 def main():
@@ -322,14 +916,16 @@ def main():
     print("eCFR Analytics Engine")
     print("=" * 60)
     
-    db_path = Path(__file__).parent / 'ecfr_analytics.duckdb'
+    # LAKE_SHARDS_DIR switches to the per-agency shards built by shards.py
+    shards_dir = os.getenv('LAKE_SHARDS_DIR')
+    db_path = Path(shards_dir) if shards_dir else Path(__file__).parent / 'ecfr_analytics.duckdb'
     
     if not db_path.exists():
         print(f"❌ Database not found: {db_path}")
-        print("Run ingestion.py first to create the database.")
+        print("Run ingestion.py (or shards.py) first to create the database.")
         return
     
-    analytics = ECFRAnalytics(str(db_path))
+    analytics = open_analytics(str(db_path))
     
     try:
         analytics.connect()
@@ -359,6 +955,7 @@ def main():
         # Export for PostgreSQL
         export_dir = Path(__file__).parent / 'exports'
         analytics.export_for_postgres(export_dir)
+        analytics.publish_results(export_dir / 'results')
         
         # Save full report
         report_file = export_dir / 'summary_report.json'
@@ -366,6 +963,11 @@ def main():
             json.dump(report, f, indent=2, default=str)
         print(f"\n✅ Full report saved: {report_file}")
         
+        analytics.tracer.report()
+        metrics_file = analytics.tracer.write_metrics()
+        if metrics_file:
+            print(f"📈 Metrics: {metrics_file}")
+        
         print("\n" + "=" * 60)
         print("✅ Analytics complete!")
         print("=" * 60)
@@ -0,0 +1,288 @@
+"""
+Async Analytics API
+
+A dependency-free ASGI application exposing the ECFRAnalytics getters
+over HTTP, straight from the DuckDB lake:
+
+    GET /health
+    GET /summary
+    GET /agencies/metrics?limit=N
+    GET /agencies/rvi?limit=N
+    GET /agencies/<slug>
+    GET /agencies/<slug>/corrections?limit=N
+    GET /agencies/<slug>/rollup   (including sub-agencies)
+    GET /trends/yearly
+    GET /trends/titles?limit=N
+    GET /time-series
+    GET /word-counts
+    GET /metrics            (Prometheus text format)
+
+DuckDB calls block, so they run on a bounded thread pool where each worker
+thread owns its own read-only ECFRAnalytics connection, reopened on the next
+query after ingestion publishes a new database generation (see
+generations.py). When DUCKDB_PATH is a shard directory (see shards.py) the
+workers share one FederatedAnalytics engine instead, which already queries
+through a cursor per shard. Identical requests that arrive while one is
+in flight share its result instead of running the query again.
+
+Run with:
+    uvicorn analytics_api:app --port 5001
+"""
+
+import asyncio
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs
+
+from analytics import ECFRAnalytics, FederatedAnalytics
+from shards import is_shard_root
+from telemetry import Tracer
+
+
+def _json_default(value: Any) -> Any:
+    """Encode DuckDB values the json module does not know."""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode_json(data: Any) -> bytes:
+    return json.dumps(data, separators=(',', ':'), default=_json_default).encode('utf-8')
+
+
+class HTTPError(Exception):
+    """An error returned to the client as a JSON body."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class AnalyticsAPI:
+    """ASGI application serving ECFRAnalytics queries."""
+
+    def __init__(self, db_path: str, max_workers: int = 4, max_pending: int = 256):
+        """
+        Initialize the API.
+
+        Args:
+            db_path: Path to DuckDB database
+            max_workers: Threads (and DuckDB connections) running queries
+            max_pending: Distinct queries allowed in flight before
+                returning 503
+        """
+        self.db_path = db_path
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.executor = None
+        self.inflight: Dict[Tuple, asyncio.Future] = {}
+        self.executions = 0
+        self._executions_lock = threading.Lock()
+        self.tracer = Tracer('analytics_api')
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Query execution
+    # ------------------------------------------------------------------
+
+    def _analytics(self) -> ECFRAnalytics:
+        """Return this worker thread's analytics engine, connecting once."""
+        analytics = getattr(self._local, 'analytics', None)
+        if analytics is None:
+            with self._connections_lock:
+                if is_shard_root(self.db_path):
+                    # One federated engine (and shard connection set) for all workers
+                    if not self._connections:
+                        federated = FederatedAnalytics(self.db_path, tracer=self.tracer)
+                        federated.connect()
+                        self._connections.append(federated)
+                    analytics = self._connections[0]
+                else:
+                    analytics = ECFRAnalytics(self.db_path, tracer=self.tracer)
+                    analytics.connect()
+                    self._connections.append(analytics)
+            self._local.analytics = analytics
+        return analytics
+
+    def _execute(self, method: str, args: Tuple) -> Any:
+        """Run one ECFRAnalytics getter on a worker thread."""
+        # Workers run concurrently; += on an attribute is not atomic
+        with self._executions_lock:
+            self.executions += 1
+        analytics = self._analytics()
+        # Move to a newly published database generation between queries
+        analytics.refresh()
+        return getattr(analytics, method)(*args)
+
+    def start(self):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix='analytics'
+            )
+
+    def shutdown(self):
+        """Stop the worker pool, close every worker's connection and the trace file."""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        with self._connections_lock:
+            for analytics in self._connections:
+                analytics.close()
+            self._connections = []
+        self._local = threading.local()
+        self.tracer.close()
+
+    async def query(self, method: str, *args) -> Any:
+        """
+        Run a getter on the thread pool, sharing in-flight identical calls.
+
+        Args:
+            method: ECFRAnalytics method name
+            *args: Positional arguments for the method
+
+        Returns:
+            The getter's result
+        """
+        key = (method, args)
+        future = self.inflight.get(key)
+        if future is None:
+            if len(self.inflight) >= self.max_pending:
+                raise HTTPError(503, "Too many pending queries")
+            self.start()
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.executor, self._execute, method, args)
+            self.inflight[key] = future
+            future.add_done_callback(lambda _: self.inflight.pop(key, None))
+        # shield: one cancelled client must not cancel the query for the others
+        return await asyncio.shield(future)
+
+    # ------------------------------------------------------------------
+    # Routing
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _limit(params: Dict[str, list], default: Optional[int], maximum: int = 1000) -> Optional[int]:
+        if 'limit' not in params:
+            return default
+        try:
+            limit = int(params['limit'][0])
+        except ValueError:
+            raise HTTPError(400, "limit must be an integer")
+        if not 1 <= limit <= maximum:
+            raise HTTPError(400, f"limit must be between 1 and {maximum}")
+        return limit
+
+    async def route(self, path: str, params: Dict[str, list]) -> Any:
+        """Dispatch a GET request to the matching analytics query."""
+        parts = [p for p in path.split('/') if p]
+
+        if parts == ['health']:
+            return {'status': 'ok', 'inflight': len(self.inflight)}
+        if parts == ['summary']:
+            return await self.query('generate_summary_report')
+        if parts == ['agencies', 'metrics']:
+            return await self.query('get_agency_metrics', self._limit(params, None))
+        if parts == ['agencies', 'rvi']:
+            return await self.query('get_top_agencies_by_rvi', self._limit(params, 20))
+        if parts == ['trends', 'yearly']:
+            return await self.query('get_correction_trends_yearly')
+        if parts == ['trends', 'titles']:
+            return await self.query('get_correction_trends_by_title', self._limit(params, 20))
+        if parts == ['time-series']:
+            return await self.query('get_time_series_data')
+        if parts == ['word-counts']:
+            return await self.query('calculate_word_counts')
+        if len(parts) == 2 and parts[0] == 'agencies':
+            detail = await self.query('get_agency_detail', parts[1])
+            if detail is None:
+                raise HTTPError(404, "Agency not found")
+            return detail
+        if len(parts) == 3 and parts[0] == 'agencies' and parts[2] == 'rollup':
+            rollup = await self.query('get_agency_rollup', parts[1])
+            if rollup is None:
+                raise HTTPError(404, "Agency not found")
+            return rollup
+        if len(parts) == 3 and parts[0] == 'agencies' and parts[2] == 'corrections':
+            return await self.query(
+                'get_corrections_for_agency', parts[1], self._limit(params, 100)
+            )
+
+        raise HTTPError(404, "Not found")
+
+    # ------------------------------------------------------------------
+    # ASGI
+    # ------------------------------------------------------------------
+
+    async def _lifespan(self, receive: Callable, send: Callable):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        content_type = b'application/json'
+        try:
+            if scope['method'] not in ('GET', 'HEAD'):
+                raise HTTPError(405, "Method not allowed")
+            if scope['path'].rstrip('/') == '/metrics':
+                status, body = 200, self.tracer.prometheus().encode('utf-8')
+                content_type = b'text/plain; version=0.0.4; charset=utf-8'
+            else:
+                params = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+                status, body = 200, encode_json(await self.route(scope['path'], params))
+        except HTTPError as e:
+            status, body = e.status, encode_json({'error': e.message})
+        except Exception as e:
+            status, body = 500, encode_json({'error': str(e)})
+
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [
+                (b'content-type', content_type),
+                (b'content-length', str(len(body)).encode('ascii')),
+            ],
+        })
+        await send({
+            'type': 'http.response.body',
+            'body': b'' if scope['method'] == 'HEAD' else body,
+        })
+
+
+app = AnalyticsAPI(
+    os.getenv('DUCKDB_PATH', str(Path(__file__).parent / 'ecfr_analytics.duckdb')),
+    max_workers=int(os.getenv('ANALYTICS_WORKERS', '4')),
+)
+
+
+def main():
+    """Serve the analytics API with uvicorn."""
+    import uvicorn
+
+    uvicorn.run(app, host='0.0.0.0', port=int(os.getenv('PORT', '5001')))
+
+
+if __name__ == '__main__':
+    main()
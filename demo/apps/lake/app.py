@@ -1,22 +1,207 @@
-from flask import Flask, jsonify
-import json
+from datetime import date
+from flask import Flask, Response, jsonify, request, send_file
 import os
+from arrow_results import ARROW_MIMETYPE, ResultStore, table_records
+from corrections_index import CorrectionsIndex, project
+from json_cache import CachedJSONFile
+from streaming import NDJSON_MIMETYPE, duckdb_records, json_array_stream, ndjson_stream
 app = Flask(__name__)
 
+# Parsed and encoded once, re-read only when the file changes on disk
+ECFR_JSON_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'json/usds/ecfr')
+AGENCIES = CachedJSONFile(os.path.join(ECFR_JSON_DIR, 'agencies.json'))
+CORRECTIONS = CachedJSONFile(os.path.join(ECFR_JSON_DIR, 'corrections.json'))
+DUCKDB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ecfr_analytics.duckdb')
+# Arrow result tables published by analytics.py, memory-mapped per request
+RESULTS = ResultStore(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'exports', 'results'))
+
+CORRECTIONS_FILTERS = ('year', 'title', 'cfr_reference', 'start_date', 'end_date', 'after', 'limit', 'fields')
+DUCKDB_CORRECTION_FIELDS = (
+    'id', 'ecfr_id', 'cfr_reference', 'title', 'chapter', 'part', 'section',
+    'corrective_action', 'error_occurred', 'error_corrected', 'lag_days',
+    'fr_citation', 'year', 'checksum',
+)
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def corrections_index():
+    """Corrections index for the current version of corrections.json."""
+    return CORRECTIONS.derived('index', CorrectionsIndex)
+
+
+def parse_corrections_query(args, known_fields, paginated=True):
+    """
+    Validate /corrections query parameters.
+
+    Args:
+        args: Request query parameters
+        known_fields: Field names that may be projected
+        paginated: Whether limit applies (streams return every match)
+
+    Returns:
+        Keyword arguments for CorrectionsIndex.query
+
+    Raises:
+        ValueError: If a parameter is malformed
+    """
+    query = {}
+    for name in ('year', 'title', 'after'):
+        if name in args:
+            try:
+                query[name] = int(args[name])
+            except ValueError:
+                raise ValueError(f"{name} must be an integer")
+
+    if args.get('cfr_reference'):
+        query['cfr_reference'] = args['cfr_reference']
+
+    for name in ('start_date', 'end_date'):
+        if name in args:
+            try:
+                query[name] = date.fromisoformat(args[name]).isoformat()
+            except ValueError:
+                raise ValueError(f"{name} must be a YYYY-MM-DD date")
+
+    if paginated:
+        try:
+            limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+        except ValueError:
+            raise ValueError("limit must be an integer")
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+        query['limit'] = limit
+
+    if args.get('fields'):
+        fields = [f.strip() for f in args['fields'].split(',') if f.strip()]
+        unknown = sorted(set(fields) - set(known_fields))
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        query['fields'] = fields
+
+    return query
+
+
 @app.route('/agencies', methods=['GET'])
 def names():
-    obj = 'json/usds/ecfr/agencies.json'
-    if not os.path.exists(obj):
+    response = AGENCIES.response()
+    if response is None:
         return jsonify({"error": "File not found"}), 404
-    with open(obj, 'r') as f:
-        data = json.load(f)
-    return jsonify(data), 200
+    return response
 
 @app.route('/corrections', methods=['GET'])
 def fizz():
-    obj = 'json/usds/ecfr/corrections.json'
-    if not os.path.exists(obj):
+    # Without filters the whole file is served from the pre-encoded cache
+    if not any(name in request.args for name in CORRECTIONS_FILTERS):
+        response = CORRECTIONS.response()
+        if response is None:
+            return jsonify({"error": "File not found"}), 404
+        return response
+
+    if not CORRECTIONS.refresh():
         return jsonify({"error": "File not found"}), 404
-    with open(obj, 'r') as f:
-        data = json.load(f)
-    return jsonify(data), 200
+    index = corrections_index()
+    try:
+        query = parse_corrections_query(request.args, index.fields)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(index.query(**query)), 200
+
+
+def corrections_from_duckdb(query):
+    """Stream corrections_parsed rows matching the parsed query filters."""
+    conditions = []
+    params = []
+    for name, clause in (
+        ('year', 'year = ?'),
+        ('title', 'title = ?'),
+        ('cfr_reference', "starts_with(cfr_reference, ?)"),
+        ('start_date', 'error_corrected >= CAST(? AS DATE)'),
+        ('end_date', 'error_corrected <= CAST(? AS DATE)'),
+        ('after', 'ecfr_id > ?'),
+    ):
+        if name in query:
+            conditions.append(clause)
+            params.append(query[name])
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    return duckdb_records(DUCKDB_PATH, f"""
+        SELECT {', '.join(DUCKDB_CORRECTION_FIELDS)} FROM corrections_parsed
+        {where}
+        ORDER BY ecfr_id
+    """, params)
+
+
+def stream_response(key, records):
+    """Stream records as NDJSON (default) or as a chunked JSON document."""
+    if request.args.get('format', 'ndjson') == 'json':
+        return Response(json_array_stream(key, records), mimetype='application/json')
+    return Response(ndjson_stream(records), mimetype=NDJSON_MIMETYPE)
+
+
+@app.route('/agencies/stream', methods=['GET'])
+def stream_agencies():
+    if request.args.get('format', 'ndjson') not in ('ndjson', 'json'):
+        return jsonify({"error": "format must be ndjson or json"}), 400
+    if not AGENCIES.refresh():
+        return jsonify({"error": "File not found"}), 404
+    return stream_response('agencies', iter(AGENCIES.data.get('agencies', [])))
+
+@app.route('/corrections/stream', methods=['GET'])
+def stream_corrections():
+    if request.args.get('format', 'ndjson') not in ('ndjson', 'json'):
+        return jsonify({"error": "format must be ndjson or json"}), 400
+    source = request.args.get('source', 'file')
+    if source not in ('file', 'duckdb'):
+        return jsonify({"error": "source must be file or duckdb"}), 400
+
+    # The DuckDB source doesn't need corrections.json or its index
+    if source == 'duckdb':
+        if not os.path.exists(DUCKDB_PATH):
+            return jsonify({"error": "Database not found"}), 404
+        known_fields = DUCKDB_CORRECTION_FIELDS
+    else:
+        if not CORRECTIONS.refresh():
+            return jsonify({"error": "File not found"}), 404
+        index = corrections_index()
+        known_fields = index.fields
+    try:
+        query = parse_corrections_query(request.args, known_fields, paginated=False)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    fields = query.pop('fields', None)
+
+    if source == 'duckdb':
+        records = corrections_from_duckdb(query)
+    else:
+        # Records are shared with the index, not copied
+        records = index.matching(**query)
+
+    return stream_response('ecfr_corrections', (project(r, fields) for r in records))
+
+@app.route('/results', methods=['GET'])
+def results_manifest():
+    manifest = RESULTS.manifest()
+    if manifest is None:
+        return jsonify({"error": "No results published"}), 404
+    return jsonify(manifest), 200
+
+@app.route('/results/<name>', methods=['GET'])
+def result_table(name):
+    output_format = request.args.get('format', 'ndjson')
+    if output_format not in ('ndjson', 'json', 'arrow'):
+        return jsonify({"error": "format must be ndjson, json or arrow"}), 400
+    # One manifest read per request, so the path and the table agree
+    manifest = RESULTS.manifest()
+    path = RESULTS.path(name, manifest) if manifest else None
+    if path is None:
+        return jsonify({"error": "Result not found"}), 404
+
+    if output_format == 'arrow':
+        # The IPC file as published; clients map or read it without decoding
+        return send_file(path, mimetype=ARROW_MIMETYPE, download_name=path.name)
+    return stream_response(name, table_records(RESULTS.open(name, manifest)))
+
+# Build the corrections index at startup rather than on the first request
+if CORRECTIONS.refresh():
+    corrections_index()
@@ -0,0 +1,362 @@
+"""
+Arrow Result Sets
+
+The analytics stage publishes its result tables as Arrow IPC files so the
+stages after it on the same host (the Postgres ETL, the Flask app) read
+them by memory-mapping instead of re-running the queries or parsing JSON.
+
+- Each publish writes a new version directory (<results>/v000042/) with
+  one uncompressed <table>.arrow file per table
+- manifest.json records the current version, the database the tables were
+  computed from (path, size and mtime of its generation) and each table's
+  file, rows, bytes and schema. It is swapped with os.replace, so readers
+  see all of a version or none of it
+- Readers map the files with pyarrow.memory_map: column buffers point into
+  the page cache, shared by every process that opens the same version
+- Versions older than the last KEEP_VERSIONS are removed on publish. A
+  reader that mapped a removed file keeps its mapping (unlinked files stay
+  readable on POSIX), and new readers follow the manifest
+
+The result queries live here rather than in the ETL so the analytics stage
+can compute them once; the ETL runs the same SQL against DuckDB when no
+matching results were published.
+
+Usage:
+    python arrow_results.py [results_dir]    # show the published manifest
+"""
+
+import json
+import os
+import shutil
+import sys
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pyarrow as pa
+
+
+MANIFEST_FILE = 'manifest.json'
+KEEP_VERSIONS = 2
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.file'
+
+# Tiered word count estimate per agency (see ECFRAnalytics.calculate_word_counts)
+WORD_COUNTS_SQL = """
+    SELECT
+        agency_slug,
+        SUM(CASE
+            WHEN part IS NOT NULL THEN 2000
+            WHEN chapter IS NOT NULL THEN 10000
+            ELSE 50000
+        END)::BIGINT as word_count
+    FROM cfr_references
+    GROUP BY agency_slug
+"""
+
+# Result tables in the column order of their PostgreSQL tables
+RESULT_QUERIES = {
+    'agencies': """
+        SELECT
+            slug,
+            name,
+            short_name,
+            parent_slug,
+            cfr_reference_count as total_cfr_references,
+            child_count,
+            checksum
+        FROM agencies_parsed
+        ORDER BY id
+    """,
+    'agency_metrics': f"""
+        WITH word_counts AS ({WORD_COUNTS_SQL})
+        SELECT
+            am.slug,
+            am.total_corrections,
+            am.years_with_corrections,
+            am.first_correction_year,
+            am.last_correction_year,
+            am.avg_correction_lag_days,
+            am.rvi,
+            COALESCE(wc.word_count, 0) as word_count_estimate
+        FROM agency_metrics am
+        LEFT JOIN word_counts wc ON wc.agency_slug = am.slug
+        ORDER BY am.slug
+    """,
+    'correction_time_series': """
+        SELECT
+            year,
+            month,
+            correction_count,
+            avg_lag_days
+        FROM correction_time_series
+        ORDER BY year, month
+    """,
+    'cfr_title_stats': """
+        SELECT
+            title,
+            correction_count,
+            years_active,
+            first_year,
+            last_year,
+            avg_lag_days
+        FROM correction_trends_by_title
+        ORDER BY title
+    """,
+    'agency_closure': """
+        SELECT
+            ancestor_slug,
+            descendant_slug,
+            depth
+        FROM agency_closure
+        ORDER BY ancestor_slug, depth, descendant_slug
+    """,
+    'agency_rollups': """
+        SELECT
+            slug,
+            descendant_count,
+            max_depth,
+            cfr_reference_count,
+            total_corrections,
+            years_with_corrections,
+            first_correction_year,
+            last_correction_year,
+            avg_correction_lag_days,
+            rvi,
+            word_count_estimate
+        FROM agency_rollups
+        ORDER BY slug
+    """,
+    # Values are rounded the same way agency_metrics stores them, so ranks
+    # match what the API previously computed per request
+    'report_scorecard': f"""
+        WITH word_counts AS ({WORD_COUNTS_SQL}),
+        ranked_agencies AS (
+            SELECT
+                am.slug,
+                am.name,
+                am.short_name,
+                am.total_corrections,
+                am.rvi,
+                COALESCE(wc.word_count, 0) as word_count_estimate,
+                ROUND(am.avg_correction_lag_days, 2) as avg_correction_lag_days,
+                am.cfr_reference_count as total_cfr_references
+            FROM agency_metrics am
+            LEFT JOIN word_counts wc ON wc.agency_slug = am.slug
+            WHERE am.total_corrections > 0
+        ),
+        scored_agencies AS (
+            SELECT
+                *,
+                RANK() OVER (ORDER BY total_corrections DESC) as corrections_rank,
+                RANK() OVER (ORDER BY rvi DESC) as rvi_rank,
+                RANK() OVER (ORDER BY word_count_estimate DESC) as size_rank,
+                RANK() OVER (ORDER BY avg_correction_lag_days ASC NULLS LAST) as responsiveness_rank,
+                COUNT(*) OVER () as total_agencies
+            FROM ranked_agencies
+        )
+        SELECT
+            slug,
+            name,
+            short_name,
+            total_corrections,
+            rvi,
+            word_count_estimate,
+            avg_correction_lag_days,
+            total_cfr_references,
+            corrections_rank,
+            rvi_rank,
+            size_rank,
+            responsiveness_rank,
+            -- Weight: corrections 30%, RVI 25%, size 20%, responsiveness 25%
+            ROUND((
+                (corrections_rank::DOUBLE / total_agencies * 0.30) +
+                (rvi_rank::DOUBLE / total_agencies * 0.25) +
+                (size_rank::DOUBLE / total_agencies * 0.20) +
+                (responsiveness_rank::DOUBLE / total_agencies * 0.25)
+            ) * 100, 2) as composite_score,
+            CASE
+                WHEN corrections_rank::DOUBLE / total_agencies <= 0.20 THEN 'A'
+                WHEN corrections_rank::DOUBLE / total_agencies <= 0.40 THEN 'B'
+                WHEN corrections_rank::DOUBLE / total_agencies <= 0.60 THEN 'C'
+                WHEN corrections_rank::DOUBLE / total_agencies <= 0.80 THEN 'D'
+                ELSE 'F'
+            END as activity_grade
+        FROM scored_agencies
+        ORDER BY composite_score DESC, slug
+    """,
+    'report_word_count': f"""
+        WITH word_counts AS ({WORD_COUNTS_SQL})
+        SELECT
+            am.slug,
+            am.name,
+            am.short_name,
+            wc.word_count as word_count_estimate,
+            am.total_corrections,
+            am.rvi,
+            am.cfr_reference_count as total_cfr_references
+        FROM agency_metrics am
+        INNER JOIN word_counts wc ON wc.agency_slug = am.slug
+        WHERE wc.word_count > 0
+        ORDER BY wc.word_count DESC, am.slug
+    """,
+}
+
+# Views export_for_postgres writes as JSON, published alongside
+EXPORT_VIEWS = [
+    'export_agencies',
+    'export_corrections',
+    'export_agency_metrics',
+    'export_correction_time_series',
+]
+
+
+def source_stamp(path: str) -> Dict[str, Any]:
+    """Identity of the database generation results are computed from."""
+    real = os.path.realpath(path)
+    stat = os.stat(real)
+    return {'path': real, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def table_rows(table: pa.Table) -> List[tuple]:
+    """Rows of a table as tuples in column order (as DuckDB's fetchall)."""
+    return list(zip(*(column.to_pylist() for column in table.columns)))
+
+
+def table_records(table: pa.Table, batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+    """Rows of a table as dicts, converted one record batch at a time."""
+    for batch in table.to_batches(max_chunksize=batch_size):
+        yield from batch.to_pylist()
+
+
+class ResultStore:
+    """Versioned Arrow IPC result tables in one directory."""
+
+    def __init__(self, directory: str, keep: int = KEEP_VERSIONS):
+        """
+        Initialize store.
+
+        Args:
+            directory: Results directory (created on first publish)
+            keep: Versions kept on disk, the current one included
+        """
+        self.directory = Path(directory)
+        self.keep = max(1, keep)
+        self.manifest_path = self.directory / MANIFEST_FILE
+
+    def manifest(self) -> Optional[Dict[str, Any]]:
+        """The published manifest (None before the first publish)."""
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def matches(self, source: str, manifest: Optional[Dict[str, Any]] = None) -> bool:
+        """Whether the published results were computed from this database generation."""
+        manifest = manifest or self.manifest()
+        try:
+            return manifest is not None and manifest['source'] == source_stamp(source)
+        except OSError:
+            return False
+
+    def publish(self, tables: Iterable[Tuple[str, pa.Table]], source: str) -> Dict[str, Any]:
+        """
+        Write tables as a new version and make it current.
+
+        Args:
+            tables: (name, table) pairs, written as they are produced
+            source: Database the tables were computed from
+
+        Returns:
+            The new manifest
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        previous = self.manifest()
+        versions = [int(path.name[1:]) for path in self.directory.glob('v[0-9]*') if path.is_dir()]
+        version = max(versions + [previous['version'] if previous else 0]) + 1
+        name = f"v{version:06d}"
+        building = self.directory / f".{name}.{uuid.uuid4().hex[:8]}"
+        building.mkdir()
+
+        entries = {}
+        try:
+            for table_name, table in tables:
+                path = building / f"{table_name}.arrow"
+                # Uncompressed, so readers can map buffers without decoding
+                with pa.OSFile(str(path), 'wb') as sink:
+                    with pa.ipc.new_file(sink, table.schema) as writer:
+                        writer.write_table(table)
+                entries[table_name] = {
+                    'file': f"{name}/{path.name}",
+                    'rows': table.num_rows,
+                    'bytes': path.stat().st_size,
+                    'schema': [[field.name, str(field.type)] for field in table.schema],
+                }
+            os.rename(building, self.directory / name)
+        except BaseException:
+            shutil.rmtree(building, ignore_errors=True)
+            raise
+
+        manifest = {
+            'version': version,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'source': source_stamp(source),
+            'tables': entries,
+        }
+        tmp = self.directory / f".{MANIFEST_FILE}.{uuid.uuid4().hex[:8]}"
+        tmp.write_text(json.dumps(manifest, indent=2))
+        os.replace(tmp, self.manifest_path)
+        self.collect(version)
+        return manifest
+
+    def collect(self, current: int) -> List[Path]:
+        """Remove versions older than the last keep; returns what was removed."""
+        removed = []
+        for path in sorted(self.directory.glob('v[0-9]*')):
+            if path.is_dir() and int(path.name[1:]) <= current - self.keep:
+                shutil.rmtree(path, ignore_errors=True)
+                removed.append(path)
+        return removed
+
+    def path(self, name: str, manifest: Optional[Dict[str, Any]] = None) -> Optional[Path]:
+        """File holding a table in the current version (None if not published)."""
+        manifest = manifest or self.manifest()
+        entry = manifest['tables'].get(name) if manifest else None
+        return self.directory / entry['file'] if entry else None
+
+    def open(self, name: str, manifest: Optional[Dict[str, Any]] = None) -> Optional[pa.Table]:
+        """
+        Memory-map a published table.
+
+        Args:
+            name: Table name
+            manifest: Version to read (the current one when None)
+
+        Returns:
+            A table whose buffers reference the mapped file, or None if the
+            table is not published
+        """
+        path = self.path(name, manifest)
+        if path is None:
+            return None
+        return pa.ipc.open_file(pa.memory_map(str(path), 'r')).read_all()
+
+
+def main():
+    """Print the published result manifest."""
+    directory = sys.argv[1] if len(sys.argv) > 1 else Path(__file__).parent / 'exports' / 'results'
+    manifest = ResultStore(directory).manifest()
+    if manifest is None:
+        print(f"❌ No results published in {directory}")
+        print("Run analytics.py first to publish them.")
+        return
+
+    print(f"📦 Results v{manifest['version']} ({manifest['created_at']})")
+    print(f"   Source: {manifest['source']['path']}")
+    for name, entry in manifest['tables'].items():
+        print(f"  {name}: {entry['rows']:,} rows, {entry['bytes'] / 1024:,.1f} KiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,469 @@
+"""
+Pipeline Benchmark Suite
+
+Times every stage of the lake pipeline at one or more data scale factors:
+
+- checksums:  add_checksums_to_agencies / add_checksums_to_corrections
+- ingestion:  ECFRIngestion.load_agencies / load_corrections /
+              build_hierarchy
+- analytics:  every ECFRAnalytics getter, export_for_postgres and
+              publish_results
+- etl:        each DuckDBToPostgresETL.transfer_* step
+
+Data is generated by synthetic.py at the requested multiple of the sample
+size (or, with --data sample, replicated from the sample files).
+
+Each step records wall time, rows processed, rows/sec and peak RSS.
+Results are written as JSON and can be saved as a baseline; later runs
+compared against it fail when a step slows down past the threshold.
+
+Postgres steps use BENCHMARK_DATABASE_URL (or --postgres-url), otherwise a
+throwaway cluster started with initdb/pg_ctl if they are on PATH, and are
+skipped when neither is available. The benchmark never touches the
+DATABASE_URL used by the application.
+
+Usage:
+    python benchmark.py --scales 0.5 1 4 -o results.json
+    python benchmark.py --scales 1 --save-baseline baselines/benchmark.json
+    python benchmark.py --scales 1 --baseline baselines/benchmark.json
+"""
+
+import argparse
+import copy
+import json
+import math
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import duckdb
+
+from analytics import ECFRAnalytics
+from checksums import add_checksums_to_agencies, add_checksums_to_corrections
+from ingestion import ECFRIngestion
+from synthetic import MAX_PARENT_AGENCIES, SampleProfile, synthetic_dataset
+from telemetry import RSSSampler
+
+
+SOURCE_DIR = Path(__file__).parent / 'json' / 'usds' / 'ecfr'
+
+# Steps faster than this are too noisy to flag as regressions
+MIN_REGRESSION_SECONDS = 0.05
+
+
+# ----------------------------------------------------------------------
+# Measurement
+# ----------------------------------------------------------------------
+
+class BenchmarkRun:
+    """Collects step timings for one scale factor."""
+
+    def __init__(self, scale: float):
+        self.scale = scale
+        self.steps: Dict[str, Dict[str, Any]] = {}
+
+    def measure(self, name: str, func: Callable[[], Any], rows: Optional[Callable[[Any], int]] = None) -> Any:
+        """
+        Time one step.
+
+        Args:
+            name: Step name, e.g. 'ingestion.load_corrections'
+            func: Zero-argument callable running the step
+            rows: Function of the step's result returning rows processed
+
+        Returns:
+            The step's result
+        """
+        with RSSSampler() as sampler:
+            start = time.perf_counter()
+            result = func()
+            seconds = time.perf_counter() - start
+
+        row_count = rows(result) if rows else None
+        self.steps[name] = {
+            'seconds': round(seconds, 4),
+            'rows': row_count,
+            'rows_per_sec': round(row_count / seconds, 1) if row_count and seconds else None,
+            'peak_rss_mb': round(sampler.peak / (1024 * 1024), 1),
+        }
+        rate = f", {self.steps[name]['rows_per_sec']:,.0f} rows/s" if self.steps[name]['rows_per_sec'] else ''
+        print(f"  ⏱️  {name}: {seconds * 1000:.1f} ms{rate}")
+        return result
+
+    def skip(self, name: str, reason: str):
+        self.steps[name] = {'skipped': reason}
+        print(f"  ⏭️  {name}: skipped ({reason})")
+
+
+# ----------------------------------------------------------------------
+# Data scaling
+# ----------------------------------------------------------------------
+
+def _with_suffix(agency: Dict[str, Any], suffix: str) -> Dict[str, Any]:
+    agency = copy.deepcopy(agency)
+    agency['slug'] += suffix
+    for child in agency.get('children', []):
+        child['slug'] += suffix
+    return agency
+
+
+def scale_dataset(agencies: Dict[str, Any], corrections: Dict[str, Any], factor: float):
+    """
+    Resize the sample data by a scale factor.
+
+    Factors below 1 take a prefix of each list. Larger factors replicate
+    records: corrections get ids offset by the source id span, agencies get
+    a slug suffix per copy (capped at MAX_PARENT_AGENCIES parents).
+
+    Returns:
+        Tuple of (agencies_data, corrections_data) without checksums
+    """
+    source_agencies = agencies['agencies']
+    source_corrections = corrections['ecfr_corrections']
+
+    agency_target = min(max(1, round(len(source_agencies) * factor)), MAX_PARENT_AGENCIES)
+    scaled_agencies = []
+    for copy_index in range(math.ceil(agency_target / len(source_agencies))):
+        suffix = f"-x{copy_index}" if copy_index else ''
+        scaled_agencies.extend(_with_suffix(a, suffix) for a in source_agencies)
+
+    correction_target = max(1, round(len(source_corrections) * factor))
+    id_span = max(c['id'] for c in source_corrections)
+    scaled_corrections = []
+    for copy_index in range(math.ceil(correction_target / len(source_corrections))):
+        for correction in source_corrections:
+            correction = copy.deepcopy(correction)
+            correction['id'] += copy_index * id_span
+            scaled_corrections.append(correction)
+
+    for record in scaled_agencies + scaled_corrections:
+        record.pop('checksum', None)
+
+    return (
+        {'agencies': scaled_agencies[:agency_target]},
+        {'ecfr_corrections': scaled_corrections[:correction_target]},
+    )
+
+
+# ----------------------------------------------------------------------
+# PostgreSQL
+# ----------------------------------------------------------------------
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def local_postgres() -> Iterator[Optional[str]]:
+    """
+    Start a throwaway PostgreSQL cluster if initdb and pg_ctl are available.
+
+    Yields:
+        Connection URL, or None when no cluster could be started
+    """
+    if not (shutil.which('initdb') and shutil.which('pg_ctl')):
+        yield None
+        return
+
+    data_dir = tempfile.mkdtemp(prefix='benchmark-pg-')
+    port = _free_port()
+    try:
+        subprocess.run(
+            ['initdb', '-D', data_dir, '-U', 'benchmark', '--auth=trust', '-E', 'UTF8'],
+            check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        subprocess.run(
+            ['pg_ctl', '-D', data_dir, '-w', '-l', os.path.join(data_dir, 'server.log'),
+             '-o', f"-p {port} -k {data_dir} -c listen_addresses=127.0.0.1", 'start'],
+            check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"  ⚠️  Could not start a local PostgreSQL cluster: {e}")
+        shutil.rmtree(data_dir, ignore_errors=True)
+        yield None
+        return
+
+    try:
+        yield f"postgresql://benchmark@127.0.0.1:{port}/postgres"
+    finally:
+        subprocess.run(
+            ['pg_ctl', '-D', data_dir, '-m', 'fast', 'stop'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def reset_postgres(etl):
+    """Empty every table the transfers write, including corrections partitions."""
+    etl.initialize_postgres_schema()
+    etl.clear_postgres_data()
+    for year in list(etl.correction_partitions()):
+        etl.drop_correction_partition(year)
+
+
+# ----------------------------------------------------------------------
+# Benchmark stages
+# ----------------------------------------------------------------------
+
+def bench_checksums(run: BenchmarkRun, agencies: Dict[str, Any], corrections: Dict[str, Any]):
+    agency_rows = sum(1 + len(a.get('children', [])) for a in agencies['agencies'])
+    run.measure('checksums.add_checksums_to_agencies',
+                lambda: add_checksums_to_agencies(agencies), lambda _: agency_rows)
+    run.measure('checksums.add_checksums_to_corrections',
+                lambda: add_checksums_to_corrections(corrections),
+                lambda data: len(data['ecfr_corrections']))
+
+
+def bench_ingestion(run: BenchmarkRun, work_dir: Path, db_path: Path,
+                    agencies: Dict[str, Any], corrections: Dict[str, Any]):
+    agencies_json = work_dir / 'agencies.json'
+    corrections_json = work_dir / 'corrections.json'
+    agencies_json.write_text(json.dumps(agencies))
+    corrections_json.write_text(json.dumps(corrections))
+
+    pipeline = ECFRIngestion(str(db_path))
+    try:
+        pipeline.connect()
+        pipeline.initialize_schema()
+        run.measure('ingestion.load_agencies',
+                    lambda: pipeline.load_agencies(agencies_json), lambda counts: sum(counts))
+        run.measure('ingestion.load_corrections',
+                    lambda: pipeline.load_corrections(corrections_json), lambda count: count)
+        run.measure('ingestion.build_hierarchy', pipeline.build_hierarchy, lambda counts: sum(counts))
+    finally:
+        pipeline.close()
+
+
+def bench_analytics(run: BenchmarkRun, work_dir: Path, db_path: Path):
+    analytics = ECFRAnalytics(str(db_path))
+    try:
+        analytics.connect()
+        slug = analytics.conn.execute(
+            "SELECT slug FROM agency_metrics ORDER BY total_corrections DESC LIMIT 1"
+        ).fetchone()[0]
+
+        getters = [
+            ('get_agency_metrics', lambda: analytics.get_agency_metrics()),
+            ('get_correction_trends_yearly', analytics.get_correction_trends_yearly),
+            ('get_correction_trends_by_title', analytics.get_correction_trends_by_title),
+            ('get_time_series_data', analytics.get_time_series_data),
+            ('get_top_agencies_by_rvi', analytics.get_top_agencies_by_rvi),
+            ('get_agency_detail', lambda: analytics.get_agency_detail(slug)),
+            ('get_corrections_for_agency', lambda: analytics.get_corrections_for_agency(slug)),
+            ('calculate_word_counts', analytics.calculate_word_counts),
+            ('generate_summary_report', analytics.generate_summary_report),
+        ]
+        for name, getter in getters:
+            run.measure(f'analytics.{name}', getter,
+                        lambda result: len(result) if isinstance(result, (list, dict)) else 1)
+
+        try:
+            import pandas  # noqa: F401  (export_for_postgres uses fetchdf)
+        except ImportError:
+            run.skip('analytics.export_for_postgres', 'pandas not installed')
+        else:
+            run.measure('analytics.export_for_postgres',
+                        lambda: analytics.export_for_postgres(work_dir / 'exports'))
+        run.measure('analytics.publish_results',
+                    lambda: analytics.publish_results(work_dir / 'exports' / 'results'),
+                    lambda manifest: sum(entry['rows'] for entry in manifest['tables'].values()))
+    finally:
+        analytics.close()
+
+
+def bench_etl(run: BenchmarkRun, db_path: Path, postgres_url: Optional[str]):
+    steps = [
+        'transfer_agencies', 'transfer_corrections', 'transfer_agency_metrics', 'transfer_hierarchy',
+        'transfer_time_series', 'transfer_cfr_title_stats', 'transfer_reports',
+    ]
+    if not postgres_url:
+        for step in steps:
+            run.skip(f'etl.{step}', 'no PostgreSQL available')
+        return
+
+    from etl_to_postgres import DuckDBToPostgresETL
+
+    etl = DuckDBToPostgresETL(str(db_path), postgres_url)
+    try:
+        etl.connect()
+        reset_postgres(etl)
+        etl.begin_run()
+        for step in steps:
+            run.measure(f'etl.{step}', getattr(etl, step), lambda count: count)
+        etl.log_etl_run(0, 'success')
+    finally:
+        etl.close()
+
+
+def build_dataset(scale: float, data: str = 'synthetic', seed: int = 42):
+    """
+    Build the dataset for one scale factor.
+
+    Args:
+        scale: Size relative to the sample data
+        data: 'synthetic' for generated records fitted to the sample,
+            'sample' for replicated sample records
+        seed: Seed for synthetic data
+
+    Returns:
+        Tuple of (agencies_data, corrections_data) without checksums
+    """
+    with open(SOURCE_DIR / 'agencies.json') as f:
+        source_agencies = json.load(f)
+    with open(SOURCE_DIR / 'corrections.json') as f:
+        source_corrections = json.load(f)
+
+    if data == 'sample':
+        return scale_dataset(source_agencies, source_corrections, scale)
+
+    profile = SampleProfile(source_agencies, source_corrections)
+    return synthetic_dataset(
+        min(max(1, round(len(source_agencies['agencies']) * scale)), MAX_PARENT_AGENCIES),
+        max(1, round(len(source_corrections['ecfr_corrections']) * scale)),
+        seed=seed,
+        profile=profile,
+    )
+
+
+def run_scale(scale: float, postgres_url: Optional[str], data: str = 'synthetic') -> Dict[str, Any]:
+    """Run every benchmark stage at one scale factor."""
+    print(f"\n📏 Scale factor {scale} ({data} data)")
+
+    agencies, corrections = build_dataset(scale, data)
+
+    run = BenchmarkRun(scale)
+    with tempfile.TemporaryDirectory(prefix='benchmark-') as tmp:
+        work_dir = Path(tmp)
+        db_path = work_dir / 'benchmark.duckdb'
+
+        bench_checksums(run, agencies, corrections)
+        bench_ingestion(run, work_dir, db_path, agencies, corrections)
+        bench_analytics(run, work_dir, db_path)
+        bench_etl(run, db_path, postgres_url)
+
+    return {
+        'agencies': sum(1 + len(a.get('children', [])) for a in agencies['agencies']),
+        'corrections': len(corrections['ecfr_corrections']),
+        'steps': run.steps,
+    }
+
+
+def run_benchmarks(scales: List[float], postgres_url: Optional[str] = None, use_postgres: bool = True,
+                   data: str = 'synthetic') -> Dict[str, Any]:
+    """
+    Run the suite at each scale factor.
+
+    Args:
+        scales: Data scale factors (1 = the size of the sample data)
+        postgres_url: Database for ETL steps (a local cluster is started
+            when None)
+        use_postgres: Set False to skip ETL steps entirely
+        data: 'synthetic' (generated, see synthetic.py) or 'sample'
+            (replicated sample records)
+
+    Returns:
+        JSON-serializable results
+    """
+    results = {
+        'environment': {
+            'python': platform.python_version(),
+            'duckdb': duckdb.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'data': data,
+        },
+        'scales': {},
+    }
+
+    @contextmanager
+    def postgres():
+        if not use_postgres:
+            yield None
+        elif postgres_url:
+            yield postgres_url
+        else:
+            with local_postgres() as url:
+                yield url
+
+    with postgres() as url:
+        for scale in scales:
+            results['scales'][str(scale)] = run_scale(scale, url, data)
+
+    return results
+
+
+def compare_to_baseline(baseline: Dict[str, Any], results: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    Find steps slower than the baseline by more than threshold.
+
+    Returns:
+        List of regression descriptions (empty when none)
+    """
+    regressions = []
+    for scale, current in results['scales'].items():
+        previous = baseline.get('scales', {}).get(scale)
+        if not previous:
+            continue
+        for step, stats in current['steps'].items():
+            before = previous['steps'].get(step, {}).get('seconds')
+            after = stats.get('seconds')
+            if before is None or after is None:
+                continue
+            if after > before * (1 + threshold) and after - before > MIN_REGRESSION_SECONDS:
+                regressions.append(
+                    f"scale {scale} {step}: {before:.3f}s -> {after:.3f}s "
+                    f"(+{(after / before - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def main():
+    """Run the benchmark suite from the command line."""
+    parser = argparse.ArgumentParser(description="Benchmark the lake pipeline")
+    parser.add_argument('--scales', type=float, nargs='+', default=[1.0], help="Data scale factors")
+    parser.add_argument('--postgres-url', default=os.getenv('BENCHMARK_DATABASE_URL'),
+                        help="Database for ETL steps (its tables are emptied)")
+    parser.add_argument('--no-postgres', action='store_true', help="Skip ETL steps")
+    parser.add_argument('--data', choices=['synthetic', 'sample'], default='synthetic',
+                        help="Generated data fitted to the sample, or replicated sample records")
+    parser.add_argument('-o', '--output', type=Path, help="Write results JSON here")
+    parser.add_argument('--baseline', type=Path, help="Baseline JSON to compare against")
+    parser.add_argument('--save-baseline', type=Path, help="Save results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=0.25, help="Allowed slowdown (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("eCFR Pipeline Benchmarks")
+    print("=" * 60)
+
+    results = run_benchmarks(args.scales, args.postgres_url, use_postgres=not args.no_postgres, data=args.data)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(results, indent=2, sort_keys=True) + '\n')
+            print(f"\n✅ Results written to {path}")
+
+    if args.baseline:
+        regressions = compare_to_baseline(json.loads(args.baseline.read_text()), results, args.threshold)
+        print("\n" + "=" * 60)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) against {args.baseline}:")
+            for regression in regressions:
+                print(f"  ⚠️  {regression}")
+            sys.exit(1)
+        print(f"✅ No regressions against {args.baseline} (threshold {args.threshold:.0%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -22,8 +22,8 @@ def calculate_checksum(data: Dict[str, Any]) -> str:
     Returns:
         Hex string of SHA-256 hash
     """
-    # Sort keys for consistent hashing
-    json_str = json.dumps(data, sort_keys=True, separators=(',', ':'))
+    # Sort keys for consistent hashing; decimals and dates hash as their text
+    json_str = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
     return hashlib.sha256(json_str.encode('utf-8')).hexdigest()
 
 
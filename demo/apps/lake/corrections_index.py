@@ -0,0 +1,156 @@
+"""
+In-memory index over eCFR corrections for filtered, paginated queries.
+
+Records are ordered by id; a record's position in that order is its key in
+every index. Year and title map to sorted position lists, while CFR
+references and correction dates are kept as sorted (value, position) pairs
+so prefixes and ranges are found by bisection. A query starts from the
+smallest matching candidate list and checks the remaining filters per
+record, so it touches only records that can match.
+"""
+
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class CorrectionsIndex:
+    """Secondary indexes over the ecfr_corrections array."""
+
+    def __init__(self, data: Dict[str, Any]):
+        """
+        Build indexes.
+
+        Args:
+            data: Parsed corrections.json ({"ecfr_corrections": [...]})
+        """
+        self.records = sorted(data.get('ecfr_corrections', []), key=lambda r: r['id'])
+        self.ids = [r['id'] for r in self.records]
+        self.fields = sorted({field for r in self.records for field in r})
+
+        by_year = defaultdict(list)
+        by_title = defaultdict(list)
+        refs = []
+        dates = []
+        for position, record in enumerate(self.records):
+            by_year[record.get('year')].append(position)
+            by_title[record.get('title')].append(position)
+            for ref in {r['cfr_reference'] for r in record.get('cfr_references', [])}:
+                refs.append((ref, position))
+            if record.get('error_corrected'):
+                dates.append((record['error_corrected'], position))
+
+        self.by_year = dict(by_year)
+        self.by_title = dict(by_title)
+        self.refs = sorted(refs)
+        self.ref_keys = [ref for ref, _ in self.refs]
+        self.dates = sorted(dates)
+        self.date_keys = [d for d, _ in self.dates]
+
+    def _ref_positions(self, prefix: str) -> List[int]:
+        start = bisect_left(self.ref_keys, prefix)
+        positions = set()
+        for ref, position in self.refs[start:]:
+            if not ref.startswith(prefix):
+                break
+            positions.add(position)
+        return sorted(positions)
+
+    def _date_positions(self, start: Optional[str], end: Optional[str]) -> List[int]:
+        lo = bisect_left(self.date_keys, start) if start else 0
+        hi = bisect_right(self.date_keys, end) if end else len(self.date_keys)
+        return sorted(position for _, position in self.dates[lo:hi])
+
+    def matching(
+        self,
+        year: Optional[int] = None,
+        title: Optional[int] = None,
+        cfr_reference: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        after: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Yield corrections matching all given filters, in id order.
+
+        Args:
+            year: Correction year
+            title: CFR title number
+            cfr_reference: Prefix of any of the record's CFR references
+            start_date: Earliest error_corrected date (YYYY-MM-DD, inclusive)
+            end_date: Latest error_corrected date (YYYY-MM-DD, inclusive)
+            after: Only records with id greater than this (keyset cursor)
+
+        Yields:
+            Matching records, lazily, so callers can stop or stream early
+        """
+        candidates = []
+        checks = []
+
+        if year is not None:
+            candidates.append(self.by_year.get(year, []))
+            checks.append(lambda r: r.get('year') == year)
+        if title is not None:
+            candidates.append(self.by_title.get(title, []))
+            checks.append(lambda r: r.get('title') == title)
+        if cfr_reference:
+            candidates.append(self._ref_positions(cfr_reference))
+            checks.append(lambda r: any(
+                ref['cfr_reference'].startswith(cfr_reference)
+                for ref in r.get('cfr_references', [])
+            ))
+        if start_date or end_date:
+            candidates.append(self._date_positions(start_date, end_date))
+            checks.append(lambda r: bool(r.get('error_corrected')) and
+                          (not start_date or r['error_corrected'] >= start_date) and
+                          (not end_date or r['error_corrected'] <= end_date))
+
+        if candidates:
+            # Walk the most selective index and check the other filters per record
+            smallest = min(range(len(candidates)), key=lambda i: len(candidates[i]))
+            positions = candidates[smallest]
+            checks = checks[:smallest] + checks[smallest + 1:]
+        else:
+            positions = range(len(self.records))
+
+        start = 0
+        if after is not None:
+            start = bisect_left(positions, bisect_right(self.ids, after))
+
+        for i in range(start, len(positions)):
+            record = self.records[positions[i]]
+            if all(check(record) for check in checks):
+                yield record
+
+    def query(self, limit: int = 100, fields: Optional[List[str]] = None, **filters) -> Dict[str, Any]:
+        """
+        Return one page of corrections matching all given filters.
+
+        Args:
+            limit: Maximum number of records to return
+            fields: Record fields to include (all when None)
+            **filters: Filters and cursor accepted by matching()
+
+        Returns:
+            Dictionary with the matching ecfr_corrections page and
+            next_after, the cursor for the following page (None at the end)
+        """
+        page = []
+        next_after = None
+        for record in self.matching(**filters):
+            if len(page) == limit:
+                next_after = page[-1]['id']
+                break
+            page.append(record)
+
+        if fields:
+            page = [project(r, fields) for r in page]
+
+        return {'ecfr_corrections': page, 'next_after': next_after}
+
+
+def project(record: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    """Keep only the requested fields of a record (all when fields is None)."""
+    if not fields:
+        return record
+    return {f: record[f] for f in fields if f in record}
@@ -34,9 +34,19 @@ CREATE TABLE IF NOT EXISTS ingestion_log (
     record_count INTEGER NOT NULL,
     file_checksum VARCHAR(64) NOT NULL,
     ingested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    status VARCHAR DEFAULT 'success'
+    status VARCHAR DEFAULT 'success',
+    run_id VARCHAR,
+    duration_ms DOUBLE,
+    bytes_read BIGINT,
+    peak_rss_bytes BIGINT
 );
 
+-- Span metrics (databases created before they were recorded)
+ALTER TABLE ingestion_log ADD COLUMN IF NOT EXISTS run_id VARCHAR;
+ALTER TABLE ingestion_log ADD COLUMN IF NOT EXISTS duration_ms DOUBLE;
+ALTER TABLE ingestion_log ADD COLUMN IF NOT EXISTS bytes_read BIGINT;
+ALTER TABLE ingestion_log ADD COLUMN IF NOT EXISTS peak_rss_bytes BIGINT;
+
 -- ============================================================================
 -- PARSED DATA TABLES (Flattened for analytics)
 -- ============================================================================
@@ -85,6 +95,32 @@ CREATE TABLE IF NOT EXISTS corrections_parsed (
     parsed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Agency hierarchy closure: one row per (ancestor, descendant) pair, each
+-- agency paired with itself at depth 0. Rebuilt by ingestion.build_hierarchy
+CREATE TABLE IF NOT EXISTS agency_closure (
+    ancestor_slug VARCHAR NOT NULL,
+    descendant_slug VARCHAR NOT NULL,
+    depth INTEGER NOT NULL,
+    PRIMARY KEY (ancestor_slug, descendant_slug)
+);
+
+-- Metrics for each agency including all of its sub-agencies. Corrections
+-- are counted once across the subtree's CFR titles, so a department's
+-- total is not the sum of its sub-agencies' totals
+CREATE TABLE IF NOT EXISTS agency_rollups (
+    slug VARCHAR PRIMARY KEY,
+    descendant_count INTEGER NOT NULL,
+    max_depth INTEGER NOT NULL,
+    cfr_reference_count INTEGER NOT NULL,
+    total_corrections INTEGER NOT NULL,
+    years_with_corrections INTEGER NOT NULL,
+    first_correction_year INTEGER,
+    last_correction_year INTEGER,
+    avg_correction_lag_days DOUBLE,
+    rvi DECIMAL(10,2) NOT NULL,
+    word_count_estimate BIGINT NOT NULL
+);
+
 -- ============================================================================
 -- ANALYTICS VIEWS
 -- ============================================================================
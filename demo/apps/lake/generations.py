@@ -0,0 +1,247 @@
+"""
+Blue/Green DuckDB Generations
+
+Rebuilds never touch the database readers have open. Each build writes a
+new generation file, and publishing it swaps a symlink atomically:
+
+    ecfr_analytics.duckdb -> ecfr_analytics.generations/ecfr_analytics.20250101T120000000000-1a2b3c4d.duckdb
+
+- Readers resolve the pointer when they connect (resolve()) and keep
+  reading their generation until they reconnect; ECFRAnalytics.refresh()
+  reconnects long-lived engines once a newer generation is published
+- A build that fails leaves the current generation in place
+- Generation names sort by build start; publishing one older than the
+  current generation is refused, so of two concurrent builds the one that
+  started first can't roll back the other
+- Generations other than the current one are deleted once they have been
+  retired for longer than the grace period (DUCKDB_GENERATION_GRACE
+  seconds, default one hour), after each publish or with
+  `python generations.py gc`
+
+Connections must open the resolved file, not the pointer: DuckDB keeps one
+database instance per path, so a second connection through the pointer
+would return the instance of the generation it pointed to first.
+
+A pre-existing regular database file at the pointer path is adopted as the
+first retired generation on the first publish.
+
+Usage:
+    python generations.py list
+    python generations.py gc --grace 0
+"""
+
+import argparse
+import fcntl
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, List, Optional, Union
+
+
+DEFAULT_GRACE_SECONDS = 3600
+BUILDING_SUFFIX = '.building'
+LOCK_FILE = '.publish.lock'
+SIDECAR_SUFFIXES = ('', '.wal')
+
+
+def resolve(db_path: Union[str, Path]) -> str:
+    """Database file a new connection should open (follows the pointer)."""
+    return os.path.realpath(db_path)
+
+
+def grace_from_env() -> float:
+    return float(os.getenv('DUCKDB_GENERATION_GRACE', DEFAULT_GRACE_SECONDS))
+
+
+class GenerationStore:
+    """Versioned database files behind one pointer path."""
+
+    def __init__(self, pointer: Union[str, Path], grace_seconds: Optional[float] = None):
+        """
+        Initialize store.
+
+        Args:
+            pointer: Path readers open (e.g. ecfr_analytics.duckdb)
+            grace_seconds: How long retired generations are kept
+                (DUCKDB_GENERATION_GRACE when None)
+        """
+        self.pointer = Path(pointer)
+        self.directory = self.pointer.with_name(f"{self.pointer.stem}.generations")
+        self.grace_seconds = grace_from_env() if grace_seconds is None else grace_seconds
+
+    def current(self) -> Optional[Path]:
+        """Generation the pointer refers to (None before the first publish)."""
+        if not self.pointer.exists():
+            return None
+        return Path(resolve(self.pointer))
+
+    def generations(self) -> List[Path]:
+        """Published generation files, oldest first."""
+        if not self.directory.is_dir():
+            return []
+        return sorted(self.directory.glob(f"{self.pointer.stem}.*{self.pointer.suffix}"))
+
+    def new_path(self) -> Path:
+        """A fresh, sortable generation file name."""
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')
+        return self.directory / f"{self.pointer.stem}.{stamp}-{uuid.uuid4().hex[:8]}{self.pointer.suffix}"
+
+    @contextmanager
+    def building(self) -> Iterator[Path]:
+        """
+        Build a new generation and publish it when the block succeeds.
+
+        The block writes the database at the yielded path and must close
+        its connection before leaving. On error, or when a newer build was
+        published meanwhile, the file is removed and the pointer is
+        untouched.
+
+        Yields:
+            Path to create the new database at
+
+        Raises:
+            RuntimeError: If a newer generation was published during the build
+        """
+        target = self.new_path()
+        target.parent.mkdir(parents=True, exist_ok=True)
+        staging = target.with_name(target.name + BUILDING_SUFFIX)
+        try:
+            yield staging
+        except BaseException:
+            _remove(staging)
+            raise
+        os.replace(staging, target)
+        _remove(staging)
+        try:
+            self.publish(target)
+        except RuntimeError:
+            _remove(target)
+            raise
+
+    def publish(self, generation: Path) -> Optional[Path]:
+        """
+        Point readers at a generation and collect expired ones.
+
+        Args:
+            generation: Database file inside the generations directory
+
+        Returns:
+            The generation previously pointed to, if any
+
+        Raises:
+            RuntimeError: If the generation is older than the current one
+        """
+        generation = Path(generation)
+        if generation.parent.resolve() != self.directory.resolve():
+            raise ValueError(f"{generation} is not in {self.directory}")
+        with self._locked():
+            previous = self.current()
+            if previous is not None and self.pointer.is_symlink() and generation.name < previous.name:
+                raise RuntimeError(f"{generation.name} is older than the current generation {previous.name}")
+            if self.pointer.exists() and not self.pointer.is_symlink():
+                # Adopt a database built before generations as a retired one
+                adopted = self.directory / f"{self.pointer.stem}.00000000T000000000000-legacy{self.pointer.suffix}"
+                os.link(self.pointer, adopted)
+                previous = adopted
+
+            link = self.pointer.with_name(f".{self.pointer.name}.{uuid.uuid4().hex[:8]}")
+            os.symlink(os.path.relpath(generation, self.pointer.parent), link)
+            os.replace(link, self.pointer)
+        self.collect()
+        return previous
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Serialize the check and swap of concurrent publishes."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / LOCK_FILE, 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def collect(self, grace_seconds: Optional[float] = None, now: Optional[float] = None) -> List[Path]:
+        """
+        Delete generations retired for longer than the grace period.
+
+        Every generation but the current one is a candidate. One older than
+        the current generation retired when its successor was written, so
+        its age is the successor's modification time; one sorting after it
+        was never published (or lost a publish race) and ages from its own.
+        Abandoned builds are collected by their own age.
+
+        Returns:
+            Deleted generation files
+        """
+        grace = self.grace_seconds if grace_seconds is None else grace_seconds
+        now = time.time() if now is None else now
+        current = self.current()
+        removed = []
+
+        generations = self.generations()
+        for index, generation in enumerate(generations):
+            if current is not None and generation.resolve() == current:
+                continue
+            if current is None or generation.name < current.name:
+                if index + 1 == len(generations):
+                    continue
+                retired_by = generations[index + 1]
+            else:
+                retired_by = generation
+            try:
+                retired_at = retired_by.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if now - retired_at >= grace:
+                _remove(generation)
+                removed.append(generation)
+
+        if self.directory.is_dir():
+            for staging in self.directory.glob(f"*{BUILDING_SUFFIX}"):
+                try:
+                    if now - staging.stat().st_mtime >= max(grace, DEFAULT_GRACE_SECONDS):
+                        _remove(staging)
+                        removed.append(staging)
+                except FileNotFoundError:
+                    continue
+        return removed
+
+
+def _remove(path: Path):
+    """Delete a database file and its WAL, ignoring ones already gone."""
+    for suffix in SIDECAR_SUFFIXES:
+        try:
+            os.unlink(f"{path}{suffix}")
+        except FileNotFoundError:
+            pass
+
+
+def main():
+    """List or garbage-collect database generations."""
+    parser = argparse.ArgumentParser(description="Manage blue/green DuckDB generations")
+    parser.add_argument('command', choices=['list', 'gc'])
+    parser.add_argument('--db', default=str(Path(__file__).parent / 'ecfr_analytics.duckdb'))
+    parser.add_argument('--grace', type=float, help="Seconds retired generations are kept")
+    args = parser.parse_args()
+
+    store = GenerationStore(args.db, grace_seconds=args.grace)
+    if args.command == 'gc':
+        removed = store.collect()
+        print(f"🗑️  Removed {len(removed)} generation(s)")
+        for path in removed:
+            print(f"  {path.name}")
+        return
+
+    current = store.current()
+    print(f"📁 {store.pointer} -> {current.name if current else '(none)'}")
+    for generation in store.generations():
+        marker = '*' if current and generation.resolve() == current else ' '
+        print(f"  {marker} {generation.name} ({generation.stat().st_size / 1024 / 1024:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,34 +3,253 @@ eCFR Data Ingestion Pipeline
 
 Loads agencies and corrections data from JSON files into DuckDB for analytics.
 Handles checksums, data validation, and transformation.
+
+Feed files are parsed incrementally (iter_feed) and loaded in batches
+sized from the resource profile, so a synthetic feed of tens of millions
+of corrections never sits in Python memory as one list.
+
+After loading, build_hierarchy materializes the agency closure table and
+per-agency rollups (each agency including its sub-agencies), so parent
+totals are one indexed lookup instead of a recursive query.
 """
 
 import json
 import hashlib
+import re
 from datetime import datetime
+from itertools import islice
 from pathlib import Path
-from typing import Dict, Any, List, Tuple
-import duckdb
+from typing import Dict, Any, Iterator, List, Optional, TextIO, Tuple
+
+from checksums import calculate_agency_checksum, calculate_correction_checksum
+from generations import GenerationStore
+from resources import ResourceProfile, connect, default_profile
+from telemetry import Span, Tracer, traced
+
+
+# Guards the closure against a parent_slug cycle; eCFR nests one level deep
+MAX_HIERARCHY_DEPTH = 16
+
+# Estimated in-memory size of one parsed feed record (an agency or a correction)
+INGEST_ROW_BYTES = 4096
+
+# Characters read from a feed file at a time
+FEED_CHUNK_CHARS = 1 << 20
+
+WHITESPACE = re.compile(r'\s*')
+
+CLOSURE_SQL = f"""
+    INSERT INTO agency_closure
+    WITH RECURSIVE closure(ancestor_slug, descendant_slug, depth) AS (
+        SELECT slug, slug, 0 FROM agencies_parsed
+        UNION ALL
+        SELECT c.ancestor_slug, a.slug, c.depth + 1
+        FROM closure c
+        INNER JOIN agencies_parsed a ON a.parent_slug = c.descendant_slug
+        WHERE c.depth < {MAX_HIERARCHY_DEPTH}
+    )
+    SELECT ancestor_slug, descendant_slug, MIN(depth)
+    FROM closure
+    GROUP BY ancestor_slug, descendant_slug
+"""
+
+ROLLUPS_SQL = """
+    INSERT INTO agency_rollups
+    WITH subtree AS (
+        SELECT 
+            ac.ancestor_slug as slug,
+            COUNT(*) - 1 as descendant_count,
+            MAX(ac.depth) as max_depth,
+            SUM(a.cfr_reference_count) as cfr_reference_count
+        FROM agency_closure ac
+        INNER JOIN agencies_parsed a ON a.slug = ac.descendant_slug
+        GROUP BY ac.ancestor_slug
+    ),
+    subtree_words AS (
+        -- Tiered estimate of ECFRAnalytics.calculate_word_counts
+        SELECT 
+            ac.ancestor_slug as slug,
+            SUM(CASE 
+                WHEN r.part IS NOT NULL THEN 2000
+                WHEN r.chapter IS NOT NULL THEN 10000
+                ELSE 50000
+            END) as word_count_estimate
+        FROM agency_closure ac
+        INNER JOIN cfr_references r ON r.agency_slug = ac.descendant_slug
+        GROUP BY ac.ancestor_slug
+    ),
+    subtree_titles AS (
+        SELECT DISTINCT ac.ancestor_slug as slug, r.title
+        FROM agency_closure ac
+        INNER JOIN cfr_references r ON r.agency_slug = ac.descendant_slug
+    ),
+    subtree_corrections AS (
+        SELECT 
+            st.slug,
+            COUNT(DISTINCT c.ecfr_id) as total_corrections,
+            COUNT(DISTINCT c.year) as years_with_corrections,
+            MIN(c.year) as first_correction_year,
+            MAX(c.year) as last_correction_year,
+            AVG(c.lag_days) as avg_correction_lag_days
+        FROM subtree_titles st
+        INNER JOIN corrections_parsed c ON c.title = st.title
+        GROUP BY st.slug
+    )
+    SELECT 
+        s.slug,
+        s.descendant_count,
+        s.max_depth,
+        s.cfr_reference_count,
+        COALESCE(sc.total_corrections, 0),
+        COALESCE(sc.years_with_corrections, 0),
+        sc.first_correction_year,
+        sc.last_correction_year,
+        sc.avg_correction_lag_days,
+        -- RVI as in the agency_metrics view, over the whole subtree
+        CASE 
+            WHEN s.cfr_reference_count > 0 AND sc.total_corrections > 0
+            THEN ROUND((sc.total_corrections::DECIMAL / s.cfr_reference_count) * 100, 2)
+            ELSE 0 
+        END,
+        COALESCE(sw.word_count_estimate, 0)
+    FROM subtree s
+    LEFT JOIN subtree_corrections sc ON sc.slug = s.slug
+    LEFT JOIN subtree_words sw ON sw.slug = s.slug
+"""
+
+
+def build_hierarchy(conn) -> Tuple[int, int]:
+    """
+    Rebuild agency_closure and agency_rollups from the loaded tables.
+    
+    Args:
+        conn: DuckDB connection to a database with the lake schema
+        
+    Returns:
+        Tuple of (closure_rows, rollup_rows)
+    """
+    # Separate statements: DuckDB rejects re-inserting a deleted key in one transaction
+    conn.execute("DELETE FROM agency_rollups")
+    conn.execute("DELETE FROM agency_closure")
+    conn.execute(CLOSURE_SQL)
+    conn.execute(ROLLUPS_SQL)
+    return (
+        conn.execute("SELECT COUNT(*) FROM agency_closure").fetchone()[0],
+        conn.execute("SELECT COUNT(*) FROM agency_rollups").fetchone()[0],
+    )
+
+
+class FeedScanner:
+    """Decodes consecutive JSON values from a file read in chunks."""
 
-from checksums import add_checksums_to_agencies, add_checksums_to_corrections
+    def __init__(self, f: TextIO, chunk_chars: int = FEED_CHUNK_CHARS):
+        self.f = f
+        self.chunk_chars = chunk_chars
+        self.decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+
+    def fill(self) -> bool:
+        """Append the next chunk, dropping what was consumed; False at end of file."""
+        chunk = self.f.read(self.chunk_chars)
+        if not chunk:
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character ('' at end of file), not consumed."""
+        while True:
+            self.pos = WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf) or not self.fill():
+                return self.buf[self.pos:self.pos + 1]
+
+    def expect(self, char: str):
+        """Consume char, the next non-whitespace character."""
+        found = self.peek()
+        if found != char:
+            raise json.JSONDecodeError(f"Expected {char!r}, found {found!r}", self.buf, self.pos)
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decode the next value, reading more of the file until it is complete."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self.buf) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_feed(json_path: Path, key: str, chunk_chars: int = FEED_CHUNK_CHARS) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the records of a feed file one at a time.
+
+    Feeds are one object holding an array ({"agencies": [...]},
+    {"ecfr_corrections": [...]}); only the record being decoded and one
+    chunk of the file are in memory at a time.
+
+    Args:
+        json_path: Feed file
+        key: Top-level key of the array
+        chunk_chars: Characters read at a time
+
+    Raises:
+        KeyError: If the feed has no such key
+    """
+    with open(json_path, 'r', encoding='utf-8') as f:
+        scanner = FeedScanner(f, chunk_chars)
+        scanner.expect('{')
+        while scanner.peek() != '}':
+            name = scanner.value()
+            scanner.expect(':')
+            if name != key:
+                scanner.value()
+            else:
+                scanner.expect('[')
+                if scanner.peek() == ']':
+                    return
+                while True:
+                    yield scanner.value()
+                    if scanner.peek() == ']':
+                        return
+                    scanner.expect(',')
+            if scanner.peek() == ',':
+                scanner.expect(',')
+    raise KeyError(key)
 
 
 class ECFRIngestion:
     """Manages ingestion of eCFR data into DuckDB."""
     
-    def __init__(self, db_path: str = 'ecfr_analytics.duckdb'):
+    def __init__(self, db_path: str = 'ecfr_analytics.duckdb', tracer: Optional[Tracer] = None,
+                 resources: Optional[ResourceProfile] = None):
         """
         Initialize ingestion pipeline.
         
         Args:
             db_path: Path to DuckDB database file
+            tracer: Records a span per stage (a new 'ingestion' tracer when None)
+            resources: Memory, thread and spill settings (the process
+                default when None)
         """
         self.db_path = db_path
         self.conn = None
+        self.tracer = tracer or Tracer('ingestion')
+        self.resources = resources
+        self.batch_rows = (resources or default_profile()).rows_within(INGEST_ROW_BYTES)
         
     def connect(self):
         """Establish DuckDB connection."""
-        self.conn = duckdb.connect(self.db_path)
+        self.conn = connect(self.db_path, resources=self.resources)
         print(f"✅ Connected to DuckDB: {self.db_path}")
         
     def close(self):
@@ -47,7 +266,8 @@ class ECFRIngestion:
             schema_sql = f.read()
         
         # Execute schema (DuckDB supports multiple statements)
-        self.conn.execute(schema_sql)
+        with self.tracer.span('ingestion.initialize_schema'):
+            self.conn.execute(schema_sql)
         print("✅ Initialized DuckDB schema")
     
     def calculate_file_checksum(self, file_path: Path) -> str:
@@ -58,6 +278,24 @@ class ECFRIngestion:
                 sha256.update(chunk)
         return sha256.hexdigest()
     
+    def log_ingestion(self, json_path: Path, file_checksum: str, span: Span):
+        """Record a finished load in ingestion_log with its span metrics."""
+        self.conn.execute("""
+            INSERT INTO ingestion_log (
+                source_file, record_count, file_checksum,
+                run_id, duration_ms, bytes_read, peak_rss_bytes
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, [
+            str(json_path),
+            span.rows,
+            file_checksum,
+            self.tracer.run_id,
+            round(span.duration * 1000, 3),
+            span.bytes,
+            span.peak_rss
+        ])
+    
     def load_agencies(self, json_path: Path) -> Tuple[int, int]:
         """
         Load agencies data into DuckDB.
@@ -70,19 +308,56 @@ class ECFRIngestion:
         """
         print(f"\n📥 Loading agencies from {json_path}")
         
-        with open(json_path, 'r') as f:
-            data = json.load(f)
+        with self.tracer.span('ingestion.load_agencies', source_file=str(json_path)) as span:
+            span.bytes = Path(json_path).stat().st_size
+            parent_count, sub_count = self._insert_agencies(json_path)
+            span.rows = parent_count + sub_count
+            file_checksum = self.calculate_file_checksum(json_path)
         
-        # Add checksums if not present
-        if 'checksum' not in data['agencies'][0]:
-            print("  Calculating checksums...")
-            data = add_checksums_to_agencies(data)
+        self.log_ingestion(json_path, file_checksum, span)
+        
+        print(f"  ✅ Loaded {parent_count} parent agencies")
+        print(f"  ✅ Loaded {sub_count} sub-agencies")
         
+        return parent_count, sub_count
+    
+    def _read_batches(self, json_path: Path, key: str) -> Iterator[List[Dict[str, Any]]]:
+        """Yield a feed's records in lists of at most batch_rows, one read span each."""
+        records = iter_feed(json_path, key)
+        while True:
+            with self.tracer.span('ingestion.read_json', key=key) as read:
+                batch = list(islice(records, self.batch_rows))
+                read.rows = len(batch)
+            if not batch:
+                return
+            yield batch
+    
+    def _insert_agencies(self, json_path: Path) -> Tuple[int, int]:
+        """Read agencies.json and insert parent and sub-agencies; returns both counts."""
         parent_count = 0
         sub_count = 0
         
+        for batch in self._read_batches(json_path, 'agencies'):
+            # Add checksums if not present
+            if 'checksum' not in batch[0]:
+                if parent_count == 0:
+                    print("  Calculating checksums...")
+                with self.tracer.span('ingestion.checksums') as checksums:
+                    for agency in batch:
+                        agency['checksum'] = calculate_agency_checksum(agency)
+                        for child in agency.get('children', []):
+                            child['checksum'] = calculate_agency_checksum(child)
+                    checksums.rows = len(batch)
+            
+            parent_count, sub_count = self._insert_agency_batch(batch, parent_count, sub_count)
+        
+        return parent_count, sub_count
+    
+    def _insert_agency_batch(self, batch: List[Dict[str, Any]], parent_count: int,
+                             sub_count: int) -> Tuple[int, int]:
+        """Insert a batch of parent agencies and their children; returns the running counts."""
         # Insert parent agencies
-        for idx, agency in enumerate(data['agencies'], start=1):
+        for idx, agency in enumerate(batch, start=parent_count + 1):
             self.conn.execute("""
                 INSERT INTO agencies_raw (id, slug, name, short_name, parent_slug, data, checksum)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
@@ -174,16 +449,6 @@ class ECFRIngestion:
                 
                 sub_count += 1
         
-        # Log ingestion
-        file_checksum = self.calculate_file_checksum(json_path)
-        self.conn.execute("""
-            INSERT INTO ingestion_log (source_file, record_count, file_checksum)
-            VALUES (?, ?, ?)
-        """, [str(json_path), parent_count + sub_count, file_checksum])
-        
-        print(f"  ✅ Loaded {parent_count} parent agencies")
-        print(f"  ✅ Loaded {sub_count} sub-agencies")
-        
         return parent_count, sub_count
     
     def load_corrections(self, json_path: Path) -> int:
@@ -198,17 +463,39 @@ class ECFRIngestion:
         """
         print(f"\n📥 Loading corrections from {json_path}")
         
-        with open(json_path, 'r') as f:
-            data = json.load(f)
+        with self.tracer.span('ingestion.load_corrections', source_file=str(json_path)) as span:
+            span.bytes = Path(json_path).stat().st_size
+            count = self._insert_corrections(json_path)
+            span.rows = count
+            file_checksum = self.calculate_file_checksum(json_path)
         
-        # Add checksums if not present
-        if 'checksum' not in data['ecfr_corrections'][0]:
-            print("  Calculating checksums...")
-            data = add_checksums_to_corrections(data)
+        self.log_ingestion(json_path, file_checksum, span)
         
+        print(f"  ✅ Loaded {count} corrections")
+        
+        return count
+    
+    def _insert_corrections(self, json_path: Path) -> int:
+        """Read corrections.json and insert every correction; returns the count."""
         count = 0
         
-        for idx, correction in enumerate(data['ecfr_corrections'], start=1):
+        for batch in self._read_batches(json_path, 'ecfr_corrections'):
+            # Add checksums if not present
+            if 'checksum' not in batch[0]:
+                if count == 0:
+                    print("  Calculating checksums...")
+                with self.tracer.span('ingestion.checksums') as checksums:
+                    for correction in batch:
+                        correction['checksum'] = calculate_correction_checksum(correction)
+                    checksums.rows = len(batch)
+            
+            count = self._insert_correction_batch(batch, count)
+        
+        return count
+    
+    def _insert_correction_batch(self, batch: List[Dict[str, Any]], count: int) -> int:
+        """Insert a batch of corrections; returns the running count."""
+        for idx, correction in enumerate(batch, start=count + 1):
             # Insert raw data
             self.conn.execute("""
                 INSERT INTO corrections_raw (id, ecfr_id, data, checksum)
@@ -261,17 +548,28 @@ class ECFRIngestion:
             
             count += 1
         
-        # Log ingestion
-        file_checksum = self.calculate_file_checksum(json_path)
-        self.conn.execute("""
-            INSERT INTO ingestion_log (source_file, record_count, file_checksum)
-            VALUES (?, ?, ?)
-        """, [str(json_path), count, file_checksum])
+        return count
+    
+    def build_hierarchy(self) -> Tuple[int, int]:
+        """
+        Materialize the agency closure table and per-agency rollups.
         
-        print(f"  ✅ Loaded {count} corrections")
+        Run after agencies and corrections are loaded; rollups count the
+        corrections on every CFR title the agency or a sub-agency references.
         
-        return count
+        Returns:
+            Tuple of (closure_rows, rollup_rows)
+        """
+        print("\n🌳 Building agency hierarchy rollups...")
+        
+        with self.tracer.span('ingestion.build_hierarchy') as span:
+            closure_rows, rollup_rows = build_hierarchy(self.conn)
+            span.rows = closure_rows + rollup_rows
+        
+        print(f"  ✅ {closure_rows} closure rows, {rollup_rows} rollups")
+        return closure_rows, rollup_rows
     
+    @traced('ingestion.verify_data')
     def verify_data(self):
         """Run verification queries to ensure data integrity."""
         print("\n🔍 Verifying data integrity...")
@@ -347,32 +645,34 @@ def main():
     corrections_json = base_path / 'json/usds/ecfr/corrections.json'
     db_path = base_path / 'ecfr_analytics.duckdb'
     
-    # Remove existing database for clean start
-    if db_path.exists():
-        db_path.unlink()
-        print(f"🗑️  Removed existing database: {db_path}")
+    # Build a new generation; readers keep the current one until it is published
+    store = GenerationStore(db_path)
+    with store.building() as build_path:
+        pipeline = ECFRIngestion(str(build_path))
+        
+        try:
+            pipeline.connect()
+            pipeline.initialize_schema()
+            
+            # Load data
+            pipeline.load_agencies(agencies_json)
+            pipeline.load_corrections(corrections_json)
+            pipeline.build_hierarchy()
+            
+            # Verify
+            pipeline.verify_data()
+        finally:
+            pipeline.close()
     
-    # Initialize pipeline
-    pipeline = ECFRIngestion(str(db_path))
+    pipeline.tracer.report()
+    metrics_file = pipeline.tracer.write_metrics()
+    if metrics_file:
+        print(f"📈 Metrics: {metrics_file}")
     
-    try:
-        pipeline.connect()
-        pipeline.initialize_schema()
-        
-        # Load data
-        pipeline.load_agencies(agencies_json)
-        pipeline.load_corrections(corrections_json)
-        
-        # Verify
-        pipeline.verify_data()
-        
-        print("\n" + "=" * 60)
-        print("✅ Ingestion complete!")
-        print(f"📁 Database: {db_path}")
-        print("=" * 60)
-        
-    finally:
-        pipeline.close()
+    print("\n" + "=" * 60)
+    print("✅ Ingestion complete!")
+    print(f"📁 Database: {db_path} -> {store.current().name}")
+    print("=" * 60)
 
 
 if __name__ == '__main__':
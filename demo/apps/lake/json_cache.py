@@ -0,0 +1,164 @@
+"""
+In-process cache of pre-serialized JSON responses.
+
+Each CachedJSONFile parses its source file once, encodes it once (in the
+same compact form as Flask's jsonify) and keeps identity, gzip and brotli
+bodies in memory. The file is re-read only when its mtime or size changes,
+so requests are served without touching the JSON encoder.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip and identity still work
+    brotli = None
+
+
+def encode_json(data: Any) -> bytes:
+    """Encode data the way Flask's default jsonify does (outside debug)."""
+    return (json.dumps(data, separators=(',', ':'), sort_keys=True) + '\n').encode('utf-8')
+
+
+def negotiate_encoding(accept_encoding: str, available) -> str:
+    """
+    Pick the best content encoding the client accepts.
+
+    Args:
+        accept_encoding: Accept-Encoding request header
+        available: Encodings with a cached body
+
+    Returns:
+        'br', 'gzip' or 'identity'
+    """
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        if params.strip().startswith('q='):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+
+    for encoding in ('br', 'gzip'):
+        if encoding in available and accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return 'identity'
+
+
+class CachedJSONFile:
+    """A JSON file held in memory as parsed data and encoded response bodies."""
+
+    def __init__(self, path: str):
+        """
+        Initialize cache.
+
+        Args:
+            path: Path to the JSON file
+        """
+        self.path = path
+        self.generation = 0
+        self._entry: Dict[str, Any] = {}
+        self._stat_key = None
+        self._lock = threading.Lock()
+
+    @property
+    def data(self) -> Any:
+        """Parsed contents of the current generation."""
+        return self._entry.get('data')
+
+    def _load(self, stat_key):
+        """Parse and encode the file, replacing the cached generation."""
+        with open(self.path, 'rb') as f:
+            data = json.load(f)
+
+        body = encode_json(data)
+        bodies = {
+            'identity': body,
+            'gzip': gzip.compress(body, compresslevel=9, mtime=0),
+        }
+        if brotli is not None:
+            bodies['br'] = brotli.compress(body, quality=11)
+
+        # Swapped in as one object so readers never mix two generations
+        self._entry = {
+            'data': data,
+            'bodies': bodies,
+            'etag': hashlib.sha256(body).hexdigest()[:32],
+            'last_modified': datetime.fromtimestamp(stat_key[0] / 1e9, tz=timezone.utc),
+            'derived': {},
+        }
+        self._stat_key = stat_key
+        self.generation += 1
+
+    def refresh(self) -> bool:
+        """
+        Reload the file if its mtime or size changed.
+
+        Returns:
+            False if the file does not exist
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+
+        stat_key = (stat.st_mtime_ns, stat.st_size)
+        if stat_key != self._stat_key:
+            with self._lock:
+                if stat_key != self._stat_key:
+                    self._load(stat_key)
+        return True
+
+    def derived(self, name: str, build: Callable[[Any], Any]) -> Any:
+        """
+        Return a value computed from the parsed data, cached per generation.
+
+        Args:
+            name: Cache key for the derived value
+            build: Function of the parsed data
+
+        Returns:
+            The derived value, rebuilt whenever the file changes
+        """
+        entry = self._entry
+        derived = entry['derived']
+        if name not in derived:
+            with self._lock:
+                if name not in derived:
+                    derived[name] = build(entry['data'])
+        return derived[name]
+
+    def response(self) -> Optional[Response]:
+        """
+        Build a response for the current request from the cached bodies.
+
+        Returns:
+            A 200 or 304 response with ETag and Last-Modified headers, or
+            None if the file does not exist
+        """
+        if not self.refresh():
+            return None
+
+        entry = self._entry
+        bodies = entry['bodies']
+        encoding = negotiate_encoding(request.headers.get('Accept-Encoding', ''), bodies)
+
+        response = Response(bodies[encoding], mimetype='application/json')
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+        etag = entry['etag']
+        response.set_etag(etag if encoding == 'identity' else f"{etag}-{encoding}")
+        response.last_modified = entry['last_modified']
+        return response.make_conditional(request)
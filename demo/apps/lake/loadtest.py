@@ -0,0 +1,436 @@
+"""
+Load Test Harness
+
+Replays a weighted mix of HTTP requests against the lake servers (app.py
+and analytics_api.py) from a pool of asyncio workers, each holding its own
+keep-alive connection, and reports throughput, latency percentiles and
+error rates as JSON. Request selection is seeded, so two runs of the same
+mix issue the same request sequence and their reports can be diffed.
+
+Usage:
+    python loadtest.py --serve flask --duration 10 --concurrency 16
+    python loadtest.py --url http://localhost:5000 --requests 2000 -o run.json
+    python loadtest.py --serve flask --compare baseline.json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+# Default request mix: (weight, path). Paths may also be absolute URLs,
+# e.g. to include the analytics API alongside the Flask app.
+DEFAULT_MIX = [
+    (10, '/corrections?year=2015&limit=50'),
+    (10, '/corrections?title=40&limit=50'),
+    (5, '/corrections?cfr_reference=40%20CFR%2052&limit=50'),
+    (5, '/corrections?start_date=2020-01-01&end_date=2020-12-31&limit=100'),
+    (3, '/agencies'),
+    (1, '/corrections'),
+    (1, '/corrections/stream?year=2015'),
+]
+
+ANALYTICS_MIX = [
+    (10, '/agencies/rvi?limit=20'),
+    (10, '/trends/yearly'),
+    (5, '/agencies/metrics?limit=50'),
+    (5, '/trends/titles?limit=20'),
+    (5, '/time-series'),
+    (1, '/summary'),
+]
+
+SERVERS = {
+    'flask': ([sys.executable, '-m', 'flask', '--app', 'app', 'run', '--port', '{port}', '--with-threads'], DEFAULT_MIX),
+    'analytics': ([sys.executable, '-m', 'uvicorn', 'analytics_api:app', '--port', '{port}', '--log-level', 'warning'], ANALYTICS_MIX),
+}
+
+
+# ----------------------------------------------------------------------
+# Minimal HTTP/1.1 client
+# ----------------------------------------------------------------------
+
+class Connection:
+    """
+    A keep-alive HTTP/1.1 connection to one host.
+
+    Connecting, waiting for the status line and reading the headers and
+    body are each bounded by ``timeout`` seconds, so a stalled server
+    raises asyncio.TimeoutError instead of hanging its worker.
+    """
+
+    def __init__(self, host: str, port: int, timeout: float = 30.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+        self.reader = self.writer = None
+
+    async def request(self, target: str, headers: Optional[Dict[str, str]] = None) -> Tuple[int, int]:
+        """
+        Send a GET request and read the full response.
+
+        Returns:
+            Tuple of (status code, body bytes received)
+        """
+        reused = self.writer is not None
+        if not reused:
+            self.reader, self.writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), self.timeout
+            )
+
+        lines = [f"GET {target} HTTP/1.1", f"Host: {self.host}:{self.port}"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        await self.writer.drain()
+
+        try:
+            status_line = await asyncio.wait_for(self.reader.readline(), self.timeout)
+        except ConnectionError:
+            status_line = b''
+        if not status_line:
+            await self.close()
+            if reused:
+                # The server dropped an idle keep-alive connection; retry once
+                return await self.request(target, headers)
+            raise ConnectionError("Connection closed by server")
+        version, status = status_line.split()[:2]
+        status = int(status)
+        response_headers, size = await asyncio.wait_for(self._read_response(status), self.timeout)
+
+        connection = response_headers.get('connection', '').lower()
+        keep_alive = connection == 'keep-alive' if version == b'HTTP/1.0' else connection != 'close'
+        if not keep_alive and self.writer is not None:
+            await self.close()
+        return status, size
+
+    async def _read_response(self, status: int) -> Tuple[Dict[str, str], int]:
+        """Read the response headers and body after the status line."""
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        size = 0
+        if response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            while True:
+                chunk_size = int((await self.reader.readline()).split(b';')[0], 16)
+                if chunk_size == 0:
+                    await self.reader.readline()
+                    break
+                size += len(await self.reader.readexactly(chunk_size))
+                await self.reader.readline()
+        elif 'content-length' in response_headers:
+            size = len(await self.reader.readexactly(int(response_headers['content-length'])))
+        elif status not in (204, 304):
+            size = len(await self.reader.read())
+            await self.close()
+        return response_headers, size
+
+
+# ----------------------------------------------------------------------
+# Load generation
+# ----------------------------------------------------------------------
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(-(-pct * len(sorted_values) // 100)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float, size: int, timeouts: int = 0) -> Dict[str, Any]:
+    """Summarize one endpoint (or the whole run). Timeouts are included in errors."""
+    values = sorted(latencies)
+    count = len(values)
+    return {
+        'requests': count,
+        'errors': errors,
+        'timeouts': timeouts,
+        'error_rate': round(errors / count, 4) if count else 0.0,
+        'throughput_rps': round(count / elapsed, 1) if elapsed else 0.0,
+        'bytes': size,
+        'latency_ms': {
+            'mean': round(sum(values) / count, 2) if count else 0.0,
+            'p50': round(percentile(values, 50), 2),
+            'p95': round(percentile(values, 95), 2),
+            'p99': round(percentile(values, 99), 2),
+            'max': round(values[-1], 2) if count else 0.0,
+        },
+    }
+
+
+def _resolve(base_url: str, path: str) -> Tuple[str, int, str]:
+    """Split a mix entry into (host, port, request target)."""
+    url = urlsplit(path if '://' in path else base_url.rstrip('/') + path)
+    target = url.path or '/'
+    if url.query:
+        target += '?' + url.query
+    return url.hostname, url.port or 80, target
+
+
+async def run_load(
+    base_url: str,
+    mix: List[Tuple[int, str]],
+    concurrency: int = 8,
+    duration: Optional[float] = None,
+    total_requests: Optional[int] = None,
+    seed: int = 42,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: float = 30.0,
+) -> Dict[str, Any]:
+    """
+    Drive the request mix and collect per-endpoint statistics.
+
+    Args:
+        base_url: Server URL for relative mix paths
+        mix: List of (weight, path or absolute URL)
+        concurrency: Number of concurrent workers (connections)
+        duration: Stop after this many seconds
+        total_requests: Stop after this many requests (default 1000 when
+            no duration is given)
+        seed: Seed for the request sequence
+        headers: Extra request headers (e.g. Accept-Encoding)
+        timeout: Seconds allowed for each phase of a request; requests
+            that exceed it are counted as errors and timeouts
+
+    Returns:
+        JSON-serializable report
+    """
+    if duration is None and total_requests is None:
+        total_requests = 1000
+
+    rng = random.Random(seed)
+    paths = [path for _, path in mix]
+    weights = [weight for weight, _ in mix]
+    stats = {path: {'latencies': [], 'errors': 0, 'timeouts': 0, 'bytes': 0} for path in paths}
+    issued = 0
+    deadline = time.perf_counter() + duration if duration else None
+
+    def next_path() -> Optional[str]:
+        nonlocal issued
+        if total_requests is not None and issued >= total_requests:
+            return None
+        if deadline is not None and time.perf_counter() >= deadline:
+            return None
+        issued += 1
+        return rng.choices(paths, weights)[0]
+
+    async def worker():
+        connections: Dict[Tuple[str, int], Connection] = {}
+        try:
+            while True:
+                path = next_path()
+                if path is None:
+                    return
+                host, port, target = _resolve(base_url, path)
+                conn = connections.setdefault((host, port), Connection(host, port, timeout))
+                entry = stats[path]
+
+                start = time.perf_counter()
+                try:
+                    status, size = await conn.request(target, headers)
+                    entry['bytes'] += size
+                    if status >= 400:
+                        entry['errors'] += 1
+                except asyncio.TimeoutError:
+                    # The response may still arrive; don't reuse the connection
+                    entry['errors'] += 1
+                    entry['timeouts'] += 1
+                    await conn.close()
+                except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+                    entry['errors'] += 1
+                    await conn.close()
+                entry['latencies'].append((time.perf_counter() - start) * 1000)
+        finally:
+            for conn in connections.values():
+                await conn.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+
+    all_latencies = [ms for entry in stats.values() for ms in entry['latencies']]
+    return {
+        'config': {
+            'base_url': base_url,
+            'concurrency': concurrency,
+            'duration': duration,
+            'requests': total_requests,
+            'seed': seed,
+            'timeout': timeout,
+            'mix': [{'weight': w, 'path': p} for w, p in mix],
+        },
+        'elapsed_seconds': round(elapsed, 3),
+        'overall': summarize(
+            all_latencies,
+            sum(entry['errors'] for entry in stats.values()),
+            elapsed,
+            sum(entry['bytes'] for entry in stats.values()),
+            sum(entry['timeouts'] for entry in stats.values()),
+        ),
+        'endpoints': {
+            path: summarize(entry['latencies'], entry['errors'], elapsed, entry['bytes'], entry['timeouts'])
+            for path, entry in stats.items()
+            if entry['latencies']
+        },
+    }
+
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.10) -> List[str]:
+    """
+    Compare two reports.
+
+    Args:
+        baseline: Earlier report
+        current: New report
+        threshold: Allowed fractional increase in p95/p99 latency (and
+            decrease in throughput) before flagging a regression
+
+    Returns:
+        List of regression descriptions (empty when none)
+    """
+    regressions = []
+    sections = [('overall', baseline['overall'], current['overall'])]
+    sections += [
+        (path, baseline['endpoints'][path], stats)
+        for path, stats in current['endpoints'].items()
+        if path in baseline['endpoints']
+    ]
+
+    for name, old, new in sections:
+        for pct in ('p95', 'p99'):
+            before, after = old['latency_ms'][pct], new['latency_ms'][pct]
+            if before and after > before * (1 + threshold):
+                regressions.append(f"{name}: {pct} {before}ms -> {after}ms")
+        if new['error_rate'] > old['error_rate']:
+            regressions.append(f"{name}: error rate {old['error_rate']} -> {new['error_rate']}")
+
+    old_rps, new_rps = baseline['overall']['throughput_rps'], current['overall']['throughput_rps']
+    if old_rps and new_rps < old_rps * (1 - threshold):
+        regressions.append(f"overall: throughput {old_rps} -> {new_rps} req/s")
+    return regressions
+
+
+# ----------------------------------------------------------------------
+# Local server management
+# ----------------------------------------------------------------------
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(kind: str, port: int, timeout: float = 30.0) -> subprocess.Popen:
+    """Start app.py or analytics_api.py locally and wait for it to accept connections."""
+    command = [part.format(port=port) for part in SERVERS[kind][0]]
+    process = subprocess.Popen(
+        command,
+        cwd=str(Path(__file__).parent),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{kind} server exited with code {process.returncode}")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return process
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f"{kind} server did not start within {timeout}s")
+
+
+def main():
+    """Run a load test from the command line."""
+    parser = argparse.ArgumentParser(description="Load test the lake HTTP endpoints")
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help="Server base URL")
+    parser.add_argument('--serve', choices=sorted(SERVERS), help="Start this server locally first")
+    parser.add_argument('--mix', type=Path, help="JSON file of [{\"weight\": n, \"path\": ...}]")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, help="Seconds to run")
+    parser.add_argument('--requests', type=int, help="Total requests to send")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--timeout', type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument('--gzip', action='store_true', help="Send Accept-Encoding: gzip")
+    parser.add_argument('-o', '--output', type=Path, help="Write the JSON report here")
+    parser.add_argument('--compare', type=Path, help="Baseline report to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10, help="Regression threshold (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    if args.mix:
+        mix = [(entry['weight'], entry['path']) for entry in json.loads(args.mix.read_text())]
+    elif args.serve:
+        mix = SERVERS[args.serve][1]
+    else:
+        mix = DEFAULT_MIX
+
+    process = None
+    base_url = args.url
+    if args.serve:
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        process = start_server(args.serve, port)
+
+    try:
+        report = asyncio.run(run_load(
+            base_url, mix,
+            concurrency=args.concurrency,
+            duration=args.duration,
+            total_requests=args.requests,
+            seed=args.seed,
+            headers={'Accept-Encoding': 'gzip'} if args.gzip else None,
+            timeout=args.timeout,
+        ))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        args.output.write_text(output + '\n')
+        print(f"✅ Report written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+    overall = report['overall']
+    print(f"📊 {overall['requests']} requests, {overall['throughput_rps']} req/s, "
+          f"p50 {overall['latency_ms']['p50']}ms, p95 {overall['latency_ms']['p95']}ms, "
+          f"p99 {overall['latency_ms']['p99']}ms, errors {overall['error_rate']:.2%}",
+          file=sys.stderr)
+
+    if args.compare:
+        regressions = compare_reports(json.loads(args.compare.read_text()), report, args.threshold)
+        for regression in regressions:
+            print(f"  ⚠️  {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print("✅ No regressions against baseline", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
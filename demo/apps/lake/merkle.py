@@ -0,0 +1,252 @@
+"""
+Merkle-tree checksum verification between DuckDB and PostgreSQL.
+
+Rows on both sides are bucketed by key range into a fixed number of leaves.
+A leaf hash is the SHA-256 of its rows' "key:checksum" pairs in key order,
+computed inside each database from the per-row SHA-256 checksums assigned
+by checksums.py. Leaves are folded into a binary Merkle tree in Python and
+the two trees are compared top-down, descending only into subtrees whose
+hashes differ, so a handful of divergent rows costs O(log n) bucket
+comparisons. Only the divergent leaves are then fetched row by row.
+"""
+
+import hashlib
+import math
+from typing import Any, Dict, List, Tuple
+
+
+# Tables that can be verified: DuckDB source, PostgreSQL target and key.
+# Integer keys are bucketed by key range; string keys by MD5 prefix.
+MERKLE_TABLES = {
+    'corrections': {
+        'duck_table': 'corrections_parsed',
+        'pg_table': 'corrections',
+        'key': 'ecfr_id',
+        'key_type': 'int',
+    },
+    'agencies': {
+        'duck_table': 'agencies_parsed',
+        'pg_table': 'agencies',
+        'key': 'slug',
+        'key_type': 'str',
+    },
+}
+
+# Hash of a bucket with no rows
+EMPTY_LEAF = hashlib.sha256(b'').hexdigest()
+
+
+def _hash_pair(left: str, right: str) -> str:
+    """Hash two child nodes into their parent."""
+    return hashlib.sha256((left + right).encode('ascii')).hexdigest()
+
+
+class MerkleTree:
+    """Binary Merkle tree over a power-of-two number of leaf buckets."""
+
+    def __init__(self, leaves: Dict[int, str], leaf_count: int):
+        """
+        Build the tree bottom-up.
+
+        Args:
+            leaves: Leaf index -> leaf hash; missing leaves are empty buckets
+            leaf_count: Number of leaves (a power of two)
+        """
+        level = [leaves.get(i, EMPTY_LEAF) for i in range(leaf_count)]
+        self.levels = [level]
+        while len(level) > 1:
+            level = [_hash_pair(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+            self.levels.append(level)
+
+    @property
+    def root(self) -> str:
+        return self.levels[-1][0]
+
+    def diff(self, other: 'MerkleTree') -> Tuple[List[int], int]:
+        """
+        Find leaves that differ from another tree of the same shape.
+
+        Returns:
+            Tuple of (divergent leaf indexes, number of node comparisons)
+        """
+        top = len(self.levels) - 1
+        pending = [(top, 0)]
+        divergent = []
+        comparisons = 0
+
+        while pending:
+            depth, index = pending.pop()
+            comparisons += 1
+            if self.levels[depth][index] == other.levels[depth][index]:
+                continue
+            if depth == 0:
+                divergent.append(index)
+            else:
+                pending.append((depth - 1, index * 2 + 1))
+                pending.append((depth - 1, index * 2))
+
+        return sorted(divergent), comparisons
+
+
+class MerkleVerifier:
+    """Locates divergent rows between DuckDB and PostgreSQL tables."""
+
+    def __init__(self, duck_conn, pg_conn, rows_per_leaf: int = 256):
+        """
+        Initialize verifier.
+
+        Args:
+            duck_conn: Open DuckDB connection (source of truth)
+            pg_conn: Open psycopg2 connection
+            rows_per_leaf: Target number of rows per leaf bucket
+        """
+        self.duck_conn = duck_conn
+        self.pg_conn = pg_conn
+        self.rows_per_leaf = rows_per_leaf
+
+    def _pg_fetchall(self, sql: str, params=None) -> List[tuple]:
+        cursor = self.pg_conn.cursor()
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+        cursor.close()
+        return rows
+
+    def _layout(self, spec: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Choose leaf count and bucket expressions shared by both sides.
+
+        Integer keys are split into equal key ranges over the combined
+        min/max of both tables; string keys use the first hex digits of
+        MD5(key), which both databases compute identically.
+        """
+        key = spec['key']
+        row_count = self.duck_conn.execute(
+            f"SELECT COUNT(*) FROM {spec['duck_table']}"
+        ).fetchone()[0]
+        wanted = max(1, math.ceil(row_count / self.rows_per_leaf))
+
+        if spec['key_type'] == 'int':
+            duck_lo, duck_hi = self.duck_conn.execute(
+                f"SELECT MIN({key}), MAX({key}) FROM {spec['duck_table']}"
+            ).fetchone()
+            pg_lo, pg_hi = self._pg_fetchall(
+                f"SELECT MIN({key}), MAX({key}) FROM {spec['pg_table']}"
+            )[0]
+            bounds = [v for v in (duck_lo, duck_hi, pg_lo, pg_hi) if v is not None]
+            lo, hi = (min(bounds), max(bounds)) if bounds else (0, 0)
+
+            leaf_count = 1 << (wanted - 1).bit_length()
+            width = max(1, math.ceil((hi - lo + 1) / leaf_count))
+            return {
+                'leaf_count': leaf_count,
+                'duck_leaf': f"(({key} - {lo}) // {width})",
+                'pg_leaf': f"(({key} - {lo}) / {width})",
+                'lo': lo,
+                'width': width,
+                'to_index': int,
+            }
+
+        digits = max(1, math.ceil(math.log(wanted, 16))) if wanted > 1 else 1
+        return {
+            'leaf_count': 16 ** digits,
+            'duck_leaf': f"substr(md5({key}), 1, {digits})",
+            'pg_leaf': f"substr(md5({key}), 1, {digits})",
+            'to_index': lambda prefix: int(prefix, 16),
+        }
+
+    def _trees(self, spec: Dict[str, str], layout: Dict[str, Any]) -> Tuple[MerkleTree, MerkleTree]:
+        """Compute leaf hashes in each database and build both trees."""
+        key = spec['key']
+
+        duck_rows = self.duck_conn.execute(f"""
+            SELECT
+                {layout['duck_leaf']} as leaf,
+                sha256(string_agg({key}::VARCHAR || ':' || checksum, ',' ORDER BY {key}))
+            FROM {spec['duck_table']}
+            GROUP BY leaf
+        """).fetchall()
+
+        # COLLATE "C" makes PostgreSQL order string keys bytewise, like DuckDB
+        order = f'{key} COLLATE "C"' if spec['key_type'] == 'str' else key
+        pg_rows = self._pg_fetchall(f"""
+            SELECT
+                {layout['pg_leaf']} as leaf,
+                encode(sha256(convert_to(
+                    string_agg({key}::text || ':' || checksum, ',' ORDER BY {order}),
+                    'UTF8'
+                )), 'hex')
+            FROM {spec['pg_table']}
+            GROUP BY leaf
+        """)
+
+        to_index = layout['to_index']
+        leaf_count = layout['leaf_count']
+        return (
+            MerkleTree({to_index(leaf): digest for leaf, digest in duck_rows}, leaf_count),
+            MerkleTree({to_index(leaf): digest for leaf, digest in pg_rows}, leaf_count),
+        )
+
+    def _leaf_rows(self, spec: Dict[str, str], layout: Dict[str, Any], leaf: int) -> Tuple[Dict, Dict]:
+        """
+        Fetch key -> checksum for one leaf bucket from both sides.
+
+        Integer buckets are selected as a key range rather than by the
+        bucket expression, so PostgreSQL can use the primary key index
+        instead of scanning the table once per divergent leaf.
+        """
+        key = spec['key']
+        if spec['key_type'] == 'int':
+            start = layout['lo'] + leaf * layout['width']
+            duck_where, pg_where = f"{key} >= ? AND {key} < ?", f"{key} >= %s AND {key} < %s"
+            params = [start, start + layout['width']]
+        else:
+            digits = len(format(layout['leaf_count'] - 1, 'x'))
+            duck_where, pg_where = f"{layout['duck_leaf']} = ?", f"{layout['pg_leaf']} = %s"
+            params = [format(leaf, f'0{digits}x')]
+
+        duck_rows = self.duck_conn.execute(f"""
+            SELECT {key}, checksum FROM {spec['duck_table']}
+            WHERE {duck_where}
+        """, params).fetchall()
+        pg_rows = self._pg_fetchall(f"""
+            SELECT {key}, checksum FROM {spec['pg_table']}
+            WHERE {pg_where}
+        """, params)
+        return dict(duck_rows), dict(pg_rows)
+
+    def verify(self, table: str) -> Dict[str, Any]:
+        """
+        Compare one table between DuckDB and PostgreSQL.
+
+        Args:
+            table: Name from MERKLE_TABLES
+
+        Returns:
+            Dictionary with the leaf count, node comparisons, divergent leaf
+            indexes, and the keys that are missing from PostgreSQL, extra in
+            PostgreSQL, or present on both sides with different checksums
+        """
+        spec = MERKLE_TABLES[table]
+        layout = self._layout(spec)
+        duck_tree, pg_tree = self._trees(spec, layout)
+        divergent, comparisons = duck_tree.diff(pg_tree)
+
+        missing, extra, mismatched = [], [], []
+        for leaf in divergent:
+            duck_rows, pg_rows = self._leaf_rows(spec, layout, leaf)
+            missing.extend(k for k in duck_rows if k not in pg_rows)
+            extra.extend(k for k in pg_rows if k not in duck_rows)
+            mismatched.extend(
+                k for k in duck_rows if k in pg_rows and duck_rows[k] != pg_rows[k]
+            )
+
+        return {
+            'table': table,
+            'leaf_count': layout['leaf_count'],
+            'comparisons': comparisons,
+            'root_match': duck_tree.root == pg_tree.root,
+            'divergent_leaves': divergent,
+            'missing': sorted(missing),
+            'extra': sorted(extra),
+            'mismatched': sorted(mismatched),
+        }
@@ -0,0 +1,622 @@
+"""
+Pipeline DAG Runner
+
+Runs the lake pipeline as a graph of stages instead of a fixed sequence of
+scripts. Each stage declares the files it reads and writes:
+
+- a stage is skipped when the content hashes of its inputs, its params
+  and its version match the last successful run and its outputs are
+  still what that run produced
+- dependencies come from the declared files (a stage reading another
+  stage's output runs after it) plus explicit `after` names
+- independent stages run in parallel, at most `max_workers` at a time
+- every stage runs inside a 'dag.<stage>' span, and its last key,
+  duration and output hashes are kept in the state file
+
+File hashes are remembered by (size, mtime, inode), so unchanged inputs
+are not re-read on every run.
+
+The lake pipeline (lake_stages) splits the eCFR feed per agency, builds
+one shard per agency (shards.py), merges the shards into
+ecfr_analytics.duckdb, exports analytics and publishes its result tables
+as Arrow files (arrow_results.py), and runs the Postgres ETL on those
+results (the ETL also renders the API response cache):
+
+    extract ──┬─ shard.<agency> ─┐
+              ├─ shard.<agency> ─┼─ lake ── analytics ── etl
+              └─ ...            ─┘
+
+A change to one agency's records rewrites only that agency's feed file,
+so only its shard is rebuilt before the shared lake, analytics and ETL
+stages.
+
+Usage:
+    python pipeline_dag.py                       # full chain
+    python pipeline_dag.py --plan                # show what would run
+    python pipeline_dag.py --no-etl --workers 8
+    python pipeline_dag.py --target lake --agency energy-department
+"""
+
+import argparse
+import filecmp
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Union
+
+from telemetry import Tracer
+
+
+STATE_FILE = 'pipeline_state.json'
+
+RAN = 'ran'
+CACHED = 'cached'
+FAILED = 'failed'
+BLOCKED = 'blocked'
+
+
+class Stage:
+    """One step of the pipeline with declared inputs and outputs."""
+
+    def __init__(
+        self,
+        name: str,
+        run: Optional[Callable[[], Any]] = None,
+        command: Optional[Sequence[str]] = None,
+        inputs: Iterable[Union[str, Path]] = (),
+        outputs: Iterable[Union[str, Path]] = (),
+        after: Iterable[str] = (),
+        params: Optional[Dict[str, Any]] = None,
+        version: str = '1',
+        cwd: Optional[str] = None,
+    ):
+        """
+        Initialize stage.
+
+        Args:
+            name: Unique stage name
+            run: Function doing the work; its JSON-serializable return
+                value is stored with the stage state
+            command: Subprocess argv to run instead of a function
+            inputs: Files or directories whose content decides whether
+                the stage must run
+            outputs: Files or directories the stage writes
+            after: Stages that must finish first (besides the producers
+                of the inputs)
+            params: Settings that change the result; part of the cache key
+            version: Bump to invalidate cached runs after a code change
+            cwd: Working directory for command
+        """
+        if (run is None) == (command is None):
+            raise ValueError(f"Stage {name}: give exactly one of run or command")
+        self.name = name
+        self.run = run
+        self.command = list(command) if command is not None else None
+        self.inputs = [Path(p) for p in inputs]
+        self.outputs = [Path(p) for p in outputs]
+        self.after = list(after)
+        self.params = params or {}
+        self.version = version
+        self.cwd = cwd
+
+    def execute(self) -> Any:
+        if self.command is not None:
+            subprocess.run(self.command, cwd=self.cwd, check=True)
+            return None
+        return self.run()
+
+    def __repr__(self):
+        return f"Stage({self.name})"
+
+
+class StageResult:
+    """Outcome of one stage in one run."""
+
+    def __init__(self, name: str, status: str, duration: float = 0.0, key: Optional[str] = None,
+                 error: Optional[str] = None, result: Any = None):
+        self.name = name
+        self.status = status
+        self.duration = duration
+        self.key = key
+        self.error = error
+        self.result = result
+
+    def __repr__(self):
+        return f"StageResult({self.name}, {self.status}, {self.duration * 1000:.0f} ms)"
+
+
+class ContentHasher:
+    """SHA-256 of files and directories, memoized by file stat."""
+
+    def __init__(self, memo: Optional[Dict[str, List[Any]]] = None):
+        """
+        Initialize hasher.
+
+        Args:
+            memo: Path to [size, mtime_ns, inode, digest] from an earlier run
+        """
+        self.memo = memo if memo is not None else {}
+        self._lock = threading.Lock()
+
+    def file_digest(self, path: Path) -> str:
+        stat = path.stat()
+        fingerprint = [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+        key = str(path.resolve())
+        with self._lock:
+            known = self.memo.get(key)
+        if known and known[:3] == fingerprint:
+            return known[3]
+
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha256.update(chunk)
+        digest = sha256.hexdigest()
+        with self._lock:
+            self.memo[key] = fingerprint + [digest]
+        return digest
+
+    def digest(self, path: Path) -> str:
+        """
+        Content digest of a file, or of every file under a directory.
+
+        Raises:
+            FileNotFoundError: If the path does not exist
+        """
+        if path.is_dir():
+            sha256 = hashlib.sha256()
+            for file in sorted(p for p in path.rglob('*') if p.is_file()):
+                sha256.update(f"{file.relative_to(path).as_posix()}\0{self.file_digest(file)}\n".encode('utf-8'))
+            return sha256.hexdigest()
+        if not path.exists():
+            raise FileNotFoundError(f"Missing: {path}")
+        return self.file_digest(path)
+
+
+def _within(path: Path, root: Path) -> bool:
+    """True when path is root or lies under it."""
+    try:
+        path.resolve().relative_to(root.resolve())
+        return True
+    except ValueError:
+        return False
+
+
+class PipelineDAG:
+    """Runs stages in dependency order, skipping unchanged ones."""
+
+    def __init__(self, stages: Sequence[Stage], state_path: str = STATE_FILE, max_workers: int = 4,
+                 tracer: Optional[Tracer] = None):
+        """
+        Initialize DAG.
+
+        Args:
+            stages: Pipeline stages
+            state_path: JSON file with each stage's last successful run
+            max_workers: Stages run concurrently
+            tracer: Records a 'dag.<stage>' span per executed stage
+                (a new 'pipeline' tracer when None)
+
+        Raises:
+            ValueError: On duplicate names, unknown dependencies or cycles
+        """
+        self.stages: Dict[str, Stage] = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Duplicate stage: {stage.name}")
+            self.stages[stage.name] = stage
+        self.state_path = Path(state_path)
+        self.max_workers = max_workers
+        self.tracer = tracer or Tracer('pipeline')
+        self.deps = self._dependencies()
+        self.order = self._topological_order()
+
+        self.state = self._load_state()
+        self.hasher = ContentHasher(self.state.setdefault('files', {}))
+        self._state_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Graph
+    # ------------------------------------------------------------------
+
+    def _dependencies(self) -> Dict[str, Set[str]]:
+        deps: Dict[str, Set[str]] = {}
+        for stage in self.stages.values():
+            unknown = set(stage.after) - set(self.stages)
+            if unknown:
+                raise ValueError(f"Stage {stage.name} runs after unknown stages: {sorted(unknown)}")
+            needed = set(stage.after)
+            for producer in self.stages.values():
+                if producer is stage:
+                    continue
+                if any(_within(path, output) for path in stage.inputs for output in producer.outputs):
+                    needed.add(producer.name)
+            deps[stage.name] = needed
+        return deps
+
+    def _topological_order(self) -> List[str]:
+        remaining = {name: set(deps) for name, deps in self.deps.items()}
+        order = []
+        while remaining:
+            ready = sorted(name for name, deps in remaining.items() if not deps)
+            if not ready:
+                raise ValueError(f"Dependency cycle among: {sorted(remaining)}")
+            for name in ready:
+                order.append(name)
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+        return order
+
+    def upstream(self, targets: Iterable[str]) -> Set[str]:
+        """Targets plus every stage they depend on."""
+        selected: Set[str] = set()
+        pending = list(targets)
+        while pending:
+            name = pending.pop()
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage: {name}")
+            if name not in selected:
+                selected.add(name)
+                pending.extend(self.deps[name])
+        return selected
+
+    # ------------------------------------------------------------------
+    # State
+    # ------------------------------------------------------------------
+
+    def _load_state(self) -> Dict[str, Any]:
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'stages': {}, 'files': {}}
+
+    def _save_state(self):
+        """Write the state file atomically (called with _state_lock held)."""
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.state_path.parent, prefix=f".{self.state_path.name}-")
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.state, f, indent=2, sort_keys=True, default=str)
+        os.replace(tmp, self.state_path)
+
+    def stage_key(self, stage: Stage) -> str:
+        """Cache key from the stage's definition and its inputs' content."""
+        material = {
+            'name': stage.name,
+            'version': stage.version,
+            'command': stage.command,
+            'params': stage.params,
+            'inputs': {str(path): self.hasher.digest(path) for path in stage.inputs},
+        }
+        return hashlib.sha256(json.dumps(material, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def _outputs_intact(self, stage: Stage, recorded: Dict[str, str]) -> bool:
+        try:
+            return all(self.hasher.digest(path) == recorded.get(str(path)) for path in stage.outputs)
+        except FileNotFoundError:
+            return False
+
+    def is_cached(self, stage: Stage) -> bool:
+        """True when the stage's last successful run is still valid."""
+        previous = self.state['stages'].get(stage.name)
+        if not previous:
+            return False
+        try:
+            key = self.stage_key(stage)
+        except FileNotFoundError:
+            return False
+        return previous['key'] == key and self._outputs_intact(stage, previous.get('outputs', {}))
+
+    # ------------------------------------------------------------------
+    # Execution
+    # ------------------------------------------------------------------
+
+    def _run_stage(self, stage: Stage, force: bool) -> StageResult:
+        """Run (or skip) one stage on a worker thread."""
+        start = time.perf_counter()
+        try:
+            key = self.stage_key(stage)
+        except FileNotFoundError as e:
+            return StageResult(stage.name, FAILED, time.perf_counter() - start, error=str(e))
+
+        previous = self.state['stages'].get(stage.name)
+        if (not force and previous and previous['key'] == key
+                and self._outputs_intact(stage, previous.get('outputs', {}))):
+            return StageResult(stage.name, CACHED, time.perf_counter() - start, key, result=previous.get('result'))
+
+        try:
+            with self.tracer.span(f'dag.{stage.name}', stage=stage.name):
+                result = stage.execute()
+                outputs = {str(path): self.hasher.digest(path) for path in stage.outputs}
+        except Exception as e:
+            return StageResult(stage.name, FAILED, time.perf_counter() - start, key, error=f"{type(e).__name__}: {e}")
+
+        duration = time.perf_counter() - start
+        with self._state_lock:
+            self.state['stages'][stage.name] = {
+                'key': key,
+                'outputs': outputs,
+                'result': result,
+                'duration_ms': round(duration * 1000, 3),
+                'finished_at': datetime.now(timezone.utc).isoformat(),
+            }
+            self._save_state()
+        return StageResult(stage.name, RAN, duration, key, result=result)
+
+    def run(self, targets: Optional[Iterable[str]] = None,
+            force: Union[bool, Iterable[str]] = False) -> Dict[str, StageResult]:
+        """
+        Run the pipeline.
+
+        Args:
+            targets: Stages to bring up to date, with their upstream
+                (everything when None)
+            force: True to rerun every selected stage, or names of stages
+                to rerun regardless of their inputs
+
+        Returns:
+            Stage name to result, in completion order
+        """
+        selected = self.upstream(targets) if targets is not None else set(self.stages)
+        forced = selected if force is True else set(force or ())
+        results: Dict[str, StageResult] = {}
+        waiting = [name for name in self.order if name in selected]
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='stage') as pool:
+            running = {}
+            while waiting or running:
+                for name in list(waiting):
+                    statuses = [results[dep].status for dep in self.deps[name] if dep in selected and dep in results]
+                    if any(status in (FAILED, BLOCKED) for status in statuses):
+                        waiting.remove(name)
+                        results[name] = StageResult(name, BLOCKED, error="upstream stage failed")
+                    elif len(statuses) == len([dep for dep in self.deps[name] if dep in selected]):
+                        waiting.remove(name)
+                        running[pool.submit(self._run_stage, self.stages[name], name in forced)] = name
+
+                if not running:
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    result = future.result()
+                    results[running.pop(future)] = result
+                    if result.status == FAILED:
+                        print(f"  ❌ {result.name}: {result.error}")
+
+        with self._state_lock:
+            self._save_state()
+        return results
+
+    def plan(self, targets: Optional[Iterable[str]] = None) -> Dict[str, str]:
+        """
+        Stage name to 'cached' or 'stale' without running anything.
+
+        A stage whose upstream is stale is stale too.
+        """
+        selected = self.upstream(targets) if targets is not None else set(self.stages)
+        plan: Dict[str, str] = {}
+        for name in self.order:
+            if name not in selected:
+                continue
+            upstream_stale = any(plan.get(dep) == 'stale' for dep in self.deps[name])
+            plan[name] = 'stale' if upstream_stale or not self.is_cached(self.stages[name]) else CACHED
+        return plan
+
+
+def report(results: Dict[str, StageResult]):
+    """Print per-stage status and timings."""
+    print("\n--- Pipeline Stages ---")
+    icons = {RAN: '✅', CACHED: '⏭️ ', FAILED: '❌', BLOCKED: '⛔'}
+    for result in results.values():
+        print(f"  {icons[result.status]} {result.name}: {result.status} ({result.duration * 1000:,.1f} ms)")
+    counts = {status: sum(r.status == status for r in results.values()) for status in icons}
+    print(f"  {counts[RAN]} ran, {counts[CACHED]} cached, {counts[FAILED]} failed, {counts[BLOCKED]} blocked")
+
+
+# ----------------------------------------------------------------------
+# The lake pipeline
+# ----------------------------------------------------------------------
+
+def split_feeds(agencies_json: Path, corrections_json: Path, feeds_dir: Path,
+                slugs: Optional[Iterable[str]] = None) -> Dict[str, int]:
+    """
+    Write one feed file per top-level agency with its corrections.
+
+    Files whose content is unchanged are left untouched, so only changed
+    agencies look new to their downstream stages. Feeds of agencies not in
+    this split (gone from the source, or not selected) are deleted.
+    Corrections are streamed into the feeds in profile-sized batches
+    (see shards.write_agency_feeds).
+
+    Returns:
+        Counts of feeds written, unchanged and removed
+    """
+    from ingestion import INGEST_ROW_BYTES, iter_feed
+    from resources import default_profile
+    from shards import write_agency_feeds
+
+    agencies = list(iter_feed(agencies_json, 'agencies'))
+    if slugs is not None:
+        wanted = set(slugs)
+        agencies = [agency for agency in agencies if agency['slug'] in wanted]
+
+    feeds_dir.mkdir(parents=True, exist_ok=True)
+    # Each feed reads as json.dumps({'agency': ..., 'corrections': [...]}, sort_keys=True)
+    tmp_paths = {agency['slug']: feeds_dir / f".{agency['slug']}.json.tmp" for agency in agencies}
+    write_agency_feeds(corrections_json, agencies, tmp_paths,
+                       lambda agency: f'{{"agency": {json.dumps(agency, sort_keys=True)}, "corrections": [',
+                       default_profile().rows_within(INGEST_ROW_BYTES))
+
+    written = unchanged = 0
+    for slug, tmp in tmp_paths.items():
+        path = feeds_dir / f"{slug}.json"
+        if path.exists() and filecmp.cmp(tmp, path, shallow=False):
+            tmp.unlink()
+            unchanged += 1
+            continue
+        os.replace(tmp, path)
+        written += 1
+
+    current = {f"{agency['slug']}.json" for agency in agencies}
+    removed = 0
+    for path in feeds_dir.glob('*.json'):
+        if path.name not in current:
+            path.unlink()
+            removed += 1
+    return {'written': written, 'unchanged': unchanged, 'removed': removed}
+
+
+def lake_stages(
+    agencies_json: Path,
+    corrections_json: Path,
+    work_dir: Path,
+    shards_dir: Path,
+    db_path: Path,
+    slugs: Optional[Iterable[str]] = None,
+    etl: bool = True,
+    tracer: Optional[Tracer] = None,
+    workers: int = 1,
+) -> List[Stage]:
+    """
+    Build the lake pipeline's stages.
+
+    Args:
+        agencies_json: Path to agencies.json
+        corrections_json: Path to corrections.json
+        work_dir: Per-agency feeds, shard records and exports
+        shards_dir: Shard directory (see shards.py)
+        db_path: Merged DuckDB database for the ETL and the Flask app
+        slugs: Only these top-level agencies (all when None)
+        etl: Include the Postgres ETL stage
+        tracer: Tracer the stages record into
+        workers: Stages the DAG runs at once; each shard build gets
+            1/workers of the resource budget
+
+    Returns:
+        The stages, ready for PipelineDAG
+    """
+    from analytics import ECFRAnalytics
+    from arrow_results import MANIFEST_FILE
+    from resources import default_profile
+    from shards import ShardCatalog, ShardedIngestion, merge_shards
+
+    with open(agencies_json) as f:
+        names = [agency['slug'] for agency in json.load(f)['agencies']]
+    known = set(names)
+    if slugs is not None:
+        wanted = set(slugs)
+        names = [name for name in names if name in wanted]
+
+    feeds_dir = work_dir / 'feeds'
+    records_dir = work_dir / 'shards'
+    exports_dir = work_dir / 'exports'
+    results_dir = exports_dir / 'results'
+    slug_list = list(slugs) if slugs is not None else None
+    shard_resources = default_profile().share(workers)
+    stages = [
+        Stage('extract', lambda: split_feeds(agencies_json, corrections_json, feeds_dir, slug_list),
+              inputs=[agencies_json, corrections_json], outputs=[feeds_dir],
+              params={'agencies': slug_list}),
+    ]
+
+    def build_shard(name: str) -> Callable[[], Any]:
+        def run() -> Dict[str, Any]:
+            with open(feeds_dir / f"{name}.json") as f:
+                feed = json.load(f)
+            builder = ShardedIngestion(str(shards_dir), tracer=tracer, resources=shard_resources)
+            entry = builder.ingest_agency(feed['agency'], feed['corrections'])
+            records_dir.mkdir(parents=True, exist_ok=True)
+            (records_dir / f"{name}.json").write_text(json.dumps(entry, indent=2, sort_keys=True))
+            return {'file': entry['file'], 'corrections': entry['corrections']}
+        return run
+
+    for name in names:
+        stages.append(Stage(f'shard.{name}', build_shard(name),
+                            inputs=[feeds_dir / f"{name}.json"],
+                            outputs=[records_dir / f"{name}.json"]))
+
+    def export_analytics() -> Dict[str, Any]:
+        analytics = ECFRAnalytics(str(db_path), tracer=tracer)
+        analytics.connect()
+        try:
+            analytics.export_for_postgres(exports_dir)
+            manifest = analytics.publish_results(results_dir)
+        finally:
+            analytics.close()
+        return {'files': sorted(p.name for p in exports_dir.iterdir()), 'results': manifest['version']}
+
+    def build_lake() -> Dict[str, int]:
+        # Agencies gone from the source lose their shard and record
+        catalog = ShardCatalog(str(shards_dir))
+        gone = catalog.remove(set(catalog.load()) - known)
+        for name in gone:
+            (records_dir / f"{name}.json").unlink(missing_ok=True)
+        return merge_shards(str(shards_dir), str(db_path), tracer=tracer, names=names)
+
+    stages += [
+        Stage('lake', build_lake,
+              inputs=[records_dir / f"{name}.json" for name in names], outputs=[db_path]),
+        Stage('analytics', export_analytics, inputs=[db_path], outputs=[exports_dir]),
+    ]
+    if etl:
+        def run_etl():
+            from etl_to_postgres import DuckDBToPostgresETL
+            DuckDBToPostgresETL(str(db_path), tracer=tracer, results_dir=str(results_dir)).run()
+        stages.append(Stage('etl', run_etl, inputs=[db_path, results_dir / MANIFEST_FILE]))
+    return stages
+
+
+def main():
+    """Run the lake pipeline DAG."""
+    base_path = Path(__file__).parent
+    parser = argparse.ArgumentParser(description="Run the lake pipeline as a cached DAG")
+    parser.add_argument('--agencies-json', default=str(base_path / 'json/usds/ecfr/agencies.json'))
+    parser.add_argument('--corrections-json', default=str(base_path / 'json/usds/ecfr/corrections.json'))
+    parser.add_argument('--work-dir', default=str(base_path / '.pipeline'))
+    parser.add_argument('--shards', default=str(base_path / 'shards'))
+    parser.add_argument('--db', default=str(base_path / 'ecfr_analytics.duckdb'))
+    parser.add_argument('--agency', action='append', help="Only this top-level agency (repeatable)")
+    parser.add_argument('--target', action='append', help="Only this stage and its upstream (repeatable)")
+    parser.add_argument('--workers', type=int, default=4, help="Stages run concurrently")
+    parser.add_argument('--force', action='store_true', help="Rerun every selected stage")
+    parser.add_argument('--no-etl', action='store_true', help="Skip the Postgres ETL stage")
+    parser.add_argument('--plan', action='store_true', help="Show cached/stale stages and exit")
+    args = parser.parse_args()
+
+    work_dir = Path(args.work_dir)
+    tracer = Tracer('pipeline')
+    stages = lake_stages(Path(args.agencies_json), Path(args.corrections_json), work_dir,
+                         Path(args.shards), Path(args.db), slugs=args.agency,
+                         etl=not args.no_etl, tracer=tracer, workers=args.workers)
+    dag = PipelineDAG(stages, state_path=str(work_dir / STATE_FILE), max_workers=args.workers, tracer=tracer)
+
+    if args.plan:
+        plan = dag.plan(args.target)
+        for name, status in plan.items():
+            print(f"  {'⏭️ ' if status == CACHED else '🔄'} {name}: {status}")
+        print(f"\n{sum(s == 'stale' for s in plan.values())} of {len(plan)} stages would run")
+        return
+
+    print(f"🧭 Running {len(dag.upstream(args.target) if args.target else dag.stages)} stages "
+          f"with {args.workers} workers...")
+    start = time.perf_counter()
+    results = dag.run(args.target, force=args.force)
+    report(results)
+    print(f"\n⏱️  {time.perf_counter() - start:.1f}s total")
+    metrics_file = tracer.write_metrics()
+    if metrics_file:
+        print(f"📈 Metrics: {metrics_file}")
+    if any(result.status in (FAILED, BLOCKED) for result in results.values()):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -22,14 +22,29 @@ CREATE TABLE IF NOT EXISTS agencies (
 CREATE INDEX IF NOT EXISTS idx_agencies_slug ON agencies(slug);
 CREATE INDEX IF NOT EXISTS idx_agencies_parent ON agencies(parent_slug);
 
+-- Agency hierarchy closure: one row per (ancestor, descendant) pair, each
+-- agency paired with itself at depth 0 (materialized by lake ingestion)
+CREATE TABLE IF NOT EXISTS agency_closure (
+    ancestor_slug VARCHAR(255) NOT NULL,
+    descendant_slug VARCHAR(255) NOT NULL,
+    depth INTEGER NOT NULL,
+    PRIMARY KEY (ancestor_slug, descendant_slug),
+    FOREIGN KEY (ancestor_slug) REFERENCES agencies(slug) ON DELETE CASCADE,
+    FOREIGN KEY (descendant_slug) REFERENCES agencies(slug) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_agency_closure_descendant ON agency_closure(descendant_slug, depth);
+
 -- ============================================================================
 -- FACT TABLES
 -- ============================================================================
 
--- Corrections fact table
+-- Corrections fact table, range-partitioned by year.
+-- Partitions (corrections_y2005, corrections_y2006, ...) are created and
+-- swapped by the ETL; see DuckDBToPostgresETL.transfer_corrections().
 CREATE TABLE IF NOT EXISTS corrections (
-    id SERIAL PRIMARY KEY,
-    ecfr_id INTEGER UNIQUE NOT NULL,
+    id SERIAL,
+    ecfr_id INTEGER NOT NULL,
     cfr_reference VARCHAR(255) NOT NULL,
     title INTEGER NOT NULL,
     chapter VARCHAR(50),
@@ -42,8 +57,10 @@ CREATE TABLE IF NOT EXISTS corrections (
     fr_citation VARCHAR(100),
     year INTEGER NOT NULL,
     checksum VARCHAR(64) NOT NULL,
-    last_modified TIMESTAMP DEFAULT NOW()
-);
+    last_modified TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (id, year),
+    UNIQUE (ecfr_id, year)
+) PARTITION BY RANGE (year);
 
 CREATE INDEX IF NOT EXISTS idx_corrections_title ON corrections(title);
 CREATE INDEX IF NOT EXISTS idx_corrections_year ON corrections(year);
@@ -74,6 +91,25 @@ CREATE TABLE IF NOT EXISTS agency_metrics (
 CREATE INDEX IF NOT EXISTS idx_agency_metrics_slug ON agency_metrics(agency_slug);
 CREATE INDEX IF NOT EXISTS idx_agency_metrics_rvi ON agency_metrics(rvi DESC);
 
+-- Agency metrics including all sub-agencies (served by /api/agencies/:slug/rollup)
+CREATE TABLE IF NOT EXISTS agency_rollups (
+    slug VARCHAR(255) PRIMARY KEY,
+    descendant_count INTEGER NOT NULL DEFAULT 0,
+    max_depth INTEGER NOT NULL DEFAULT 0,
+    cfr_reference_count INTEGER DEFAULT 0,
+    total_corrections INTEGER DEFAULT 0,
+    years_with_corrections INTEGER DEFAULT 0,
+    first_correction_year INTEGER,
+    last_correction_year INTEGER,
+    avg_correction_lag_days DECIMAL(10,2),
+    rvi DECIMAL(10,2) DEFAULT 0,
+    word_count_estimate BIGINT DEFAULT 0,
+    created_at TIMESTAMP DEFAULT NOW(),
+    FOREIGN KEY (slug) REFERENCES agencies(slug) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_agency_rollups_corrections ON agency_rollups(total_corrections DESC);
+
 -- Time series data for charting
 CREATE TABLE IF NOT EXISTS correction_time_series (
     id SERIAL PRIMARY KEY,
@@ -101,11 +137,70 @@ CREATE TABLE IF NOT EXISTS cfr_title_stats (
 
 CREATE INDEX IF NOT EXISTS idx_cfr_title_stats_title ON cfr_title_stats(title);
 
+-- ============================================================================
+-- REPORT TABLES (computed in DuckDB once per ETL run)
+-- ============================================================================
+
+-- Agency scorecard (served by /api/reports/scorecard)
+CREATE TABLE IF NOT EXISTS report_scorecard (
+    slug VARCHAR(255) PRIMARY KEY,
+    name VARCHAR(500) NOT NULL,
+    short_name VARCHAR(100),
+    total_corrections INTEGER DEFAULT 0,
+    rvi DECIMAL(10,2) DEFAULT 0,
+    word_count_estimate INTEGER DEFAULT 0,
+    avg_correction_lag_days DECIMAL(10,2),
+    total_cfr_references INTEGER DEFAULT 0,
+    corrections_rank INTEGER NOT NULL,
+    rvi_rank INTEGER NOT NULL,
+    size_rank INTEGER NOT NULL,
+    responsiveness_rank INTEGER NOT NULL,
+    composite_score DECIMAL(10,2) NOT NULL,
+    activity_grade CHAR(1) NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_report_scorecard_score ON report_scorecard(composite_score DESC);
+
+-- Word count report (served by /api/reports/word-count)
+CREATE TABLE IF NOT EXISTS report_word_count (
+    slug VARCHAR(255) PRIMARY KEY,
+    name VARCHAR(500) NOT NULL,
+    short_name VARCHAR(100),
+    word_count_estimate INTEGER NOT NULL,
+    total_corrections INTEGER DEFAULT 0,
+    rvi DECIMAL(10,2) DEFAULT 0,
+    total_cfr_references INTEGER DEFAULT 0,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_report_word_count_words ON report_word_count(word_count_estimate DESC);
+
+-- ============================================================================
+-- API RESPONSE CACHE (rendered by the ETL, read by the API)
+-- ============================================================================
+
+-- One row per endpoint + canonical query string, valid until the next ETL run
+CREATE TABLE IF NOT EXISTS api_response_cache (
+    endpoint VARCHAR(255) NOT NULL,
+    params VARCHAR(500) NOT NULL DEFAULT '',
+    body TEXT NOT NULL,
+    body_gzip BYTEA NOT NULL,
+    etag VARCHAR(100) NOT NULL,
+    content_type VARCHAR(100) NOT NULL DEFAULT 'application/json; charset=utf-8',
+    generated_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (endpoint, params)
+);
+
 -- ============================================================================
 -- METADATA TABLES
 -- ============================================================================
 
 -- ETL run log
+-- One summary row per run (stage = 'run'), one checkpoint row per
+-- committed batch (stage = table name, status = 'committed') and one span
+-- row per pipeline step (stage = span name such as 'etl.transfer_agencies',
+-- status = 'ok' or 'error').
 CREATE TABLE IF NOT EXISTS etl_log (
     id SERIAL PRIMARY KEY,
     run_timestamp TIMESTAMP DEFAULT NOW(),
@@ -113,9 +208,31 @@ CREATE TABLE IF NOT EXISTS etl_log (
     records_processed INTEGER DEFAULT 0,
     status VARCHAR(50) DEFAULT 'success',
     error_message TEXT,
-    duration_seconds INTEGER
+    duration_seconds INTEGER,
+    run_id VARCHAR(36),
+    stage VARCHAR(100) DEFAULT 'run',
+    batch_number INTEGER,
+    duration_ms NUMERIC(14, 3),
+    bytes_processed BIGINT,
+    peak_memory_bytes BIGINT
 );
 
+-- Columns added for checkpointed runs (databases created before them)
+ALTER TABLE etl_log ADD COLUMN IF NOT EXISTS run_id VARCHAR(36);
+ALTER TABLE etl_log ADD COLUMN IF NOT EXISTS stage VARCHAR(100) DEFAULT 'run';
+ALTER TABLE etl_log ADD COLUMN IF NOT EXISTS batch_number INTEGER;
+
+-- Columns added for span metrics
+ALTER TABLE etl_log ADD COLUMN IF NOT EXISTS duration_ms NUMERIC(14, 3);
+ALTER TABLE etl_log ADD COLUMN IF NOT EXISTS bytes_processed BIGINT;
+ALTER TABLE etl_log ADD COLUMN IF NOT EXISTS peak_memory_bytes BIGINT;
+
+-- source_db holds the resolved generation path, which can exceed 255 characters
+ALTER TABLE etl_log ALTER COLUMN source_db TYPE TEXT;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_etl_log_checkpoint ON etl_log(run_id, stage, batch_number);
+CREATE INDEX IF NOT EXISTS idx_etl_log_run ON etl_log(run_id, stage);
+
 -- Data checksums for integrity verification
 CREATE TABLE IF NOT EXISTS data_checksums (
     id SERIAL PRIMARY KEY,
@@ -196,6 +313,26 @@ FROM agencies parent
 INNER JOIN agencies child ON child.parent_slug = parent.slug
 ORDER BY parent.name, child.name;
 
+-- Top-level departments including their sub-agencies
+CREATE OR REPLACE VIEW v_department_rollups AS
+SELECT 
+    a.slug,
+    a.name,
+    a.short_name,
+    r.descendant_count,
+    r.cfr_reference_count,
+    r.total_corrections,
+    r.years_with_corrections,
+    r.first_correction_year,
+    r.last_correction_year,
+    r.avg_correction_lag_days,
+    r.rvi,
+    r.word_count_estimate
+FROM agencies a
+INNER JOIN agency_rollups r ON r.slug = a.slug
+WHERE a.parent_slug IS NULL
+ORDER BY r.total_corrections DESC, a.slug;
+
 -- ============================================================================
 -- FUNCTIONS
 -- ============================================================================
@@ -0,0 +1,392 @@
+"""
+Query Profiler for ECFRAnalytics
+
+Opt-in profiling of every query ECFRAnalytics runs. When enabled, each
+query executes with DuckDB's JSON profiler on and records:
+
+- query_log:        one row per call (wall time, CPU time, rows, views used)
+- query_operators:  per-operator timings and cardinalities for each call
+- slow_queries:     calls over the threshold, with parameters and the
+                    rendered EXPLAIN ANALYZE operator tree
+
+Results go to a separate DuckDB file, since the lake is opened read-only.
+The report ranks queries, views or operators by cumulative cost, which is
+what decides the next view to materialize or index.
+
+Enable with:
+    QUERY_PROFILE_DB=query_profile.duckdb QUERY_PROFILE_THRESHOLD_MS=50 python analytics.py
+or pass profiler=QueryProfiler(...) to ECFRAnalytics.
+
+Usage:
+    python profiler.py run --repeat 3       # profile every getter
+    python profiler.py report --by view     # rank by cumulative cost
+"""
+
+import argparse
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from resources import connect
+
+
+PROFILE_SCHEMA = """
+CREATE SEQUENCE IF NOT EXISTS query_log_seq START 1;
+CREATE TABLE IF NOT EXISTS query_log (
+    id INTEGER PRIMARY KEY DEFAULT nextval('query_log_seq'),
+    recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    db_path VARCHAR NOT NULL,
+    query_name VARCHAR NOT NULL,
+    duration_ms DOUBLE NOT NULL,
+    cpu_ms DOUBLE,
+    rows_returned BIGINT,
+    rows_scanned BIGINT,
+    views VARCHAR[]
+);
+
+CREATE TABLE IF NOT EXISTS query_operators (
+    query_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    depth INTEGER NOT NULL,
+    operator VARCHAR NOT NULL,
+    table_name VARCHAR,
+    timing_ms DOUBLE,
+    cardinality BIGINT,
+    PRIMARY KEY (query_id, position)
+);
+
+CREATE SEQUENCE IF NOT EXISTS slow_queries_seq START 1;
+CREATE TABLE IF NOT EXISTS slow_queries (
+    id INTEGER PRIMARY KEY DEFAULT nextval('slow_queries_seq'),
+    query_id INTEGER NOT NULL,
+    recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    query_name VARCHAR NOT NULL,
+    sql VARCHAR NOT NULL,
+    params VARCHAR,
+    duration_ms DOUBLE NOT NULL,
+    threshold_ms DOUBLE NOT NULL,
+    plan VARCHAR
+);
+"""
+
+DEFAULT_PROFILE_DB = 'query_profile.duckdb'
+DEFAULT_THRESHOLD_MS = 100.0
+
+_env_profilers: Dict[str, 'QueryProfiler'] = {}
+_env_lock = threading.Lock()
+
+
+def flatten_operators(node: Dict[str, Any], depth: int = 0) -> List[Dict[str, Any]]:
+    """Flatten a DuckDB JSON profile tree into operators in plan order."""
+    operators = []
+    if node.get('operator_type'):
+        extra = node.get('extra_info') or {}
+        operators.append({
+            'depth': depth,
+            'operator': node['operator_type'],
+            # DuckDB 1.1 names the scanned table under 'Text'
+            'table_name': (extra.get('Table') or extra.get('Text')) if 'SCAN' in node['operator_type'] else None,
+            'timing_ms': (node.get('operator_timing') or 0) * 1000,
+            'cardinality': node.get('operator_cardinality'),
+        })
+        depth += 1
+    for child in node.get('children', []):
+        operators.extend(flatten_operators(child, depth))
+    return operators
+
+
+def render_plan(operators: List[Dict[str, Any]]) -> str:
+    """Render flattened operators as an indented EXPLAIN ANALYZE style tree."""
+    lines = []
+    for op in operators:
+        table = f" {op['table_name']}" if op['table_name'] else ''
+        lines.append(
+            f"{'  ' * op['depth']}{op['operator']}{table}  "
+            f"{op['timing_ms']:.3f} ms  {op['cardinality']} rows"
+        )
+    return '\n'.join(lines)
+
+
+class ConnectionProfile:
+    """Profiling state of one DuckDB connection."""
+
+    def __init__(self, profiler: 'QueryProfiler', conn, db_path: str):
+        self.profiler = profiler
+        self.conn = conn
+        self.db_path = db_path
+        fd, self.output_path = tempfile.mkstemp(prefix='duckdb_profile_', suffix='.json')
+        os.close(fd)
+        conn.execute("SET enable_profiling = 'json'")
+        conn.execute(f"SET profiling_output = '{self.output_path}'")
+        self.views = [
+            row[0] for row in conn.execute(
+                "SELECT view_name FROM duckdb_views() WHERE NOT internal"
+            ).fetchall()
+        ]
+
+    def run(self, name: str, sql: str, params: Optional[List[Any]], fetch: Callable[[Any], Any]) -> Any:
+        """
+        Execute and fetch one query with profiling, then record it.
+
+        Args:
+            name: Query name (the ECFRAnalytics getter)
+            sql: SQL text
+            params: Bound parameters
+            fetch: Consumes the DuckDB result, e.g. lambda r: r.fetchall()
+
+        Returns:
+            Whatever fetch returns
+        """
+        start = time.perf_counter()
+        result = fetch(self.conn.execute(sql, params or []))
+        duration_ms = (time.perf_counter() - start) * 1000
+
+        try:
+            with open(self.output_path) as f:
+                profile = json.load(f)
+        except (OSError, ValueError):
+            profile = {}
+        if profile.get('query_name') != sql:
+            # The profile belongs to another statement; keep the timing only
+            profile = {}
+
+        views = [v for v in self.views if re.search(rf'\b{re.escape(v)}\b', sql)]
+        self.profiler.record(self.db_path, name, sql, params, duration_ms, profile, views)
+        return result
+
+    def close(self):
+        try:
+            os.unlink(self.output_path)
+        except OSError:
+            pass
+
+
+class QueryProfiler:
+    """Collects query profiles into a DuckDB profile database."""
+
+    def __init__(self, profile_db: str = DEFAULT_PROFILE_DB, threshold_ms: float = DEFAULT_THRESHOLD_MS):
+        """
+        Initialize profiler.
+
+        Args:
+            profile_db: DuckDB file holding query_log, query_operators and
+                slow_queries
+            threshold_ms: Calls at least this slow go to slow_queries
+        """
+        self.profile_db = profile_db
+        self.threshold_ms = threshold_ms
+        self.conn = connect(profile_db)
+        self.conn.execute(PROFILE_SCHEMA)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional['QueryProfiler']:
+        """
+        Profiler configured by QUERY_PROFILE_DB / QUERY_PROFILE_THRESHOLD_MS.
+
+        Returns None when QUERY_PROFILE_DB is unset. One profiler is shared
+        per file so every connection in the process writes through it.
+        """
+        profile_db = os.getenv('QUERY_PROFILE_DB')
+        if not profile_db:
+            return None
+        with _env_lock:
+            profiler = _env_profilers.get(profile_db)
+            if profiler is None:
+                threshold = float(os.getenv('QUERY_PROFILE_THRESHOLD_MS', DEFAULT_THRESHOLD_MS))
+                profiler = _env_profilers[profile_db] = cls(profile_db, threshold)
+            return profiler
+
+    def attach(self, conn, db_path: str) -> ConnectionProfile:
+        """Turn on JSON profiling for a connection."""
+        return ConnectionProfile(self, conn, db_path)
+
+    def record(self, db_path: str, name: str, sql: str, params: Optional[List[Any]],
+               duration_ms: float, profile: Dict[str, Any], views: List[str]):
+        """Store one profiled call, and its plan when it was slow."""
+        operators = flatten_operators(profile) if profile else []
+
+        with self._lock:
+            query_id = self.conn.execute("""
+                INSERT INTO query_log (
+                    db_path, query_name, duration_ms, cpu_ms,
+                    rows_returned, rows_scanned, views
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                RETURNING id
+            """, [
+                db_path,
+                name,
+                duration_ms,
+                profile['cpu_time'] * 1000 if 'cpu_time' in profile else None,
+                profile.get('rows_returned'),
+                profile.get('cumulative_rows_scanned'),
+                views,
+            ]).fetchone()[0]
+
+            if operators:
+                self.conn.executemany("""
+                    INSERT INTO query_operators (
+                        query_id, position, depth, operator, table_name, timing_ms, cardinality
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, [
+                    [query_id, position, op['depth'], op['operator'], op['table_name'],
+                     op['timing_ms'], op['cardinality']]
+                    for position, op in enumerate(operators)
+                ])
+
+            if duration_ms >= self.threshold_ms:
+                self.conn.execute("""
+                    INSERT INTO slow_queries (
+                        query_id, query_name, sql, params, duration_ms, threshold_ms, plan
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, [
+                    query_id, name, sql, json.dumps(params or [], default=str),
+                    duration_ms, self.threshold_ms, render_plan(operators) or None,
+                ])
+
+    def report(self, by: str = 'query', limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Rank profiled work by cumulative cost.
+
+        Args:
+            by: 'query' (getter), 'view' (views referenced) or 'operator'
+                (operator type and table)
+            limit: Rows to return
+
+        Returns:
+            List of dicts ordered by total_ms descending
+        """
+        if by == 'query':
+            sql = """
+                SELECT query_name AS name, COUNT(*) AS calls,
+                       SUM(duration_ms) AS total_ms, AVG(duration_ms) AS avg_ms,
+                       quantile_cont(duration_ms, 0.95) AS p95_ms, MAX(duration_ms) AS max_ms,
+                       COUNT(*) FILTER (WHERE duration_ms >= ?) AS slow_calls
+                FROM query_log
+                GROUP BY query_name
+            """
+            params = [self.threshold_ms]
+        elif by == 'view':
+            sql = """
+                SELECT view AS name, COUNT(*) AS calls,
+                       SUM(duration_ms) AS total_ms, AVG(duration_ms) AS avg_ms,
+                       quantile_cont(duration_ms, 0.95) AS p95_ms, MAX(duration_ms) AS max_ms,
+                       COUNT(*) FILTER (WHERE duration_ms >= ?) AS slow_calls
+                FROM (SELECT unnest(views) AS view, duration_ms FROM query_log)
+                GROUP BY view
+            """
+            params = [self.threshold_ms]
+        elif by == 'operator':
+            sql = """
+                SELECT operator || COALESCE(' ' || table_name, '') AS name,
+                       COUNT(*) AS calls, SUM(timing_ms) AS total_ms,
+                       AVG(timing_ms) AS avg_ms, quantile_cont(timing_ms, 0.95) AS p95_ms,
+                       MAX(timing_ms) AS max_ms, SUM(cardinality) AS rows
+                FROM query_operators
+                GROUP BY ALL
+            """
+            params = []
+        else:
+            raise ValueError(f"Unknown report grouping: {by}")
+
+        with self._lock:
+            cursor = self.conn.execute(f"{sql} ORDER BY total_ms DESC LIMIT {int(limit)}", params)
+            columns = [d[0] for d in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def close(self):
+        self.conn.close()
+
+
+def print_report(rows: List[Dict[str, Any]], by: str):
+    """Print a ranked report table."""
+    last = 'rows' if by == 'operator' else 'slow_calls'
+    print(f"{by:<48} {'calls':>7} {'total ms':>11} {'avg ms':>9} {'p95 ms':>9} {'max ms':>9} {last:>10}")
+    for row in rows:
+        print(f"{row['name'][:48]:<48} {row['calls']:>7} {row['total_ms']:>11.1f} {row['avg_ms']:>9.2f} "
+              f"{row['p95_ms']:>9.2f} {row['max_ms']:>9.2f} {row[last] or 0:>10}")
+
+
+def profile_getters(db_path: str, profiler: QueryProfiler, repeat: int = 1) -> int:
+    """Run every ECFRAnalytics getter with profiling; returns calls made."""
+    from analytics import ECFRAnalytics
+
+    analytics = ECFRAnalytics(db_path, profiler=profiler)
+    analytics.connect()
+    calls = 0
+    try:
+        slug = (analytics.get_top_agencies_by_rvi(limit=1) or [{'slug': ''}])[0]['slug']
+        getters = [
+            lambda: analytics.get_agency_metrics(),
+            lambda: analytics.get_correction_trends_yearly(),
+            lambda: analytics.get_correction_trends_by_title(),
+            lambda: analytics.get_time_series_data(),
+            lambda: analytics.get_top_agencies_by_rvi(),
+            lambda: analytics.get_agency_detail(slug),
+            lambda: analytics.get_corrections_for_agency(slug),
+            lambda: analytics.calculate_word_counts(),
+            lambda: analytics.generate_summary_report(),
+        ]
+        for _ in range(repeat):
+            for getter in getters:
+                getter()
+                calls += 1
+    finally:
+        analytics.close()
+    return calls
+
+
+def main():
+    """Profile analytics queries or report on collected profiles."""
+    parser = argparse.ArgumentParser(description="ECFRAnalytics query profiler")
+    parser.add_argument('--profile-db', default=os.getenv('QUERY_PROFILE_DB', DEFAULT_PROFILE_DB))
+    parser.add_argument('--threshold-ms', type=float,
+                        default=float(os.getenv('QUERY_PROFILE_THRESHOLD_MS', DEFAULT_THRESHOLD_MS)))
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help="Profile every ECFRAnalytics getter")
+    run.add_argument('--db', default=str(Path(__file__).parent / 'ecfr_analytics.duckdb'))
+    run.add_argument('--repeat', type=int, default=1)
+
+    report = commands.add_parser('report', help="Rank profiled queries by cumulative cost")
+    report.add_argument('--by', choices=['query', 'view', 'operator'], default='query')
+    report.add_argument('--limit', type=int, default=20)
+    report.add_argument('--slow', action='store_true', help="Also print the slowest plans")
+
+    args = parser.parse_args()
+    profiler = QueryProfiler(args.profile_db, args.threshold_ms)
+
+    try:
+        if args.command == 'run':
+            print(f"🔬 Profiling analytics getters on {args.db}")
+            calls = profile_getters(args.db, profiler, args.repeat)
+            print(f"  ✅ Profiled {calls} getter calls into {args.profile_db}")
+        else:
+            print(f"\n📊 Cumulative query cost by {args.by} ({args.profile_db})\n")
+            print_report(profiler.report(args.by, args.limit), args.by)
+
+            if args.slow:
+                slowest = profiler.conn.execute("""
+                    SELECT query_name, duration_ms, params, plan
+                    FROM slow_queries
+                    QUALIFY row_number() OVER (PARTITION BY query_name ORDER BY duration_ms DESC) = 1
+                    ORDER BY duration_ms DESC
+                    LIMIT 5
+                """).fetchall()
+                for name, duration_ms, params, plan in slowest:
+                    print(f"\n🐢 {name}: {duration_ms:.1f} ms, params {params}")
+                    print(plan or '  (no plan captured)')
+    finally:
+        profiler.close()
+
+
+if __name__ == '__main__':
+    main()
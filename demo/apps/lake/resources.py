@@ -0,0 +1,286 @@
+"""
+Resource Profiles
+
+Sizes every DuckDB connection the lake opens from the limits of the
+container it runs in. DuckDB's defaults (80% of host RAM, one thread per
+host core) over-commit on shared hosts, where the cgroup limit is far
+below what the host reports.
+
+- Memory is the cgroup memory limit (v2 memory.max or v1
+  memory.limit_in_bytes, the tightest along this process's cgroup path),
+  or physical RAM when unlimited
+- CPUs are the cgroup CPU quota, or the CPUs this process may run on
+- DuckDB gets half of the memory as memory_limit and spills what does not
+  fit to temp_directory, so joins and sorts larger than RAM complete
+- Python-side buffers (ETL batches, snapshot sort runs, decoded unload
+  batches) size themselves from a fifth of the memory (rows_within);
+  the rest is headroom for the interpreter and fetched results
+- Code with several databases open at once (parallel shard builds,
+  federated shard connections) splits the budget with share()
+
+Environment overrides:
+    LAKE_MEMORY_LIMIT    Total memory budget ('4GiB', '512MB' or bytes)
+    LAKE_THREADS         DuckDB threads
+    LAKE_TEMP_DIR        Spill directory (default <system tmp>/lake-spill)
+    LAKE_MAX_TEMP_SIZE   Cap on spilled data
+    LAKE_CGROUP_ROOT     cgroup filesystem (default /sys/fs/cgroup)
+
+DuckDB refuses a second connection to an open database file with a
+different configuration, so all lake code connects through connect() and
+the process-wide default_profile().
+
+Usage:
+    python resources.py        # show the detected profile
+"""
+
+import hashlib
+import math
+import os
+import re
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import duckdb
+
+
+CGROUP_ROOT = '/sys/fs/cgroup'
+DUCKDB_MEMORY_FRACTION = 0.5
+PYTHON_MEMORY_FRACTION = 0.2
+MIN_MEMORY_LIMIT = 32 * 1024 * 1024
+UNLIMITED = 1 << 60
+
+SIZE_UNITS = {
+    '': 1, 'b': 1,
+    'kb': 1000, 'mb': 1000 ** 2, 'gb': 1000 ** 3, 'tb': 1000 ** 4,
+    'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3, 't': 1024 ** 4,
+    'kib': 1024, 'mib': 1024 ** 2, 'gib': 1024 ** 3, 'tib': 1024 ** 4,
+}
+
+
+def parse_size(text: str) -> int:
+    """
+    Parse a size such as '512MB', '1.5GiB' or '1048576' into bytes.
+
+    Raises:
+        ValueError: If the text is not a size
+    """
+    match = re.fullmatch(r'\s*([0-9]*\.?[0-9]+)\s*([a-zA-Z]*)\s*', str(text))
+    if not match or match.group(2).lower() not in SIZE_UNITS:
+        raise ValueError(f"Invalid size: {text!r}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).lower()])
+
+
+def format_size(size: int) -> str:
+    """Size in the unit DuckDB settings accept without rounding."""
+    return f"{max(1, size // 1024)}KiB"
+
+
+def _read(path: Path) -> Optional[str]:
+    try:
+        return path.read_text().strip()
+    except OSError:
+        return None
+
+
+def _cgroup_dirs(root: Path, controller: str) -> List[Path]:
+    """cgroup directories limiting this process for a controller, innermost first."""
+    mounts = [root]
+    try:
+        mounts += [root / name for name in sorted(os.listdir(root)) if controller in name.split(',')]
+    except OSError:
+        return []
+
+    paths = {'/'}
+    for line in (_read(Path('/proc/self/cgroup')) or '').splitlines():
+        parts = line.split(':', 2)
+        if len(parts) == 3 and (parts[1] == '' or controller in parts[1].split(',')):
+            paths.add(parts[2])
+
+    dirs = []
+    for mount in mounts:
+        for path in sorted(paths, key=len, reverse=True):
+            current = mount / path.lstrip('/')
+            while True:
+                if current.is_dir() and current not in dirs:
+                    dirs.append(current)
+                if current == mount:
+                    break
+                current = current.parent
+    return dirs
+
+
+def cgroup_memory_limit(root: Optional[str] = None) -> Optional[int]:
+    """Tightest cgroup memory limit in bytes (None when unlimited)."""
+    root = Path(root or os.getenv('LAKE_CGROUP_ROOT', CGROUP_ROOT))
+    limits = []
+    for directory in _cgroup_dirs(root, 'memory'):
+        for name in ('memory.max', 'memory.limit_in_bytes'):
+            value = _read(directory / name)
+            if value and value.isdigit() and int(value) < UNLIMITED:
+                limits.append(int(value))
+    return min(limits) if limits else None
+
+
+def cgroup_cpu_limit(root: Optional[str] = None) -> Optional[float]:
+    """CPUs allowed by the cgroup quota (None when unlimited)."""
+    root = Path(root or os.getenv('LAKE_CGROUP_ROOT', CGROUP_ROOT))
+    limits = []
+    for directory in _cgroup_dirs(root, 'cpu'):
+        quota_period = (_read(directory / 'cpu.max') or '').split()
+        if len(quota_period) == 2 and quota_period[0].isdigit():
+            limits.append(int(quota_period[0]) / int(quota_period[1]))
+        quota = _read(directory / 'cpu.cfs_quota_us')
+        period = _read(directory / 'cpu.cfs_period_us')
+        if quota and period and quota.isdigit() and int(quota) > 0:
+            limits.append(int(quota) / int(period))
+    return min(limits) if limits else None
+
+
+def host_memory() -> int:
+    return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+
+
+def available_cpus() -> int:
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+class ResourceProfile:
+    """Memory, thread and spill settings for DuckDB connections and buffers."""
+
+    def __init__(self, memory_bytes: int, threads: int, temp_directory: Optional[str] = None,
+                 max_temp_size: Optional[int] = None):
+        """
+        Initialize profile.
+
+        Args:
+            memory_bytes: Total budget for this process (or this share of it)
+            threads: DuckDB worker threads
+            temp_directory: Where DuckDB spills (LAKE_TEMP_DIR or
+                <system tmp>/lake-spill when None)
+            max_temp_size: Cap on spilled bytes (DuckDB's default when None)
+        """
+        self.memory_bytes = memory_bytes
+        self.threads = max(1, threads)
+        self.temp_directory = temp_directory or os.getenv(
+            'LAKE_TEMP_DIR', os.path.join(tempfile.gettempdir(), 'lake-spill')
+        )
+        self.max_temp_size = max_temp_size
+
+    @classmethod
+    def detect(cls, cgroup_root: Optional[str] = None) -> 'ResourceProfile':
+        """Profile from the environment overrides and the cgroup limits."""
+        if os.getenv('LAKE_MEMORY_LIMIT'):
+            memory = parse_size(os.environ['LAKE_MEMORY_LIMIT'])
+        else:
+            memory = min(filter(None, [cgroup_memory_limit(cgroup_root), host_memory()]))
+
+        if os.getenv('LAKE_THREADS'):
+            threads = int(os.environ['LAKE_THREADS'])
+        else:
+            quota = cgroup_cpu_limit(cgroup_root)
+            threads = min(available_cpus(), math.ceil(quota)) if quota else available_cpus()
+
+        max_temp = os.getenv('LAKE_MAX_TEMP_SIZE')
+        return cls(memory, threads, max_temp_size=parse_size(max_temp) if max_temp else None)
+
+    @property
+    def memory_limit(self) -> int:
+        """DuckDB memory_limit in bytes."""
+        return max(MIN_MEMORY_LIMIT, int(self.memory_bytes * DUCKDB_MEMORY_FRACTION))
+
+    @property
+    def python_budget(self) -> int:
+        """Bytes Python-side buffers may hold."""
+        return int(self.memory_bytes * PYTHON_MEMORY_FRACTION)
+
+    def share(self, parts: int) -> 'ResourceProfile':
+        """Profile for one of parts databases open at the same time."""
+        parts = max(1, parts)
+        return ResourceProfile(self.memory_bytes // parts, self.threads // parts,
+                               self.temp_directory, self.max_temp_size)
+
+    def rows_within(self, row_bytes: int, cap: Optional[int] = None) -> int:
+        """
+        Rows of about row_bytes each that fit the Python buffer budget.
+
+        Args:
+            row_bytes: Estimated in-memory size of one buffered row
+            cap: Upper bound (e.g. the previous fixed batch size)
+        """
+        rows = max(1, self.python_budget // max(1, row_bytes))
+        return min(rows, cap) if cap else rows
+
+    def config(self, db_path: str = ':memory:') -> Dict[str, Any]:
+        """
+        DuckDB connection config.
+
+        Each database gets its own spill directory under temp_directory
+        (DuckDB removes it on close). The name depends only on the process
+        and the path, so every connection to one file gets the same config.
+        """
+        Path(self.temp_directory).mkdir(parents=True, exist_ok=True)
+        key = hashlib.sha1(os.path.abspath(db_path).encode('utf-8')).hexdigest()[:12]
+        config = {
+            'memory_limit': format_size(self.memory_limit),
+            'threads': self.threads,
+            'temp_directory': os.path.join(self.temp_directory, f"{os.getpid()}-{key}"),
+        }
+        if self.max_temp_size:
+            config['max_temp_directory_size'] = format_size(self.max_temp_size)
+        return config
+
+    def connect(self, db_path: str = ':memory:', read_only: bool = False) -> duckdb.DuckDBPyConnection:
+        """Open a DuckDB connection with this profile's settings."""
+        return duckdb.connect(str(db_path), read_only=read_only, config=self.config(str(db_path)))
+
+    def __repr__(self):
+        return (f"ResourceProfile(memory={self.memory_bytes / 1024 / 1024:.0f} MiB, "
+                f"duckdb={self.memory_limit / 1024 / 1024:.0f} MiB, threads={self.threads})")
+
+
+_default: Optional[ResourceProfile] = None
+_default_lock = threading.Lock()
+
+
+def default_profile() -> ResourceProfile:
+    """The process-wide profile, detected once."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = ResourceProfile.detect()
+        return _default
+
+
+def connect(db_path: str = ':memory:', read_only: bool = False,
+            resources: Optional[ResourceProfile] = None) -> duckdb.DuckDBPyConnection:
+    """
+    Open a DuckDB connection sized by a resource profile.
+
+    Args:
+        db_path: Database file (in-memory when omitted)
+        read_only: Open read-only
+        resources: Profile to apply (default_profile() when None)
+    """
+    return (resources or default_profile()).connect(db_path, read_only)
+
+
+def main():
+    """Print the detected resource profile."""
+    memory = cgroup_memory_limit()
+    cpus = cgroup_cpu_limit()
+    profile = default_profile()
+    print(f"🧮 cgroup memory: {f'{memory / 1024 / 1024:,.0f} MiB' if memory else 'unlimited'}, "
+          f"host: {host_memory() / 1024 / 1024:,.0f} MiB")
+    print(f"🧮 cgroup CPUs: {cpus if cpus else 'unlimited'}, available: {available_cpus()}")
+    print(f"✅ {profile}")
+    for key, value in profile.config().items():
+        print(f"  {key} = {value}")
+    print(f"  python buffers = {profile.python_budget / 1024 / 1024:,.0f} MiB")
+
+
+if __name__ == '__main__':
+    main()
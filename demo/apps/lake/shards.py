@@ -0,0 +1,613 @@
+"""
+Per-Agency Shards
+
+Lays the lake out as one DuckDB file per onboarded agency instead of a
+single ecfr_analytics.duckdb, so agencies can be added (20-30 a year from
+the zOS onboarding plan) without reloading or locking the others:
+
+    shards/
+        catalog.json                          shard → file, agencies, CFR titles, row counts
+        agriculture-department.1f0c9a2b.duckdb
+        energy-department.77d3e410.duckdb
+        ...
+
+Each shard holds one top-level agency, its sub-agencies, their CFR
+references and the corrections for their CFR titles, under the normal
+duckdb_schema.sql, so every analytics view works inside a shard.
+
+A shard is built under a new file name and the catalog is rewritten
+atomically to point at it; the previous file is then unlinked. Readers
+keep querying the file they opened until they notice the new catalog, so
+ingesting one agency never blocks queries on it or on any other shard.
+(New names also matter because DuckDB reuses an open database for a path
+it has seen, so a file replaced in place would never be reopened.)
+
+merge_shards() builds a new generation of the single ecfr_analytics.duckdb
+from the shards with bulk INSERT ... SELECT over ATTACHed files, for
+consumers that read one database (the Postgres ETL, the Flask app).
+
+FederatedAnalytics (analytics.py) fans queries out to the shards and
+merges their partial aggregates with the helpers here:
+
+- counts and sums add, minimums and maximums combine, averages travel as
+  (sum, count) pairs
+- corrections are shared by every agency citing their CFR title, so each
+  title is owned by exactly one shard (title_owners) and correction
+  aggregates only count owned titles
+- distinct counts over values that repeat across shards travel as
+  HyperLogLog registers, which merge by taking the maximum
+
+Usage:
+    python shards.py --root shards                      # every agency
+    python shards.py --root shards --agency department-of-energy
+"""
+
+import argparse
+import fcntl
+import json
+import math
+import os
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from decimal import ROUND_HALF_UP, Decimal
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from generations import GenerationStore
+from ingestion import INGEST_ROW_BYTES, ECFRIngestion, build_hierarchy, iter_feed
+from resources import ResourceProfile, connect, default_profile
+from telemetry import Tracer
+
+
+CATALOG_FILE = 'catalog.json'
+SHARD_SUFFIX = '.duckdb'
+
+# HyperLogLog precision: 2^12 registers, ~1.6% standard error
+HLL_PRECISION = 12
+
+
+def is_shard_root(path: str) -> bool:
+    """True when path is a shard directory rather than a DuckDB file."""
+    return (Path(path) / CATALOG_FILE).is_file()
+
+
+def agency_titles(agency: Dict[str, Any]) -> List[int]:
+    """CFR titles cited by an agency or any of its sub-agencies."""
+    titles = set()
+    for entry in [agency, *agency.get('children', [])]:
+        for ref in entry.get('cfr_references', []):
+            if ref.get('title') is not None:
+                titles.add(int(ref['title']))
+    return sorted(titles)
+
+
+def write_agency_feeds(corrections_json: Path, agencies: Sequence[Dict[str, Any]],
+                       paths: Dict[str, Path], head: Callable[[Dict[str, Any]], str],
+                       batch_rows: int) -> Dict[str, int]:
+    """
+    Stream corrections.json into one feed file per agency.
+
+    Each file is head(agency), the corrections on the agency's CFR titles
+    as sorted-key JSON separated by ', ', then ']}', so it reads back as
+    if the whole feed had been written with json.dumps(..., sort_keys=True).
+    At most batch_rows encoded corrections are held before they are
+    appended to their files.
+
+    Args:
+        corrections_json: Path to corrections.json
+        agencies: Top-level agency records
+        paths: Agency slug to the feed file to (over)write
+        head: Feed text up to and including the corrections' '['
+        batch_rows: Corrections buffered across all feeds
+
+    Returns:
+        Agency slug to the number of corrections in its feed
+    """
+    owners: Dict[int, List[str]] = {}
+    for agency in agencies:
+        for title in agency_titles(agency):
+            owners.setdefault(title, []).append(agency['slug'])
+        paths[agency['slug']].write_text(head(agency), encoding='utf-8')
+
+    counts = {agency['slug']: 0 for agency in agencies}
+    pending: Dict[str, List[str]] = {slug: [] for slug in counts}
+    buffered = 0
+
+    def flush():
+        for slug, items in pending.items():
+            if items:
+                with open(paths[slug], 'a', encoding='utf-8') as f:
+                    f.write(''.join(items))
+                items.clear()
+
+    for correction in iter_feed(corrections_json, 'ecfr_corrections'):
+        slugs = owners.get(int(correction['title']), [])
+        if not slugs:
+            continue
+        text = json.dumps(correction, sort_keys=True)
+        for slug in slugs:
+            pending[slug].append(f", {text}" if counts[slug] else text)
+            counts[slug] += 1
+        buffered += len(slugs)
+        if buffered >= batch_rows:
+            flush()
+            buffered = 0
+    flush()
+
+    for slug in counts:
+        with open(paths[slug], 'a', encoding='utf-8') as f:
+            f.write(']}')
+    return counts
+
+
+class ShardCatalog:
+    """The catalog.json index of a shard directory."""
+
+    def __init__(self, root: str):
+        """
+        Initialize catalog.
+
+        Args:
+            root: Shard directory (created when missing)
+        """
+        self.root = Path(root)
+        self.path = self.root / CATALOG_FILE
+
+    def shard_path(self, entry: Dict[str, Any]) -> Path:
+        """Current file of a catalog entry."""
+        return self.root / entry['file']
+
+    def version(self) -> Tuple[int, int]:
+        """Changes on every register(), which writes a new file."""
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return (0, 0)
+        return (stat.st_ino, stat.st_mtime_ns)
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """Shard name to entry (agencies, titles, row counts, updated_at)."""
+        try:
+            with open(self.path) as f:
+                return json.load(f)['shards']
+        except FileNotFoundError:
+            return {}
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Serialize catalog updates from concurrent ingestions."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / f"{CATALOG_FILE}.lock", 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def register(self, name: str, entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Add or replace one shard's entry, leaving the others untouched.
+
+        Returns:
+            The entry it replaced, if any
+        """
+        with self._locked():
+            shards = self.load()
+            previous = shards.get(name)
+            shards[name] = entry
+            self._write(shards)
+        return previous
+
+    def remove(self, names: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Drop shards from the catalog and delete their files.
+
+        Readers holding a removed file keep reading it until they refresh.
+
+        Returns:
+            Shard name to the entry removed, for names that were registered
+        """
+        with self._locked():
+            shards = self.load()
+            removed = {name: shards.pop(name) for name in set(names) if name in shards}
+            if removed:
+                self._write(shards)
+        for entry in removed.values():
+            self.shard_path(entry).unlink(missing_ok=True)
+        return removed
+
+    def _write(self, shards: Dict[str, Dict[str, Any]]):
+        """Replace catalog.json atomically; call with the lock held."""
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix='.catalog-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'shards': shards}, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
+
+    def shard_for(self, slug: str, shards: Optional[Dict[str, Dict[str, Any]]] = None) -> Optional[str]:
+        """Shard holding an agency or sub-agency slug."""
+        for name, entry in (shards if shards is not None else self.load()).items():
+            if slug in entry['agencies']:
+                return name
+        return None
+
+    @staticmethod
+    def title_owners(shards: Dict[str, Dict[str, Any]]) -> Dict[int, str]:
+        """
+        Assign every CFR title to exactly one shard.
+
+        Corrections are copied into every shard citing their title; counting
+        them only in the owner keeps merged correction aggregates exact.
+        The owner is the first shard by name, so it only changes when an
+        agency sorting earlier onboards with the same title.
+        """
+        owners: Dict[int, str] = {}
+        for name in sorted(shards):
+            for title in shards[name]['titles']:
+                owners.setdefault(title, name)
+        return owners
+
+
+class ShardedIngestion:
+    """Builds per-agency shards with the regular ingestion pipeline."""
+
+    def __init__(self, root: str, tracer: Optional[Tracer] = None,
+                 resources: Optional[ResourceProfile] = None):
+        """
+        Initialize sharded ingestion.
+
+        Args:
+            root: Shard directory
+            tracer: Records a span per shard (a new 'ingestion' tracer when None)
+            resources: Budget for one shard build (the process default when None)
+        """
+        self.catalog = ShardCatalog(root)
+        self.tracer = tracer or Tracer('ingestion')
+        self.resources = resources or default_profile()
+
+    def ingest_agency(self, agency: Dict[str, Any], corrections: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Build (or rebuild) one agency's shard and register it.
+
+        Args:
+            agency: Top-level agency record from agencies.json
+            corrections: All corrections; those for the agency's titles are kept
+
+        Returns:
+            The shard's catalog entry
+        """
+        wanted = set(agency_titles(agency))
+        selected = [c for c in corrections if int(c['title']) in wanted]
+        self.catalog.root.mkdir(parents=True, exist_ok=True)
+
+        with tempfile.TemporaryDirectory(dir=self.catalog.root, prefix=f".{agency['slug']}-") as tmp:
+            corrections_json = Path(tmp) / 'corrections.json'
+            with open(corrections_json, 'w') as f:
+                json.dump({'ecfr_corrections': selected}, f)
+            return self.ingest_feed(agency, corrections_json, len(selected))
+
+    def ingest_feed(self, agency: Dict[str, Any], corrections_json: Path, count: int) -> Dict[str, Any]:
+        """
+        Build (or rebuild) one agency's shard from its own corrections file and register it.
+
+        Args:
+            agency: Top-level agency record from agencies.json
+            corrections_json: Corrections for the agency's titles only
+            count: Corrections in corrections_json
+
+        Returns:
+            The shard's catalog entry
+        """
+        name = agency['slug']
+        self.catalog.root.mkdir(parents=True, exist_ok=True)
+
+        with self.tracer.span('ingestion.shard', shard=name) as span:
+            with tempfile.TemporaryDirectory(dir=self.catalog.root, prefix=f".{name}-") as tmp:
+                agencies_json = Path(tmp) / 'agencies.json'
+                with open(agencies_json, 'w') as f:
+                    json.dump({'agencies': [agency]}, f)
+
+                db_path = Path(tmp) / 'shard.duckdb'
+                pipeline = ECFRIngestion(str(db_path), tracer=self.tracer, resources=self.resources)
+                try:
+                    pipeline.connect()
+                    pipeline.initialize_schema()
+                    pipeline.load_agencies(agencies_json)
+                    if count:
+                        pipeline.load_corrections(corrections_json)
+                    pipeline.build_hierarchy()
+                finally:
+                    pipeline.close()
+
+                shard_file = f"{name}.{uuid.uuid4().hex[:8]}{SHARD_SUFFIX}"
+                os.replace(db_path, self.catalog.root / shard_file)
+
+            entry = {
+                'file': shard_file,
+                'agencies': [agency['slug']] + [child['slug'] for child in agency.get('children', [])],
+                'titles': agency_titles(agency),
+                'corrections': count,
+                'bytes': (self.catalog.root / shard_file).stat().st_size,
+                'updated_at': datetime.now(timezone.utc).isoformat(),
+            }
+            previous = self.catalog.register(name, entry)
+            if previous and previous['file'] != shard_file:
+                # Readers holding the old file keep reading it until they refresh
+                self.catalog.shard_path(previous).unlink(missing_ok=True)
+            span.rows = len(entry['agencies']) + count
+            span.bytes = entry['bytes']
+        return entry
+
+    def ingest_all(self, agencies_json: Path, corrections_json: Path,
+                   slugs: Optional[Iterable[str]] = None, workers: int = 4) -> Dict[str, Dict[str, Any]]:
+        """
+        Build shards for every (or the selected) top-level agency in parallel.
+
+        Args:
+            agencies_json: Path to agencies.json
+            corrections_json: Path to corrections.json
+            slugs: Only these top-level agencies (all when None)
+            workers: Shards built concurrently, each with 1/workers of
+                the resource budget
+
+        Corrections are streamed into one temporary file per agency
+        (write_agency_feeds) rather than held as a list; the top-level
+        agency records, a few hundred, are read whole.
+
+        Returns:
+            Shard name to catalog entry for the shards built
+        """
+        agencies = list(iter_feed(agencies_json, 'agencies'))
+
+        if slugs is not None:
+            wanted = set(slugs)
+            agencies = [agency for agency in agencies if agency['slug'] in wanted]
+            unknown = wanted - {agency['slug'] for agency in agencies}
+            if unknown:
+                raise ValueError(f"Unknown agencies: {sorted(unknown)}")
+
+        self.catalog.root.mkdir(parents=True, exist_ok=True)
+        builder = ShardedIngestion(str(self.catalog.root), self.tracer, self.resources.share(workers))
+        with tempfile.TemporaryDirectory(dir=self.catalog.root, prefix='.feeds-') as tmp:
+            paths = {agency['slug']: Path(tmp) / f"{agency['slug']}.json" for agency in agencies}
+            counts = write_agency_feeds(corrections_json, agencies, paths,
+                                        lambda agency: '{"ecfr_corrections": [',
+                                        self.resources.rows_within(INGEST_ROW_BYTES))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='shard') as pool:
+                entries = pool.map(
+                    lambda agency: builder.ingest_feed(agency, paths[agency['slug']], counts[agency['slug']]),
+                    agencies)
+                return {agency['slug']: entry for agency, entry in zip(agencies, entries)}
+
+
+def merge_shards(root: str, db_path: str, tracer: Optional[Tracer] = None,
+                 resources: Optional[ResourceProfile] = None,
+                 names: Optional[Iterable[str]] = None) -> Dict[str, int]:
+    """
+    Rebuild one database holding every (or the named) shard, as ingestion.py would.
+
+    Agencies get the ids ingestion assigns (parent n, children n * 1000 + k)
+    with n the shard's position by name; corrections are taken from their
+    title's owner so each appears once, keyed by their eCFR id. The result
+    is published as a new generation of db_path (see generations.py).
+
+    Args:
+        root: Shard directory
+        db_path: Database to (re)create
+        tracer: Records the merge span (a new 'ingestion' tracer when None)
+        resources: Budget for the merge; attached shards share it (the
+            process default when None)
+        names: Only these shards (all registered when None)
+
+    Returns:
+        Table name to row count
+
+    Raises:
+        ValueError: If a named shard is not in the catalog
+    """
+    tracer = tracer or Tracer('ingestion')
+    catalog = ShardCatalog(root)
+    shards = catalog.load()
+    if names is not None:
+        wanted = set(names)
+        unknown = wanted - set(shards)
+        if unknown:
+            raise ValueError(f"Shards not in the catalog: {sorted(unknown)}")
+        shards = {name: entry for name, entry in shards.items() if name in wanted}
+    owners = ShardCatalog.title_owners(shards)
+    schema_sql = (Path(__file__).parent / 'duckdb_schema.sql').read_text()
+
+    store = GenerationStore(db_path)
+    with tracer.span('ingestion.merge_shards', shards=len(shards)) as span, store.building() as build_path:
+        conn = connect(str(build_path), resources=resources)
+        try:
+            conn.execute(schema_sql)
+            for position, name in enumerate(sorted(shards), start=1):
+                owned = sorted(title for title, owner in owners.items() if owner == name)
+                owned_filter = f"title IN ({', '.join(map(str, owned))})" if owned else "FALSE"
+                new_id = f"CASE WHEN id < 1000 THEN {position} ELSE {position} * 1000 + id % 1000 END"
+
+                path = str(catalog.shard_path(shards[name])).replace("'", "''")
+                conn.execute(f"ATTACH '{path}' AS shard (READ_ONLY)")
+                try:
+                    conn.execute(f"""
+                        INSERT INTO agencies_raw BY NAME
+                        SELECT * REPLACE ({new_id} AS id) FROM shard.agencies_raw
+                    """)
+                    conn.execute(f"""
+                        INSERT INTO agencies_parsed BY NAME
+                        SELECT * REPLACE ({new_id} AS id) FROM shard.agencies_parsed
+                    """)
+                    conn.execute("""
+                        INSERT INTO cfr_references BY NAME
+                        SELECT * EXCLUDE (id) FROM shard.cfr_references ORDER BY id
+                    """)
+                    conn.execute(f"""
+                        INSERT INTO corrections_parsed BY NAME
+                        SELECT * REPLACE (ecfr_id AS id) FROM shard.corrections_parsed
+                        WHERE {owned_filter}
+                    """)
+                    conn.execute(f"""
+                        INSERT INTO corrections_raw BY NAME
+                        SELECT * REPLACE (ecfr_id AS id) FROM shard.corrections_raw
+                        WHERE ecfr_id IN (SELECT ecfr_id FROM shard.corrections_parsed WHERE {owned_filter})
+                    """)
+                finally:
+                    conn.execute("DETACH shard")
+            build_hierarchy(conn)
+
+            counts = {
+                table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ('agencies_parsed', 'cfr_references', 'corrections_parsed')
+            }
+        finally:
+            conn.close()
+        span.rows = sum(counts.values())
+        span.bytes = build_path.stat().st_size
+    return counts
+
+
+# ----------------------------------------------------------------------
+# Partial aggregate merging
+# ----------------------------------------------------------------------
+
+def merge_groups(partials: Iterable[Sequence[tuple]], keys: int, kinds: Sequence[str]) -> Dict[tuple, List[Any]]:
+    """
+    Merge grouped partial aggregates from several shards.
+
+    Args:
+        partials: Each shard's rows, (*group key, *aggregates)
+        keys: Number of leading group key columns
+        kinds: Merge for each aggregate column: 'sum', 'min' or 'max'
+
+    Returns:
+        Group key to merged aggregate values
+    """
+    merged: Dict[tuple, List[Any]] = {}
+    for rows in partials:
+        for row in rows:
+            key, values = tuple(row[:keys]), row[keys:]
+            current = merged.get(key)
+            if current is None:
+                merged[key] = list(values)
+                continue
+            for i, (kind, value) in enumerate(zip(kinds, values)):
+                if value is None:
+                    continue
+                if current[i] is None:
+                    current[i] = value
+                elif kind == 'sum':
+                    current[i] += value
+                elif kind == 'min':
+                    current[i] = min(current[i], value)
+                elif kind == 'max':
+                    current[i] = max(current[i], value)
+                else:
+                    raise ValueError(f"Unknown merge kind: {kind}")
+    return merged
+
+
+def merged_average(total: Optional[float], count: Optional[int], digits: Optional[int] = None) -> Optional[float]:
+    """
+    Average from merged (sum, count) partials.
+
+    Args:
+        total: Merged sum
+        count: Merged count
+        digits: Round half away from zero like DuckDB's ROUND (no rounding when None)
+    """
+    if not count:
+        return None
+    if digits is None:
+        return float(total) / count
+    average = Decimal(total) / Decimal(count)
+    return float(average.quantize(Decimal(1).scaleb(-digits), rounding=ROUND_HALF_UP))
+
+
+def hll_registers_sql(table: str, column: str, precision: int = HLL_PRECISION) -> str:
+    """
+    Query returning (register, rank) pairs of a column's HyperLogLog sketch.
+
+    The low bits of DuckDB's 64-bit hash pick the register (they are better
+    mixed than the high bits for small integers); the rank is the position
+    of the first set bit in the remaining bits, from bit_count of the value
+    with every bit below its highest one set.
+    """
+    high = 64 - precision
+    return f"""
+        SELECT h & {(1 << precision) - 1} AS register, MAX({high + 1} - bit_count(s)) AS rank
+        FROM (
+            SELECT
+                h,
+                h >> {precision} AS w,
+                w | (w >> 1) AS s1,
+                s1 | (s1 >> 2) AS s2,
+                s2 | (s2 >> 4) AS s3,
+                s3 | (s3 >> 8) AS s4,
+                s4 | (s4 >> 16) AS s5,
+                s5 | (s5 >> 32) AS s
+            FROM (SELECT hash("{column}") AS h FROM "{table}" WHERE "{column}" IS NOT NULL)
+        )
+        GROUP BY register
+    """
+
+
+class HyperLogLog:
+    """A mergeable distinct-count sketch built from hll_registers_sql rows."""
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add_registers(self, rows: Iterable[Tuple[int, int]]):
+        """Fold one shard's (register, rank) rows into the sketch."""
+        registers = self.registers
+        for register, rank in rows:
+            if rank > registers[register]:
+                registers[register] = rank
+
+    def merge(self, other: 'HyperLogLog'):
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches of different precision")
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def estimate(self) -> int:
+        """Estimated number of distinct values."""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -rank for rank in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+def main():
+    """Build per-agency shards from the eCFR JSON files."""
+    base_path = Path(__file__).parent
+    parser = argparse.ArgumentParser(description="Build per-agency DuckDB shards")
+    parser.add_argument('--root', default=str(base_path / 'shards'))
+    parser.add_argument('--agencies-json', default=str(base_path / 'json/usds/ecfr/agencies.json'))
+    parser.add_argument('--corrections-json', default=str(base_path / 'json/usds/ecfr/corrections.json'))
+    parser.add_argument('--agency', action='append', help="Only this top-level agency (repeatable)")
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    ingestion = ShardedIngestion(args.root)
+    print(f"🧩 Building shards in {args.root}...")
+    start = time.perf_counter()
+    built = ingestion.ingest_all(Path(args.agencies_json), Path(args.corrections_json),
+                                 slugs=args.agency, workers=args.workers)
+    elapsed = time.perf_counter() - start
+
+    total = len(ingestion.catalog.load())
+    print(f"\n✅ Built {len(built)} shards in {elapsed:.1f}s ({total} in catalog)")
+    ingestion.tracer.report()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,482 @@
+"""
+Snapshot Diff Engine
+
+Compares two keyed snapshots of an extract and emits the inserts, updates
+and deletes that turn the old one into the new one, for incremental loads
+into DuckDB instead of full reloads.
+
+- Each row gets a checksum with checksums.calculate_checksum
+- Snapshots are sorted by key with an external merge sort: sorted runs of
+  at most memory_rows rows are spilled to temporary files and merged
+  lazily, so memory stays bounded however large the extract is
+- The diff is a single merge join over the two sorted streams
+- The new snapshot's (key, checksum) pairs are written as a sorted state
+  file while diffing, so the next run only has to sort the new extract
+
+Usage:
+    python snapshot_diff.py --new agencies.jsonl --key id \\
+        --state agencies.state --db ecfr_analytics.duckdb --table db2_agencies
+    python snapshot_diff.py --new AGENCY.UNLOAD --copybook AGENCY.cpy --key agency_id \\
+        --state agencies.state --db ecfr_analytics.duckdb --table db2_agencies
+"""
+
+import argparse
+import heapq
+import json
+import os
+import pickle
+import re
+import tempfile
+from itertools import islice
+from operator import itemgetter
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import duckdb
+import pyarrow as pa
+
+from checksums import calculate_checksum
+from resources import connect, default_profile
+from telemetry import Tracer
+
+
+DEFAULT_MEMORY_ROWS = 200_000
+# Rough size of one buffered record as Python objects, for sizing sort runs
+SNAPSHOT_ROW_BYTES = 1024
+PICKLE_CHUNK_ROWS = 1024
+APPLY_BATCH_ROWS = 10_000
+
+INSERT, UPDATE, DELETE = 'insert', 'update', 'delete'
+
+# (key, checksum, record); record is None for state files
+Entry = Tuple[tuple, str, Optional[Dict[str, Any]]]
+
+
+class Change:
+    """One row-level difference between snapshots."""
+
+    __slots__ = ('op', 'key', 'record')
+
+    def __init__(self, op: str, key: tuple, record: Optional[Dict[str, Any]] = None):
+        self.op = op
+        self.key = key
+        self.record = record
+
+    def __repr__(self):
+        return f"<Change {self.op} {self.key}>"
+
+
+def _write_entries(path: Path, entries: Iterable[Entry]) -> int:
+    """Pickle entries in chunks; returns the number written."""
+    count = 0
+    with open(path, 'wb') as f:
+        iterator = iter(entries)
+        while True:
+            chunk = list(islice(iterator, PICKLE_CHUNK_ROWS))
+            if not chunk:
+                return count
+            pickle.dump(chunk, f, protocol=pickle.HIGHEST_PROTOCOL)
+            count += len(chunk)
+
+
+def _read_entries(path: Path) -> Iterator[Entry]:
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                chunk = pickle.load(f)
+            except EOFError:
+                return
+            yield from chunk
+
+
+class ExternalSorter:
+    """Sorts snapshot rows by key in bounded memory."""
+
+    def __init__(
+        self,
+        key_fields: Sequence[str],
+        memory_rows: int = DEFAULT_MEMORY_ROWS,
+        tmp_dir: Optional[str] = None,
+        keep_records: bool = True,
+    ):
+        """
+        Initialize sorter.
+
+        Args:
+            key_fields: Fields that identify a row
+            memory_rows: Rows held in memory before a sorted run is spilled
+            tmp_dir: Directory for run files (system default when None)
+            keep_records: Carry full records; False keeps only key and checksum
+        """
+        self.key_fields = list(key_fields)
+        self.memory_rows = memory_rows
+        self.tmp_dir = tmp_dir
+        self.keep_records = keep_records
+        self.rows = 0
+        self.spilled_runs = 0
+
+    def entry(self, record: Dict[str, Any]) -> Entry:
+        key = tuple(record.get(field) for field in self.key_fields)
+        if None in key:
+            raise ValueError(f"Row without a complete key {self.key_fields}: {record}")
+        return key, calculate_checksum(record), record if self.keep_records else None
+
+    def sort(self, records: Iterable[Dict[str, Any]]) -> Iterator[Entry]:
+        """
+        Yield (key, checksum, record) entries in key order.
+
+        Run files live in a temporary directory removed when the generator
+        is exhausted or closed.
+        """
+        by_key = itemgetter(0)
+        with tempfile.TemporaryDirectory(prefix='snapshot-sort-', dir=self.tmp_dir) as tmp:
+            runs: List[Path] = []
+            buffer: List[Entry] = []
+            for record in records:
+                buffer.append(self.entry(record))
+                self.rows += 1
+                if len(buffer) >= self.memory_rows:
+                    buffer.sort(key=by_key)
+                    runs.append(Path(tmp) / f"run-{len(runs):05d}.pkl")
+                    _write_entries(runs[-1], buffer)
+                    buffer = []
+            buffer.sort(key=by_key)
+
+            if not runs:
+                yield from buffer
+                return
+            if buffer:
+                runs.append(Path(tmp) / f"run-{len(runs):05d}.pkl")
+                _write_entries(runs[-1], buffer)
+                buffer = []
+            self.spilled_runs = len(runs)
+            yield from heapq.merge(*(_read_entries(run) for run in runs), key=by_key)
+
+
+def _unique(entries: Iterable[Entry], label: str) -> Iterator[Entry]:
+    """Pass sorted entries through, rejecting duplicate keys."""
+    previous = None
+    for entry in entries:
+        if previous is not None and entry[0] == previous:
+            raise ValueError(f"Duplicate key {entry[0]} in {label} snapshot")
+        previous = entry[0]
+        yield entry
+
+
+class SnapshotDiff:
+    """Merge-join diff of two keyed snapshots."""
+
+    def __init__(
+        self,
+        key_fields: Sequence[str],
+        memory_rows: int = DEFAULT_MEMORY_ROWS,
+        tmp_dir: Optional[str] = None,
+    ):
+        """
+        Initialize diff engine.
+
+        Args:
+            key_fields: Fields that identify a row in both snapshots
+            memory_rows: Rows per in-memory sorted run
+            tmp_dir: Directory for spilled runs
+        """
+        self.key_fields = list(key_fields)
+        self.memory_rows = memory_rows
+        self.tmp_dir = tmp_dir
+        self.stats = {INSERT: 0, UPDATE: 0, DELETE: 0, 'unchanged': 0}
+        self.spilled_runs = 0
+
+    def _sorter(self, keep_records: bool) -> ExternalSorter:
+        return ExternalSorter(self.key_fields, self.memory_rows, self.tmp_dir, keep_records)
+
+    def diff(
+        self,
+        old_records: Iterable[Dict[str, Any]],
+        new_records: Iterable[Dict[str, Any]],
+        state_out: Optional[str] = None,
+    ) -> Iterator[Change]:
+        """
+        Diff two snapshots given as record iterables.
+
+        Args:
+            old_records: Previous snapshot
+            new_records: Current snapshot
+            state_out: Write the current snapshot's sorted state here
+
+        Yields:
+            Changes in key order
+        """
+        old_sorter = self._sorter(keep_records=False)
+        yield from self._merge(old_sorter.sort(old_records), new_records, state_out, [old_sorter])
+
+    def diff_state(
+        self,
+        state_path: Optional[str],
+        new_records: Iterable[Dict[str, Any]],
+        state_out: Optional[str] = None,
+    ) -> Iterator[Change]:
+        """
+        Diff a snapshot against the state file written by the previous run.
+
+        Args:
+            state_path: Previous state file (None or missing: everything is new)
+            new_records: Current snapshot
+            state_out: Write the current snapshot's sorted state here
+
+        Yields:
+            Changes in key order
+        """
+        old: Iterable[Entry] = ()
+        if state_path and Path(state_path).exists():
+            old = _read_entries(Path(state_path))
+        yield from self._merge(old, new_records, state_out, [])
+
+    def _merge(self, old: Iterable[Entry], new_records: Iterable[Dict[str, Any]],
+               state_out: Optional[str], sorters: List[ExternalSorter]) -> Iterator[Change]:
+        new_sorter = self._sorter(keep_records=True)
+        sorters.append(new_sorter)
+        old_entries = _unique(old, 'old')
+        new_entries = _unique(new_sorter.sort(new_records), 'new')
+
+        state_file = None
+        if state_out:
+            # Written beside the target and renamed, so a failed run keeps the old state
+            state_file = tempfile.NamedTemporaryFile(
+                'wb', dir=Path(state_out).parent, prefix='.state-', delete=False
+            )
+        state_chunk: List[Entry] = []
+
+        def record_state(entry: Entry):
+            if state_file is not None:
+                state_chunk.append((entry[0], entry[1], None))
+                if len(state_chunk) >= PICKLE_CHUNK_ROWS:
+                    pickle.dump(state_chunk, state_file, protocol=pickle.HIGHEST_PROTOCOL)
+                    state_chunk.clear()
+
+        try:
+            old_entry = next(old_entries, None)
+            new_entry = next(new_entries, None)
+            while old_entry is not None or new_entry is not None:
+                if new_entry is None or (old_entry is not None and old_entry[0] < new_entry[0]):
+                    self.stats[DELETE] += 1
+                    yield Change(DELETE, old_entry[0])
+                    old_entry = next(old_entries, None)
+                    continue
+
+                record_state(new_entry)
+                if old_entry is None or new_entry[0] < old_entry[0]:
+                    self.stats[INSERT] += 1
+                    yield Change(INSERT, new_entry[0], new_entry[2])
+                elif new_entry[1] != old_entry[1]:
+                    self.stats[UPDATE] += 1
+                    yield Change(UPDATE, new_entry[0], new_entry[2])
+                    old_entry = next(old_entries, None)
+                else:
+                    self.stats['unchanged'] += 1
+                    old_entry = next(old_entries, None)
+                new_entry = next(new_entries, None)
+
+            if state_file is not None:
+                if state_chunk:
+                    pickle.dump(state_chunk, state_file, protocol=pickle.HIGHEST_PROTOCOL)
+                state_file.close()
+                os.replace(state_file.name, state_out)
+                state_file = None
+        finally:
+            if state_file is not None:
+                state_file.close()
+                os.unlink(state_file.name)
+            self.spilled_runs = sum(s.spilled_runs for s in sorters)
+
+
+def table_exists(conn: duckdb.DuckDBPyConnection, table: str) -> bool:
+    """Whether table exists in the DuckDB database."""
+    return conn.execute(
+        "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = ?", [table]
+    ).fetchone()[0] > 0
+
+
+def infer_schema(records: Iterable[Dict[str, Any]], chunk_rows: int = APPLY_BATCH_ROWS) -> pa.Schema:
+    """
+    Arrow schema covering every record of a snapshot.
+
+    Chunk schemas are unified with type promotion, so a column that is NULL
+    in the first rows takes its type from later ones. Columns that are NULL
+    in every record become strings.
+    """
+    schema = None
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, chunk_rows))
+        if not chunk:
+            break
+        chunk_schema = pa.Table.from_pylist(chunk).schema
+        schema = chunk_schema if schema is None else pa.unify_schemas(
+            [schema, chunk_schema], promote_options='permissive'
+        )
+    if schema is None:
+        raise ValueError("Cannot infer a schema from an empty snapshot")
+    return pa.schema([
+        field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+        for field in schema
+    ])
+
+
+def apply_changes(
+    conn: duckdb.DuckDBPyConnection,
+    table: str,
+    key_fields: Sequence[str],
+    changes: Iterable[Change],
+    batch_rows: int = APPLY_BATCH_ROWS,
+    tracer: Optional[Tracer] = None,
+    schema: Optional[pa.Schema] = None,
+) -> Dict[str, int]:
+    """
+    Apply changes to a DuckDB table in one transaction.
+
+    Each batch deletes the keys of its updates and deletes with one
+    DELETE ... USING and inserts the new rows with one INSERT ... BY NAME.
+    If the table does not exist it is created with schema, or from the
+    first inserted rows when no schema is given.
+
+    Args:
+        conn: DuckDB connection
+        table: Target table
+        key_fields: Key columns
+        changes: Changes from SnapshotDiff
+        batch_rows: Changes per batch
+        tracer: Tracer for the apply span
+        schema: Arrow schema of the records (RecordLayout.schema for
+            unloads, infer_schema() of the snapshot for JSON lines)
+
+    Raises:
+        ValueError: If the table must be created without a schema and a
+            column is NULL in every row of the first batch, so its type
+            is unknown
+
+    Returns:
+        Counts of applied inserts, updates and deletes
+    """
+    for name in [table, *key_fields]:
+        if not re.fullmatch(r'[A-Za-z_][A-Za-z0-9_]*', name):
+            raise ValueError(f"Invalid identifier: {name}")
+    tracer = tracer or Tracer('snapshot_diff')
+    key_match = ' AND '.join(f"t.{k} = k.{k}" for k in key_fields)
+    counts = {INSERT: 0, UPDATE: 0, DELETE: 0}
+
+    def flush(batch: List[Change]):
+        exists = table_exists(conn, table)
+        removed = [c.key for c in batch if c.op != INSERT]
+        if removed and exists:
+            change_keys = pa.Table.from_pylist([dict(zip(key_fields, key)) for key in removed])
+            conn.register('change_keys', change_keys)
+            conn.execute(f"DELETE FROM {table} t USING change_keys k WHERE {key_match}")
+            conn.unregister('change_keys')
+
+        rows = [c.record for c in batch if c.op != DELETE]
+        if rows:
+            change_rows = pa.Table.from_pylist(rows, schema=schema)
+            if not exists and schema is None:
+                untyped = [f.name for f in change_rows.schema if pa.types.is_null(f.type)]
+                if untyped:
+                    raise ValueError(f"No schema for {table} and no values in {', '.join(untyped)}")
+            conn.register('change_rows', change_rows)
+            if not exists:
+                conn.execute(f"CREATE TABLE {table} AS SELECT * FROM change_rows")
+            else:
+                conn.execute(f"INSERT INTO {table} BY NAME SELECT * FROM change_rows")
+            conn.unregister('change_rows')
+        for change in batch:
+            counts[change.op] += 1
+
+    with tracer.span('snapshot_diff.apply', table=table) as span:
+        conn.execute("BEGIN TRANSACTION")
+        try:
+            batch: List[Change] = []
+            for change in changes:
+                batch.append(change)
+                if len(batch) >= batch_rows:
+                    flush(batch)
+                    batch = []
+            if batch:
+                flush(batch)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        span.rows = sum(counts.values())
+    return counts
+
+
+def read_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    """Records of a JSON lines snapshot."""
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_layout(copybook: str):
+    """RecordLayout of an unload's copybook."""
+    from unload_decoder import RecordLayout
+
+    return RecordLayout.from_copybook(Path(copybook).read_text())
+
+
+def read_unload(path: str, copybook: str) -> Iterator[Dict[str, Any]]:
+    """Records of a fixed-length EBCDIC unload, decoded a batch at a time."""
+    from unload_decoder import UnloadDecoder
+
+    for batch in UnloadDecoder(read_layout(copybook), path).batches():
+        yield from batch.to_pylist()
+
+
+def main():
+    """Diff a new extract against the last run's state and apply the changes."""
+    parser = argparse.ArgumentParser(description="Incrementally load a keyed snapshot into DuckDB")
+    parser.add_argument('--new', required=True, help="Current snapshot (JSON lines or unload)")
+    parser.add_argument('--copybook', help="Copybook when --new is an EBCDIC unload")
+    parser.add_argument('--key', required=True, help="Comma-separated key fields")
+    parser.add_argument('--state', required=True, help="Sorted state file from the previous run")
+    parser.add_argument('--db', default='ecfr_analytics.duckdb')
+    parser.add_argument('--table', required=True)
+    parser.add_argument('--memory-rows', type=int,
+                        help="Rows per sorted run (sized from the resource profile by default)")
+    parser.add_argument('--tmp-dir', help="Directory for spilled sort runs (LAKE_TEMP_DIR by default)")
+    args = parser.parse_args()
+
+    resources = default_profile()
+    memory_rows = args.memory_rows or resources.rows_within(SNAPSHOT_ROW_BYTES, cap=DEFAULT_MEMORY_ROWS)
+    key_fields = [k.strip() for k in args.key.split(',')]
+    records = read_unload(args.new, args.copybook) if args.copybook else read_jsonl(args.new)
+    tmp_dir = args.tmp_dir or resources.temp_directory
+    os.makedirs(tmp_dir, exist_ok=True)
+    engine = SnapshotDiff(key_fields, memory_rows, tmp_dir)
+    tracer = Tracer('snapshot_diff')
+
+    print(f"🔍 Diffing {args.new} against {args.state}...")
+    conn = connect(args.db)
+    try:
+        schema = None
+        if args.copybook:
+            schema = read_layout(args.copybook).schema
+        elif not table_exists(conn, args.table):
+            # Typed from the whole first snapshot, not just its first batch
+            schema = infer_schema(read_jsonl(args.new))
+
+        # The state file is only replaced once the changes are committed
+        state_tmp = f"{args.state}.pending"
+        counts = apply_changes(conn, args.table, key_fields,
+                               engine.diff_state(args.state, records, state_tmp),
+                               tracer=tracer, schema=schema)
+        os.replace(state_tmp, args.state)
+    finally:
+        conn.close()
+
+    print(f"✅ {counts[INSERT]:,} inserts, {counts[UPDATE]:,} updates, {counts[DELETE]:,} deletes "
+          f"({engine.stats['unchanged']:,} unchanged, {engine.spilled_runs} spilled runs)")
+    tracer.report()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,329 @@
+"""
+Sterilization Stage
+
+Applies the zOS/PIPELINE.md sterilization rules to a staged DuckDB table
+as one set-based statement:
+
+- Identity treatment: direct identifiers become salted SHA-256 tokens
+  (<column>_hash); the raw columns never reach the output
+- Attribute suppression: numeric quasi-identifiers are banded
+  (<column>_band, e.g. '30_to_39'), timestamps are bucketed
+  (<column>_<unit>) and free-text columns are dropped
+- Structural risk control: rows whose quasi-identifier combination occurs
+  fewer than k times are suppressed, using one window count per
+  quasi-identifier set in the same pass (QUALIFY), not a join back to a
+  grouped copy. Suppressing a row for one set can push a cell of another
+  set below k, so with several sets the counts are re-checked on the
+  output until a pass deletes nothing
+
+The salt comes from STERILIZATION_SALT and is bound as a query parameter;
+only its version label and a fingerprint are stored. Every run records its
+policy, SQL, row counts and column lineage in sterilization_runs and
+sterilization_columns.
+
+Usage:
+    STERILIZATION_SALT=... python sterilization.py --db ecfr_analytics.duckdb --policy policy.json
+
+Policy (JSON):
+    {
+      "source": "stage_raw",
+      "output": "safe_data",
+      "identifiers": ["raw_name", "raw_ssn"],
+      "drop": ["clinician_notes"],
+      "bands": {"age": 10},
+      "buckets": {"encounter_ts": "week"},
+      "quasi_identifiers": [["age_band", "encounter_ts_week"]],
+      "k": 5
+    }
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import duckdb
+
+from checksums import calculate_checksum
+from resources import connect
+from telemetry import Tracer
+
+
+DEFAULT_K = 5
+BUCKET_UNITS = ('day', 'week', 'month', 'quarter', 'year')
+
+STERILIZATION_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sterilization_runs (
+    run_id VARCHAR PRIMARY KEY,
+    source_table VARCHAR NOT NULL,
+    output_table VARCHAR NOT NULL,
+    policy JSON NOT NULL,
+    policy_checksum VARCHAR(64) NOT NULL,
+    salt_version VARCHAR,
+    salt_fingerprint VARCHAR(16) NOT NULL,
+    k INTEGER NOT NULL,
+    rows_in BIGINT NOT NULL,
+    rows_out BIGINT NOT NULL,
+    rows_suppressed BIGINT NOT NULL,
+    duration_ms DOUBLE,
+    sql_text VARCHAR NOT NULL,
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS sterilization_columns (
+    run_id VARCHAR NOT NULL,
+    output_column VARCHAR,
+    source_column VARCHAR NOT NULL,
+    treatment VARCHAR NOT NULL
+);
+"""
+
+
+class SterilizationPolicy:
+    """Which columns of a staged table get which treatment."""
+
+    def __init__(self, source: str, output: str, identifiers: Optional[List[str]] = None,
+                 drop: Optional[List[str]] = None, bands: Optional[Dict[str, int]] = None,
+                 buckets: Optional[Dict[str, str]] = None,
+                 quasi_identifiers: Optional[List[List[str]]] = None, k: int = DEFAULT_K):
+        """
+        Initialize policy.
+
+        Args:
+            source: Staged table to read
+            output: Table to (re)create with the sterilized rows
+            identifiers: Direct identifiers to tokenize
+            drop: Columns excluded from the output (free text, etc.)
+            bands: Numeric column to integer band width
+            buckets: Timestamp column to date_trunc unit
+            quasi_identifiers: Output column sets that must each occur k times
+            k: Minimum cell count
+        """
+        self.source = source
+        self.output = output
+        self.identifiers = identifiers or []
+        self.drop = drop or []
+        self.bands = bands or {}
+        self.buckets = buckets or {}
+        self.quasi_identifiers = quasi_identifiers or []
+        self.k = k
+
+        for name in [source, output, *self.identifiers, *self.drop, *self.bands, *self.buckets,
+                     *(column for qi in self.quasi_identifiers for column in qi)]:
+            if not re.fullmatch(r'[A-Za-z_][A-Za-z0-9_]*', name):
+                raise ValueError(f"Invalid identifier: {name}")
+        for column, unit in self.buckets.items():
+            if unit not in BUCKET_UNITS:
+                raise ValueError(f"{column}: bucket unit must be one of {BUCKET_UNITS}")
+        for column, width in self.bands.items():
+            # Labels are integer bounds ('30_to_39'), which a fractional width can't express
+            if isinstance(width, bool) or not isinstance(width, (int, float)) or width <= 0 \
+                    or width != int(width):
+                raise ValueError(f"{column}: band width must be a positive integer")
+            self.bands[column] = int(width)
+        if k < 1:
+            raise ValueError("k must be at least 1")
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'SterilizationPolicy':
+        return cls(**data)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'source': self.source,
+            'output': self.output,
+            'identifiers': self.identifiers,
+            'drop': self.drop,
+            'bands': self.bands,
+            'buckets': self.buckets,
+            'quasi_identifiers': self.quasi_identifiers,
+            'k': self.k,
+        }
+
+
+def salt_fingerprint(salt: str) -> str:
+    """Short digest identifying a salt without revealing it."""
+    return hashlib.sha256(f"sterilization-salt:{salt}".encode('utf-8')).hexdigest()[:16]
+
+
+class Sterilizer:
+    """Runs sterilization policies against a DuckDB database."""
+
+    def __init__(self, conn: duckdb.DuckDBPyConnection, salt: Optional[str] = None,
+                 salt_version: Optional[str] = None, tracer: Optional[Tracer] = None):
+        """
+        Initialize sterilizer.
+
+        Args:
+            conn: DuckDB connection holding the staged tables
+            salt: Tokenization salt (defaults to STERILIZATION_SALT)
+            salt_version: Salt label for provenance (defaults to STERILIZATION_SALT_VERSION)
+            tracer: Tracer for run spans
+
+        Raises:
+            ValueError: If no salt is configured
+        """
+        self.conn = conn
+        self.salt = salt if salt is not None else os.getenv('STERILIZATION_SALT')
+        if not self.salt:
+            raise ValueError("STERILIZATION_SALT is not set; refusing to tokenize without a salt")
+        self.salt_version = salt_version or os.getenv('STERILIZATION_SALT_VERSION')
+        self.tracer = tracer or Tracer('sterilization')
+        self.conn.execute(STERILIZATION_SCHEMA)
+
+    def _source_columns(self, table: str) -> List[str]:
+        rows = self.conn.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = ? ORDER BY ordinal_position",
+            [table],
+        ).fetchall()
+        if not rows:
+            raise ValueError(f"Source table {table} not found")
+        return [row[0] for row in rows]
+
+    def build_sql(self, policy: SterilizationPolicy) -> Tuple[str, List[Tuple[Optional[str], str, str]]]:
+        """
+        Build the sterilization statement.
+
+        Returns:
+            Tuple of (sql, lineage) where lineage lists
+            (output_column, source_column, treatment)
+        """
+        columns = self._source_columns(policy.source)
+        treated = {*policy.identifiers, *policy.drop, *policy.bands, *policy.buckets}
+        missing = treated - set(columns)
+        if missing:
+            raise ValueError(f"Policy columns not in {policy.source}: {sorted(missing)}")
+
+        expressions: Dict[str, str] = {}
+        lineage: List[Tuple[Optional[str], str, str]] = []
+        for column in columns:
+            if column in policy.identifiers:
+                output = f"{column}_hash"
+                expressions[output] = f'sha256($salt || CAST("{column}" AS VARCHAR))'
+                lineage.append((output, column, 'salted_sha256'))
+            elif column in policy.bands:
+                width = policy.bands[column]
+                low = f'floor("{column}" / {width}) * {width}'
+                output = f"{column}_band"
+                expressions[output] = f"CAST({low} AS BIGINT) || '_to_' || CAST({low} + {width} - 1 AS BIGINT)"
+                lineage.append((output, column, f'band:{width}'))
+            elif column in policy.buckets:
+                unit = policy.buckets[column]
+                output = f"{column}_{unit}"
+                expressions[output] = f"date_trunc('{unit}', \"{column}\")"
+                lineage.append((output, column, f'bucket:{unit}'))
+            elif column in policy.drop:
+                lineage.append((None, column, 'dropped'))
+            else:
+                expressions[column] = f'"{column}"'
+                lineage.append((column, column, 'kept'))
+
+        for qi in policy.quasi_identifiers:
+            unknown = set(qi) - set(expressions)
+            if unknown:
+                raise ValueError(f"Quasi-identifiers not in the output: {sorted(unknown)}")
+
+        select = ',\n    '.join(f'{expr} AS "{output}"' for output, expr in expressions.items())
+        sql = f'CREATE OR REPLACE TABLE "{policy.output}" AS\nSELECT\n    {select}\nFROM "{policy.source}"'
+        if policy.quasi_identifiers:
+            # One window count per set, evaluated in the same scan as the treatment
+            conditions = [
+                f"COUNT(*) OVER (PARTITION BY {', '.join(expressions[column] for column in qi)}) >= {policy.k}"
+                for qi in policy.quasi_identifiers
+            ]
+            sql += '\nQUALIFY ' + '\n    AND '.join(conditions)
+        return sql, lineage
+
+    def suppression_sql(self, policy: SterilizationPolicy) -> str:
+        """
+        Build the statement that re-checks every quasi-identifier set on the output.
+
+        Returns:
+            A DELETE of the output rows in a cell below k for any set
+        """
+        partitions = [', '.join(f'"{column}"' for column in qi) for qi in policy.quasi_identifiers]
+        conditions = [f"COUNT(*) OVER (PARTITION BY {columns}) < {policy.k}" for columns in partitions]
+        return (
+            f'DELETE FROM "{policy.output}" WHERE rowid IN (\n'
+            f'    SELECT rowid FROM "{policy.output}"\n'
+            '    QUALIFY ' + '\n        OR '.join(conditions) + '\n)'
+        )
+
+    def run(self, policy: SterilizationPolicy) -> Dict[str, Any]:
+        """
+        Sterilize a staged table and record provenance.
+
+        Returns:
+            The sterilization_runs row as a dict
+        """
+        run_id = str(uuid.uuid4())
+        sql, lineage = self.build_sql(policy)
+        # A single set is settled by the QUALIFY; overlapping sets need re-checks
+        suppression = self.suppression_sql(policy) if len(policy.quasi_identifiers) > 1 else None
+
+        with self.tracer.span('sterilization.run', source=policy.source, output=policy.output) as span:
+            rows_in = self.conn.execute(f'SELECT COUNT(*) FROM "{policy.source}"').fetchone()[0]
+            self.conn.execute(sql, {'salt': self.salt} if policy.identifiers else None)
+            passes = 1
+            while suppression and self.conn.execute(suppression).fetchone()[0]:
+                passes += 1
+            rows_out = self.conn.execute(f'SELECT COUNT(*) FROM "{policy.output}"').fetchone()[0]
+            span.rows = rows_out
+            span.attributes['passes'] = passes
+        if suppression:
+            sql += ';\n' + suppression
+
+        record = {
+            'run_id': run_id,
+            'source_table': policy.source,
+            'output_table': policy.output,
+            'policy': json.dumps(policy.to_dict(), sort_keys=True),
+            'policy_checksum': calculate_checksum(policy.to_dict()),
+            'salt_version': self.salt_version,
+            'salt_fingerprint': salt_fingerprint(self.salt),
+            'k': policy.k,
+            'rows_in': rows_in,
+            'rows_out': rows_out,
+            'rows_suppressed': rows_in - rows_out,
+            'duration_ms': span.duration * 1000,
+            'sql_text': sql,
+        }
+        self.conn.execute(
+            f"INSERT INTO sterilization_runs ({', '.join(record)}) VALUES ({', '.join('?' * len(record))})",
+            list(record.values()),
+        )
+        self.conn.executemany(
+            "INSERT INTO sterilization_columns VALUES (?, ?, ?, ?)",
+            [[run_id, *entry] for entry in lineage],
+        )
+        return record
+
+
+def main():
+    """Run a sterilization policy from the command line."""
+    parser = argparse.ArgumentParser(description="Sterilize a staged DuckDB table")
+    parser.add_argument('--db', default='ecfr_analytics.duckdb')
+    parser.add_argument('--policy', required=True, help="Policy JSON file")
+    args = parser.parse_args()
+
+    with open(args.policy) as f:
+        policy = SterilizationPolicy.from_dict(json.load(f))
+
+    conn = connect(args.db)
+    try:
+        sterilizer = Sterilizer(conn)
+        print(f"🧼 Sterilizing {policy.source} → {policy.output} (k={policy.k})...")
+        result = sterilizer.run(policy)
+    finally:
+        conn.close()
+
+    print(f"✅ {result['rows_out']:,} of {result['rows_in']:,} rows kept, "
+          f"{result['rows_suppressed']:,} suppressed in {result['duration_ms']:.0f} ms")
+    print(f"  Provenance run {result['run_id']} (salt {result['salt_version'] or 'unversioned'})")
+
+
+if __name__ == '__main__':
+    main()
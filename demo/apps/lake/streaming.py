@@ -0,0 +1,109 @@
+"""
+Streaming JSON encoders for the Flask lake server.
+
+Records are encoded one at a time and flushed in small batches, so the
+first bytes go out immediately and a response never holds more than one
+batch of encoded output. Records come either from the in-memory
+corrections index (no second copy of the dataset) or from a DuckDB cursor
+read with fetchmany.
+"""
+
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from generations import resolve
+from resources import connect
+
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+STREAM_BATCH_SIZE = 200
+
+
+def _encode(record: Dict[str, Any]) -> str:
+    """Encode one record compactly; dates and decimals become strings."""
+    return json.dumps(record, separators=(',', ':'), sort_keys=True, default=str)
+
+
+def _batched(records: Iterable[Dict[str, Any]], batch_size: int) -> Iterator[List[str]]:
+    batch = []
+    for record in records:
+        batch.append(_encode(record))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ndjson_stream(records: Iterable[Dict[str, Any]], batch_size: int = STREAM_BATCH_SIZE) -> Iterator[str]:
+    """
+    Encode records as newline-delimited JSON.
+
+    Args:
+        records: Records to encode (consumed lazily)
+        batch_size: Records per yielded chunk
+
+    Yields:
+        Chunks of one JSON document per line
+    """
+    for batch in _batched(records, batch_size):
+        yield '\n'.join(batch) + '\n'
+
+
+def json_array_stream(
+    key: str,
+    records: Iterable[Dict[str, Any]],
+    batch_size: int = STREAM_BATCH_SIZE,
+) -> Iterator[str]:
+    """
+    Encode records as {"<key>": [...]} in chunks.
+
+    Args:
+        key: Name of the top-level array, e.g. 'ecfr_corrections'
+        records: Records to encode (consumed lazily)
+        batch_size: Records per yielded chunk
+
+    Yields:
+        Chunks that concatenate to one JSON document
+    """
+    yield '{' + json.dumps(key) + ':['
+    separator = ''
+    for batch in _batched(records, batch_size):
+        yield separator + ','.join(batch)
+        separator = ','
+    yield ']}\n'
+
+
+def duckdb_records(
+    db_path: str,
+    sql: str,
+    params: Optional[List[Any]] = None,
+    batch_size: int = STREAM_BATCH_SIZE,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield query results as dictionaries, fetching batch_size rows at a time.
+
+    The read-only connection is opened on first iteration and closed when
+    the generator finishes or is closed (e.g. the client disconnects).
+
+    Args:
+        db_path: Path to the DuckDB database
+        sql: Query to run
+        params: Query parameters
+        batch_size: Rows per fetchmany call
+
+    Yields:
+        One dictionary per row
+    """
+    conn = connect(resolve(db_path), read_only=True)
+    try:
+        cursor = conn.execute(sql, params or [])
+        columns = [desc[0] for desc in cursor.description]
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(zip(columns, row))
+    finally:
+        conn.close()
@@ -0,0 +1,314 @@
+"""
+Synthetic eCFR Data Generator
+
+Writes agencies.json and corrections.json files in the exact shapes that
+ECFRIngestion.load_agencies / load_corrections consume, at any size.
+Distributions are fitted to the committed sample files:
+
+- correction titles, years, day of year, correction lag and actions
+- CFR references (with hierarchy) drawn per title from the sample pool
+- references per correction, children per agency, references per agency
+
+Generation is deterministic for a given seed and streams records straight
+to disk, so memory stays constant whether writing a thousand corrections
+or tens of millions.
+
+Usage:
+    python synthetic.py --agencies 400 --corrections 10000000 --out-dir /tmp/ecfr
+"""
+
+import argparse
+import json
+import random
+import re
+from bisect import bisect
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from itertools import accumulate
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, TextIO
+
+
+SAMPLE_DIR = Path(__file__).parent / 'json' / 'usds' / 'ecfr'
+
+# ingestion.py numbers children idx * 1000 + n: at most 999 parents with
+# 999 children each keep agency ids unique
+MAX_PARENT_AGENCIES = 999
+MAX_CHILDREN = 999
+
+AGENCY_KINDS = [
+    'Office', 'Bureau', 'Administration', 'Service', 'Commission', 'Board',
+    'Agency', 'Council', 'Center', 'Institute', 'Corporation', 'Division',
+]
+AGENCY_TOPICS = [
+    'Agriculture', 'Commerce', 'Defense', 'Education', 'Energy', 'Health',
+    'Housing', 'Justice', 'Labor', 'Transportation', 'Treasury', 'Veterans Affairs',
+    'Environmental Quality', 'Fisheries', 'Aviation', 'Maritime Affairs',
+    'Public Lands', 'Trade', 'Science', 'Consumer Safety', 'Emergency Management',
+    'Statistics', 'Standards', 'Rural Development', 'Water Resources',
+]
+
+
+class Distribution:
+    """Categorical distribution sampled by bisecting cumulative weights."""
+
+    def __init__(self, counts: Dict[Any, int]):
+        items = sorted(counts.items(), key=lambda item: repr(item[0]))
+        self.values = [value for value, _ in items]
+        self.cum_weights = list(accumulate(count for _, count in items))
+        self.total = self.cum_weights[-1] if self.cum_weights else 0
+
+    def sample(self, rng: random.Random) -> Any:
+        return self.values[bisect(self.cum_weights, rng.random() * self.total)]
+
+
+class SampleProfile:
+    """Distributions fitted to the sample eCFR files."""
+
+    def __init__(self, agencies: Dict[str, Any], corrections: Dict[str, Any]):
+        """
+        Fit distributions.
+
+        Args:
+            agencies: Parsed sample agencies.json
+            corrections: Parsed sample corrections.json
+        """
+        records = corrections['ecfr_corrections']
+
+        self.titles = Distribution(Counter(r['title'] for r in records))
+        self.years = Distribution(Counter(r['year'] for r in records))
+        self.actions = Distribution(Counter(r['corrective_action'] for r in records))
+        self.positions = Distribution(Counter(r['position'] for r in records))
+        self.reference_counts = Distribution(Counter(len(r['cfr_references']) for r in records))
+        self.last_modified = Distribution(Counter(r['last_modified'] for r in records))
+        self.toc_rate = sum(1 for r in records if r.get('display_in_toc')) / len(records)
+
+        corrected = [date.fromisoformat(r['error_corrected']) for r in records]
+        self.day_of_year = Distribution(Counter(d.timetuple().tm_yday for d in corrected))
+
+        lags = Counter()
+        missing_occurred = 0
+        for record, corrected_on in zip(records, corrected):
+            if record.get('error_occurred'):
+                lags[(corrected_on - date.fromisoformat(record['error_occurred'])).days] += 1
+            else:
+                missing_occurred += 1
+        self.lags = Distribution(lags)
+        self.missing_occurred_rate = missing_occurred / len(records)
+
+        # Reference pools per title; each entry is a full cfr_references item
+        pools = defaultdict(list)
+        for record in records:
+            for ref in record['cfr_references']:
+                pools[record['title']].append(ref)
+        self.references = {title: refs for title, refs in pools.items()}
+
+        parents = agencies['agencies']
+        children = [child for a in parents for child in a.get('children', [])]
+        self.children_counts = Distribution(Counter(len(a.get('children', [])) for a in parents))
+        self.agency_reference_counts = Distribution(
+            Counter(len(a.get('cfr_references', [])) for a in parents + children)
+        )
+        self.agency_references = [ref for a in parents + children for ref in a.get('cfr_references', [])]
+
+    @classmethod
+    def from_files(cls, sample_dir: Path = SAMPLE_DIR) -> 'SampleProfile':
+        """Fit a profile to agencies.json and corrections.json in sample_dir."""
+        with open(sample_dir / 'agencies.json') as f:
+            agencies = json.load(f)
+        with open(sample_dir / 'corrections.json') as f:
+            corrections = json.load(f)
+        return cls(agencies, corrections)
+
+
+def slugify(name: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')
+
+
+class SyntheticECFR:
+    """Deterministic generator of eCFR-shaped agencies and corrections."""
+
+    def __init__(self, profile: Optional[SampleProfile] = None, seed: int = 42):
+        """
+        Initialize generator.
+
+        Args:
+            profile: Fitted distributions (fitted to the sample files when None)
+            seed: Random seed; the same seed always yields the same records
+        """
+        self.profile = profile or SampleProfile.from_files()
+        self.seed = seed
+
+    # ------------------------------------------------------------------
+    # Agencies
+    # ------------------------------------------------------------------
+
+    def _agency(self, rng: random.Random, name: str, short_name: str, slug: str) -> Dict[str, Any]:
+        profile = self.profile
+        references = [
+            dict(rng.choice(profile.agency_references))
+            for _ in range(profile.agency_reference_counts.sample(rng))
+        ]
+        return {
+            'name': name,
+            'short_name': short_name,
+            'display_name': name,
+            'sortable_name': name,
+            'slug': slug,
+            'children': [],
+            'cfr_references': references,
+        }
+
+    def iter_agencies(self, count: int, children: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yield parent agencies with their children.
+
+        Args:
+            count: Number of parent agencies (at most MAX_PARENT_AGENCIES)
+            children: Fixed children per parent (sampled from the profile
+                when None, at most MAX_CHILDREN)
+
+        Yields:
+            Agency dictionaries shaped like agencies.json entries
+        """
+        if count > MAX_PARENT_AGENCIES:
+            raise ValueError(f"At most {MAX_PARENT_AGENCIES} parent agencies are supported")
+
+        rng = random.Random(f"{self.seed}-agencies")
+        for index in range(1, count + 1):
+            kind = rng.choice(AGENCY_KINDS)
+            topic = rng.choice(AGENCY_TOPICS)
+            name = f"{kind} of {topic} {index}"
+            short_name = f"{kind[0]}{''.join(w[0] for w in topic.split())}{index}"
+            agency = self._agency(rng, name, short_name, slugify(name))
+
+            child_count = children if children is not None else self.profile.children_counts.sample(rng)
+            for child_index in range(1, min(child_count, MAX_CHILDREN) + 1):
+                child_name = f"{rng.choice(AGENCY_KINDS)} of {rng.choice(AGENCY_TOPICS)} {index}-{child_index}"
+                child = self._agency(rng, child_name, None, slugify(child_name))
+                del child['children']
+                agency['children'].append(child)
+
+            yield agency
+
+    # ------------------------------------------------------------------
+    # Corrections
+    # ------------------------------------------------------------------
+
+    def iter_corrections(self, count: int, start_id: int = 1) -> Iterator[Dict[str, Any]]:
+        """
+        Yield corrections.
+
+        Args:
+            count: Number of corrections
+            start_id: id of the first correction
+
+        Yields:
+            Correction dictionaries shaped like corrections.json entries
+        """
+        profile = self.profile
+        rng = random.Random(f"{self.seed}-corrections-{start_id}")
+
+        for correction_id in range(start_id, start_id + count):
+            title = profile.titles.sample(rng)
+            year = profile.years.sample(rng)
+
+            year_start = date(year, 1, 1)
+            days_in_year = (date(year + 1, 1, 1) - year_start).days
+            day = min(profile.day_of_year.sample(rng), days_in_year)
+            corrected = year_start + timedelta(days=day - 1)
+
+            occurred = None
+            if rng.random() >= profile.missing_occurred_rate:
+                occurred = (corrected - timedelta(days=profile.lags.sample(rng))).isoformat()
+
+            pool = profile.references[title]
+            references = [rng.choice(pool) for _ in range(profile.reference_counts.sample(rng))]
+
+            # Federal Register volume 70 is 2005; pages run through the year
+            page = int(day / days_in_year * 80000) + rng.randint(1, 400)
+
+            yield {
+                'id': correction_id,
+                'cfr_references': references,
+                'corrective_action': profile.actions.sample(rng),
+                'error_corrected': corrected.isoformat(),
+                'error_occurred': occurred,
+                'fr_citation': f"{year - 1935} FR {page}",
+                'position': profile.positions.sample(rng),
+                'display_in_toc': rng.random() < profile.toc_rate,
+                'title': title,
+                'year': year,
+                'last_modified': max(profile.last_modified.sample(rng), corrected.isoformat()),
+            }
+
+    # ------------------------------------------------------------------
+    # Output
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _write_array(f: TextIO, key: str, records: Iterator[Dict[str, Any]], batch_size: int = 1000) -> int:
+        """Stream records into {"<key>": [...]} without holding them in memory."""
+        f.write('{' + json.dumps(key) + ':[')
+        written = 0
+        batch = []
+        for record in records:
+            batch.append(json.dumps(record, separators=(',', ':')))
+            if len(batch) >= batch_size:
+                f.write((',' if written else '') + ','.join(batch))
+                written += len(batch)
+                batch = []
+        if batch:
+            f.write((',' if written else '') + ','.join(batch))
+            written += len(batch)
+        f.write(']}')
+        return written
+
+    def write_agencies(self, path: Path, count: int, children: Optional[int] = None) -> int:
+        """Write an agencies.json file; returns the number of parent agencies."""
+        with open(path, 'w') as f:
+            return self._write_array(f, 'agencies', self.iter_agencies(count, children))
+
+    def write_corrections(self, path: Path, count: int) -> int:
+        """Write a corrections.json file; returns the number of corrections."""
+        with open(path, 'w') as f:
+            return self._write_array(f, 'ecfr_corrections', self.iter_corrections(count))
+
+
+def synthetic_dataset(agencies: int, corrections: int, seed: int = 42,
+                      profile: Optional[SampleProfile] = None):
+    """
+    Build an in-memory synthetic dataset.
+
+    Returns:
+        Tuple of (agencies_data, corrections_data) without checksums
+    """
+    generator = SyntheticECFR(profile, seed)
+    return (
+        {'agencies': list(generator.iter_agencies(agencies))},
+        {'ecfr_corrections': list(generator.iter_corrections(corrections))},
+    )
+
+
+def main():
+    """Generate synthetic eCFR files from the command line."""
+    parser = argparse.ArgumentParser(description="Generate synthetic eCFR data")
+    parser.add_argument('--agencies', type=int, default=153, help="Parent agencies")
+    parser.add_argument('--children', type=int, help="Children per agency (sampled when omitted)")
+    parser.add_argument('--corrections', type=int, default=3343, help="Corrections")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out-dir', type=Path, required=True)
+    args = parser.parse_args()
+
+    args.out_dir.mkdir(parents=True, exist_ok=True)
+    generator = SyntheticECFR(seed=args.seed)
+
+    print(f"📝 Generating synthetic eCFR data (seed {args.seed})")
+    agencies = generator.write_agencies(args.out_dir / 'agencies.json', args.agencies, args.children)
+    print(f"  ✅ Wrote {agencies} agencies to {args.out_dir / 'agencies.json'}")
+    corrections = generator.write_corrections(args.out_dir / 'corrections.json', args.corrections)
+    print(f"  ✅ Wrote {corrections} corrections to {args.out_dir / 'corrections.json'}")
+
+
+if __name__ == '__main__':
+    main()
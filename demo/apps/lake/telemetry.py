@@ -0,0 +1,339 @@
+"""
+Pipeline Telemetry
+
+Structured spans for the lake pipeline. Every ingestion stage, analytics
+query and ETL step runs inside a span that records:
+
+- wall time
+- rows and bytes processed (when the stage knows them)
+- peak resident memory while the span was open
+- status and error message
+
+Spans nest per thread, so a stage's queries appear as its children.
+Finished spans can be streamed to a JSON lines trace file, and per-span
+totals are rendered in the Prometheus text exposition format, either
+served over HTTP or written for node_exporter's textfile collector.
+
+Configuration (all optional):
+    PIPELINE_TRACE_FILE   append every finished span to this JSON lines file
+    PIPELINE_METRICS_DIR  write <service>.prom here when write_metrics() runs
+"""
+
+import functools
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+# Spans kept in memory for export; totals are kept for every span
+MAX_RECENT_SPANS = 10000
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        scale = 1 if sys.platform == 'darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def traced(name: str) -> Callable:
+    """
+    Decorator running a method inside a span on its object's tracer.
+
+    For classes that keep a Tracer in self.tracer; the method can reach
+    its span through self.tracer.current().
+    """
+    def decorate(method: Callable) -> Callable:
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.tracer.span(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class RSSSampler:
+    """Samples RSS on a background thread to find a step's peak."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, current_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = current_rss()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+class Span:
+    """One timed unit of pipeline work."""
+
+    def __init__(self, name: str, parent: Optional['Span'] = None, attributes: Optional[Dict[str, Any]] = None):
+        self.span_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.parent_id = parent.span_id if parent else None
+        self.depth = parent.depth + 1 if parent else 0
+        self.attributes = attributes or {}
+        self.rows: Optional[int] = None
+        self.bytes: Optional[int] = None
+        self.status = 'ok'
+        self.error: Optional[str] = None
+        self.started_at = datetime.now(timezone.utc)
+        self.duration = 0.0
+        self.peak_rss = current_rss()
+        self._start = time.perf_counter()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'started_at': self.started_at.isoformat(),
+            'duration_ms': round(self.duration * 1000, 3),
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'peak_rss_bytes': self.peak_rss,
+            'status': self.status,
+            'error': self.error,
+            'attributes': self.attributes,
+        }
+
+
+class Tracer:
+    """Records spans for one pipeline service (ingestion, analytics, etl)."""
+
+    def __init__(
+        self,
+        service: str,
+        run_id: Optional[str] = None,
+        trace_file: Optional[str] = None,
+        metrics_dir: Optional[str] = None,
+        sample_interval: float = 0.01,
+    ):
+        """
+        Initialize tracer.
+
+        Args:
+            service: Service label on every span and metric
+            run_id: Run identifier (a new UUID when None)
+            trace_file: JSON lines file each finished span is appended to
+                (defaults to PIPELINE_TRACE_FILE)
+            metrics_dir: Directory write_metrics() writes <service>.prom to
+                (defaults to PIPELINE_METRICS_DIR)
+            sample_interval: Seconds between RSS samples while spans are open
+        """
+        self.service = service
+        self.run_id = run_id or str(uuid.uuid4())
+        self.trace_file = trace_file or os.getenv('PIPELINE_TRACE_FILE')
+        self.metrics_dir = metrics_dir or os.getenv('PIPELINE_METRICS_DIR')
+        self.sample_interval = sample_interval
+        self.spans = deque(maxlen=MAX_RECENT_SPANS)
+        self.totals: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._open: List[Span] = []
+        self._sampler = None
+        self._sampler_stop = None
+        # Opened on the first finished span, flushed after each one
+        self._trace = None
+
+    # ------------------------------------------------------------------
+    # Memory sampling
+    # ------------------------------------------------------------------
+
+    def _sample(self, stop: threading.Event):
+        while not stop.wait(self.sample_interval):
+            rss = current_rss()
+            with self._lock:
+                for span in self._open:
+                    if rss > span.peak_rss:
+                        span.peak_rss = rss
+
+    def _opened(self, span: Span):
+        with self._lock:
+            self._open.append(span)
+            if self._sampler is None:
+                self._sampler_stop = threading.Event()
+                self._sampler = threading.Thread(
+                    target=self._sample, args=(self._sampler_stop,), daemon=True
+                )
+                self._sampler.start()
+
+    def _closed(self, span: Span):
+        with self._lock:
+            self._open.remove(span)
+            if not self._open and self._sampler is not None:
+                # The sampler exits on its own; no join on the hot path
+                self._sampler_stop.set()
+                self._sampler = None
+
+    # ------------------------------------------------------------------
+    # Spans
+    # ------------------------------------------------------------------
+
+    def current(self) -> Optional[Span]:
+        """Innermost open span on this thread."""
+        stack = getattr(self._local, 'stack', None)
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span]:
+        """
+        Time a block of work.
+
+        Set span.rows / span.bytes inside the block when known. Exceptions
+        mark the span as failed and propagate.
+
+        Args:
+            name: Span name, e.g. 'ingestion.load_corrections'
+            **attributes: Extra fields recorded with the span
+        """
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+
+        span = Span(name, stack[-1] if stack else None, attributes)
+        stack.append(span)
+        self._opened(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = 'error'
+            span.error = str(e)
+            raise
+        finally:
+            span.duration = time.perf_counter() - span._start
+            span.peak_rss = max(span.peak_rss, current_rss())
+            self._closed(span)
+            stack.pop()
+            self._record(span)
+
+    def _record(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+            totals = self.totals.get(span.name)
+            if totals is None:
+                totals = self.totals[span.name] = {
+                    'count': 0, 'errors': 0, 'seconds': 0.0,
+                    'rows': 0, 'bytes': 0, 'peak_rss_bytes': 0,
+                }
+            totals['count'] += 1
+            totals['errors'] += span.status == 'error'
+            totals['seconds'] += span.duration
+            totals['rows'] += span.rows or 0
+            totals['bytes'] += span.bytes or 0
+            totals['peak_rss_bytes'] = max(totals['peak_rss_bytes'], span.peak_rss)
+
+            if self.trace_file:
+                if self._trace is None:
+                    self._trace = open(self.trace_file, 'a')
+                record = {'run_id': self.run_id, 'service': self.service, **span.to_dict()}
+                self._trace.write(json.dumps(record, default=str) + '\n')
+                self._trace.flush()
+
+    def close(self):
+        """Close the trace file; a later span reopens it."""
+        with self._lock:
+            if self._trace is not None:
+                self._trace.close()
+                self._trace = None
+
+    def finished(self, max_depth: Optional[int] = None) -> List[Span]:
+        """Finished spans in completion order, optionally only the outer ones."""
+        with self._lock:
+            spans = list(self.spans)
+        if max_depth is None:
+            return spans
+        return [span for span in spans if span.depth <= max_depth]
+
+    # ------------------------------------------------------------------
+    # Export
+    # ------------------------------------------------------------------
+
+    def write_jsonl(self, path: Path) -> int:
+        """Write finished spans as JSON lines; returns the span count."""
+        spans = self.finished()
+        with open(path, 'w') as f:
+            for span in spans:
+                record = {'run_id': self.run_id, 'service': self.service, **span.to_dict()}
+                f.write(json.dumps(record, default=str) + '\n')
+        return len(spans)
+
+    def prometheus(self) -> str:
+        """Per-span totals in the Prometheus text exposition format."""
+        metrics = [
+            ('span_count_total', 'count', 'counter', 'Spans finished'),
+            ('span_errors_total', 'errors', 'counter', 'Spans that raised'),
+            ('span_duration_seconds_total', 'seconds', 'counter', 'Time spent in spans'),
+            ('span_rows_total', 'rows', 'counter', 'Rows processed in spans'),
+            ('span_bytes_total', 'bytes', 'counter', 'Bytes processed in spans'),
+            ('span_peak_rss_bytes', 'peak_rss_bytes', 'gauge', 'Highest RSS seen during a span'),
+        ]
+        with self._lock:
+            totals = {name: dict(values) for name, values in sorted(self.totals.items())}
+
+        lines = []
+        for metric, field, kind, help_text in metrics:
+            full_name = f"ecfr_pipeline_{metric}"
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            for name, values in totals.items():
+                value = values[field]
+                value = f"{value:.6f}" if isinstance(value, float) else str(value)
+                lines.append(f'{full_name}{{service="{self.service}",span="{name}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: Path):
+        """Write metrics atomically so a collector never reads a partial file."""
+        path = Path(path)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        with open(tmp_path, 'w') as f:
+            f.write(self.prometheus())
+        os.replace(tmp_path, path)
+
+    def write_metrics(self) -> Optional[Path]:
+        """Write <service>.prom into metrics_dir, if one is configured."""
+        if not self.metrics_dir:
+            return None
+        path = Path(self.metrics_dir) / f"{self.service}.prom"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.write_prometheus(path)
+        return path
+
+    def report(self, max_depth: int = 0):
+        """Print a timing table of the outer spans."""
+        spans = self.finished(max_depth)
+        if not spans:
+            return
+        print(f"\n⏱️  Stage timings ({self.service}, run {self.run_id})")
+        for span in spans:
+            rows = f", {span.rows:,} rows" if span.rows is not None else ''
+            status = '' if span.status == 'ok' else ' ❌'
+            print(f"  {'  ' * span.depth}{span.name}: {span.duration * 1000:,.1f} ms"
+                  f"{rows}, peak {span.peak_rss / (1024 * 1024):,.1f} MB{status}")
@@ -0,0 +1,241 @@
+"""
+Async Analytics API tests
+
+Validates:
+- Endpoints return the ECFRAnalytics results
+- Error handling (404 / 400 / 405)
+- Coalescing of concurrent identical requests
+- Bounded worker pool and lifespan shutdown
+- Prometheus metrics for the queries served
+"""
+
+import asyncio
+import json
+import time
+from pathlib import Path
+
+from analytics import ECFRAnalytics
+from analytics_api import AnalyticsAPI, encode_json
+
+
+DB_PATH = str(Path(__file__).parent / 'ecfr_analytics.duckdb')
+
+
+async def call(app, path, query_string=b'', method='GET'):
+    """Send one HTTP request through the ASGI app and collect the response."""
+    scope = {
+        'type': 'http',
+        'method': method,
+        'path': path,
+        'query_string': query_string,
+        'headers': [],
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    status = messages[0]['status']
+    body = b''.join(m.get('body', b'') for m in messages[1:])
+    if not body:
+        return status, None
+    if dict(messages[0]['headers'])[b'content-type'] == b'application/json':
+        return status, json.loads(body)
+    return status, body.decode('utf-8')
+
+
+def test_endpoints():
+    """Test that endpoints return the same data as ECFRAnalytics."""
+    print("\n🧪 Testing Analytics Endpoints...")
+
+    analytics = ECFRAnalytics(DB_PATH)
+    analytics.connect()
+    slug = analytics.get_top_agencies_by_rvi(limit=1)[0]['slug']
+    expected = {
+        ('/agencies/metrics', b'limit=5'): analytics.get_agency_metrics(limit=5),
+        ('/agencies/rvi', b''): analytics.get_top_agencies_by_rvi(),
+        ('/trends/yearly', b''): analytics.get_correction_trends_yearly(),
+        ('/trends/titles', b'limit=3'): analytics.get_correction_trends_by_title(limit=3),
+        ('/time-series', b''): analytics.get_time_series_data(),
+        ('/word-counts', b''): analytics.calculate_word_counts(),
+        (f'/agencies/{slug}', b''): analytics.get_agency_detail(slug),
+        (f'/agencies/{slug}/corrections', b'limit=10'): analytics.get_corrections_for_agency(slug, 10),
+        ('/agencies/agriculture-department/rollup', b''): analytics.get_agency_rollup('agriculture-department'),
+    }
+    analytics.close()
+
+    app = AnalyticsAPI(DB_PATH, max_workers=2)
+
+    async def run():
+        for (path, query_string), result in expected.items():
+            status, body = await call(app, path, query_string)
+            assert status == 200, f"{path} returned {status}"
+            assert body == json.loads(encode_json(result)), f"{path} differs from ECFRAnalytics"
+            print(f"  ✅ {path}")
+
+        status, body = await call(app, '/summary')
+        assert status == 200 and body['overview']['total_corrections'] > 0, "Summary failed"
+        print(f"  ✅ /summary")
+
+    try:
+        asyncio.run(run())
+    finally:
+        app.shutdown()
+
+
+def test_errors():
+    """Test error responses."""
+    print("\n🧪 Testing Error Responses...")
+
+    app = AnalyticsAPI(DB_PATH, max_workers=1)
+
+    async def run():
+        cases = [
+            ('/agencies/no-such-agency', b'', 'GET', 404),
+            ('/agencies/no-such-agency/rollup', b'', 'GET', 404),
+            ('/nope', b'', 'GET', 404),
+            ('/agencies/rvi', b'limit=abc', 'GET', 400),
+            ('/agencies/rvi', b'limit=0', 'GET', 400),
+            ('/trends/yearly', b'', 'POST', 405),
+        ]
+        for path, query_string, method, expected in cases:
+            status, body = await call(app, path, query_string, method)
+            assert status == expected, f"{method} {path}?{query_string.decode()} returned {status}"
+            assert 'error' in body, f"{path} error response has no message"
+        print(f"  ✅ {len(cases)} error cases")
+
+    try:
+        asyncio.run(run())
+    finally:
+        app.shutdown()
+
+
+def test_request_coalescing():
+    """Test that concurrent identical requests run the query once."""
+    print("\n🧪 Testing Request Coalescing...")
+
+    app = AnalyticsAPI(DB_PATH, max_workers=2)
+    original = ECFRAnalytics.get_time_series_data
+
+    def slow_time_series(self):
+        time.sleep(0.2)
+        return original(self)
+
+    ECFRAnalytics.get_time_series_data = slow_time_series
+
+    async def run():
+        responses = await asyncio.gather(*[call(app, '/time-series') for _ in range(20)])
+        assert all(status == 200 for status, _ in responses), "Coalesced request failed"
+        assert all(body == responses[0][1] for _, body in responses), "Coalesced results differ"
+        assert app.executions == 1, f"20 identical requests ran {app.executions} queries"
+        assert not app.inflight, "In-flight table not cleared"
+        print(f"  ✅ 20 concurrent requests ran 1 query")
+
+        # Different queries still run in parallel on the pool
+        await asyncio.gather(call(app, '/trends/titles', b'limit=5'), call(app, '/trends/titles', b'limit=6'))
+        assert app.executions == 3, f"Distinct queries were coalesced ({app.executions} executions)"
+        print(f"  ✅ Distinct queries are not coalesced")
+
+    try:
+        asyncio.run(run())
+    finally:
+        ECFRAnalytics.get_time_series_data = original
+        app.shutdown()
+
+    assert len(app._connections) == 0, "Connections left open after shutdown"
+
+
+def test_worker_pool_bound():
+    """Test that no more than max_workers connections are opened."""
+    print("\n🧪 Testing Worker Pool Bound...")
+
+    app = AnalyticsAPI(DB_PATH, max_workers=3)
+
+    async def run():
+        await asyncio.gather(*[
+            call(app, '/agencies/metrics', f'limit={n}'.encode()) for n in range(1, 41)
+        ])
+        assert app.executions == 40, f"Expected 40 distinct queries, ran {app.executions}"
+        assert len(app._connections) <= 3, f"Opened {len(app._connections)} connections"
+        print(f"  ✅ 40 queries on {len(app._connections)} connections")
+
+    try:
+        asyncio.run(run())
+    finally:
+        app.shutdown()
+
+
+def test_metrics_endpoint():
+    """Test that /metrics reports spans for the queries served."""
+    print("\n🧪 Testing Metrics Endpoint...")
+
+    app = AnalyticsAPI(DB_PATH, max_workers=2)
+
+    async def run():
+        await call(app, '/agencies/rvi')
+        await call(app, '/agencies/rvi', b'limit=5')
+        await call(app, '/summary')
+        return await call(app, '/metrics')
+
+    try:
+        status, text = asyncio.run(run())
+    finally:
+        app.shutdown()
+
+    assert status == 200, f"/metrics returned {status}"
+    assert '# TYPE ecfr_pipeline_span_duration_seconds_total counter' in text, "Missing TYPE line"
+    # Two direct calls plus one from the summary report
+    assert 'ecfr_pipeline_span_count_total{service="analytics_api",span="analytics.get_top_agencies_by_rvi"} 3' in text, \
+        "RVI query count wrong"
+    assert 'span="analytics.generate_summary_report"' in text, "Summary span missing"
+    print(f"  ✅ Query spans exported in Prometheus format")
+
+
+def run_all_tests():
+    """Run all analytics API tests."""
+    print("=" * 60)
+    print("Async Analytics API - Tests")
+    print("=" * 60)
+
+    tests = [
+        ("Analytics Endpoints", test_endpoints),
+        ("Error Responses", test_errors),
+        ("Request Coalescing", test_request_coalescing),
+        ("Worker Pool Bound", test_worker_pool_bound),
+        ("Metrics Endpoint", test_metrics_endpoint),
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test_name, test_func in tests:
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"\n❌ {test_name} FAILED: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"\n❌ {test_name} ERROR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"Test Results: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed == 0:
+        print("✅ All tests passed! Analytics API is working correctly.")
+    else:
+        print(f"❌ {failed} test(s) failed. Please review errors above.")
+
+    return failed == 0
+
+
+if __name__ == '__main__':
+    import sys
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
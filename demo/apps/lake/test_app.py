@@ -0,0 +1,292 @@
+"""
+Flask lake server tests
+
+Validates:
+- Cached responses match the source JSON
+- Compressed variants and content negotiation
+- ETag / Last-Modified conditional requests
+- Cache invalidation when the source file changes
+- Indexed filtering and pagination of /corrections
+- Streaming NDJSON / chunked JSON responses
+"""
+
+import gzip
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import duckdb
+
+import app as lake_app
+from app import app
+from json_cache import CachedJSONFile, brotli
+
+
+JSON_DIR = Path(__file__).parent / 'json' / 'usds' / 'ecfr'
+
+
+def test_cached_responses():
+    """Test that cached routes return the source JSON in every encoding."""
+    print("\n🧪 Testing Cached Responses...")
+
+    client = app.test_client()
+
+    for route, filename in (('/agencies', 'agencies.json'), ('/corrections', 'corrections.json')):
+        with open(JSON_DIR / filename, 'r') as f:
+            expected = json.load(f)
+
+        response = client.get(route)
+        assert response.status_code == 200, f"{route} returned {response.status_code}"
+        assert response.mimetype == 'application/json'
+        assert json.loads(response.data) == expected, f"{route} body differs from {filename}"
+
+        response = client.get(route, headers={'Accept-Encoding': 'gzip, deflate'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert json.loads(gzip.decompress(response.data)) == expected, f"{route} gzip body differs"
+
+        if brotli is not None:
+            response = client.get(route, headers={'Accept-Encoding': 'gzip, br'})
+            assert response.headers['Content-Encoding'] == 'br'
+            assert json.loads(brotli.decompress(response.data)) == expected, f"{route} br body differs"
+
+        print(f"  ✅ {route} serves {filename}")
+
+
+def test_conditional_requests():
+    """Test ETag and Last-Modified revalidation."""
+    print("\n🧪 Testing Conditional Requests...")
+
+    client = app.test_client()
+
+    response = client.get('/corrections')
+    etag = response.headers['ETag']
+    last_modified = response.headers['Last-Modified']
+    assert etag and last_modified, "Missing validators"
+    assert response.headers['Vary'] == 'Accept-Encoding'
+
+    response = client.get('/corrections', headers={'If-None-Match': etag})
+    assert response.status_code == 304, f"If-None-Match returned {response.status_code}"
+    assert response.data == b'', "304 response carried a body"
+    print(f"  ✅ If-None-Match returns 304")
+
+    response = client.get('/corrections', headers={'If-Modified-Since': last_modified})
+    assert response.status_code == 304, f"If-Modified-Since returned {response.status_code}"
+    print(f"  ✅ If-Modified-Since returns 304")
+
+    # Compressed variants carry their own validator
+    response = client.get('/corrections', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['ETag'] != etag, "gzip variant reused the identity ETag"
+
+    response = client.get('/corrections', headers={'If-None-Match': '"stale"'})
+    assert response.status_code == 200, "Stale ETag did not return a full response"
+    print(f"  ✅ Stale validators return 200")
+
+
+def test_cache_invalidation():
+    """Test that the cache is rebuilt only when the file changes."""
+    print("\n🧪 Testing Cache Invalidation...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'data.json')
+        with open(path, 'w') as f:
+            json.dump({'items': [1, 2, 3]}, f)
+
+        cache = CachedJSONFile(path)
+        with app.test_request_context('/'):
+            etag = cache.response().headers['ETag']
+            cache.response()
+        builds = []
+        cache.derived('total', lambda data: builds.append(1) or sum(data['items']))
+        assert cache.derived('total', lambda data: builds.append(1)) == 6
+
+        assert cache.generation == 1, f"Unchanged file parsed {cache.generation} times"
+        assert len(builds) == 1, "Derived value rebuilt without a file change"
+        print(f"  ✅ Unchanged file is parsed once")
+
+        with open(path, 'w') as f:
+            json.dump({'items': [1, 2, 3, 4]}, f)
+
+        with app.test_request_context('/'):
+            response = cache.response()
+
+        assert cache.generation == 2, "File change did not invalidate the cache"
+        assert response.headers['ETag'] != etag, "ETag unchanged after file change"
+        assert json.loads(response.data) == {'items': [1, 2, 3, 4]}
+        assert cache.derived('total', lambda data: sum(data['items'])) == 10
+        print(f"  ✅ Size change invalidates cached bodies and derived values")
+
+        os.remove(path)
+        with app.test_request_context('/'):
+            assert cache.response() is None, "Missing file still served from cache"
+        print(f"  ✅ Missing file is reported")
+
+
+def test_corrections_filters():
+    """Test indexed filtering, keyset pagination and field projection."""
+    print("\n🧪 Testing Corrections Filters...")
+
+    client = app.test_client()
+    with open(JSON_DIR / 'corrections.json', 'r') as f:
+        records = sorted(json.load(f)['ecfr_corrections'], key=lambda r: r['id'])
+
+    def fetch_all(params):
+        """Follow next_after until the last page."""
+        results = []
+        after = None
+        while True:
+            query = dict(params, limit=50)
+            if after is not None:
+                query['after'] = after
+            body = client.get('/corrections', query_string=query).get_json()
+            assert len(body['ecfr_corrections']) <= 50, "Page exceeded limit"
+            results.extend(body['ecfr_corrections'])
+            after = body['next_after']
+            if after is None:
+                return results
+
+    sample = records[len(records) // 2]
+    prefix = sample['cfr_references'][0]['cfr_reference'].rsplit('.', 1)[0]
+    cases = [
+        ({'year': sample['year']}, lambda r: r['year'] == sample['year']),
+        ({'title': sample['title'], 'year': sample['year']},
+         lambda r: r['title'] == sample['title'] and r['year'] == sample['year']),
+        ({'cfr_reference': prefix},
+         lambda r: any(ref['cfr_reference'].startswith(prefix) for ref in r['cfr_references'])),
+        ({'start_date': '2015-01-01', 'end_date': '2015-06-30'},
+         lambda r: '2015-01-01' <= r['error_corrected'] <= '2015-06-30'),
+    ]
+
+    for params, predicate in cases:
+        expected = [r['id'] for r in records if predicate(r)]
+        actual = [r['id'] for r in fetch_all(params)]
+        assert expected, f"Test case {params} matches nothing"
+        assert actual == expected, f"{params}: {len(actual)} results, expected {len(expected)}"
+        print(f"  ✅ {params} -> {len(actual)} corrections")
+
+    body = client.get('/corrections', query_string={'year': sample['year'], 'fields': 'id,title'}).get_json()
+    assert all(set(r) == {'id', 'title'} for r in body['ecfr_corrections']), "Projection leaked fields"
+    print(f"  ✅ Field projection")
+
+    for params in ({'year': 'abc'}, {'limit': 0}, {'start_date': '2015-13-01'}, {'fields': 'id,nope'}):
+        response = client.get('/corrections', query_string=params)
+        assert response.status_code == 400, f"{params} returned {response.status_code}"
+    print(f"  ✅ Invalid parameters return 400")
+
+
+def test_streaming():
+    """Test NDJSON and chunked JSON streams from the index and DuckDB."""
+    print("\n🧪 Testing Streaming Responses...")
+
+    client = app.test_client()
+    with open(JSON_DIR / 'corrections.json', 'r') as f:
+        corrections = json.load(f)
+    expected = sorted(corrections['ecfr_corrections'], key=lambda r: r['id'])
+
+    response = client.get('/corrections/stream')
+    assert response.is_streamed, "NDJSON response was buffered"
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.get_data(as_text=True).splitlines()
+    assert [json.loads(line) for line in lines] == expected, "NDJSON stream differs from source"
+    print(f"  ✅ NDJSON stream of {len(lines)} corrections")
+
+    response = client.get('/corrections/stream', query_string={'format': 'json'})
+    assert response.is_streamed, "JSON array response was buffered"
+    assert response.get_json() == {'ecfr_corrections': expected}, "Chunked JSON differs from source"
+    print(f"  ✅ Chunked JSON array")
+
+    year = expected[0]['year']
+    response = client.get('/corrections/stream', query_string={'year': year, 'fields': 'id'})
+    ids = [json.loads(line)['id'] for line in response.get_data(as_text=True).splitlines()]
+    assert ids == [r['id'] for r in expected if r['year'] == year], "Filtered stream differs"
+    print(f"  ✅ Filtered and projected stream")
+
+    db_path = Path(__file__).parent / 'ecfr_analytics.duckdb'
+    if db_path.exists():
+        conn = duckdb.connect(str(db_path), read_only=True)
+        count = conn.execute(
+            "SELECT COUNT(*) FROM corrections_parsed WHERE year = ?", [year]
+        ).fetchone()[0]
+        conn.close()
+
+        response = client.get('/corrections/stream', query_string={'source': 'duckdb', 'year': year})
+        rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert len(rows) == count, f"DuckDB stream returned {len(rows)} rows, expected {count}"
+        assert all(row['year'] == year for row in rows), "DuckDB stream ignored year filter"
+        print(f"  ✅ DuckDB stream of {len(rows)} rows")
+
+    response = client.get('/agencies/stream', query_string={'format': 'json'})
+    with open(JSON_DIR / 'agencies.json', 'r') as f:
+        assert response.get_json() == json.load(f), "Agencies stream differs from source"
+    print(f"  ✅ Agencies stream")
+
+    assert client.get('/corrections/stream', query_string={'format': 'xml'}).status_code == 400
+    assert client.get('/corrections/stream', query_string={'source': 'pg'}).status_code == 400
+    assert client.get('/agencies/stream', query_string={'format': 'xml'}).status_code == 400
+    print(f"  ✅ Invalid stream options return 400")
+
+    # source=duckdb is served without corrections.json
+    saved = lake_app.CORRECTIONS, lake_app.DUCKDB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'lake.duckdb')
+        conn = duckdb.connect(db_path)
+        columns = ', '.join(f"{i} AS {name}" for i, name in enumerate(lake_app.DUCKDB_CORRECTION_FIELDS))
+        conn.execute(f"CREATE TABLE corrections_parsed AS SELECT {columns}")
+        conn.close()
+        lake_app.CORRECTIONS = CachedJSONFile(os.path.join(tmp, 'corrections.json'))
+        lake_app.DUCKDB_PATH = db_path
+        try:
+            from_db = client.get('/corrections/stream', query_string={'source': 'duckdb', 'fields': 'id'})
+            from_file = client.get('/corrections/stream')
+        finally:
+            lake_app.CORRECTIONS, lake_app.DUCKDB_PATH = saved
+    assert from_db.status_code == 200, f"DuckDB stream returned {from_db.status_code}"
+    assert [json.loads(line) for line in from_db.get_data(as_text=True).splitlines()] == [{'id': 0}]
+    assert from_file.status_code == 404, f"File stream returned {from_file.status_code}"
+    print(f"  ✅ DuckDB stream served without corrections.json")
+
+
+def run_all_tests():
+    """Run all Flask app tests."""
+    print("=" * 60)
+    print("Flask Lake Server - Tests")
+    print("=" * 60)
+
+    tests = [
+        ("Cached Responses", test_cached_responses),
+        ("Conditional Requests", test_conditional_requests),
+        ("Cache Invalidation", test_cache_invalidation),
+        ("Corrections Filters", test_corrections_filters),
+        ("Streaming Responses", test_streaming),
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test_name, test_func in tests:
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"\n❌ {test_name} FAILED: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"\n❌ {test_name} ERROR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"Test Results: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed == 0:
+        print("✅ All tests passed! Flask app is working correctly.")
+    else:
+        print(f"❌ {failed} test(s) failed. Please review errors above.")
+
+    return failed == 0
+
+
+if __name__ == '__main__':
+    import sys
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
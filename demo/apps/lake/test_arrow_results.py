@@ -0,0 +1,192 @@
+"""
+Arrow result set tests
+
+Validates:
+- The analytics stage publishes every result table with a manifest that
+  records its version and source generation
+- Published tables are memory-mapped without copying and match what
+  DuckDB returns for the same queries
+- Old versions are collected while mapped tables stay readable
+- The ETL reads published results only when they match its generation
+- The Flask app serves the manifest and tables as JSON or Arrow
+"""
+
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+import pyarrow as pa
+
+import app as lake_app
+from analytics import ECFRAnalytics
+from arrow_results import EXPORT_VIEWS, RESULT_QUERIES, ResultStore, source_stamp, table_rows
+from resources import connect
+from test_generations import build
+
+
+BASE_PATH = Path(__file__).parent
+DB_PATH = BASE_PATH / 'ecfr_analytics.duckdb'
+
+
+def publish(db_path, results_dir):
+    analytics = ECFRAnalytics(str(db_path))
+    analytics.connect()
+    try:
+        return analytics.publish_results(Path(results_dir))
+    finally:
+        analytics.close()
+
+
+def test_publish_and_map():
+    """Test publishing, zero-copy reads and version collection."""
+    print("\n🧪 Testing Publish and Memory-Map...")
+
+    conn = connect(str(DB_PATH.resolve()), read_only=True)
+    try:
+        expected = {name: conn.execute(query).fetchall() for name, query in RESULT_QUERIES.items()}
+        corrections = conn.execute("SELECT COUNT(*) FROM corrections_parsed").fetchone()[0]
+    finally:
+        conn.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ResultStore(tmp)
+        first = publish(DB_PATH, tmp)
+
+        allocated = pa.total_allocated_bytes()
+        tables = {name: store.open(name) for name in first['tables']}
+        copied = pa.total_allocated_bytes() - allocated
+        mapped = {name: table_rows(table) for name, table in tables.items() if name in RESULT_QUERIES}
+
+        versions = [publish(DB_PATH, tmp)['version'] for _ in range(2)]
+        on_disk = sorted(path.name for path in Path(tmp).glob('v*'))
+        # Mapped before its version was removed
+        still_readable = tables['export_corrections'].num_rows
+        leftovers = [path.name for path in Path(tmp).iterdir() if path.name.startswith('.')]
+
+    assert set(first['tables']) == set(RESULT_QUERIES) | set(EXPORT_VIEWS), sorted(first['tables'])
+    assert first['version'] == 1 and versions == [2, 3], (first['version'], versions)
+    assert first['source'] == source_stamp(str(DB_PATH)), first['source']
+    assert copied == 0, f"Reading mapped tables allocated {copied} bytes"
+    for name, rows in expected.items():
+        assert mapped[name] == rows, f"{name} differs from DuckDB"
+        assert first['tables'][name]['rows'] == len(rows), name
+    assert still_readable == corrections, still_readable
+    assert on_disk == ['v000002', 'v000003'], on_disk
+    assert leftovers == [], leftovers
+    print(f"  ✅ {len(first['tables'])} tables mapped with 0 bytes copied; v1 collected after v3")
+
+
+def test_etl_reads_results():
+    """Test that the ETL maps results for its own generation only."""
+    print("\n🧪 Testing ETL Result Reads...")
+
+    from etl_to_postgres import DuckDBToPostgresETL
+
+    with tempfile.TemporaryDirectory() as tmp:
+        publish(DB_PATH, Path(tmp) / 'current')
+        other = Path(tmp) / 'other.duckdb'
+        build(other, tmp, 2)
+        publish(other, Path(tmp) / 'stale')
+
+        rows = {}
+        for name in ('current', 'stale'):
+            etl = DuckDBToPostgresETL(str(DB_PATH), results_dir=str(Path(tmp) / name))
+            etl.connect()
+            try:
+                rows[name] = (etl.results is not None, {
+                    table: etl.result_rows(table) for table in ('agency_metrics', 'report_scorecard')
+                })
+            finally:
+                etl.close()
+
+        queried = DuckDBToPostgresETL(str(DB_PATH))
+        queried.connect()
+        try:
+            baseline = {table: queried.result_rows(table) for table in ('agency_metrics', 'report_scorecard')}
+        finally:
+            queried.close()
+
+    assert rows['current'][0], "Results for the current generation were ignored"
+    assert not rows['stale'][0], "Results from another database were used"
+    assert rows['current'][1] == baseline == rows['stale'][1], "Mapped rows differ from DuckDB"
+    assert all(len(metric) == 8 for metric in baseline['agency_metrics']), "Word counts missing"
+    print(f"  ✅ Current results mapped, stale results ignored, "
+          f"{len(baseline['agency_metrics'])} metrics identical either way")
+
+
+def test_app_endpoints():
+    """Test the manifest and table endpoints."""
+    print("\n🧪 Testing App Result Endpoints...")
+
+    client = lake_app.app.test_client()
+    saved = lake_app.RESULTS
+    with tempfile.TemporaryDirectory() as tmp:
+        lake_app.RESULTS = ResultStore(tmp)
+        try:
+            missing = client.get('/results').status_code
+            manifest = publish(DB_PATH, tmp)
+
+            listed = client.get('/results').get_json()
+            as_json = client.get('/results/agency_metrics', query_string={'format': 'json'}).get_json()
+            ndjson = client.get('/results/export_agencies').get_data(as_text=True).splitlines()
+            response = client.get('/results/report_scorecard', query_string={'format': 'arrow'})
+            arrow = pa.ipc.open_file(pa.BufferReader(response.get_data())).read_all()
+            expected = ResultStore(tmp).open('report_scorecard')
+            unknown = client.get('/results/nope').status_code
+            bad_format = client.get('/results/agencies', query_string={'format': 'csv'}).status_code
+        finally:
+            lake_app.RESULTS = saved
+
+    assert missing == 404, missing
+    assert listed['version'] == manifest['version'] and listed['tables'].keys() == manifest['tables'].keys()
+    assert len(as_json['agency_metrics']) == manifest['tables']['agency_metrics']['rows']
+    assert len(ndjson) == manifest['tables']['export_agencies']['rows'], len(ndjson)
+    assert 'slug' in json.loads(ndjson[0]), ndjson[0]
+    assert response.mimetype == 'application/vnd.apache.arrow.file', response.mimetype
+    assert arrow.equals(expected), "Arrow download differs from the published table"
+    assert (unknown, bad_format) == (404, 400), (unknown, bad_format)
+    print(f"  ✅ Manifest, JSON, NDJSON and Arrow ({len(response.get_data()) / 1024:.1f} KiB) served")
+
+
+def run_all_tests():
+    """Run all Arrow result tests."""
+    print("=" * 60)
+    print("Arrow Result Sets - Tests")
+    print("=" * 60)
+
+    tests = [
+        ("Publish and Memory-Map", test_publish_and_map),
+        ("ETL Result Reads", test_etl_reads_results),
+        ("App Result Endpoints", test_app_endpoints),
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test_name, test_func in tests:
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"\n❌ {test_name} FAILED: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"\n❌ {test_name} ERROR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"Test Results: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed == 0:
+        print("✅ All tests passed! Arrow result sets are working correctly.")
+    else:
+        print(f"❌ {failed} test(s) failed. Please review errors above.")
+
+    return failed == 0
+
+
+if __name__ == '__main__':
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,112 @@
+"""
+Benchmark suite tests
+
+Validates:
+- Dataset scaling keeps ids and slugs unique
+- A small benchmark run records every step
+- Baseline regression detection
+"""
+
+import json
+
+from benchmark import SOURCE_DIR, compare_to_baseline, run_benchmarks, scale_dataset
+
+
+def load_sources():
+    with open(SOURCE_DIR / 'agencies.json') as f:
+        agencies = json.load(f)
+    with open(SOURCE_DIR / 'corrections.json') as f:
+        corrections = json.load(f)
+    return agencies, corrections
+
+
+def test_scale_dataset():
+    """Test that scaled datasets have the requested size and unique keys."""
+    print("\n🧪 Testing Dataset Scaling...")
+
+    agencies, corrections = load_sources()
+    source_count = len(corrections['ecfr_corrections'])
+
+    for factor in (0.1, 1, 2.5):
+        scaled_agencies, scaled_corrections = scale_dataset(agencies, corrections, factor)
+        records = scaled_corrections['ecfr_corrections']
+        ids = [c['id'] for c in records]
+        slugs = [a['slug'] for a in scaled_agencies['agencies']]
+        slugs += [c['slug'] for a in scaled_agencies['agencies'] for c in a.get('children', [])]
+
+        assert len(records) == round(source_count * factor), f"Scale {factor}: {len(records)} corrections"
+        assert len(set(ids)) == len(ids), f"Scale {factor}: duplicate correction ids"
+        assert len(set(slugs)) == len(slugs), f"Scale {factor}: duplicate agency slugs"
+        assert all('checksum' not in c for c in records), "Scaled records kept stale checksums"
+        print(f"  ✅ Scale {factor}: {len(records)} corrections, {len(slugs)} agencies")
+
+    # Source data is not modified
+    assert len(corrections['ecfr_corrections']) == source_count
+
+
+def test_benchmark_run():
+    """Test a small benchmark run without PostgreSQL."""
+    print("\n🧪 Testing Benchmark Run...")
+
+    results = run_benchmarks([0.05], use_postgres=False)
+    steps = results['scales']['0.05']['steps']
+
+    for name in ('checksums.add_checksums_to_corrections', 'ingestion.load_agencies',
+                 'ingestion.load_corrections', 'analytics.get_agency_metrics',
+                 'analytics.generate_summary_report'):
+        assert steps[name]['seconds'] >= 0, f"{name} not timed"
+        assert steps[name]['peak_rss_mb'] > 0, f"{name} has no peak RSS"
+    assert steps['ingestion.load_corrections']['rows'] == results['scales']['0.05']['corrections']
+    assert steps['etl.transfer_corrections'] == {'skipped': 'no PostgreSQL available'}
+    print(f"  ✅ {len(steps)} steps recorded")
+
+    assert compare_to_baseline(results, results, 0.25) == [], "Run regressed against itself"
+
+    slower = json.loads(json.dumps(results))
+    slower['scales']['0.05']['steps']['ingestion.load_corrections']['seconds'] += 10
+    regressions = compare_to_baseline(results, slower, 0.25)
+    assert len(regressions) == 1 and 'load_corrections' in regressions[0], f"Regressions: {regressions}"
+    print(f"  ✅ Slowdown past threshold flagged")
+
+
+def run_all_tests():
+    """Run all benchmark suite tests."""
+    print("=" * 60)
+    print("Pipeline Benchmarks - Tests")
+    print("=" * 60)
+
+    tests = [
+        ("Dataset Scaling", test_scale_dataset),
+        ("Benchmark Run", test_benchmark_run),
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test_name, test_func in tests:
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"\n❌ {test_name} FAILED: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"\n❌ {test_name} ERROR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"Test Results: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed == 0:
+        print("✅ All tests passed! Benchmark suite is working correctly.")
+    else:
+        print(f"❌ {failed} test(s) failed. Please review errors above.")
+
+    return failed == 0
+
+
+if __name__ == '__main__':
+    import sys
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
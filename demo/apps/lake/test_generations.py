@@ -0,0 +1,255 @@
+"""
+Database generation tests
+
+Validates:
+- Publishing swaps the pointer and adopts a pre-existing database
+- Readers keep serving their generation during and after a rebuild,
+  and move to the new one on refresh or reconnect
+- A failed build leaves the published generation untouched
+- Retired generations are collected only after the grace period
+- An older build can't be published over a newer generation, and every
+  generation but the current one is eventually collected
+"""
+
+import asyncio
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from analytics import ECFRAnalytics
+from analytics_api import AnalyticsAPI
+from generations import BUILDING_SUFFIX, GenerationStore
+from ingestion import ECFRIngestion
+from test_analytics_api import call
+from test_shards import load_source
+
+
+SLUGS = ['civil-rights-commission', 'african-development-foundation', 'administrative-conference-of-the-united-states']
+
+
+def build(path, tmp, count):
+    """Ingest the first count agencies of SLUGS into a database at path."""
+    source, _ = load_source()
+    agencies_json = Path(tmp) / 'agencies.json'
+    agencies_json.write_text(json.dumps({'agencies': [source[slug] for slug in SLUGS[:count]]}))
+
+    pipeline = ECFRIngestion(str(path))
+    pipeline.connect()
+    pipeline.initialize_schema()
+    pipeline.load_agencies(agencies_json)
+    pipeline.close()
+
+
+def agency_count(analytics):
+    return len(analytics.get_agency_metrics())
+
+
+def test_publish():
+    """Test pointer swaps and adoption of a database built in place."""
+    print("\n🧪 Testing Publish...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pointer = Path(tmp) / 'lake.duckdb'
+        build(pointer, tmp, 1)
+
+        store = GenerationStore(pointer, grace_seconds=3600)
+        published = []
+        for count in (2, 3):
+            with store.building() as path:
+                build(path, tmp, count)
+            published.append(store.current())
+
+        is_symlink = pointer.is_symlink()
+        generations = store.generations()
+        leftovers = list(store.directory.glob(f"*{BUILDING_SUFFIX}*"))
+        analytics = ECFRAnalytics(str(pointer))
+        analytics.connect()
+        try:
+            count = agency_count(analytics)
+        finally:
+            analytics.close()
+
+    assert is_symlink, "Pointer is not a symlink"
+    assert len(generations) == 3, [g.name for g in generations]
+    assert generations[0].name.endswith('-legacy.duckdb'), generations[0].name
+    assert published == generations[1:], published
+    assert leftovers == [], leftovers
+    assert count == 3, f"Pointer serves {count} agencies"
+    print(f"  ✅ {len(generations)} generations, pre-existing database adopted")
+
+
+def test_readers_during_rebuild():
+    """Test that open readers serve through a rebuild and then move over."""
+    print("\n🧪 Testing Readers During Rebuild...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pointer = Path(tmp) / 'lake.duckdb'
+        store = GenerationStore(pointer, grace_seconds=3600)
+        with store.building() as path:
+            build(path, tmp, 1)
+
+        reader = ECFRAnalytics(str(pointer))
+        reader.connect()
+        app = AnalyticsAPI(str(pointer), max_workers=1)
+
+        async def api_agencies():
+            status, body = await call(app, '/agencies/metrics')
+            assert status == 200, status
+            return len(body)
+
+        try:
+            api_before = asyncio.run(api_agencies())
+            with store.building() as path:
+                build(path, tmp, 3)
+                during = agency_count(reader)
+                api_during = asyncio.run(api_agencies())
+
+            stale = agency_count(reader)
+            refreshed = reader.refresh()
+            after = agency_count(reader)
+            api_after = asyncio.run(api_agencies())
+            unchanged = reader.refresh()
+
+            try:
+                with store.building() as path:
+                    build(path, tmp, 2)
+                    raise RuntimeError("source feed truncated")
+            except RuntimeError:
+                pass
+            after_failure = agency_count(reader)
+            failure_left = list(store.directory.glob(f"*{BUILDING_SUFFIX}*"))
+            fresh = ECFRAnalytics(str(pointer))
+            fresh.connect()
+            fresh_count = agency_count(fresh)
+            fresh.close()
+        finally:
+            reader.close()
+            app.shutdown()
+
+    assert (api_before, during, api_during) == (1, 1, 1), (api_before, during, api_during)
+    assert stale == 1, "Open reader switched without refresh"
+    assert refreshed and after == 3, f"Refresh served {after}"
+    assert api_after == 3, f"API worker served {api_after} after publish"
+    assert not unchanged, "Refresh reconnected without a new generation"
+    assert after_failure == 3 and fresh_count == 3, "Failed build was published"
+    assert failure_left == [], failure_left
+    print("  ✅ Readers served 1 agency during the rebuild, 3 after refresh")
+
+
+def test_collect():
+    """Test that retired generations outlive the grace period only."""
+    print("\n🧪 Testing Garbage Collection...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pointer = Path(tmp) / 'lake.duckdb'
+        store = GenerationStore(pointer, grace_seconds=3600)
+        for count in (1, 2, 3):
+            with store.building() as path:
+                build(path, tmp, count)
+        generations = store.generations()
+        abandoned = store.directory / f"lake.99999999T000000000000-dead.duckdb{BUILDING_SUFFIX}"
+        abandoned.write_bytes(b'partial')
+
+        now = time.time()
+        kept = store.collect(now=now)
+        # The first generation retired when the second was written
+        retired_at = generations[1].stat().st_mtime
+        early = store.collect(now=retired_at + 3599)
+        removed = store.collect(now=now + 3600)
+        remaining = store.generations()
+        current = store.current()
+        abandoned_left = abandoned.exists()
+
+        reader = ECFRAnalytics(str(pointer))
+        reader.connect()
+        count = agency_count(reader)
+        reader.close()
+
+    assert len(generations) == 3 and kept == [] and early == [], (kept, early)
+    assert removed == generations[:2] + [abandoned], [p.name for p in removed]
+    assert remaining == [current] == generations[2:], remaining
+    assert not abandoned_left, "Abandoned build kept"
+    assert count == 3
+    print(f"  ✅ {len(removed) - 1} retired generations and 1 abandoned build collected, current kept")
+
+
+def test_publish_order():
+    """Test that an older build can't replace a newer published generation."""
+    print("\n🧪 Testing Publish Order...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pointer = Path(tmp) / 'lake.duckdb'
+        store = GenerationStore(pointer, grace_seconds=3600)
+
+        # Two overlapping builds: the one started first finishes last
+        first = store.building()
+        first_path = first.__enter__()
+        with store.building() as path:
+            build(path, tmp, 2)
+        newer = store.current()
+        build(first_path, tmp, 1)
+        try:
+            first.__exit__(None, None, None)
+            refused = False
+        except RuntimeError:
+            refused = True
+        after_race = store.current()
+        generations = store.generations()
+
+        # A stray file sorting after the current generation is aged by itself
+        stray = store.directory / "lake.99999999T000000000000-stray.duckdb"
+        stray.write_bytes(b'never published')
+        now = time.time()
+        kept = store.collect(now=now)
+        removed = store.collect(now=now + 3600)
+
+    assert refused, "Older build was published over a newer one"
+    assert after_race == newer and generations == [newer], [g.name for g in generations]
+    assert kept == [] and removed == [stray], (kept, removed)
+    print(f"  ✅ Stale publish refused, generation after the current one collected")
+
+
+def run_all_tests():
+    """Run all generation tests."""
+    print("=" * 60)
+    print("Database Generations - Tests")
+    print("=" * 60)
+
+    tests = [
+        ("Publish", test_publish),
+        ("Readers During Rebuild", test_readers_during_rebuild),
+        ("Garbage Collection", test_collect),
+        ("Publish Order", test_publish_order),
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test_name, test_func in tests:
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"\n❌ {test_name} FAILED: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"\n❌ {test_name} ERROR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"Test Results: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed == 0:
+        print("✅ All tests passed! Database generations are working correctly.")
+    else:
+        print(f"❌ {failed} test(s) failed. Please review errors above.")
+
+    return failed == 0
+
+
+if __name__ == '__main__':
+    import sys
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,207 @@
+"""
+Agency hierarchy tests
+
+Validates:
+- The closure table pairs every agency with itself and each ancestor
+- Rollups match totals computed by walking the hierarchy in Python,
+  counting a correction once per subtree
+- Agencies without sub-agencies roll up to their own agency_metrics
+- Rebuilding the hierarchy is idempotent
+"""
+
+import shutil
+import sys
+import tempfile
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+from pathlib import Path
+
+from analytics import ECFRAnalytics
+from ingestion import build_hierarchy
+from resources import connect
+
+
+DB_PATH = Path(__file__).parent / 'ecfr_analytics.duckdb'
+
+
+def subtree(children, slug):
+    """slug and every agency below it, walked recursively."""
+    found = [slug]
+    for child in children.get(slug, []):
+        found += subtree(children, child)
+    return found
+
+
+def test_closure():
+    """Test closure rows against the parent_slug tree."""
+    print("\n🧪 Testing Closure Table...")
+
+    conn = connect(str(DB_PATH.resolve()), read_only=True)
+    try:
+        agencies = conn.execute("SELECT slug, parent_slug, child_count FROM agencies_parsed").fetchall()
+        closure = conn.execute("SELECT ancestor_slug, descendant_slug, depth FROM agency_closure").fetchall()
+    finally:
+        conn.close()
+
+    children = defaultdict(list)
+    for slug, parent, _ in agencies:
+        if parent:
+            children[parent].append(slug)
+
+    expected = set()
+    for slug, _, _ in agencies:
+        expected.add((slug, slug, 0))
+        for child in subtree(children, slug)[1:]:
+            expected.add((slug, child, 1 if child in children[slug] else 2))
+
+    direct = defaultdict(int)
+    for ancestor, _, depth in closure:
+        if depth == 1:
+            direct[ancestor] += 1
+
+    assert len(closure) == len(set(closure)), "Duplicate closure rows"
+    assert set(closure) == expected, sorted(set(closure) ^ expected)[:5]
+    assert all(direct[slug] == count for slug, _, count in agencies), "Depth-1 rows differ from child_count"
+    print(f"  ✅ {len(closure)} closure rows for {len(agencies)} agencies, "
+          f"{sum(direct.values())} parent/child pairs")
+
+
+def test_rollups():
+    """Test rollups against a recursive walk over the base tables."""
+    print("\n🧪 Testing Rollups...")
+
+    conn = connect(str(DB_PATH.resolve()), read_only=True)
+    try:
+        parents = dict(conn.execute("SELECT slug, parent_slug FROM agencies_parsed").fetchall())
+        references = conn.execute("SELECT agency_slug, title, chapter, part FROM cfr_references").fetchall()
+        corrections = conn.execute("SELECT ecfr_id, title, year, lag_days FROM corrections_parsed").fetchall()
+        rollups = {
+            row[0]: row[1:] for row in conn.execute("""
+                SELECT slug, descendant_count, cfr_reference_count, total_corrections,
+                       first_correction_year, last_correction_year, avg_correction_lag_days, rvi,
+                       word_count_estimate
+                FROM agency_rollups
+            """).fetchall()
+        }
+        leaves_differ = conn.execute("""
+            SELECT COUNT(*) FROM agency_rollups r
+            INNER JOIN agency_metrics m ON m.slug = r.slug
+            WHERE r.descendant_count = 0 AND (
+                r.total_corrections != m.total_corrections OR r.rvi != m.rvi
+                OR r.cfr_reference_count != m.cfr_reference_count
+                OR r.avg_correction_lag_days IS DISTINCT FROM m.avg_correction_lag_days
+            )
+        """).fetchone()[0]
+    finally:
+        conn.close()
+
+    children = defaultdict(list)
+    for slug, parent in parents.items():
+        if parent:
+            children[parent].append(slug)
+    refs_by_agency = defaultdict(list)
+    for slug, title, chapter, part in references:
+        refs_by_agency[slug].append((title, 2000 if part else 10000 if chapter else 50000))
+    corrections_by_title = defaultdict(list)
+    for correction in corrections:
+        corrections_by_title[correction[1]].append(correction)
+
+    checked = 0
+    for slug in parents:
+        members = subtree(children, slug)
+        refs = [ref for member in members for ref in refs_by_agency[member]]
+        matched = {c[0]: c for title in {t for t, _ in refs} for c in corrections_by_title[title]}
+        lags = [c[3] for c in matched.values() if c[3] is not None]
+        rvi = Decimal(0)
+        if refs and matched:
+            rvi = (Decimal(len(matched)) / len(refs) * 100).quantize(Decimal('0.01'), ROUND_HALF_UP)
+        years = [c[2] for c in matched.values()]
+        expected = (
+            len(members) - 1, len(refs), len(matched),
+            min(years) if years else None, max(years) if years else None,
+            sum(lags) / len(lags) if lags else None, rvi, sum(words for _, words in refs),
+        )
+        actual = rollups[slug]
+        assert actual[:5] == expected[:5] and actual[6:] == expected[6:], f"{slug}: {actual} != {expected}"
+        assert (actual[5] is None) == (expected[5] is None), slug
+        assert actual[5] is None or abs(actual[5] - expected[5]) < 1e-9, slug
+        checked += 1
+
+    departments = [slug for slug in parents if children[slug]]
+    widest = max(departments, key=lambda slug: len(children[slug]))
+    assert leaves_differ == 0, f"{leaves_differ} leaf rollups differ from agency_metrics"
+    print(f"  ✅ {checked} rollups match the recursive walk; "
+          f"{widest} spans {len(children[widest])} sub-agencies")
+
+
+def test_rebuild():
+    """Test that rebuilding the hierarchy replaces rather than appends."""
+    print("\n🧪 Testing Rebuild...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Generations are never written after publishing, so a copy is consistent
+        path = str(Path(tmp) / 'copy.duckdb')
+        shutil.copyfile(DB_PATH.resolve(), path)
+
+        conn = connect(path)
+        try:
+            first = build_hierarchy(conn)
+            second = build_hierarchy(conn)
+        finally:
+            conn.close()
+
+        analytics = ECFRAnalytics(path)
+        analytics.connect()
+        try:
+            rollup = analytics.get_agency_rollup('agriculture-department')
+        finally:
+            analytics.close()
+
+    assert first == second, (first, second)
+    assert rollup['depth'] == 0 and rollup['descendant_count'] == len(rollup['sub_agencies']) > 0, rollup
+    assert all(sub['parent_slug'] == 'agriculture-department' and sub['depth'] == 1 for sub in rollup['sub_agencies'])
+    assert rollup['total_corrections'] >= max(sub['total_corrections'] for sub in rollup['sub_agencies'])
+    print(f"  ✅ Rebuilt twice to {first[0]} closure rows and {first[1]} rollups")
+
+
+def run_all_tests():
+    """Run all hierarchy tests."""
+    print("=" * 60)
+    print("Agency Hierarchy - Tests")
+    print("=" * 60)
+
+    tests = [
+        ("Closure Table", test_closure),
+        ("Rollups", test_rollups),
+        ("Rebuild", test_rebuild),
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test_name, test_func in tests:
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"\n❌ {test_name} FAILED: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"\n❌ {test_name} ERROR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"Test Results: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed == 0:
+        print("✅ All tests passed! Agency hierarchy is working correctly.")
+    else:
+        print(f"❌ {failed} test(s) failed. Please review errors above.")
+
+    return failed == 0
+
+
+if __name__ == '__main__':
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,155 @@
+"""
+Load test harness tests
+
+Validates:
+- Percentile and regression calculations
+- A short load run against the Flask app
+- Requests to a stalled server time out and count as errors
+"""
+
+import asyncio
+import threading
+
+from werkzeug.serving import make_server
+
+from app import app
+from loadtest import compare_reports, percentile, run_load
+
+
+def test_percentiles_and_comparison():
+    """Test nearest-rank percentiles and baseline comparison."""
+    print("\n🧪 Testing Percentiles and Comparison...")
+
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 95) == 95.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([7.0], 99) == 7.0
+    assert percentile([], 50) == 0.0
+    print(f"  ✅ Nearest-rank percentiles")
+
+    def report(p95, rps, error_rate=0.0):
+        stats = {'latency_ms': {'p95': p95, 'p99': p95}, 'error_rate': error_rate, 'throughput_rps': rps}
+        return {'overall': stats, 'endpoints': {'/x': stats}}
+
+    assert compare_reports(report(10.0, 100.0), report(10.5, 98.0)) == [], "Noise flagged as regression"
+    regressions = compare_reports(report(10.0, 100.0), report(20.0, 50.0, 0.1))
+    assert any('p95' in r for r in regressions), "Latency regression missed"
+    assert any('throughput' in r for r in regressions), "Throughput regression missed"
+    assert any('error rate' in r for r in regressions), "Error rate regression missed"
+    print(f"  ✅ Regressions flagged beyond threshold")
+
+
+def test_load_run():
+    """Test a short load run against the Flask app."""
+    print("\n🧪 Testing Load Run...")
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    mix = [
+        (5, '/corrections?year=2015&limit=10'),
+        (1, '/agencies'),
+        (1, '/corrections/stream?year=2015'),
+        (1, '/does-not-exist'),
+    ]
+    try:
+        report = asyncio.run(run_load(
+            f"http://127.0.0.1:{server.server_port}", mix, concurrency=4, total_requests=80
+        ))
+        repeat = asyncio.run(run_load(
+            f"http://127.0.0.1:{server.server_port}", mix, concurrency=4, total_requests=80
+        ))
+    finally:
+        server.shutdown()
+
+    overall = report['overall']
+    assert overall['requests'] == 80, f"Sent {overall['requests']} requests"
+    assert set(report['endpoints']) == {path for _, path in mix}, "Mix entries missing from report"
+
+    missing = report['endpoints']['/does-not-exist']
+    assert missing['errors'] == missing['requests'], "404s not counted as errors"
+    assert overall['errors'] == missing['errors'], "Unexpected errors on valid routes"
+    assert report['endpoints']['/agencies']['bytes'] > 0, "Response bodies not read"
+    print(f"  ✅ 80 requests, error rate {overall['error_rate']:.2%}")
+
+    counts = {path: stats['requests'] for path, stats in report['endpoints'].items()}
+    repeat_counts = {path: stats['requests'] for path, stats in repeat['endpoints'].items()}
+    assert counts == repeat_counts, "Seeded runs issued different request mixes"
+    print(f"  ✅ Seeded runs replay the same mix")
+
+
+def test_timeouts():
+    """Test that a server which stops responding can't hang a worker."""
+    print("\n🧪 Testing Timeouts...")
+
+    async def stalled(reader, writer):
+        # Answer with a status line on odd connections, then go silent
+        await reader.readline()
+        if writer.get_extra_info('peername')[1] % 2:
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Length: 10\r\n\r\n')
+        await asyncio.sleep(60)
+
+    async def run():
+        server = await asyncio.start_server(stalled, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            return await asyncio.wait_for(run_load(
+                f"http://127.0.0.1:{port}", [(1, '/slow')], concurrency=2, total_requests=6, timeout=0.2
+            ), 10)
+        finally:
+            server.close()
+
+    report = asyncio.run(run())
+    overall = report['overall']
+
+    assert overall['requests'] == 6, f"Sent {overall['requests']} requests"
+    assert overall['timeouts'] == 6 and overall['errors'] == 6, overall
+    assert overall['latency_ms']['max'] < 1000, overall['latency_ms']
+    print(f"  ✅ {overall['timeouts']} stalled requests timed out as errors "
+          f"(max {overall['latency_ms']['max']}ms)")
+
+
+def run_all_tests():
+    """Run all load test harness tests."""
+    print("=" * 60)
+    print("Load Test Harness - Tests")
+    print("=" * 60)
+
+    tests = [
+        ("Percentiles and Comparison", test_percentiles_and_comparison),
+        ("Load Run", test_load_run),
+        ("Timeouts", test_timeouts),
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test_name, test_func in tests:
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"\n❌ {test_name} FAILED: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"\n❌ {test_name} ERROR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"Test Results: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed == 0:
+        print("✅ All tests passed! Load test harness is working correctly.")
+    else:
+        print(f"❌ {failed} test(s) failed. Please review errors above.")
+
+    return failed == 0
+
+
+if __name__ == '__main__':
+    import sys
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,280 @@
+"""
+Pipeline DAG tests
+
+Validates:
+- Unchanged stages are skipped and a changed input reruns only downstream
+- Independent stages run in parallel within the worker limit
+- A failed stage blocks its dependents but not unrelated stages
+- The lake pipeline rebuilds only the changed agency's shard and the
+  merged lake matches a single-database ingestion
+- An agency removed from the source loses its feed and shard, and an
+  --agency run merges only the selected shards
+"""
+
+import json
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from analytics import ECFRAnalytics
+from generations import resolve
+from pipeline_dag import BLOCKED, CACHED, FAILED, RAN, PipelineDAG, Stage, lake_stages
+from resources import connect
+from shards import ShardCatalog
+from test_shards import AGENCIES_JSON, CORRECTIONS_JSON, build_single_db, load_source
+
+
+def copy_stage(name, source, target, calls):
+    def run():
+        calls.append(name)
+        target.write_text(source.read_text().upper())
+    return Stage(name, run, inputs=[source], outputs=[target])
+
+
+def test_cache_and_downstream():
+    """Test that reruns skip unchanged stages and follow changed inputs."""
+    print("\n🧪 Testing Cache and Downstream Reruns...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        (tmp / 'a.txt').write_text('a')
+        (tmp / 'b.txt').write_text('b')
+        calls = []
+        stages = lambda: [
+            copy_stage('upper_a', tmp / 'a.txt', tmp / 'A.txt', calls),
+            copy_stage('upper_b', tmp / 'b.txt', tmp / 'B.txt', calls),
+            copy_stage('final_a', tmp / 'A.txt', tmp / 'final.txt', calls),
+        ]
+        state = tmp / 'state.json'
+
+        first = PipelineDAG(stages(), state_path=state).run()
+        second = PipelineDAG(stages(), state_path=state).run()
+        (tmp / 'a.txt').write_text('changed')
+        third = PipelineDAG(stages(), state_path=state).run()
+        time.sleep(0.01)
+        (tmp / 'b.txt').write_text('b')  # same content, new mtime
+        fourth = PipelineDAG(stages(), state_path=state).run()
+        (tmp / 'final.txt').unlink()
+        plan = PipelineDAG(stages(), state_path=state).plan()
+        fifth = PipelineDAG(stages(), state_path=state).run()
+        final = (tmp / 'final.txt').read_text()
+        deps = PipelineDAG(stages(), state_path=state).deps
+
+    assert deps == {'upper_a': set(), 'upper_b': set(), 'final_a': {'upper_a'}}, deps
+    assert all(r.status == RAN for r in first.values()), first
+    assert all(r.status == CACHED for r in second.values()), second
+    assert {n for n, r in third.items() if r.status == RAN} == {'upper_a', 'final_a'}, third
+    assert all(r.status == CACHED for r in fourth.values()), f"Touched input reran: {fourth}"
+    assert plan == {'upper_a': CACHED, 'upper_b': CACHED, 'final_a': 'stale'}, plan
+    assert {n for n, r in fifth.items() if r.status == RAN} == {'final_a'}, fifth
+    assert final == 'CHANGED'
+    assert sorted(calls) == ['final_a'] * 3 + ['upper_a'] * 2 + ['upper_b'], calls
+    print(f"  ✅ {len(calls)} stage runs across 5 pipeline runs")
+
+
+def test_parallel_limit():
+    """Test that independent stages overlap without exceeding max_workers."""
+    print("\n🧪 Testing Parallel Limit...")
+
+    lock = threading.Lock()
+    active = [0]
+    peak = [0]
+
+    def sleeper():
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.1)
+        with lock:
+            active[0] -= 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stages = [Stage(f'sleep.{i}', sleeper) for i in range(6)]
+        stages.append(Stage('join', lambda: 'joined', after=[s.name for s in stages]))
+        start = time.perf_counter()
+        results = PipelineDAG(stages, state_path=Path(tmp) / 'state.json', max_workers=3).run()
+        elapsed = time.perf_counter() - start
+
+    assert peak[0] == 3, f"Peak concurrency {peak[0]}"
+    assert elapsed < 0.5, f"6 x 100 ms stages on 3 workers took {elapsed:.2f}s"
+    assert list(results)[-1] == 'join' and results['join'].result == 'joined'
+    try:
+        PipelineDAG([Stage('x', sleeper, after=['y']), Stage('y', sleeper, after=['x'])])
+        raise AssertionError("Cycle accepted")
+    except ValueError as e:
+        assert 'cycle' in str(e)
+    print(f"  ✅ Peak {peak[0]} concurrent stages, {elapsed * 1000:.0f} ms total")
+
+
+def test_failure_blocks_dependents():
+    """Test that failures stop dependents, spare siblings and rerun once fixed."""
+    print("\n🧪 Testing Failure Propagation...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        broken = [True]
+        out = tmp / 'out.txt'
+
+        def flaky():
+            if broken[0]:
+                raise RuntimeError("source unavailable")
+            out.write_text('ok')
+
+        def stages():
+            return [
+                Stage('flaky', flaky, outputs=[out]),
+                Stage('downstream', lambda: out.read_text(), inputs=[out]),
+                Stage('sibling', lambda: 'fine'),
+            ]
+
+        failed = PipelineDAG(stages(), state_path=tmp / 'state.json').run()
+        broken[0] = False
+        fixed = PipelineDAG(stages(), state_path=tmp / 'state.json').run()
+
+    assert failed['flaky'].status == FAILED and 'source unavailable' in failed['flaky'].error
+    assert failed['downstream'].status == BLOCKED, failed
+    assert failed['sibling'].status == RAN, failed
+    assert fixed['flaky'].status == RAN and fixed['downstream'].status == RAN, fixed
+    assert fixed['downstream'].result == 'ok' and fixed['sibling'].status == CACHED, fixed
+    print("  ✅ Failure blocked 1 dependent, sibling ran, rerun recovered")
+
+
+def test_lake_pipeline():
+    """Test the lake DAG end to end with one agency changed between runs."""
+    print("\n🧪 Testing Lake Pipeline...")
+
+    slugs = ['energy-department', 'civil-rights-commission', 'african-development-foundation']
+    source, _ = load_source()
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        agencies = json.loads(AGENCIES_JSON.read_text())
+        agencies_json = tmp / 'agencies.json'
+        agencies_json.write_text(json.dumps(agencies))
+        db_path = tmp / 'lake.duckdb'
+
+        def run():
+            stages = lake_stages(agencies_json, CORRECTIONS_JSON, tmp / 'work', tmp / 'shards', db_path,
+                                 slugs=slugs, etl=False)
+            return PipelineDAG(stages, state_path=tmp / 'work' / 'state.json', max_workers=3).run()
+
+        first = run()
+        second = run()
+        for agency in agencies['agencies']:
+            if agency['slug'] == 'civil-rights-commission':
+                agency['name'] = 'Commission on Civil Rights (renamed)'
+        agencies_json.write_text(json.dumps(agencies))
+        third = run()
+
+        lake = ECFRAnalytics(str(db_path))
+        lake.connect()
+        renamed = [dict(source[slug]) for slug in slugs]
+        renamed[1]['name'] = 'Commission on Civil Rights (renamed)'
+        single = ECFRAnalytics(build_single_db(str(tmp), renamed))
+        single.connect()
+        try:
+            for method in ('get_overview', 'get_agency_metrics', 'get_correction_trends_yearly'):
+                assert getattr(lake, method)() == getattr(single, method)(), f"{method} differs"
+            detail = lake.get_agency_detail('civil-rights-commission')
+        finally:
+            lake.close()
+            single.close()
+        exports = sorted(p.name for p in (tmp / 'work' / 'exports').iterdir())
+
+    reran = {name for name, result in third.items() if result.status == RAN}
+    assert all(r.status == RAN for r in first.values()), first
+    assert len(first) == len(slugs) + 3, sorted(first)
+    assert all(r.status == CACHED for r in second.values()), second
+    assert reran == {'extract', 'shard.civil-rights-commission', 'lake', 'analytics'}, reran
+    assert detail['name'] == 'Commission on Civil Rights (renamed)'
+    assert 'agencies.json' in exports, exports
+    print(f"  ✅ {len(first)} stages built, rerun touched {len(reran)}, lake matches single ingestion")
+
+
+def test_removed_agency():
+    """Test that a removed agency leaves the lake and --agency merges only the selection."""
+    print("\n🧪 Testing Removed Agency...")
+
+    slugs = ['energy-department', 'civil-rights-commission', 'african-development-foundation']
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        agencies = json.loads(AGENCIES_JSON.read_text())
+        agencies_json = tmp / 'agencies.json'
+        agencies_json.write_text(json.dumps(agencies))
+        db_path = tmp / 'lake.duckdb'
+        catalog = ShardCatalog(str(tmp / 'shards'))
+
+        def run(selected):
+            stages = lake_stages(agencies_json, CORRECTIONS_JSON, tmp / 'work', tmp / 'shards', db_path,
+                                 slugs=selected, etl=False)
+            results = PipelineDAG(stages, state_path=tmp / 'work' / 'state.json', max_workers=3).run()
+            assert all(r.status in (RAN, CACHED) for r in results.values()), results
+            conn = connect(resolve(db_path), read_only=True)
+            try:
+                top = {row[0] for row in conn.execute(
+                    "SELECT slug FROM agencies_parsed WHERE parent_slug IS NULL").fetchall()}
+            finally:
+                conn.close()
+            feeds = {path.stem for path in (tmp / 'work' / 'feeds').glob('*.json')}
+            return top, feeds, set(catalog.load())
+
+        run(slugs)
+        removed_file = catalog.shard_path(catalog.load()['african-development-foundation'])
+        agencies['agencies'] = [a for a in agencies['agencies'] if a['slug'] != 'african-development-foundation']
+        agencies_json.write_text(json.dumps(agencies))
+        after_removal = run(slugs)
+        record_left = (tmp / 'work' / 'shards' / 'african-development-foundation.json').exists()
+        file_left = removed_file.exists()
+        selected = run(['civil-rights-commission'])
+
+    remaining = {'energy-department', 'civil-rights-commission'}
+    assert after_removal == (remaining, remaining, remaining), after_removal
+    assert not record_left and not file_left, "Removed agency's shard record or file kept"
+    assert selected == ({'civil-rights-commission'}, {'civil-rights-commission'}, remaining), selected
+    print(f"  ✅ Removed agency dropped from feeds, catalog and lake; --agency merged 1 of {len(remaining)} shards")
+
+
+def run_all_tests():
+    """Run all pipeline DAG tests."""
+    print("=" * 60)
+    print("Pipeline DAG - Tests")
+    print("=" * 60)
+
+    tests = [
+        ("Cache and Downstream Reruns", test_cache_and_downstream),
+        ("Parallel Limit", test_parallel_limit),
+        ("Failure Propagation", test_failure_blocks_dependents),
+        ("Lake Pipeline", test_lake_pipeline),
+        ("Removed Agency", test_removed_agency),
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test_name, test_func in tests:
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"\n❌ {test_name} FAILED: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"\n❌ {test_name} ERROR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"Test Results: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed == 0:
+        print("✅ All tests passed! Pipeline DAG is working correctly.")
+    else:
+        print(f"❌ {failed} test(s) failed. Please review errors above.")
+
+    return failed == 0
+
+
+if __name__ == '__main__':
+    import sys
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,150 @@
+"""
+Query profiler tests
+
+Validates:
+- Every profiled getter call is logged with operator timings
+- Slow calls keep their parameters and plan
+- Reports rank by cumulative cost
+- Profiling stays off unless enabled
+"""
+
+import tempfile
+from pathlib import Path
+
+from analytics import ECFRAnalytics
+from profiler import QueryProfiler, profile_getters
+
+
+DB_PATH = str(Path(__file__).parent / 'ecfr_analytics.duckdb')
+
+
+def test_query_log():
+    """Test that each call is logged with views and operator timings."""
+    print("\n🧪 Testing Query Log...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        profiler = QueryProfiler(str(Path(tmp) / 'profile.duckdb'), threshold_ms=1e9)
+        analytics = ECFRAnalytics(DB_PATH, profiler=profiler)
+        analytics.connect()
+        metrics = analytics.get_agency_metrics(limit=5)
+        analytics.get_agency_metrics(limit=5)
+        analytics.get_time_series_data()
+        analytics.close()
+
+        calls = profiler.conn.execute("""
+            SELECT query_name, rows_returned, views, cpu_ms
+            FROM query_log
+            ORDER BY id
+        """).fetchall()
+        scans = profiler.conn.execute("""
+            SELECT DISTINCT table_name FROM query_operators
+            WHERE query_id = 1 AND table_name IS NOT NULL
+        """).fetchall()
+        slow = profiler.conn.execute("SELECT COUNT(*) FROM slow_queries").fetchone()[0]
+        profiler.close()
+
+    assert [c[0] for c in calls] == ['get_agency_metrics', 'get_agency_metrics', 'get_time_series_data']
+    assert calls[0][1] == len(metrics), f"Logged {calls[0][1]} rows, fetched {len(metrics)}"
+    assert calls[0][2] == ['agency_metrics'], f"Views: {calls[0][2]}"
+    assert calls[0][3] is not None, "CPU time missing from the DuckDB profile"
+    assert {'agencies_parsed', 'corrections_parsed'} <= {s[0] for s in scans}, f"Scans: {scans}"
+    assert slow == 0, "Fast calls logged as slow"
+    print(f"  ✅ {len(calls)} calls logged; agency_metrics scans {sorted(s[0] for s in scans)}")
+
+
+def test_slow_queries_and_report():
+    """Test slow-query capture and cumulative cost ranking."""
+    print("\n🧪 Testing Slow Queries and Report...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        profiler = QueryProfiler(str(Path(tmp) / 'profile.duckdb'), threshold_ms=0)
+        analytics = ECFRAnalytics(DB_PATH, profiler=profiler)
+        analytics.connect()
+        slug = analytics.get_top_agencies_by_rvi(limit=1)[0]['slug']
+        analytics.get_agency_detail(slug)
+        analytics.close()
+
+        name, params, plan = profiler.conn.execute("""
+            SELECT query_name, params, plan FROM slow_queries
+            WHERE query_name = 'get_agency_detail'
+        """).fetchone()
+        assert slug in params, f"Parameters not kept: {params}"
+        assert 'TABLE_SCAN agencies_parsed' in plan, f"Plan missing scans:\n{plan}"
+        print(f"  ✅ Slow call kept its parameters and plan")
+
+        calls = profile_getters(DB_PATH, profiler, repeat=2)
+        by_query = profiler.report('query')
+        by_view = profiler.report('view')
+        by_operator = profiler.report('operator', limit=5)
+        profiler.close()
+
+    totals = [row['total_ms'] for row in by_query]
+    assert totals == sorted(totals, reverse=True), "Report not ranked by cumulative cost"
+    assert sum(row['calls'] for row in by_query) >= calls, "Report lost calls"
+    assert 'agency_metrics' in {row['name'] for row in by_view}, "agency_metrics view not ranked"
+    assert len(by_operator) == 5 and by_operator[0]['total_ms'] >= by_operator[-1]['total_ms']
+    print(f"  ✅ Costliest query {by_query[0]['name']}, view {by_view[0]['name']}, "
+          f"operator {by_operator[0]['name']}")
+
+
+def test_profiling_off_by_default():
+    """Test that ECFRAnalytics does not profile unless asked to."""
+    print("\n🧪 Testing Profiling Off by Default...")
+
+    analytics = ECFRAnalytics(DB_PATH)
+    analytics.connect()
+    try:
+        assert analytics.profiler is None, "Profiler enabled without QUERY_PROFILE_DB"
+        setting = analytics.conn.execute(
+            "SELECT current_setting('enable_profiling')"
+        ).fetchone()[0]
+        assert analytics.get_time_series_data(), "Getter failed without profiler"
+    finally:
+        analytics.close()
+
+    assert setting in (None, '', 'no_output'), f"enable_profiling = {setting}"
+    print(f"  ✅ No profiling without a profiler")
+
+
+def run_all_tests():
+    """Run all query profiler tests."""
+    print("=" * 60)
+    print("Query Profiler - Tests")
+    print("=" * 60)
+
+    tests = [
+        ("Query Log", test_query_log),
+        ("Slow Queries and Report", test_slow_queries_and_report),
+        ("Profiling Off by Default", test_profiling_off_by_default),
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test_name, test_func in tests:
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"\n❌ {test_name} FAILED: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"\n❌ {test_name} ERROR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"Test Results: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed == 0:
+        print("✅ All tests passed! Query profiler is working correctly.")
+    else:
+        print(f"❌ {failed} test(s) failed. Please review errors above.")
+
+    return failed == 0
+
+
+if __name__ == '__main__':
+    import sys
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,297 @@
+"""
+Resource profile tests
+
+Validates:
+- Memory and CPU limits are read from cgroup v1 and v2 files
+- Every connection gets the profile's memory limit, threads and spill
+  directory, and connections to one file share a configuration
+- Budgets split across concurrent databases and Python buffers, with
+  federated shard queries held within the DuckDB budget
+- Feeds are parsed incrementally and loaded in profile-sized batches
+- A dataset larger than a capped address space completes by spilling,
+  where DuckDB's defaults run out of memory
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from analytics import ECFRAnalytics
+from resources import MIN_MEMORY_LIMIT, ResourceProfile, cgroup_cpu_limit, cgroup_memory_limit, parse_size
+from streaming import duckdb_records
+
+
+BASE_PATH = Path(__file__).parent
+MiB = 1024 * 1024
+
+SPILL_CHILD = """
+import json, resource, sys
+cap = int(sys.argv[1])
+resource.setrlimit(resource.RLIMIT_AS, (cap, cap))
+import duckdb
+from resources import connect
+
+conn = connect(sys.argv[2]) if sys.argv[3] == 'profile' else duckdb.connect(sys.argv[2])
+conn.execute(\"\"\"
+    CREATE TABLE big AS
+    SELECT range AS id, repeat(md5(CAST(range AS VARCHAR)), 3) AS s FROM range(1000000)
+\"\"\")
+try:
+    rows = conn.execute(\"\"\"
+        SELECT COUNT(*), SUM(length(s)) FROM (
+            SELECT s, row_number() OVER (ORDER BY s) AS rn FROM big
+        ) WHERE rn % 7 = 0
+    \"\"\").fetchone()
+    distinct = conn.execute("SELECT COUNT(DISTINCT s) FROM big").fetchone()[0]
+    result = {'rows': list(rows), 'distinct': distinct}
+except duckdb.OutOfMemoryException as e:
+    result = {'error': str(e).splitlines()[0]}
+result['memory_limit'] = conn.execute("SELECT current_setting('memory_limit')").fetchone()[0]
+result['max_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024
+print(json.dumps(result))
+"""
+
+
+def fake_cgroup(root, files):
+    for name, content in files.items():
+        path = Path(root) / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content + '\n')
+    return str(root)
+
+
+def test_cgroup_detection():
+    """Test cgroup v2 and v1 limit parsing."""
+    print("\n🧪 Testing cgroup Detection...")
+
+    saved = {key: os.environ.pop(key) for key in ('LAKE_MEMORY_LIMIT', 'LAKE_THREADS') if key in os.environ}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            v2 = fake_cgroup(Path(tmp) / 'v2', {'memory.max': str(512 * MiB), 'cpu.max': '150000 100000'})
+            v1 = fake_cgroup(Path(tmp) / 'v1', {
+                'memory/memory.limit_in_bytes': str(768 * MiB),
+                'cpu,cpuacct/cpu.cfs_quota_us': '400000',
+                'cpu,cpuacct/cpu.cfs_period_us': '100000',
+            })
+            unlimited = fake_cgroup(Path(tmp) / 'none', {
+                'memory.max': 'max', 'cpu.max': 'max 100000',
+                'memory/memory.limit_in_bytes': '9223372036854771712',
+                'cpu/cpu.cfs_quota_us': '-1', 'cpu/cpu.cfs_period_us': '100000',
+            })
+
+            detected = [
+                (cgroup_memory_limit(v2), cgroup_cpu_limit(v2)),
+                (cgroup_memory_limit(v1), cgroup_cpu_limit(v1)),
+                (cgroup_memory_limit(unlimited), cgroup_cpu_limit(unlimited)),
+            ]
+            profile = ResourceProfile.detect(cgroup_root=v2)
+            os.environ['LAKE_MEMORY_LIMIT'] = '1.5GiB'
+            os.environ['LAKE_THREADS'] = '3'
+            overridden = ResourceProfile.detect(cgroup_root=v2)
+    finally:
+        os.environ.pop('LAKE_MEMORY_LIMIT', None)
+        os.environ.pop('LAKE_THREADS', None)
+        os.environ.update(saved)
+
+    assert detected == [(512 * MiB, 1.5), (768 * MiB, 4.0), (None, None)], detected
+    assert profile.memory_bytes == 512 * MiB and profile.memory_limit == 256 * MiB, profile
+    assert profile.threads == min(2, len(os.sched_getaffinity(0))), profile
+    assert overridden.memory_bytes == int(1.5 * 1024 * MiB) and overridden.threads == 3, overridden
+    assert [parse_size(s) for s in ('512MB', '2GiB', '1048576', '64k')] == [512 * 10 ** 6, 2 * 1024 * MiB, MiB, 65536]
+    print(f"  ✅ v2, v1 and unlimited cgroups parsed; {profile}")
+
+
+def test_connection_settings():
+    """Test that connections carry the profile and can share a file."""
+    print("\n🧪 Testing Connection Settings...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        profile = ResourceProfile(2048 * MiB, 4, temp_directory=str(Path(tmp) / 'spill'))
+        db_path = str(Path(tmp) / 'settings.duckdb')
+        conn = profile.connect(db_path)
+        settings = conn.execute("""
+            SELECT current_setting('memory_limit'), current_setting('threads'), current_setting('temp_directory')
+        """).fetchone()
+        conn.close()
+
+        quarter = profile.share(4)
+        tiny = profile.share(1000)
+
+        # The analytics engine and a streaming response read one file at once
+        analytics = ECFRAnalytics(str(BASE_PATH / 'ecfr_analytics.duckdb'))
+        analytics.connect()
+        try:
+            streamed = sum(1 for _ in duckdb_records(analytics.db_path, "SELECT slug FROM agencies_parsed"))
+            metrics = analytics.get_agency_metrics()
+        finally:
+            analytics.close()
+
+    assert settings[0] == '1.0 GiB' and settings[1] == 4, settings
+    assert settings[2].startswith(str(Path(tmp) / 'spill')), settings
+    assert (quarter.memory_limit, quarter.threads) == (256 * MiB, 1), quarter
+    assert tiny.memory_limit == MIN_MEMORY_LIMIT and tiny.threads == 1, tiny
+    assert profile.rows_within(1024) == int(2048 * MiB * 0.2) // 1024
+    assert profile.rows_within(1024, cap=5000) == 5000 and tiny.rows_within(10 * MiB) == 1
+    assert streamed == len(metrics) > 0, (streamed, len(metrics))
+    print(f"  ✅ {settings[0]} / {settings[1]} threads applied, shares split down to the floor")
+
+
+def test_federated_budget():
+    """Test that concurrent shard queries stay within the profile's DuckDB budget."""
+    print("\n🧪 Testing Federated Budget...")
+
+    from analytics import FederatedAnalytics
+    from shards import ShardedIngestion
+    from test_shards import SLUGS, load_source
+
+    source, corrections = load_source()
+    with tempfile.TemporaryDirectory() as tmp:
+        ingestion = ShardedIngestion(tmp)
+        for slug in SLUGS[3:]:
+            ingestion.ingest_agency(source[slug], corrections)
+
+        limits = {}
+        # 256 MiB gives DuckDB 128 MiB: four queries at the 32 MiB floor, not eight
+        for label, profile, workers in (('small', ResourceProfile(256 * MiB, 8), 8),
+                                        ('large', ResourceProfile(2048 * MiB, 8), 2)):
+            federated = FederatedAnalytics(tmp, max_workers=workers, resources=profile)
+            federated.connect()
+            try:
+                settings = {
+                    conn.execute("SELECT current_setting('memory_limit')").fetchone()[0]
+                    for conn, _ in federated._state[0].values()
+                }
+                metrics = federated.get_agency_metrics()
+            finally:
+                federated.close()
+            limits[label] = (federated.max_workers, settings, profile.memory_limit, len(metrics))
+
+    small_workers, small_settings, small_budget, _ = limits['small']
+    large_workers, large_settings, large_budget, rows = limits['large']
+    assert small_workers == 4 and small_settings == {'32.0 MiB'}, limits['small']
+    assert small_workers * MIN_MEMORY_LIMIT <= small_budget
+    assert large_workers == 2 and large_settings == {'512.0 MiB'}, limits['large']
+    assert large_workers * 512 * MiB <= large_budget and rows > 0
+    print(f"  ✅ {len(SLUGS[3:])} shards: {small_workers} x 32 MiB within 128 MiB, "
+          f"{large_workers} x 512 MiB within 1 GiB")
+
+
+def test_streamed_feeds():
+    """Test that feeds are parsed in chunks and buffered in profile-sized batches."""
+    print("\n🧪 Testing Streamed Feeds...")
+
+    from ingestion import INGEST_ROW_BYTES, ECFRIngestion, iter_feed
+    from shards import agency_titles, write_agency_feeds
+    from test_shards import AGENCIES_JSON, CORRECTIONS_JSON, SLUGS, load_source
+
+    source, corrections = load_source()
+    # A few hundred rows of Python buffer
+    profile = ResourceProfile(2 * MiB, 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        pipeline = ECFRIngestion(str(Path(tmp) / 'streamed.duckdb'), resources=profile)
+        pipeline.connect()
+        try:
+            pipeline.initialize_schema()
+            pipeline.load_agencies(AGENCIES_JSON)
+            count = pipeline.load_corrections(CORRECTIONS_JSON)
+            loaded = {row[0] for row in pipeline.conn.execute("SELECT ecfr_id FROM corrections_parsed").fetchall()}
+        finally:
+            pipeline.close()
+        reads = [span.rows for span in pipeline.tracer.finished() if span.name == 'ingestion.read_json']
+
+        agencies = [source[slug] for slug in SLUGS]
+        paths = {slug: Path(tmp) / f"{slug}.json" for slug in SLUGS}
+        counts = write_agency_feeds(CORRECTIONS_JSON, agencies, paths,
+                                    lambda agency: '{"ecfr_corrections": [', batch_rows=7)
+        feeds = {slug: json.loads(path.read_text())['ecfr_corrections'] for slug, path in paths.items()}
+
+    batch_rows = profile.rows_within(INGEST_ROW_BYTES)
+    assert 1 < batch_rows < len(corrections), batch_rows
+    assert count == len(corrections) and loaded == {c['id'] for c in corrections}, count
+    assert max(reads) <= batch_rows and sum(reads) == len(source) + len(corrections), reads
+    assert list(iter_feed(CORRECTIONS_JSON, 'ecfr_corrections', chunk_chars=7)) == corrections
+    for agency in agencies:
+        titles = set(agency_titles(agency))
+        expected = [c for c in corrections if int(c['title']) in titles]
+        assert feeds[agency['slug']] == expected and counts[agency['slug']] == len(expected), agency['slug']
+    print(f"  ✅ {count} corrections in {len(reads)} reads of at most {batch_rows} rows, "
+          f"{sum(counts.values())} split into {len(SLUGS)} feeds 7 at a time")
+
+
+def test_spill_under_cap():
+    """Test a larger-than-memory sort under a capped address space."""
+    print("\n🧪 Testing Spill Under a Memory Cap...")
+
+    cap = 512 * MiB
+    with tempfile.TemporaryDirectory() as tmp:
+        # The container reports 256 MiB; DuckDB gets half and spills the rest
+        cgroup = fake_cgroup(Path(tmp) / 'cgroup', {'memory.max': str(256 * MiB)})
+        env = {key: value for key, value in os.environ.items() if not key.startswith('LAKE_')}
+        env.update(LAKE_CGROUP_ROOT=cgroup, LAKE_TEMP_DIR=str(Path(tmp) / 'spill'))
+
+        results = {}
+        for mode in ('profile', 'defaults'):
+            child = subprocess.run(
+                [sys.executable, '-c', SPILL_CHILD, str(cap), str(Path(tmp) / f'{mode}.duckdb'), mode],
+                cwd=BASE_PATH, env=env, capture_output=True, text=True, timeout=300,
+            )
+            assert child.returncode == 0, f"{mode} child crashed: {child.stderr[-500:]}"
+            results[mode] = json.loads(child.stdout.strip().splitlines()[-1])
+        spill_left = os.listdir(Path(tmp) / 'spill')
+
+    profiled, defaults = results['profile'], results['defaults']
+    assert profiled.get('rows') == [142857, 13714272] and profiled['distinct'] == 1_000_000, profiled
+    assert profiled['memory_limit'] == '128.0 MiB', profiled
+    assert profiled['max_rss_mb'] * MiB < cap, profiled
+    assert 'error' in defaults, f"DuckDB defaults fit under the cap; the test proves nothing: {defaults}"
+    assert spill_left == [], f"Spill files left behind: {spill_left}"
+    print(f"  ✅ Sorted 1M wide rows in {profiled['max_rss_mb']} MB RSS under a {cap // MiB} MiB cap "
+          f"(defaults: {defaults['error'][:60]}...)")
+
+
+def run_all_tests():
+    """Run all resource profile tests."""
+    print("=" * 60)
+    print("Resource Profiles - Tests")
+    print("=" * 60)
+
+    tests = [
+        ("cgroup Detection", test_cgroup_detection),
+        ("Connection Settings", test_connection_settings),
+        ("Federated Budget", test_federated_budget),
+        ("Streamed Feeds", test_streamed_feeds),
+        ("Spill Under a Memory Cap", test_spill_under_cap),
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test_name, test_func in tests:
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"\n❌ {test_name} FAILED: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"\n❌ {test_name} ERROR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"Test Results: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed == 0:
+        print("✅ All tests passed! Resource profiles are working correctly.")
+    else:
+        print(f"❌ {failed} test(s) failed. Please review errors above.")
+
+    return failed == 0
+
+
+if __name__ == '__main__':
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,280 @@
+"""
+Per-agency shard tests
+
+Validates:
+- Federated getters match the same agencies loaded into one database
+- Partial aggregates and HyperLogLog sketches merge correctly
+- Rebuilding or adding a shard never blocks an open engine
+- Queries fan out to every shard, single-agency lookups to one
+"""
+
+import json
+import tempfile
+from pathlib import Path
+
+import duckdb
+
+from analytics import ECFRAnalytics, FederatedAnalytics
+from ingestion import ECFRIngestion
+from shards import HyperLogLog, ShardedIngestion, agency_titles, hll_registers_sql, merge_groups
+from telemetry import Tracer
+
+
+BASE_PATH = Path(__file__).parent
+AGENCIES_JSON = BASE_PATH / 'json/usds/ecfr/agencies.json'
+CORRECTIONS_JSON = BASE_PATH / 'json/usds/ecfr/corrections.json'
+
+# Overlapping CFR titles (2, 5, 36, 48) and one agency without corrections
+SLUGS = [
+    'agriculture-department', 'defense-department', 'education-department',
+    'energy-department', 'african-development-foundation',
+    'united-states-agency-for-global-media', 'civil-rights-commission',
+    'administrative-conference-of-the-united-states',
+]
+
+
+def load_source():
+    with open(AGENCIES_JSON) as f:
+        agencies = {a['slug']: a for a in json.load(f)['agencies']}
+    with open(CORRECTIONS_JSON) as f:
+        corrections = json.load(f)['ecfr_corrections']
+    return agencies, corrections
+
+
+def build_single_db(tmp, agencies):
+    """Load the same agencies into one database the classic way."""
+    _, corrections = load_source()
+    titles = {title for agency in agencies for title in agency_titles(agency)}
+    agencies_json = Path(tmp) / 'agencies.json'
+    corrections_json = Path(tmp) / 'corrections.json'
+    agencies_json.write_text(json.dumps({'agencies': agencies}))
+    corrections_json.write_text(json.dumps(
+        {'ecfr_corrections': [c for c in corrections if c['title'] in titles]}
+    ))
+
+    db_path = str(Path(tmp) / 'single.duckdb')
+    pipeline = ECFRIngestion(db_path)
+    pipeline.connect()
+    pipeline.initialize_schema()
+    pipeline.load_agencies(agencies_json)
+    pipeline.load_corrections(corrections_json)
+    pipeline.build_hierarchy()
+    pipeline.close()
+    return db_path
+
+
+def test_federated_matches_single():
+    """Test every getter against one database holding the same agencies."""
+    print("\n🧪 Testing Federated vs Single Database...")
+
+    source, _ = load_source()
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / 'shards'
+        built = ShardedIngestion(str(root)).ingest_all(AGENCIES_JSON, CORRECTIONS_JSON, slugs=SLUGS, workers=3)
+        single = ECFRAnalytics(build_single_db(tmp, [source[slug] for slug in SLUGS]))
+        federated = FederatedAnalytics(str(root), max_workers=4)
+        single.connect()
+        federated.connect()
+        try:
+            checks = [
+                ('get_overview', ()),
+                ('get_agency_metrics', ()),
+                ('get_agency_metrics', (5,)),
+                ('get_top_agencies_by_rvi', (5,)),
+                ('get_correction_trends_yearly', ()),
+                ('get_correction_trends_by_title', (7,)),
+                ('get_time_series_data', ()),
+                ('calculate_word_counts', ()),
+                ('get_agency_detail', ('agriculture-department',)),
+                ('get_agency_detail', ('forest-service',)),
+                ('get_agency_detail', ('no-such-agency',)),
+                ('get_corrections_for_agency', ('energy-department', 25)),
+                ('get_agency_rollup', ('agriculture-department',)),
+                ('get_agency_rollup', ('forest-service',)),
+                ('get_agency_rollup', ('no-such-agency',)),
+            ]
+            for method, args in checks:
+                expected = getattr(single, method)(*args)
+                actual = getattr(federated, method)(*args)
+                if method == 'get_overview':
+                    expected['year_range'] = tuple(expected['year_range'])
+                assert actual == expected, f"{method}{args} differs:\n{actual}\n{expected}"
+
+            for view in ('export_agencies', 'export_corrections', 'export_correction_time_series'):
+                single_out, federated_out = Path(tmp) / f'single-{view}.json', Path(tmp) / f'fed-{view}.json'
+                single._export_view(view, single_out)
+                federated._export_view(view, federated_out)
+                expected = sorted(json.loads(single_out.read_text()), key=lambda r: r.get('id', 0))
+                actual = json.loads(federated_out.read_text())
+                for record in expected + actual:
+                    record.pop('last_updated', None)
+                    record.pop('last_modified', None)
+                assert actual == expected, f"{view} export differs"
+        finally:
+            single.close()
+            federated.close()
+
+    corrections = sum(entry['corrections'] for entry in built.values())
+    assert len(built) == len(SLUGS)
+    print(f"  ✅ {len(checks)} getters and 3 exports match across {len(built)} shards "
+          f"({corrections} shard correction rows)")
+
+
+def test_merge_partials():
+    """Test merge_groups and HyperLogLog merging on overlapping shards."""
+    print("\n🧪 Testing Partial Merges...")
+
+    merged = merge_groups([
+        [(2020, 3, 30, 4, 12), (2021, 1, None, None, None)],
+        [(2020, 2, 10, 1, 15), (2021, 4, 8, 8, 8)],
+    ], keys=1, kinds=['sum', 'sum', 'min', 'max'])
+    assert merged == {(2020,): [5, 40, 1, 15], (2021,): [5, 8, 8, 8]}, merged
+
+    conns = []
+    for start in (0, 150_000, 300_000):
+        conn = duckdb.connect()
+        conn.execute(f"CREATE TABLE ids AS SELECT range AS id FROM range({start}, {start + 250_000})")
+        conns.append(conn)
+
+    sketches = []
+    for conn in conns:
+        sketch = HyperLogLog()
+        sketch.add_registers(conn.execute(hll_registers_sql('ids', 'id')).fetchall())
+        sketches.append(sketch)
+    combined = HyperLogLog()
+    for sketch in reversed(sketches):
+        combined.merge(sketch)
+    estimate = combined.estimate()
+
+    conns[0].execute("CREATE TABLE few AS SELECT id FROM ids WHERE id < 40")
+    small = HyperLogLog()
+    small.add_registers(conns[0].execute(hll_registers_sql('few', 'id')).fetchall())
+
+    exact = 550_000
+    error = abs(estimate - exact) / exact
+    assert error < 0.05, f"Estimate {estimate} is {error:.1%} off {exact}"
+    assert abs(small.estimate() - 40) <= 1, f"Small estimate {small.estimate()}"
+    assert sum(s.estimate() for s in sketches) > 1.3 * estimate, "Overlap counted twice"
+    print(f"  ✅ {estimate:,} distinct estimated for {exact:,} ({error:.2%} error)")
+
+
+def test_ingestion_does_not_block():
+    """Test rebuilding and adding shards while an engine has them open."""
+    print("\n🧪 Testing Non-Blocking Ingestion...")
+
+    source, corrections = load_source()
+    with tempfile.TemporaryDirectory() as tmp:
+        ingestion = ShardedIngestion(tmp)
+        for slug in SLUGS[:3]:
+            ingestion.ingest_agency(source[slug], corrections)
+
+        federated = FederatedAnalytics(tmp, max_workers=2)
+        federated.connect()
+        try:
+            before = federated.get_agency_detail('energy-department')
+            totals_before = federated.get_overview()
+
+            # An open cursor keeps reading its file while the shard is replaced
+            conn = federated._state[0]['agriculture-department'][0]
+            cursor = conn.cursor()
+            cursor.execute("SELECT name FROM agencies_parsed ORDER BY id")
+
+            renamed = dict(source['agriculture-department'], name='Department of Agriculture (renamed)')
+            ingestion.ingest_agency(renamed, corrections)
+            ingestion.ingest_agency(source['energy-department'], corrections)
+
+            in_flight = cursor.fetchall()
+            cursor.close()
+            detail = federated.get_agency_detail('agriculture-department')
+            after = federated.get_agency_detail('energy-department')
+            totals_after = federated.get_overview()
+        finally:
+            federated.close()
+
+    assert before is None and after['slug'] == 'energy-department', "New shard not picked up"
+    assert in_flight[0][0] == 'Department of Agriculture', "In-flight query saw the rebuilt shard"
+    assert detail['name'] == 'Department of Agriculture (renamed)', "Rebuilt shard not reopened"
+    assert totals_after['total_agencies'] == totals_before['total_agencies'] + 2
+    print(f"  ✅ Shard rebuilt and added while open ({totals_after['total_agencies']} agencies)")
+
+
+def test_fan_out():
+    """Test that queries reach every shard once and lookups only their own."""
+    print("\n🧪 Testing Fan-Out...")
+
+    source, corrections = load_source()
+    with tempfile.TemporaryDirectory() as tmp:
+        ingestion = ShardedIngestion(tmp)
+        for slug in SLUGS[3:]:
+            ingestion.ingest_agency(source[slug], corrections)
+
+        tracer = Tracer('analytics')
+        federated = FederatedAnalytics(tmp, tracer=tracer, max_workers=4)
+        federated.connect()
+
+        def shards_queried(method, *args):
+            before = len(tracer.finished())
+            result = getattr(federated, method)(*args)
+            return result, [span.attributes['shard'] for span in tracer.finished()[before:]
+                            if span.name == 'analytics.shard']
+
+        try:
+            first, yearly = shards_queried('get_correction_trends_yearly')
+            _, repeated = shards_queried('get_correction_trends_yearly')
+            _, detail = shards_queried('get_agency_detail', 'civil-rights-commission')
+            ingestion.ingest_agency(source['energy-department'], corrections)
+            onboarded, after_onboarding = shards_queried('get_correction_trends_yearly')
+        finally:
+            federated.close()
+
+    assert sorted(yearly) == sorted(SLUGS[3:]), f"Yearly trends reached {sorted(yearly)}"
+    assert repeated == [], f"Unchanged shards queried again: {repeated}"
+    assert detail == ['civil-rights-commission'], f"Detail lookup reached {detail}"
+    assert after_onboarding == ['energy-department'], f"Onboarding re-queried {after_onboarding}"
+    assert onboarded == first, "Re-ingesting an existing agency changed the trends"
+    print(f"  ✅ {len(yearly)} shards queried in parallel, repeats cached, detail routed to 1")
+
+
+def run_all_tests():
+    """Run all shard tests."""
+    print("=" * 60)
+    print("Per-Agency Shards - Tests")
+    print("=" * 60)
+
+    tests = [
+        ("Federated vs Single Database", test_federated_matches_single),
+        ("Partial Merges", test_merge_partials),
+        ("Non-Blocking Ingestion", test_ingestion_does_not_block),
+        ("Fan-Out", test_fan_out),
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test_name, test_func in tests:
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"\n❌ {test_name} FAILED: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"\n❌ {test_name} ERROR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"Test Results: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed == 0:
+        print("✅ All tests passed! Per-agency shards are working correctly.")
+    else:
+        print(f"❌ {failed} test(s) failed. Please review errors above.")
+
+    return failed == 0
+
+
+if __name__ == '__main__':
+    import sys
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,264 @@
+"""
+Snapshot diff engine tests
+
+Validates:
+- External sort spills bounded runs and merges them in key order
+- Inserts, updates and deletes match an in-memory diff
+- State files let the next run diff without the old snapshot
+- Changes applied to DuckDB reproduce the new snapshot
+- Tables created by the first apply take their types from the schema,
+  not from NULLs in the first batch
+"""
+
+import random
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+
+import duckdb
+import pyarrow as pa
+
+from snapshot_diff import (
+    DELETE, INSERT, UPDATE, ExternalSorter, SnapshotDiff, apply_changes, infer_schema,
+)
+
+
+def make_snapshot(count, seed=7):
+    rng = random.Random(seed)
+    return [
+        {
+            'agency_id': n,
+            'region': rng.choice(['EAST', 'WEST']),
+            'name': f"Agency {n}",
+            'budget': Decimal(rng.randint(0, 10_000_000)) / 100,
+        }
+        for n in range(count)
+    ]
+
+
+def evolve(snapshot, seed=11):
+    """Delete, update and insert a few percent of the rows."""
+    rng = random.Random(seed)
+    rows = [dict(r) for r in snapshot if rng.random() > 0.05]
+    for row in rows:
+        if rng.random() < 0.05:
+            row['budget'] += 1
+    top = max(r['agency_id'] for r in snapshot)
+    rows += [{'agency_id': top + n, 'region': 'EAST', 'name': f"New {n}", 'budget': Decimal('1.00')}
+             for n in range(1, 40)]
+    rng.shuffle(rows)
+    return rows
+
+
+def expected_changes(old, new):
+    old_by_key = {r['agency_id']: r for r in old}
+    new_by_key = {r['agency_id']: r for r in new}
+    return {
+        INSERT: sorted(k for k in new_by_key if k not in old_by_key),
+        UPDATE: sorted(k for k in new_by_key if k in old_by_key and new_by_key[k] != old_by_key[k]),
+        DELETE: sorted(k for k in old_by_key if k not in new_by_key),
+    }
+
+
+def grouped(changes):
+    result = {INSERT: [], UPDATE: [], DELETE: []}
+    for change in changes:
+        result[change.op].append(change.key[0])
+    return result
+
+
+def test_external_sort():
+    """Test that runs spill to disk, merge in order and are cleaned up."""
+    print("\n🧪 Testing External Sort...")
+
+    rows = make_snapshot(1000)
+    random.Random(3).shuffle(rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        sorter = ExternalSorter(['region', 'agency_id'], memory_rows=100, tmp_dir=tmp)
+        entries = sorter.sort(rows)
+        first = next(entries)
+        spilled = list(Path(tmp).rglob('run-*.pkl'))
+        keys = [first[0]] + [entry[0] for entry in entries]
+        leftover = list(Path(tmp).iterdir())
+
+    assert len(spilled) == 10, f"Expected 10 spilled runs, found {len(spilled)}"
+    assert keys == sorted((r['region'], r['agency_id']) for r in rows), "Merge out of key order"
+    assert sorter.rows == 1000 and sorter.spilled_runs == 10
+    assert leftover == [], f"Run files left behind: {leftover}"
+    print(f"  ✅ 1000 rows merged from {sorter.spilled_runs} spilled runs")
+
+
+def test_diff():
+    """Test changes against an in-memory diff, with and without spilling."""
+    print("\n🧪 Testing Diff...")
+
+    old = make_snapshot(2000)
+    new = evolve(old)
+    expected = expected_changes(old, new)
+
+    for memory_rows in (10_000, 150):
+        engine = SnapshotDiff(['agency_id'], memory_rows=memory_rows)
+        changes = list(engine.diff(old, new))
+        assert grouped(changes) == expected, f"memory_rows={memory_rows}: diff mismatch"
+        assert all(c.record is not None for c in changes if c.op != DELETE)
+        assert engine.stats['unchanged'] == len(new) - len(expected[INSERT]) - len(expected[UPDATE])
+    assert engine.spilled_runs > 0, "Small memory budget did not spill"
+
+    try:
+        list(SnapshotDiff(['agency_id']).diff(old, new + new[:1]))
+        raise AssertionError("Duplicate key accepted")
+    except ValueError:
+        pass
+    print(f"  ✅ {len(expected[INSERT])} inserts, {len(expected[UPDATE])} updates, "
+          f"{len(expected[DELETE])} deletes")
+
+
+def test_state_file():
+    """Test diffing against the previous run's state file."""
+    print("\n🧪 Testing State File...")
+
+    old = make_snapshot(1500)
+    new = evolve(old)
+    newer = evolve(new, seed=12)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        state = str(Path(tmp) / 'agencies.state')
+        first = grouped(SnapshotDiff(['agency_id']).diff_state(state, old, state_out=state))
+        engine = SnapshotDiff(['agency_id'], memory_rows=200)
+        second = grouped(engine.diff_state(state, new, state_out=state))
+        third = grouped(SnapshotDiff(['agency_id']).diff_state(state, newer, state_out=state))
+        leftover = sorted(p.name for p in Path(tmp).iterdir())
+
+    assert len(first[INSERT]) == len(old) and not first[UPDATE] and not first[DELETE]
+    assert second == expected_changes(old, new), "Diff against state differs from full diff"
+    assert third == expected_changes(new, newer), "State not replaced after the second run"
+    assert leftover == ['agencies.state'], f"Unexpected files: {leftover}"
+    print(f"  ✅ Three runs chained through the state file")
+
+
+def test_apply_duckdb():
+    """Test that applied changes turn the old table into the new snapshot."""
+    print("\n🧪 Testing DuckDB Apply...")
+
+    old = make_snapshot(3000)
+    new = evolve(old)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        state = str(Path(tmp) / 'agencies.state')
+        conn = duckdb.connect(str(Path(tmp) / 'lake.duckdb'))
+
+        initial = apply_changes(conn, 'db2_agencies', ['agency_id'],
+                                SnapshotDiff(['agency_id']).diff_state(state, old, state_out=state))
+        counts = apply_changes(conn, 'db2_agencies', ['agency_id'],
+                               SnapshotDiff(['agency_id']).diff_state(state, new, state_out=state),
+                               batch_rows=100)
+
+        table = conn.execute("""
+            SELECT agency_id, region, name, budget FROM db2_agencies ORDER BY agency_id
+        """).fetchall()
+
+        # A failure after some batches were written rolls the whole apply back
+        def failing_changes():
+            for n, change in enumerate(SnapshotDiff(['agency_id']).diff(new, old)):
+                if n == 250:
+                    raise RuntimeError("extract truncated")
+                yield change
+
+        try:
+            apply_changes(conn, 'db2_agencies', ['agency_id'], failing_changes(), batch_rows=100)
+            raise AssertionError("Failure not raised")
+        except RuntimeError:
+            pass
+        after_failure = conn.execute("SELECT COUNT(*) FROM db2_agencies").fetchone()[0]
+        conn.close()
+
+    expected = expected_changes(old, new)
+    assert initial[INSERT] == len(old), f"Initial load inserted {initial[INSERT]}"
+    assert counts == {op: len(keys) for op, keys in expected.items()}, counts
+    assert table == sorted((r['agency_id'], r['region'], r['name'], r['budget']) for r in new), \
+        "Table does not match the new snapshot"
+    assert after_failure == len(new), "Failed apply not rolled back"
+    print(f"  ✅ {counts[INSERT]} inserts, {counts[UPDATE]} updates, {counts[DELETE]} deletes applied")
+
+
+def test_apply_schema():
+    """Test that a column NULL in the first batch keeps its real type."""
+    print("\n🧪 Testing Apply Schema...")
+
+    first = [{'id': i, 'note': None} for i in range(10)]
+    second = [dict(r, note='hello') if r['id'] == 3 else r for r in first]
+    schemas = {
+        'explicit': pa.schema([('id', pa.int64()), ('note', pa.string())]),
+        'inferred': infer_schema(first),
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = duckdb.connect(str(Path(tmp) / 'lake.duckdb'))
+        notes = {}
+        for name, schema in schemas.items():
+            state = str(Path(tmp) / f'{name}.state')
+            for snapshot in (first, second):
+                apply_changes(conn, f'notes_{name}', ['id'],
+                              SnapshotDiff(['id']).diff_state(state, snapshot, state_out=state),
+                              batch_rows=4, schema=schema)
+            notes[name] = conn.execute(f"SELECT note FROM notes_{name} WHERE id = 3").fetchone()[0]
+
+        try:
+            apply_changes(conn, 'notes_untyped', ['id'], SnapshotDiff(['id']).diff([], first))
+            raise AssertionError("Untyped column not rejected")
+        except ValueError as e:
+            rejected = str(e)
+        created = conn.execute("SELECT COUNT(*) FROM information_schema.tables "
+                               "WHERE table_name = 'notes_untyped'").fetchone()[0]
+        conn.close()
+
+    assert notes == {'explicit': 'hello', 'inferred': 'hello'}, notes
+    assert schemas['inferred'].field('note').type == pa.string(), schemas['inferred']
+    assert 'note' in rejected and created == 0, (rejected, created)
+    print(f"  ✅ All-NULL first batch applied with explicit and inferred schemas")
+
+
+def run_all_tests():
+    """Run all snapshot diff tests."""
+    print("=" * 60)
+    print("Snapshot Diff Engine - Tests")
+    print("=" * 60)
+
+    tests = [
+        ("External Sort", test_external_sort),
+        ("Diff", test_diff),
+        ("State File", test_state_file),
+        ("DuckDB Apply", test_apply_duckdb),
+        ("Apply Schema", test_apply_schema),
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test_name, test_func in tests:
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"\n❌ {test_name} FAILED: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"\n❌ {test_name} ERROR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"Test Results: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed == 0:
+        print("✅ All tests passed! Snapshot diff engine is working correctly.")
+    else:
+        print(f"❌ {failed} test(s) failed. Please review errors above.")
+
+    return failed == 0
+
+
+if __name__ == '__main__':
+    import sys
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,240 @@
+"""
+Sterilization stage tests
+
+Validates:
+- Salted SHA-256 tokens match hashlib and depend on the salt
+- Raw identifiers and dropped columns never reach the output
+- Banding and bucketing of quasi-identifiers
+- Cells below k are suppressed for every quasi-identifier set, including
+  cells that fall below k when another set suppresses rows
+- Provenance rows record the run without the salt
+"""
+
+import hashlib
+from collections import Counter
+
+import duckdb
+
+from sterilization import SterilizationPolicy, Sterilizer, salt_fingerprint
+
+
+def staged_connection(rows=2000):
+    conn = duckdb.connect()
+    conn.execute(f"""
+        CREATE TABLE stage_raw AS
+        SELECT
+            range AS record_id,
+            CASE WHEN range % 50 = 0 THEN NULL ELSE 'Person ' || range END AS raw_name,
+            printf('%09d', range * 7919 % 1000000000) AS raw_ssn,
+            CASE WHEN range % 97 = 0 THEN CAST(95 + range % 7 AS INTEGER)
+                 ELSE CAST(18 + (range * 37) % 70 AS INTEGER) END AS age,
+            TIMESTAMP '2024-01-01 08:00:00' + to_days(CAST(range % 120 AS INTEGER)) AS encounter_ts,
+            ['north', 'south', 'east', 'west', 'island'][1 + CAST(range % 5 AS INTEGER)] AS region,
+            'notes for ' || range AS clinician_notes
+        FROM range({rows})
+    """)
+    return conn
+
+
+POLICY = {
+    'source': 'stage_raw',
+    'output': 'safe_data',
+    'identifiers': ['raw_name', 'raw_ssn'],
+    'drop': ['clinician_notes'],
+    'bands': {'age': 10},
+    'buckets': {'encounter_ts': 'month'},
+    'quasi_identifiers': [['age_band', 'encounter_ts_month'], ['age_band', 'region']],
+    'k': 5,
+}
+
+
+def test_tokenization():
+    """Test salted hashes, NULL handling and removal of raw identifiers."""
+    print("\n🧪 Testing Tokenization...")
+
+    conn = staged_connection()
+    policy = SterilizationPolicy.from_dict({**POLICY, 'quasi_identifiers': []})
+    Sterilizer(conn, salt='pepper-1').run(policy)
+    columns = [row[0] for row in conn.execute("DESCRIBE safe_data").fetchall()]
+    first = conn.execute("""
+        SELECT raw_name_hash, raw_ssn_hash FROM safe_data WHERE record_id = 1
+    """).fetchone()
+    null_names = conn.execute("SELECT COUNT(*) FROM safe_data WHERE raw_name_hash IS NULL").fetchone()[0]
+
+    Sterilizer(conn, salt='pepper-2').run(policy)
+    resalted = conn.execute("SELECT raw_name_hash FROM safe_data WHERE record_id = 1").fetchone()[0]
+
+    assert 'raw_name' not in columns and 'raw_ssn' not in columns, f"Raw identifiers kept: {columns}"
+    assert 'clinician_notes' not in columns, "Free text not dropped"
+    assert first[0] == hashlib.sha256(b'pepper-1Person 1').hexdigest(), "Token is not sha256(salt || value)"
+    assert first[1] == hashlib.sha256(b'pepper-1000007919').hexdigest()
+    assert null_names == 40, f"{null_names} NULL names (expected 40)"
+    assert resalted != first[0], "Token does not depend on the salt"
+
+    try:
+        Sterilizer(conn, salt='')
+        raise AssertionError("Empty salt accepted")
+    except ValueError:
+        pass
+    print(f"  ✅ Output columns: {', '.join(columns)}")
+
+
+def test_generalization():
+    """Test age bands and timestamp buckets."""
+    print("\n🧪 Testing Generalization...")
+
+    conn = staged_connection(300)
+    Sterilizer(conn, salt='pepper').run(SterilizationPolicy.from_dict({**POLICY, 'quasi_identifiers': []}))
+    rows = conn.execute("""
+        SELECT s.age, s.encounter_ts, d.age_band, d.encounter_ts_month
+        FROM stage_raw s JOIN safe_data d USING (record_id)
+    """).fetchall()
+
+    for age, ts, band, month in rows:
+        low = age // 10 * 10
+        assert band == f"{low}_to_{low + 9}", f"Age {age} banded as {band}"
+        assert month == ts.date().replace(day=1), f"{ts} bucketed as {month}"
+    print(f"  ✅ {len(rows)} rows banded and bucketed")
+
+
+def test_k_anonymity():
+    """Test that every quasi-identifier set meets the minimum cell count."""
+    print("\n🧪 Testing K-Anonymity...")
+
+    conn = staged_connection()
+    result = Sterilizer(conn, salt='pepper').run(SterilizationPolicy.from_dict(POLICY))
+    kept = conn.execute("SELECT age_band, encounter_ts_month, region FROM safe_data").fetchall()
+
+    # Reference: drop rows in a cell below k for either set until none are left
+    source = conn.execute("""
+        SELECT (age // 10 * 10) AS low, date_trunc('month', encounter_ts) AS month, region
+        FROM stage_raw
+    """).fetchall()
+    expected = source
+    while True:
+        by_month = Counter((low, month) for low, month, _ in expected)
+        by_region = Counter((low, region) for low, _, region in expected)
+        remaining = [row for row in expected
+                     if by_month[row[:2]] >= 5 and by_region[(row[0], row[2])] >= 5]
+        if len(remaining) == len(expected):
+            break
+        expected = remaining
+
+    assert len(kept) == len(expected) == result['rows_out'], f"Kept {len(kept)}, expected {len(expected)}"
+    assert result['rows_suppressed'] == len(source) - len(expected) > 0, "Nothing suppressed"
+    print(f"  ✅ {result['rows_out']} rows kept, {result['rows_suppressed']} suppressed at k=5")
+
+
+def test_overlapping_sets():
+    """Test that suppression for one set can't leave another set's cell below k."""
+    print("\n🧪 Testing Overlapping Quasi-Identifier Sets...")
+
+    conn = duckdb.connect()
+    conn.execute("""
+        CREATE TABLE stage_raw AS
+        SELECT * FROM (VALUES ('x', 'p'), ('x', 'p'), ('x', 'q'), ('y', 'q')) t(a, b)
+    """)
+    tiny = {'source': 'stage_raw', 'output': 'safe_data', 'quasi_identifiers': [['a'], ['b']], 'k': 2}
+    result = Sterilizer(conn, salt='pepper').run(SterilizationPolicy.from_dict(tiny))
+    tiny_rows = conn.execute("SELECT a, b FROM safe_data ORDER BY ALL").fetchall()
+
+    # At k=40 the first pass leaves (age_band, region) cells below k
+    conn = staged_connection()
+    wide = {**POLICY, 'k': 40}
+    sterilizer = Sterilizer(conn, salt='pepper')
+    sterilizer.run(SterilizationPolicy.from_dict(wide))
+    passes = sterilizer.tracer.finished()[-1].attributes['passes']
+    smallest = [
+        conn.execute(f"SELECT MIN(n) FROM (SELECT COUNT(*) AS n FROM safe_data GROUP BY {', '.join(qi)})").fetchone()[0]
+        for qi in wide['quasi_identifiers']
+    ]
+    kept = conn.execute("SELECT COUNT(*) FROM safe_data").fetchone()[0]
+
+    try:
+        SterilizationPolicy.from_dict({**POLICY, 'bands': {'age': 2.5}})
+        raise AssertionError("Fractional band width accepted")
+    except ValueError:
+        pass
+
+    assert tiny_rows == [('x', 'p'), ('x', 'p')], tiny_rows
+    assert result['rows_suppressed'] == 2, result
+    assert passes > 1, "Policy no longer exercises a re-check pass"
+    assert kept > 0 and all(n >= 40 for n in smallest), f"Cells below k: {smallest}"
+    print(f"  ✅ Every cell has >= k rows after {passes} passes ({kept} rows kept at k=40)")
+
+
+def test_provenance():
+    """Test run and column lineage records."""
+    print("\n🧪 Testing Provenance...")
+
+    conn = staged_connection(500)
+    sterilizer = Sterilizer(conn, salt='pepper', salt_version='2025-q1')
+    first = sterilizer.run(SterilizationPolicy.from_dict(POLICY))
+    sterilizer.run(SterilizationPolicy.from_dict({**POLICY, 'k': 2}))
+
+    runs = conn.execute("""
+        SELECT run_id, k, rows_in, rows_out, salt_version, salt_fingerprint, sql_text, policy
+        FROM sterilization_runs ORDER BY started_at, k DESC
+    """).fetchall()
+    lineage = dict(conn.execute("""
+        SELECT source_column, treatment FROM sterilization_columns WHERE run_id = ?
+    """, [first['run_id']]).fetchall())
+    stored = ' '.join(str(value) for run in runs for value in run)
+
+    assert [run[1] for run in runs] == [5, 2], f"Runs: {[run[1] for run in runs]}"
+    assert runs[0][2] == 500 and runs[1][3] >= runs[0][3], "Row counts not recorded"
+    assert runs[0][4] == '2025-q1' and runs[0][5] == salt_fingerprint('pepper')
+    assert 'pepper' not in stored, "Salt stored in provenance"
+    assert 'QUALIFY' in runs[0][6] and '$salt' in runs[0][6], "SQL not recorded"
+    assert lineage == {
+        'record_id': 'kept', 'raw_name': 'salted_sha256', 'raw_ssn': 'salted_sha256',
+        'age': 'band:10', 'encounter_ts': 'bucket:month', 'region': 'kept',
+        'clinician_notes': 'dropped',
+    }, lineage
+    print(f"  ✅ {len(runs)} runs with lineage for {len(lineage)} columns")
+
+
+def run_all_tests():
+    """Run all sterilization tests."""
+    print("=" * 60)
+    print("Sterilization Stage - Tests")
+    print("=" * 60)
+
+    tests = [
+        ("Tokenization", test_tokenization),
+        ("Generalization", test_generalization),
+        ("K-Anonymity", test_k_anonymity),
+        ("Overlapping Quasi-Identifier Sets", test_overlapping_sets),
+        ("Provenance", test_provenance),
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test_name, test_func in tests:
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"\n❌ {test_name} FAILED: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"\n❌ {test_name} ERROR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"Test Results: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed == 0:
+        print("✅ All tests passed! Sterilization stage is working correctly.")
+    else:
+        print(f"❌ {failed} test(s) failed. Please review errors above.")
+
+    return failed == 0
+
+
+if __name__ == '__main__':
+    import sys
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
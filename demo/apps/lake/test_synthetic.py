@@ -0,0 +1,173 @@
+"""
+Synthetic data generator tests
+
+Validates:
+- Output matches the sample eCFR shapes and loads through ECFRIngestion
+- Generation is deterministic per seed
+- Distributions follow the sample data
+- Streaming output uses constant memory
+"""
+
+import json
+import tempfile
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+
+import duckdb
+
+from ingestion import ECFRIngestion
+from synthetic import SAMPLE_DIR, SampleProfile, SyntheticECFR
+
+
+PROFILE = SampleProfile.from_files()
+
+
+def test_shapes_and_ingestion():
+    """Test that generated files have the sample shapes and load into DuckDB."""
+    print("\n🧪 Testing Shapes and Ingestion...")
+
+    with open(SAMPLE_DIR / 'agencies.json') as f:
+        sample_agency = json.load(f)['agencies'][0]
+    with open(SAMPLE_DIR / 'corrections.json') as f:
+        sample_correction = json.load(f)['ecfr_corrections'][0]
+
+    generator = SyntheticECFR(PROFILE, seed=7)
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        generator.write_agencies(tmp / 'agencies.json', 40)
+        generator.write_corrections(tmp / 'corrections.json', 2000)
+
+        with open(tmp / 'agencies.json') as f:
+            agencies = json.load(f)['agencies']
+        with open(tmp / 'corrections.json') as f:
+            corrections = json.load(f)['ecfr_corrections']
+
+        assert set(agencies[0]) == set(sample_agency), f"Agency keys: {sorted(agencies[0])}"
+        assert set(corrections[0]) == set(sample_correction), f"Correction keys: {sorted(corrections[0])}"
+        slugs = [a['slug'] for a in agencies] + [c['slug'] for a in agencies for c in a['children']]
+        assert len(slugs) == len(set(slugs)), "Duplicate agency slugs"
+        assert [c['id'] for c in corrections] == list(range(1, 2001)), "Correction ids not sequential"
+        print(f"  ✅ {len(slugs)} agencies and {len(corrections)} corrections in eCFR shape")
+
+        pipeline = ECFRIngestion(str(tmp / 'synthetic.duckdb'))
+        pipeline.connect()
+        pipeline.initialize_schema()
+        pipeline.load_agencies(tmp / 'agencies.json')
+        pipeline.load_corrections(tmp / 'corrections.json')
+        pipeline.close()
+
+        conn = duckdb.connect(str(tmp / 'synthetic.duckdb'), read_only=True)
+        loaded_agencies = conn.execute("SELECT COUNT(*) FROM agencies_parsed").fetchone()[0]
+        loaded_corrections = conn.execute("SELECT COUNT(*) FROM corrections_parsed").fetchone()[0]
+        negative_lags = conn.execute("SELECT COUNT(*) FROM corrections_parsed WHERE lag_days < 0").fetchone()[0]
+        conn.close()
+
+        assert loaded_agencies == len(slugs), f"Loaded {loaded_agencies} of {len(slugs)} agencies"
+        assert loaded_corrections == 2000, f"Loaded {loaded_corrections} corrections"
+        assert negative_lags == 0, f"{negative_lags} corrections fixed before they occurred"
+        print(f"  ✅ Files load through ECFRIngestion")
+
+
+def test_determinism():
+    """Test that a seed always produces the same records."""
+    print("\n🧪 Testing Determinism...")
+
+    first = list(SyntheticECFR(PROFILE, seed=3).iter_corrections(500))
+    second = list(SyntheticECFR(PROFILE, seed=3).iter_corrections(500))
+    other = list(SyntheticECFR(PROFILE, seed=4).iter_corrections(500))
+
+    assert first == second, "Same seed produced different corrections"
+    assert first != other, "Different seeds produced identical corrections"
+    assert list(SyntheticECFR(PROFILE, seed=3).iter_agencies(20)) == \
+        list(SyntheticECFR(PROFILE, seed=3).iter_agencies(20)), "Same seed produced different agencies"
+    print(f"  ✅ Output is a function of the seed")
+
+
+def test_distributions():
+    """Test that generated data follows the sample distributions."""
+    print("\n🧪 Testing Distributions...")
+
+    with open(SAMPLE_DIR / 'corrections.json') as f:
+        sample = json.load(f)['ecfr_corrections']
+    generated = list(SyntheticECFR(PROFILE, seed=11).iter_corrections(20000))
+
+    def shares(records, key):
+        counts = Counter(key(r) for r in records)
+        return {value: count / len(records) for value, count in counts.items()}
+
+    for name, key in (('title', lambda r: r['title']), ('year', lambda r: r['year'])):
+        expected = shares(sample, key)
+        actual = shares(generated, key)
+        top = max(expected, key=expected.get)
+        assert abs(actual.get(top, 0) - expected[top]) < 0.02, \
+            f"{name} {top}: {actual.get(top, 0):.3f} vs sample {expected[top]:.3f}"
+        assert set(actual) <= set(expected), f"Generated {name}s not in the sample"
+        print(f"  ✅ {name} distribution matches (top {top}: {actual[top]:.1%} vs {expected[top]:.1%})")
+
+    assert all(r['year'] == int(r['error_corrected'][:4]) for r in generated), "year != error_corrected year"
+    assert all(str(r['title']) == r['cfr_references'][0]['hierarchy']['title'] for r in generated), \
+        "References drawn from another title"
+    print(f"  ✅ Dates and references are consistent")
+
+
+def test_constant_memory():
+    """Test that streaming output does not grow with record count."""
+    print("\n🧪 Testing Constant Memory...")
+
+    generator = SyntheticECFR(PROFILE, seed=5)
+    peaks = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in (2000, 20000):
+            tracemalloc.start()
+            generator.write_corrections(Path(tmp) / f'corrections_{count}.json', count)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+    assert peaks[1] < peaks[0] * 1.5, f"Peak memory grew from {peaks[0]} to {peaks[1]} bytes"
+    print(f"  ✅ Peak memory {peaks[0] / 1e6:.1f} MB for 2k, {peaks[1] / 1e6:.1f} MB for 20k")
+
+
+def run_all_tests():
+    """Run all synthetic generator tests."""
+    print("=" * 60)
+    print("Synthetic Data Generator - Tests")
+    print("=" * 60)
+
+    tests = [
+        ("Shapes and Ingestion", test_shapes_and_ingestion),
+        ("Determinism", test_determinism),
+        ("Distributions", test_distributions),
+        ("Constant Memory", test_constant_memory),
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test_name, test_func in tests:
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"\n❌ {test_name} FAILED: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"\n❌ {test_name} ERROR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"Test Results: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed == 0:
+        print("✅ All tests passed! Synthetic generator is working correctly.")
+    else:
+        print(f"❌ {failed} test(s) failed. Please review errors above.")
+
+    return failed == 0
+
+
+if __name__ == '__main__':
+    import sys
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,191 @@
+"""
+Pipeline telemetry tests
+
+Validates:
+- Span nesting, error status, rows, bytes and peak memory
+- JSON lines and Prometheus exports
+- Ingestion spans persisted to ingestion_log
+- One span per ECFRAnalytics query
+"""
+
+import json
+import tempfile
+from pathlib import Path
+
+import duckdb
+
+from analytics import ECFRAnalytics
+from ingestion import ECFRIngestion
+from telemetry import Tracer
+
+
+SAMPLE_DIR = Path(__file__).parent / 'json' / 'usds' / 'ecfr'
+DB_PATH = str(Path(__file__).parent / 'ecfr_analytics.duckdb')
+
+
+def test_spans():
+    """Test span nesting, failure status and recorded measurements."""
+    print("\n🧪 Testing Spans...")
+
+    tracer = Tracer('test')
+    with tracer.span('stage', source='unit') as outer:
+        with tracer.span('stage.step') as inner:
+            buffer = bytearray(32 * 1024 * 1024)
+            inner.rows = 10
+            inner.bytes = len(buffer)
+        outer.rows = 10
+        del buffer
+
+    try:
+        with tracer.span('stage.broken'):
+            raise ValueError("bad input")
+    except ValueError:
+        pass
+
+    step, stage, broken = tracer.finished()
+    assert step.parent_id == stage.span_id and step.depth == 1, "Child not nested under its stage"
+    assert stage.attributes == {'source': 'unit'}, "Attributes not recorded"
+    assert step.peak_rss >= 32 * 1024 * 1024, f"Peak RSS {step.peak_rss} below the allocation"
+    assert stage.duration >= step.duration, "Stage shorter than its child"
+    assert broken.status == 'error' and broken.error == 'bad input', "Failure not recorded"
+    assert broken.parent_id is None, "Span stack not unwound after an error"
+    assert [s.name for s in tracer.finished(max_depth=0)] == ['stage', 'stage.broken']
+    print(f"  ✅ Nested spans with rows, bytes, peak memory and errors")
+
+
+def test_exports():
+    """Test JSON lines streaming and the Prometheus text format."""
+    print("\n🧪 Testing Exports...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        trace_file = Path(tmp) / 'trace.jsonl'
+        tracer = Tracer('test', run_id='run-1', trace_file=str(trace_file), metrics_dir=tmp)
+
+        handles = set()
+        for rows in (3, 4):
+            with tracer.span('etl.transfer', table='agencies') as span:
+                span.rows = rows
+            handles.add(id(tracer._trace))
+
+        # Each span is flushed while the file stays open
+        records = [json.loads(line) for line in trace_file.read_text().splitlines()]
+        assert len(records) == 2, f"Expected 2 trace lines, got {len(records)}"
+        assert len(handles) == 1, "Trace file reopened per span"
+        assert records[0]['run_id'] == 'run-1' and records[0]['service'] == 'test'
+        assert records[1]['rows'] == 4 and records[1]['attributes'] == {'table': 'agencies'}
+        tracer.close()
+        print(f"  ✅ Spans streamed as JSON lines")
+
+        metrics_file = tracer.write_metrics()
+        text = metrics_file.read_text()
+        assert metrics_file.name == 'test.prom', f"Unexpected metrics file {metrics_file}"
+        assert '# TYPE ecfr_pipeline_span_rows_total counter' in text
+        assert 'ecfr_pipeline_span_count_total{service="test",span="etl.transfer"} 2' in text
+        assert 'ecfr_pipeline_span_rows_total{service="test",span="etl.transfer"} 7' in text
+        assert not list(Path(tmp).glob('.*.tmp')), "Temporary metrics file left behind"
+        print(f"  ✅ Totals written in Prometheus text format")
+
+
+def test_ingestion_log():
+    """Test that each load records its span metrics in ingestion_log."""
+    print("\n🧪 Testing Ingestion Log...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / 'telemetry.duckdb'
+        pipeline = ECFRIngestion(str(db_path))
+        pipeline.connect()
+        pipeline.initialize_schema()
+        pipeline.load_agencies(SAMPLE_DIR / 'agencies.json')
+        pipeline.load_corrections(SAMPLE_DIR / 'corrections.json')
+        pipeline.close()
+
+        conn = duckdb.connect(str(db_path), read_only=True)
+        rows = conn.execute("""
+            SELECT source_file, record_count, run_id, duration_ms, bytes_read, peak_rss_bytes
+            FROM ingestion_log
+            ORDER BY id
+        """).fetchall()
+        conn.close()
+
+    assert len(rows) == 2, f"Expected 2 ingestion_log rows, got {len(rows)}"
+    for source_file, record_count, run_id, duration_ms, bytes_read, peak_rss in rows:
+        assert run_id == pipeline.tracer.run_id, "Row not tagged with the run"
+        assert duration_ms > 0 and peak_rss > 0, f"{source_file}: missing span metrics"
+        assert bytes_read == Path(source_file).stat().st_size, f"{source_file}: wrong byte count"
+
+    names = [span.name for span in pipeline.tracer.finished()]
+    for name in ('ingestion.initialize_schema', 'ingestion.read_json',
+                 'ingestion.load_agencies', 'ingestion.load_corrections'):
+        assert name in names, f"Missing span {name}"
+    print(f"  ✅ {rows[1][1]} corrections logged in {rows[1][3]:.0f} ms")
+
+
+def test_analytics_queries():
+    """Test that every ECFRAnalytics query runs in its own span."""
+    print("\n🧪 Testing Analytics Query Spans...")
+
+    analytics = ECFRAnalytics(DB_PATH)
+    analytics.connect()
+    try:
+        metrics = analytics.get_agency_metrics(limit=5)
+        analytics.get_agency_detail('no-such-agency')
+        analytics.generate_summary_report()
+    finally:
+        analytics.close()
+
+    spans = analytics.tracer.finished()
+    first = spans[0]
+    assert first.name == 'analytics.get_agency_metrics' and first.rows == len(metrics), \
+        f"First span {first.name} with {first.rows} rows"
+    assert spans[1].name == 'analytics.get_agency_detail' and spans[1].rows == 0
+
+    report = [s for s in spans if s.name == 'analytics.generate_summary_report'][0]
+    children = [s.name for s in spans if s.parent_id == report.span_id]
+    assert 'analytics.count_corrections' in children, f"Summary children: {children}"
+    assert 'analytics.get_correction_trends_yearly' in children, f"Summary children: {children}"
+    print(f"  ✅ {len(spans)} spans, summary report with {len(children)} child queries")
+
+
+def run_all_tests():
+    """Run all telemetry tests."""
+    print("=" * 60)
+    print("Pipeline Telemetry - Tests")
+    print("=" * 60)
+
+    tests = [
+        ("Spans", test_spans),
+        ("Exports", test_exports),
+        ("Ingestion Log", test_ingestion_log),
+        ("Analytics Query Spans", test_analytics_queries),
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test_name, test_func in tests:
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"\n❌ {test_name} FAILED: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"\n❌ {test_name} ERROR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"Test Results: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed == 0:
+        print("✅ All tests passed! Telemetry is working correctly.")
+    else:
+        print(f"❌ {failed} test(s) failed. Please review errors above.")
+
+    return failed == 0
+
+
+if __name__ == '__main__':
+    import sys
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,230 @@
+"""
+DB2 unload decoder tests
+
+Validates:
+- Copybook parsing (offsets, usages, FILLER, null indicators)
+- Character, zoned, packed and binary decoding across batch boundaries
+- Invalid numerics become NULL and are counted
+- Batches stream into DuckDB with the copybook's types
+"""
+
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+
+import duckdb
+
+from unload_decoder import RecordLayout, UnloadDecoder
+
+
+COPYBOOK = """\
+      * eCFR agency extract (DB2 UNLOAD, RECFM=FB, LRECL=80)
+000100 01  AGENCY-REC.
+000200     05  AGENCY-ID          PIC S9(9) COMP.
+000300     05  AGENCY-NAME        PIC X(40).
+000400     05  SHORT-NAME-NI      PIC X.
+000500     05  SHORT-NAME         PIC X(10).
+000600     05  CFR-TITLE          PIC 99.
+000700     05  WORD-COUNT         PIC S9(11) COMP-3.
+000800     05  RVI                PIC S9(5)V99 PACKED-DECIMAL.
+000900     05  CORRECTIONS        PIC S9(5).
+001000     05  FILLER             PIC X(3).
+001100     05  CHANGE-PCT         PIC S9(3)V9(2).
+"""
+
+ROWS = [
+    (1, 'Department of Agriculture', 'USDA', 7, 12_345_678_901, Decimal('12.50'), 42, Decimal('1.25')),
+    (-2, 'Office of Défense Programs', None, 32, -5, Decimal('-0.07'), -3, Decimal('-100.00')),
+    (300_000, '', 'X', 0, 0, Decimal('99999.99'), 0, Decimal('0.00')),
+]
+
+
+def ebcdic(text, width):
+    return text.ljust(width).encode('cp037')
+
+
+def zoned(value, digits, signed=True):
+    body = bytearray(0xF0 | int(d) for d in str(abs(value)).zfill(digits))
+    zone = 0xD0 if value < 0 else 0xC0 if signed else 0xF0
+    body[-1] = zone | (body[-1] & 0x0F)
+    return bytes(body)
+
+
+def packed(value, digits):
+    nibbles = [int(d) for d in str(abs(value)).zfill(digits // 2 * 2 + 1)]
+    nibbles.append(0x0D if value < 0 else 0x0C)
+    return bytes(nibbles[i] << 4 | nibbles[i + 1] for i in range(0, len(nibbles), 2))
+
+
+def encode(row):
+    agency_id, name, short, title, words, rvi, corrections, change = row
+    return b''.join([
+        agency_id.to_bytes(4, 'big', signed=True),
+        ebcdic(name, 40),
+        b'\x00' if short is not None else b'\xff',
+        ebcdic(short or '', 10),
+        zoned(title, 2, signed=False),
+        packed(words, 11),
+        packed(int(rvi * 100), 7),
+        zoned(corrections, 5),
+        b'\x40' * 3,
+        zoned(int(change * 100), 5),
+    ])
+
+
+def write_unload(path, rows):
+    with open(path, 'wb') as f:
+        for row in rows:
+            f.write(encode(row))
+
+
+def test_copybook():
+    """Test layout offsets, usages, FILLER and null indicators."""
+    print("\n🧪 Testing Copybook Parsing...")
+
+    layout = RecordLayout.from_copybook(COPYBOOK)
+    fields = {f.name: f for f in layout.fields}
+
+    assert layout.name == 'AGENCY-REC' and layout.record_length == 80, \
+        f"{layout.name} / {layout.record_length}"
+    assert list(fields) == ['agency_id', 'agency_name', 'short_name', 'cfr_title',
+                            'word_count', 'rvi', 'corrections', 'change_pct'], list(fields)
+    assert (fields['agency_id'].kind, fields['agency_id'].length) == ('binary', 4)
+    assert (fields['word_count'].offset, fields['word_count'].length) == (57, 6)
+    assert (fields['rvi'].digits, fields['rvi'].scale, fields['rvi'].length) == (7, 2, 4)
+    assert fields['short_name'].null_indicator == 44, "Null indicator not attached"
+    assert fields['agency_name'].null_indicator is None
+    assert fields['change_pct'].offset == 75, "FILLER not skipped over"
+
+    try:
+        RecordLayout.from_copybook("01 REC.\n 05 CODES PIC X(2) OCCURS 5 TIMES.")
+        raise AssertionError("OCCURS accepted")
+    except ValueError:
+        pass
+    print(f"  ✅ {len(fields)} fields over {layout.record_length} bytes")
+
+
+def test_decode():
+    """Test every field kind across batch boundaries."""
+    print("\n🧪 Testing Decoding...")
+
+    layout = RecordLayout.from_copybook(COPYBOOK)
+    rows = ROWS * 3
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'AGENCY.UNLOAD'
+        write_unload(path, rows)
+        decoder = UnloadDecoder(layout, str(path), batch_rows=4)
+        batches = list(decoder.batches())
+
+    assert [b.num_rows for b in batches] == [4, 4, 1], [b.num_rows for b in batches]
+    decoded = [tuple(r.values()) for b in batches for r in b.to_pylist()]
+    assert decoded == rows, f"First mismatch: {next(d for d, r in zip(decoded, rows) if d != r)}"
+    assert str(batches[0].schema.field('rvi').type) == 'decimal128(7, 2)'
+    assert sum(decoder.invalid.values()) == 0, decoder.invalid
+    print(f"  ✅ {len(decoded)} records decoded in {len(batches)} batches")
+
+
+def test_invalid_numerics():
+    """Test that bad packed or zoned data loads as NULL and is counted."""
+    print("\n🧪 Testing Invalid Numerics...")
+
+    layout = RecordLayout.from_copybook(COPYBOOK)
+    record = bytearray(encode(ROWS[0]))
+    record[57:63] = b'\x40' * 6        # word_count: blanks instead of packed
+    record[67:72] = ebcdic('12A45', 5)  # corrections: letter in a zoned field
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'BAD.UNLOAD'
+        path.write_bytes(bytes(record) + encode(ROWS[1]))
+        decoder = UnloadDecoder(layout, str(path))
+        first, second = next(decoder.batches()).to_pylist()
+
+        path.write_bytes(bytes(record[:-1]))
+        try:
+            UnloadDecoder(layout, str(path))
+            raise AssertionError("Truncated file accepted")
+        except ValueError:
+            pass
+
+    assert first['word_count'] is None and first['corrections'] is None
+    assert first['rvi'] == Decimal('12.50'), "Valid fields lost alongside invalid ones"
+    assert second['word_count'] == -5
+    assert decoder.invalid == {**{f.name: 0 for f in layout.fields}, 'word_count': 1, 'corrections': 1}
+    print(f"  ✅ Invalid values NULLed and counted")
+
+
+def test_load_duckdb():
+    """Test streaming batches into a DuckDB table and appending."""
+    print("\n🧪 Testing DuckDB Load...")
+
+    layout = RecordLayout.from_copybook(COPYBOOK)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'AGENCY.UNLOAD'
+        write_unload(path, ROWS * 1000)
+
+        conn = duckdb.connect(str(Path(tmp) / 'lake.duckdb'))
+        decoder = UnloadDecoder(layout, str(path), batch_rows=512)
+        loaded = decoder.load(conn, 'db2_agencies')
+        decoder.load(conn, 'db2_agencies', replace=False)
+
+        count, nulls, total_rvi = conn.execute("""
+            SELECT COUNT(*), COUNT(*) - COUNT(short_name), SUM(rvi)
+            FROM db2_agencies
+        """).fetchone()
+        types = dict(conn.execute("""
+            SELECT column_name, data_type FROM information_schema.columns
+            WHERE table_name = 'db2_agencies'
+        """).fetchall())
+        conn.close()
+
+    assert loaded == 3000 and count == 6000, f"Loaded {loaded}, table has {count}"
+    assert nulls == 2000, f"{nulls} NULL short names"
+    assert total_rvi == sum(r[5] for r in ROWS) * 2000, f"SUM(rvi) = {total_rvi}"
+    assert types['word_count'] == 'BIGINT' and types['rvi'] == 'DECIMAL(7,2)', types
+    assert decoder.invalid['rvi'] == 0
+    print(f"  ✅ {count} rows in db2_agencies")
+
+
+def run_all_tests():
+    """Run all unload decoder tests."""
+    print("=" * 60)
+    print("DB2 Unload Decoder - Tests")
+    print("=" * 60)
+
+    tests = [
+        ("Copybook Parsing", test_copybook),
+        ("Decoding", test_decode),
+        ("Invalid Numerics", test_invalid_numerics),
+        ("DuckDB Load", test_load_duckdb),
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test_name, test_func in tests:
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"\n❌ {test_name} FAILED: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"\n❌ {test_name} ERROR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"Test Results: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed == 0:
+        print("✅ All tests passed! Unload decoder is working correctly.")
+    else:
+        print(f"❌ {failed} test(s) failed. Please review errors above.")
+
+    return failed == 0
+
+
+if __name__ == '__main__':
+    import sys
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,480 @@
+"""
+DB2 Unload Decoder
+
+Decodes fixed-width EBCDIC (code page 037) unload files described by a
+COBOL copybook into Arrow record batches that DuckDB loads directly:
+
+- PIC X character fields (trailing blanks trimmed)
+- PIC 9 / S9 zoned decimal (DISPLAY), sign in the last byte's zone
+- COMP-3 / PACKED-DECIMAL
+- COMP / COMP-4 / COMP-5 / BINARY big-endian integers
+- Implied decimal points (V) become Arrow decimals
+- A one-byte PIC X field named <name>-NI holds the DB2 null indicator
+  for the field after it (nonzero means NULL)
+
+The file is memory-mapped and viewed as a (records, record_length) byte
+matrix. Every field is decoded for a whole batch of records at once with
+NumPy slicing, lookup tables and matrix products; no Python code runs per
+record, so multi-GB unloads decode in a few passes over each batch
+rather than at interpreter speed.
+
+Usage:
+    python unload_decoder.py --copybook AGENCY.cpy --unload AGENCY.UNLOAD \\
+        --db ecfr_analytics.duckdb --table db2_agencies
+"""
+
+import argparse
+import re
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import duckdb
+import numpy as np
+import pyarrow as pa
+
+from resources import connect, default_profile
+from telemetry import Tracer
+
+
+DEFAULT_BATCH_ROWS = 65536
+# Decoded Arrow bytes per unload byte, roughly (UTF-8 text, offsets, validity)
+DECODE_EXPANSION = 4
+
+CODEC = 'cp037'
+EBCDIC_SPACE = 0x40
+
+# Extra UTF-8 bytes each EBCDIC byte needs (cp037 maps onto Latin-1: 0 or 1)
+UTF8_EXTRA_BYTES = bytes(len(c.encode('utf-8')) - 1 for c in bytes(range(256)).decode(CODEC))
+
+USAGES = {
+    'DISPLAY': 'zoned',
+    'COMP-3': 'packed', 'COMPUTATIONAL-3': 'packed', 'PACKED-DECIMAL': 'packed',
+    'COMP': 'binary', 'COMPUTATIONAL': 'binary', 'COMP-4': 'binary',
+    'COMPUTATIONAL-4': 'binary', 'COMP-5': 'binary', 'COMPUTATIONAL-5': 'binary',
+    'BINARY': 'binary',
+}
+
+# Largest value a binary field of each width can hold, in decimal digits
+BINARY_PRECISION = {2: 5, 4: 10, 8: 19}
+
+
+class CopybookField:
+    """One elementary field of a record layout."""
+
+    def __init__(self, name: str, offset: int, kind: str, digits: int = 0,
+                 scale: int = 0, signed: bool = False, length: Optional[int] = None):
+        """
+        Initialize field.
+
+        Args:
+            name: Column name (COBOL name lowercased, hyphens as underscores)
+            offset: Byte offset within the record
+            kind: 'char', 'zoned', 'packed' or 'binary'
+            digits: Total numeric digits (integer and fraction)
+            scale: Digits after the implied decimal point
+            signed: Whether the PIC has an S
+            length: Byte length for char fields
+        """
+        self.name = name
+        self.offset = offset
+        self.kind = kind
+        self.digits = digits
+        self.scale = scale
+        self.signed = signed
+        self.null_indicator: Optional[int] = None
+
+        if kind == 'char':
+            self.length = length
+        elif kind == 'zoned':
+            self.length = digits
+        elif kind == 'packed':
+            self.length = digits // 2 + 1
+        elif kind == 'binary':
+            self.length = 2 if digits <= 4 else 4 if digits <= 9 else 8
+        else:
+            raise ValueError(f"Unknown field kind: {kind}")
+
+        if kind in ('zoned', 'packed') and digits > 18:
+            raise ValueError(f"{name}: {digits} digits exceed 64-bit decoding")
+
+    @property
+    def arrow_type(self) -> pa.DataType:
+        if self.kind == 'char':
+            return pa.string()
+        if self.kind == 'binary':
+            if self.scale:
+                return pa.decimal128(BINARY_PRECISION[self.length], self.scale)
+            if self.length == 8:
+                return pa.int64() if self.signed else pa.uint64()
+            if self.length == 4 and not self.signed:
+                return pa.int64()
+            return pa.int32()
+        if self.scale:
+            return pa.decimal128(self.digits, self.scale)
+        return pa.int32() if self.digits <= 9 else pa.int64()
+
+    def __repr__(self):
+        return f"<CopybookField {self.name} {self.kind} @{self.offset}+{self.length}>"
+
+
+class RecordLayout:
+    """Fields of a fixed-length record."""
+
+    def __init__(self, fields: List[CopybookField], record_length: Optional[int] = None,
+                 name: Optional[str] = None):
+        """
+        Initialize layout.
+
+        Args:
+            fields: Elementary fields (FILLER and null indicators excluded)
+            record_length: Bytes per record (defaults to the end of the last field)
+            name: Record (01 level) name
+        """
+        self.fields = fields
+        self.record_length = record_length or max(f.offset + f.length for f in fields)
+        self.name = name
+
+    @property
+    def schema(self) -> pa.Schema:
+        return pa.schema([
+            pa.field(f.name, f.arrow_type, nullable=f.null_indicator is not None)
+            for f in self.fields
+        ])
+
+    @classmethod
+    def from_copybook(cls, text: str, record_length: Optional[int] = None) -> 'RecordLayout':
+        """
+        Parse a COBOL copybook.
+
+        Handles levels 01-49 with PIC X, 9, S, V and repeat counts, and the
+        usages above. OCCURS and REDEFINES are not supported; level 66 and
+        88 entries are ignored.
+
+        Args:
+            text: Copybook source (fixed or free format)
+            record_length: LRECL, when longer than the described fields
+
+        Returns:
+            RecordLayout
+
+        Raises:
+            ValueError: On unsupported clauses or PIC strings
+        """
+        statements = ' '.join(_copybook_lines(text))
+        fields: List[CopybookField] = []
+        offset = 0
+        record_name = None
+        pending_indicator: Optional[int] = None
+
+        for statement in re.split(r'\.(?:\s+|$)', statements):
+            statement = statement.strip().upper()
+            if not statement:
+                continue
+            match = re.match(r'(\d\d?)\s+([A-Z0-9-]+)(.*)$', statement)
+            if not match:
+                raise ValueError(f"Cannot parse copybook entry: {statement!r}")
+            level, name, clauses = int(match.group(1)), match.group(2), match.group(3)
+            if level in (66, 77, 88):
+                continue
+            if re.search(r'\b(OCCURS|REDEFINES)\b', clauses):
+                raise ValueError(f"{name}: OCCURS and REDEFINES are not supported")
+
+            pic = re.search(r'\bPIC(?:TURE)?\s+(?:IS\s+)?(\S+)', clauses)
+            if not pic:
+                if level == 1:
+                    record_name = name
+                continue  # Group item
+
+            usage = 'DISPLAY'
+            for word in re.findall(r'[A-Z0-9-]+', clauses[pic.end():] + ' ' + clauses[:pic.start()]):
+                if word in USAGES:
+                    usage = word
+            field = _picture_field(_column_name(name), offset, pic.group(1), USAGES[usage])
+            offset += field.length
+
+            if name.endswith('-NI') and field.kind == 'char' and field.length == 1:
+                pending_indicator = field.offset
+                continue
+            if name == 'FILLER':
+                continue
+            field.null_indicator, pending_indicator = pending_indicator, None
+            fields.append(field)
+
+        if not fields:
+            raise ValueError("Copybook describes no fields")
+        if record_length is not None and record_length < offset:
+            raise ValueError(f"Record length {record_length} shorter than the {offset}-byte layout")
+        return cls(fields, record_length or offset, record_name)
+
+
+def _copybook_lines(text: str) -> Iterator[str]:
+    """Source lines with sequence areas and comments removed."""
+    for line in text.splitlines():
+        if len(line) > 6 and re.fullmatch(r'\d{6}| {6}', line[:6]):
+            if line[6] in '*/':
+                continue
+            line = line[6:72]
+        elif line.lstrip().startswith('*'):
+            continue
+        yield line
+
+
+def _column_name(name: str) -> str:
+    return name.lower().replace('-', '_')
+
+
+def _picture_field(name: str, offset: int, picture: str, kind: str) -> CopybookField:
+    expanded = re.sub(r'(.)\((\d+)\)', lambda m: m.group(1) * int(m.group(2)), picture)
+    if re.fullmatch(r'[XA]+', expanded):
+        if kind != 'zoned':
+            raise ValueError(f"{name}: PIC {picture} cannot be {kind}")
+        return CopybookField(name, offset, 'char', length=len(expanded))
+
+    match = re.fullmatch(r'(S?)(9*)(?:V(9*))?', expanded)
+    if not match or not (match.group(2) or match.group(3)):
+        raise ValueError(f"{name}: unsupported PIC {picture}")
+    scale = len(match.group(3) or '')
+    return CopybookField(name, offset, kind, digits=len(match.group(2)) + scale,
+                         scale=scale, signed=bool(match.group(1)))
+
+
+# ----------------------------------------------------------------------
+# Vectorized decoders: each takes a (rows, field_length) uint8 matrix
+# ----------------------------------------------------------------------
+
+def decode_char(block: np.ndarray) -> pa.Array:
+    """EBCDIC text to an Arrow string array, trailing blanks removed."""
+    rows, width = block.shape
+    raw = np.ascontiguousarray(block)
+
+    # Length up to the last non-blank byte
+    nonblank = raw != EBCDIC_SPACE
+    lengths = width - np.argmax(nonblank[:, ::-1], axis=1)
+    lengths[~nonblank.any(axis=1)] = 0
+    keep = np.arange(width) < lengths[:, None]
+
+    # One codec pass over the whole batch; characters above 0x7F take two bytes
+    kept = raw[keep].tobytes()
+    data = kept.decode(CODEC).encode('utf-8')
+    sizes = lengths
+    if len(data) != len(kept):
+        extra = np.frombuffer(raw.tobytes().translate(UTF8_EXTRA_BYTES), dtype=np.uint8)
+        sizes = lengths + (extra.reshape(rows, width) & keep).sum(axis=1)
+
+    offsets = np.zeros(rows + 1, dtype=np.int32)
+    np.cumsum(sizes, out=offsets[1:])
+    return pa.StringArray.from_buffers(rows, pa.py_buffer(offsets), pa.py_buffer(data))
+
+
+def _digits_value(digits: np.ndarray) -> np.ndarray:
+    """Row-wise base-10 value of a (rows, n) matrix of digit values."""
+    powers = 10 ** np.arange(digits.shape[1] - 1, -1, -1, dtype=np.int64)
+    return digits.astype(np.int64) @ powers
+
+
+def decode_packed(block: np.ndarray):
+    """
+    COMP-3 to unscaled integers.
+
+    Returns:
+        Tuple of (values, valid) where invalid nibbles or signs are not valid
+    """
+    nibbles = np.empty((block.shape[0], block.shape[1] * 2), dtype=np.uint8)
+    nibbles[:, 0::2] = block >> 4
+    nibbles[:, 1::2] = block & 0x0F
+    digits, sign = nibbles[:, :-1], nibbles[:, -1]
+
+    valid = (digits <= 9).all(axis=1) & (sign >= 0x0A)
+    values = _digits_value(np.where(digits <= 9, digits, 0))
+    negative = (sign == 0x0B) | (sign == 0x0D)
+    return np.where(negative, -values, values), valid
+
+
+def decode_zoned(block: np.ndarray):
+    """
+    Zoned decimal to unscaled integers.
+
+    Returns:
+        Tuple of (values, valid) where bad zones or digits are not valid
+    """
+    zones, digits = block >> 4, block & 0x0F
+    sign = zones[:, -1]
+
+    valid = ((zones[:, :-1] == 0x0F).all(axis=1)
+             & ((sign == 0x0F) | (sign == 0x0C) | (sign == 0x0D))
+             & (digits <= 9).all(axis=1))
+    values = _digits_value(np.where(digits <= 9, digits, 0))
+    return np.where(sign == 0x0D, -values, values), valid
+
+
+def decode_binary(block: np.ndarray, signed: bool) -> np.ndarray:
+    """Big-endian binary integers."""
+    width = block.shape[1]
+    dtype = np.dtype(f">{'i' if signed else 'u'}{width}")
+    return np.ascontiguousarray(block).view(dtype).ravel().astype(dtype.newbyteorder('='))
+
+
+def _decimal_array(values: np.ndarray, valid: Optional[np.ndarray], dtype: pa.DataType) -> pa.Array:
+    """Unscaled int64 values as a decimal128 array without per-value conversion."""
+    values = values.astype(np.int64, copy=False)
+    words = np.empty((len(values), 2), dtype='<i8')
+    words[:, 0] = values
+    words[:, 1] = values >> 63
+    return pa.Array.from_buffers(dtype, len(values), [_validity(valid), pa.py_buffer(words)])
+
+
+def _validity(valid: Optional[np.ndarray]) -> Optional[pa.Buffer]:
+    if valid is None or valid.all():
+        return None
+    return pa.py_buffer(np.packbits(valid, bitorder='little'))
+
+
+class UnloadDecoder:
+    """Decodes an unload file batch by batch."""
+
+    def __init__(self, layout: RecordLayout, path: str, batch_rows: int = DEFAULT_BATCH_ROWS):
+        """
+        Initialize decoder.
+
+        Args:
+            layout: Record layout
+            path: Fixed-length (RECFM=FB) unload file
+            batch_rows: Records per Arrow batch
+
+        Raises:
+            ValueError: If the file size is not a whole number of records
+        """
+        self.layout = layout
+        self.path = Path(path)
+        self.batch_rows = batch_rows
+        self.size = self.path.stat().st_size
+        if self.size % layout.record_length:
+            raise ValueError(
+                f"{path}: {self.size} bytes is not a multiple of the "
+                f"{layout.record_length}-byte record length"
+            )
+        self.records = self.size // layout.record_length
+        self.invalid: Dict[str, int] = {f.name: 0 for f in layout.fields}
+
+    def _records(self) -> np.ndarray:
+        if self.records == 0:
+            return np.empty((0, self.layout.record_length), dtype=np.uint8)
+        data = np.memmap(self.path, dtype=np.uint8, mode='r')
+        return data.reshape(self.records, self.layout.record_length)
+
+    def decode_batch(self, block: np.ndarray) -> pa.RecordBatch:
+        """Decode a (rows, record_length) byte matrix into a record batch."""
+        arrays = []
+        for field in self.layout.fields:
+            columns = block[:, field.offset:field.offset + field.length]
+            valid = None
+            if field.null_indicator is not None:
+                valid = block[:, field.null_indicator] == 0
+
+            if field.kind == 'char':
+                array = decode_char(columns)
+                if valid is not None and not valid.all():
+                    array = pa.StringArray.from_buffers(
+                        len(array), array.buffers()[1], array.buffers()[2], _validity(valid)
+                    )
+                arrays.append(array)
+                continue
+
+            if field.kind == 'binary':
+                values = decode_binary(columns, field.signed)
+            else:
+                decode = decode_packed if field.kind == 'packed' else decode_zoned
+                values, ok = decode(columns)
+                bad = ~ok if valid is None else ~ok & valid
+                self.invalid[field.name] += int(bad.sum())
+                valid = ok if valid is None else ok & valid
+
+            if field.scale:
+                arrays.append(_decimal_array(values, valid, field.arrow_type))
+            else:
+                mask = None if valid is None or valid.all() else ~valid
+                arrays.append(pa.array(values, type=field.arrow_type, mask=mask))
+
+        return pa.RecordBatch.from_arrays(arrays, schema=self.layout.schema)
+
+    def batches(self) -> Iterator[pa.RecordBatch]:
+        """Decode the file lazily, batch_rows records at a time."""
+        records = self._records()
+        for start in range(0, self.records, self.batch_rows):
+            yield self.decode_batch(records[start:start + self.batch_rows])
+
+    def reader(self) -> pa.RecordBatchReader:
+        return pa.RecordBatchReader.from_batches(self.layout.schema, self.batches())
+
+    def load(self, conn: duckdb.DuckDBPyConnection, table: str, replace: bool = True,
+             tracer: Optional[Tracer] = None) -> int:
+        """
+        Stream the decoded batches into a DuckDB table.
+
+        Args:
+            conn: DuckDB connection
+            table: Target table
+            replace: Recreate the table; otherwise append to it
+            tracer: Tracer for the load span
+
+        Returns:
+            Number of records loaded
+        """
+        if not re.fullmatch(r'[A-Za-z_][A-Za-z0-9_]*', table):
+            raise ValueError(f"Invalid table name: {table}")
+        tracer = tracer or Tracer('unload')
+
+        with tracer.span('unload.load', table=table, source=str(self.path)) as span:
+            unload_batches = self.reader()
+            conn.register('unload_batches', unload_batches)
+            try:
+                if replace:
+                    conn.execute(f"CREATE OR REPLACE TABLE {table} AS SELECT * FROM unload_batches")
+                else:
+                    conn.execute(f"INSERT INTO {table} SELECT * FROM unload_batches")
+            finally:
+                conn.unregister('unload_batches')
+            span.rows = self.records
+            span.bytes = self.size
+        return self.records
+
+
+def main():
+    """Decode an unload file into the DuckDB lake."""
+    parser = argparse.ArgumentParser(description="Load a DB2 EBCDIC unload into DuckDB")
+    parser.add_argument('--copybook', required=True, help="COBOL copybook describing the record")
+    parser.add_argument('--unload', required=True, help="Fixed-length unload file")
+    parser.add_argument('--db', default='ecfr_analytics.duckdb')
+    parser.add_argument('--table', required=True)
+    parser.add_argument('--record-length', type=int, help="LRECL when longer than the copybook")
+    parser.add_argument('--batch-rows', type=int,
+                        help="Records per batch (sized from the resource profile by default)")
+    parser.add_argument('--append', action='store_true', help="Append instead of replacing the table")
+    args = parser.parse_args()
+
+    layout = RecordLayout.from_copybook(Path(args.copybook).read_text(), args.record_length)
+    batch_rows = args.batch_rows or default_profile().rows_within(
+        layout.record_length * DECODE_EXPANSION, cap=DEFAULT_BATCH_ROWS
+    )
+    decoder = UnloadDecoder(layout, args.unload, batch_rows)
+    print(f"📼 {args.unload}: {decoder.records:,} records of {layout.record_length} bytes, "
+          f"{len(layout.fields)} fields")
+
+    conn = connect(args.db)
+    start = time.perf_counter()
+    try:
+        rows = decoder.load(conn, args.table, replace=not args.append)
+    finally:
+        conn.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"✅ Loaded {rows:,} rows into {args.table} in {elapsed:.2f}s "
+          f"({decoder.size / 1024 / 1024 / max(elapsed, 1e-9):.0f} MB/s)")
+    for name, count in decoder.invalid.items():
+        if count:
+            print(f"  ⚠️  {name}: {count:,} invalid numeric values loaded as NULL")
+
+
+if __name__ == '__main__':
+    main()
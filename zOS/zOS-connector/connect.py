@@ -1,27 +1,27 @@
-from py3270 import Emulator
+import asyncio
+import os
 import ssl
 
-HOST = "tk4-emulator"  # docker network alias
-PORT = 10443
-
-# Connect using TLS-wrapped socket
-context = ssl.create_default_context()
-em = Emulator(visible=True, secure=True, ssl_context=context)
-em.connect(f"{HOST}:{PORT}")
-
-# Example: login and submit JCL
-em.send_string("USERID")
-em.send_enter()
-em.send_string("PASSWORD")
-em.send_enter()
-
-# Submit JCL
-with open("/app/hello.jcl") as f:
-    jcl_lines = f.read().splitlines()
-    for line in jcl_lines:
-        em.send_string(line)
-        em.send_enter()
-
-# Capture SYSOUT (mock)
-print("JCL submitted to emulator.")
-em.terminate()
+from session_pool import Job, JobTracker, SessionPool, submit_all
+
+HOST = os.getenv("TN3270_HOST", "tk4-emulator")  # docker network alias
+PORT = int(os.getenv("TN3270_PORT", "10443"))
+JCL_PATH = os.getenv("JCL_PATH", "/app/hello.jcl")
+
+
+async def main():
+    # Connect using TLS-wrapped socket
+    context = ssl.create_default_context()
+
+    # Example: log on one session and submit JCL, waiting for the output queue
+    async with SessionPool(HOST, PORT, os.getenv("TSO_USER", "USERID"),
+                           os.getenv("TSO_PASSWORD", "PASSWORD"), size=1,
+                           ssl_context=context) as pool:
+        tracker = JobTracker(pool)
+        job, = await submit_all(pool, [Job.from_file(JCL_PATH)], tracker)
+        await tracker.close()
+
+    print(f"JCL submitted to emulator: {job.reference if job.job_id else job.error} {job.state}")
+
+
+asyncio.run(main())
@@ -0,0 +1,368 @@
+"""
+Mock TN3270 Host
+
+A local TN3270 server that behaves enough like TSO on the TK4- emulator to
+exercise the connector without a mainframe:
+
+- Logon panel ("Logon ===>") and password prompt
+- READY panel with a command line
+- SUBMIT * opens a JCL entry panel with one input field per card; Enter
+  stores the page, PF3 submits ("IKJ56250I JOB name(JOBnnnnn) SUBMITTED")
+- STATUS name(id) or STATUS (name(id),...) reports each job as on the
+  input queue, executing or on the output queue
+- LOGOFF ends the session
+
+Jobs move through the queues on a timer. Every reply can be delayed to
+simulate host and network latency, and the host counts round trips and
+concurrent sessions so pacing changes can be measured.
+
+Usage:
+    python mock_host.py --port 3270 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import itertools
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+from tn3270 import (
+    AID_CLEAR, AID_ENTER, AID_PF, ATTR_INTENSE, ATTR_NONDISPLAY, ATTR_PROTECTED,
+    CODEC, CODES, COLS, DO, OPT_BINARY, OPT_EOR, OPT_TTYPE, ORDER_IC, ORDER_SBA,
+    ORDER_SF, ROWS, TTYPE_IS, TTYPE_SEND, WILL, TelnetStream, address,
+    encode_address, parse_inbound,
+)
+
+
+JCL_FIELDS = 18
+JCL_WIDTH = 80
+COMMAND_WIDTH = 72
+MESSAGE_ROWS = 20
+
+
+class MockJob:
+    """A submitted job moving through the input, execution and output queues."""
+
+    def __init__(self, name: str, job_id: str, lines: List[str], queue_seconds: float, run_seconds: float):
+        self.name = name
+        self.job_id = job_id
+        self.lines = lines
+        self.submitted = time.monotonic()
+        self.queue_seconds = queue_seconds
+        self.run_seconds = run_seconds
+
+    @property
+    def state(self) -> str:
+        elapsed = time.monotonic() - self.submitted
+        if elapsed < self.queue_seconds:
+            return 'ON INPUT QUEUE'
+        if elapsed < self.queue_seconds + self.run_seconds:
+            return 'EXECUTING'
+        return 'ON OUTPUT QUEUE'
+
+
+class Panel:
+    """Builds an Erase/Write record from protected text and input fields."""
+
+    def __init__(self):
+        self.items: List[Tuple[int, int, str, int, Optional[str], int]] = []
+        self.cursor_field: Optional[str] = None
+
+    def text(self, row: int, col: int, text: str, intense: bool = False):
+        attr = ATTR_PROTECTED | (ATTR_INTENSE if intense else 0)
+        self.items.append((row, col, text, attr, None, len(text)))
+
+    def field(self, row: int, col: int, name: str, length: int, hidden: bool = False, value: str = ''):
+        attr = ATTR_NONDISPLAY if hidden else 0
+        self.items.append((row, col, value, attr, name, length))
+        if self.cursor_field is None:
+            self.cursor_field = name
+
+    def layout(self) -> Dict[int, str]:
+        """Map each input field's first data address to its name."""
+        return {
+            (address(row, col) + 1) % (ROWS * COLS): name
+            for row, col, _, _, name, _ in self.items if name
+        }
+
+    def render(self, unlock: bool = True) -> bytes:
+        wcc = CODES[0x03 if unlock else 0x01]
+        out = bytearray([0xF5, wcc])
+        for row, col, text, attr, name, length in self.items:
+            out += bytes([ORDER_SBA]) + encode_address(address(row, col))
+            out += bytes([ORDER_SF, CODES[attr]])
+            if name == self.cursor_field and name is not None:
+                out += bytes([ORDER_IC])
+            out += text.encode(CODEC)
+            if name:
+                # Close the input field with a protected attribute after it
+                end = address(row, col) + 1 + length
+                if end < ROWS * COLS:
+                    out += bytes([ORDER_SBA]) + encode_address(end)
+                    out += bytes([ORDER_SF, CODES[ATTR_PROTECTED]])
+        return bytes(out)
+
+
+class MockHost:
+    """TSO-like mock host serving any number of concurrent sessions."""
+
+    def __init__(
+        self,
+        users: Optional[Dict[str, str]] = None,
+        latency: float = 0.0,
+        queue_seconds: float = 0.2,
+        run_seconds: float = 0.5,
+    ):
+        """
+        Initialize host.
+
+        Args:
+            users: Userid to password map (HERC01/CUL8TR when None)
+            latency: Seconds added before every reply
+            queue_seconds: Time a job spends on the input queue
+            run_seconds: Time a job spends executing
+        """
+        self.users = users or {'HERC01': 'CUL8TR'}
+        self.latency = latency
+        self.queue_seconds = queue_seconds
+        self.run_seconds = run_seconds
+        self.jobs: Dict[str, MockJob] = {}
+        self.round_trips = 0
+        self.sessions = 0
+        self.max_sessions = 0
+        self._job_numbers = itertools.count(1)
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> int:
+        """Start listening; returns the bound port."""
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    # ------------------------------------------------------------------
+    # Protocol
+    # ------------------------------------------------------------------
+
+    async def _negotiate(self, stream: TelnetStream) -> str:
+        """Negotiate TN3270 options; returns the client's terminal type."""
+        terminal = {}
+        replies = asyncio.Queue()
+
+        async def on_option(command, option):
+            await replies.put((command, option))
+
+        async def on_subnegotiation(payload):
+            if payload[:2] == bytes([OPT_TTYPE, TTYPE_IS]):
+                terminal['type'] = payload[2:].decode('ascii', 'replace')
+                await replies.put(('ttype', None))
+
+        stream.on_option = on_option
+        stream.on_subnegotiation = on_subnegotiation
+
+        # No record arrives during negotiation; reading one runs the handlers
+        reader = asyncio.create_task(stream.read_record())
+        try:
+            await stream.send_command(DO, OPT_TTYPE)
+            await self._expect(replies, (WILL, OPT_TTYPE))
+            await stream.send_subnegotiation(bytes([OPT_TTYPE, TTYPE_SEND]))
+            await self._expect(replies, ('ttype', None))
+            for option in (OPT_EOR, OPT_BINARY):
+                await stream.send_command(DO, option)
+                await stream.send_command(WILL, option)
+            # Wait for every answer so none is left half-read on cancel
+            await self._expect(replies, (WILL, OPT_EOR), (DO, OPT_EOR),
+                               (WILL, OPT_BINARY), (DO, OPT_BINARY))
+        finally:
+            reader.cancel()
+            try:
+                await reader
+            except asyncio.CancelledError:
+                pass
+        return terminal.get('type', '')
+
+    @staticmethod
+    async def _expect(replies: asyncio.Queue, *wanted: tuple, timeout: float = 10.0):
+        """Wait until every wanted reply has arrived, in any order."""
+        pending = set(wanted)
+        while pending:
+            pending.discard(await asyncio.wait_for(replies.get(), timeout))
+
+    async def _show(self, stream: TelnetStream, panel: Panel) -> Tuple[int, Dict[str, str]]:
+        """Send a panel and wait for the next AID; returns (aid, {field: text})."""
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        await stream.send_record(panel.render())
+        record = await stream.read_record()
+        self.round_trips += 1
+        aid, _, data = parse_inbound(record)
+        layout = panel.layout()
+        return aid, {layout[addr]: text for addr, text in data.items() if addr in layout}
+
+    # ------------------------------------------------------------------
+    # Panels
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def logon_panel(message: str = '') -> Panel:
+        panel = Panel()
+        panel.text(1, 2, 'TK4- MOCK HOST', intense=True)
+        panel.text(3, 2, message)
+        panel.text(12, 2, 'Logon ===>')
+        panel.field(12, 13, 'userid', 8)
+        return panel
+
+    @staticmethod
+    def password_panel(userid: str) -> Panel:
+        panel = Panel()
+        panel.text(1, 2, f'ENTER CURRENT PASSWORD FOR {userid}-')
+        panel.field(2, 2, 'password', 8, hidden=True)
+        return panel
+
+    @staticmethod
+    def ready_panel(messages: List[str]) -> Panel:
+        panel = Panel()
+        shown = (messages + ['READY'])[-MESSAGE_ROWS:]
+        for row, message in enumerate(shown, start=1):
+            panel.text(row, 2, message[:COLS - 2])
+        panel.text(ROWS, 2, '===>')
+        panel.field(ROWS, 7, 'command', COMMAND_WIDTH)
+        return panel
+
+    @staticmethod
+    def jcl_panel(received: int) -> Panel:
+        panel = Panel()
+        panel.text(1, 2, 'SUBMIT * - ENTER JCL, PF3 TO SUBMIT, CLEAR TO CANCEL', intense=True)
+        panel.text(2, 2, f'LINES RECEIVED: {received}')
+        # Full 80-column cards, each attribute byte right before its card
+        for n in range(JCL_FIELDS):
+            attr = address(4, 1) + n * (JCL_WIDTH + 1)
+            panel.field(attr // COLS + 1, attr % COLS + 1, f'card{n:02d}', JCL_WIDTH)
+        return panel
+
+    # ------------------------------------------------------------------
+    # Commands
+    # ------------------------------------------------------------------
+
+    def submit(self, lines: List[str]) -> str:
+        match = re.match(r'//(\S+)\s+JOB\b', lines[0]) if lines else None
+        if not match:
+            return 'IKJ56251I JOB NOT SUBMITTED - FIRST CARD IS NOT A JOB STATEMENT'
+        name = match.group(1)
+        job_id = f"JOB{next(self._job_numbers):05d}"
+        self.jobs[job_id] = MockJob(name, job_id, lines, self.queue_seconds, self.run_seconds)
+        return f'IKJ56250I JOB {name}({job_id}) SUBMITTED'
+
+    def status(self, argument: str) -> List[str]:
+        messages = []
+        for name, job_id in re.findall(r'([A-Z0-9$#@]+)\(([A-Z0-9]+)\)', argument.upper()):
+            job = self.jobs.get(job_id)
+            if job is None or job.name != name:
+                messages.append(f'IKJ56216I JOB {name}({job_id}) NOT FOUND')
+            elif job.state == 'EXECUTING':
+                messages.append(f'IKJ56211I JOB {name}({job_id}) EXECUTING')
+            else:
+                messages.append(f'IKJ56192I JOB {name}({job_id}) {job.state}')
+        return messages or ['IKJ56217I NO JOBS SPECIFIED']
+
+    async def _jcl_entry(self, stream: TelnetStream) -> Optional[List[str]]:
+        """Collect JCL pages until PF3 (submit) or CLEAR (cancel)."""
+        lines: List[str] = []
+        while True:
+            aid, data = await self._show(stream, self.jcl_panel(len(lines)))
+            page = [data.get(f'card{n:02d}', '').rstrip() for n in range(JCL_FIELDS)]
+            while page and not page[-1]:
+                page.pop()
+            lines.extend(page)
+            if aid == AID_PF[3]:
+                return lines
+            if aid == AID_CLEAR:
+                return None
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        stream = TelnetStream(reader, writer)
+        self.sessions += 1
+        self.max_sessions = max(self.max_sessions, self.sessions)
+        try:
+            await self._negotiate(stream)
+            stream.on_option = None
+            stream.on_subnegotiation = None
+
+            # Logon
+            message = ''
+            while True:
+                _, data = await self._show(stream, self.logon_panel(message))
+                userid = data.get('userid', '').strip().upper()
+                if userid not in self.users:
+                    message = f'IKJ56420I USERID {userid or "?"} NOT AUTHORIZED FOR TSO'
+                    continue
+                _, data = await self._show(stream, self.password_panel(userid))
+                if data.get('password', '').strip().upper() == self.users[userid]:
+                    break
+                message = 'IKJ56421I PASSWORD NOT AUTHORIZED FOR USERID'
+
+            messages = [f'IKJ56455I {userid} LOGON IN PROGRESS']
+            while True:
+                aid, data = await self._show(stream, self.ready_panel(messages))
+                command = data.get('command', '').strip()
+                verb, _, argument = command.partition(' ')
+                verb = verb.upper()
+
+                if aid != AID_ENTER or not command:
+                    messages = []
+                elif verb in ('SUBMIT', 'SUB') and argument.strip() == '*':
+                    lines = await self._jcl_entry(stream)
+                    if lines is None:
+                        messages = ['SUBMIT CANCELLED']
+                    else:
+                        if self.latency:
+                            # Interim locked screen while the reader queues the job
+                            await stream.send_record(self.ready_panel(['SUBMITTING...']).render(unlock=False))
+                        messages = [self.submit(lines)]
+                elif verb in ('STATUS', 'ST'):
+                    messages = self.status(argument)
+                elif verb == 'LOGOFF':
+                    await stream.send_record(self.logon_panel(f'IKJ56470I {userid} LOGGED OFF TSO').render())
+                    return
+                else:
+                    messages = [f'IKJ56500I COMMAND {verb} NOT FOUND']
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.TimeoutError):
+            pass
+        finally:
+            self.sessions -= 1
+            await stream.close()
+
+
+async def serve(host: str, port: int, latency: float, queue_seconds: float, run_seconds: float):
+    mock = MockHost(latency=latency, queue_seconds=queue_seconds, run_seconds=run_seconds)
+    bound = await mock.start(host, port)
+    print(f"🖥️  Mock TN3270 host listening on {host}:{bound} (users: {', '.join(mock.users)})")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await mock.stop()
+
+
+def main():
+    """Run the mock host from the command line."""
+    parser = argparse.ArgumentParser(description="Mock TSO host over TN3270")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=3270)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds before each reply")
+    parser.add_argument('--queue-seconds', type=float, default=0.2)
+    parser.add_argument('--run-seconds', type=float, default=0.5)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.latency, args.queue_seconds, args.run_seconds))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
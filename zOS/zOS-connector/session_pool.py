@@ -0,0 +1,464 @@
+"""
+TSO Session Pool
+
+Authenticated TN3270 sessions for concurrent JCL submission:
+
+- TSOSession: logon, READY commands, SUBMIT * and STATUS on one terminal
+- SessionPool: a fixed number of logged-on sessions shared by tasks,
+  bounding how many jobs are entered at once
+- JobTracker: one batched STATUS command per poll for every job in flight
+- submit_all: submit a batch of jobs across the pool and wait for them
+
+Input is paced by screen state: each AID key waits only until the host
+unlocks the keyboard, and a JCL panel is filled a whole page of cards at
+a time, so a job costs a few round trips instead of one per line.
+"""
+
+import asyncio
+import re
+import ssl
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Iterable, List, Optional
+
+from tn3270 import TN3270Client, TN3270Error
+
+
+class Job:
+    """A JCL job and what the host has reported about it."""
+
+    def __init__(self, source: str, lines: List[str]):
+        self.source = source
+        self.lines = lines
+        self.name: Optional[str] = None
+        self.job_id: Optional[str] = None
+        self.state = 'PENDING'
+        self.error: Optional[str] = None
+        self.submitted_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @classmethod
+    def from_file(cls, path: str) -> 'Job':
+        with open(path) as f:
+            return cls(path, f.read().splitlines())
+
+    @property
+    def reference(self) -> str:
+        """name(id) as used by STATUS."""
+        return f"{self.name}({self.job_id})"
+
+    @property
+    def done(self) -> bool:
+        return self.state in ('OUTPUT', 'FAILED', 'NOT FOUND')
+
+    def __repr__(self):
+        label = self.reference if self.job_id else self.source
+        return f"<Job {label} {self.state}>"
+
+
+class TSOSession:
+    """
+    One TSO terminal session.
+
+    Screen patterns are class attributes so a host with different panels
+    (or message ids) can be supported by subclassing.
+    """
+
+    LOGON_PROMPT = r'Logon ===>'
+    PASSWORD_PROMPT = r'ENTER CURRENT PASSWORD'
+    READY = r'^\s*READY\s*$'
+    LOGON_FAILED = r'IKJ5642\dI.*'
+    JCL_PANEL = r'SUBMIT \*'
+    SUBMITTED = r'IKJ56250I JOB (\S+)\((\w+)\) SUBMITTED'
+    NOT_SUBMITTED = r'IKJ56251I.*'
+    STATUS_MESSAGE = r'IKJ56\d{3}I JOB (\S+)\((\w+)\) (ON INPUT QUEUE|EXECUTING|ON OUTPUT QUEUE|NOT FOUND)'
+
+    # Host wording to Job.state
+    STATES = {
+        'ON INPUT QUEUE': 'QUEUED',
+        'EXECUTING': 'EXECUTING',
+        'ON OUTPUT QUEUE': 'OUTPUT',
+        'NOT FOUND': 'NOT FOUND',
+    }
+
+    def __init__(self, host: str, port: int, ssl_context: Optional[ssl.SSLContext] = None,
+                 timeout: float = 30.0):
+        """
+        Initialize session.
+
+        Args:
+            host: TN3270 host
+            port: TN3270 port
+            ssl_context: TLS context, or None for a plain connection
+            timeout: Seconds to wait for any one screen
+        """
+        self.host = host
+        self.port = port
+        self.ssl_context = ssl_context
+        self.client = TN3270Client(timeout=timeout)
+        self.userid: Optional[str] = None
+
+    @property
+    def connected(self) -> bool:
+        return self.client.connected
+
+    @property
+    def round_trips(self) -> int:
+        return self.client.round_trips
+
+    async def login(self, userid: str, password: str):
+        """
+        Connect and log on to TSO, leaving the session at READY.
+
+        Raises:
+            TN3270Error: If the host rejects the userid or password
+        """
+        await self.client.connect(self.host, self.port, self.ssl_context)
+        await self.client.wait_for(self.LOGON_PROMPT)
+        await self._type(userid)
+        await self.client.enter()
+
+        match = await self.client.wait_for(f'{self.PASSWORD_PROMPT}|{self.LOGON_FAILED}')
+        if not re.match(self.PASSWORD_PROMPT, match.group(0)):
+            raise TN3270Error(f"Logon rejected: {match.group(0).strip()}")
+        await self._type(password)
+        await self.client.enter()
+
+        match = await self.client.wait_for(f'{self.READY}|{self.LOGON_FAILED}')
+        if re.match(self.LOGON_FAILED, match.group(0).strip()):
+            raise TN3270Error(f"Logon rejected: {match.group(0).strip()}")
+        self.userid = userid
+
+    async def _type(self, text: str):
+        """Type into the first input field."""
+        fields = self.client.input_fields()
+        if not fields:
+            raise TN3270Error(f"No input field on screen:\n{self.client.text()}")
+        self.client.fill(fields[0], text)
+
+    async def command(self, text: str, expect: str = READY) -> str:
+        """
+        Run a command from READY.
+
+        Returns:
+            Screen text once the host is back at the expected screen
+        """
+        fields = self.client.input_fields()
+        if not fields:
+            raise TN3270Error(f"No command line on screen:\n{self.client.text()}")
+        self.client.fill(fields[-1], text)
+        await self.client.enter()
+        await self.client.wait_for(expect)
+        return self.client.text()
+
+    @property
+    def command_width(self) -> int:
+        fields = self.client.input_fields()
+        return fields[-1].length if fields else 0
+
+    async def submit(self, job: Job) -> Job:
+        """
+        Enter a job with SUBMIT * and record its name and id.
+
+        Each JCL panel is filled with as many cards as it has input fields
+        before Enter; PF3 on the last page submits.
+
+        Raises:
+            TN3270Error: If the host does not accept the job
+        """
+        await self.command('SUBMIT *', expect=self.JCL_PANEL)
+        lines = job.lines
+        offset = 0
+        while True:
+            fields = self.client.input_fields()
+            if not fields:
+                raise TN3270Error(f"No JCL fields on screen:\n{self.client.text()}")
+            page = lines[offset:offset + len(fields)]
+            for field, line in zip(fields, page):
+                if len(line) > field.length:
+                    # Cancel the entry so the session is back at READY
+                    await self.client.clear()
+                    await self.client.wait_for(self.READY)
+                    job.state = 'FAILED'
+                    job.error = f"card longer than {field.length} columns: {line!r}"
+                    raise TN3270Error(f"{job.source}: {job.error}")
+                self.client.fill(field, line)
+            offset += len(page)
+
+            if offset >= len(lines):
+                await self.client.pf(3)
+                break
+            await self.client.enter()
+            await self.client.wait_for(self.JCL_PANEL)
+
+        match = await self.client.wait_for(f'{self.SUBMITTED}|{self.NOT_SUBMITTED}')
+        submitted = re.match(self.SUBMITTED, match.group(0))
+        if not submitted:
+            job.state = 'FAILED'
+            job.error = match.group(0).strip()
+            raise TN3270Error(f"{job.source}: {job.error}")
+        job.name, job.job_id = submitted.group(1), submitted.group(2)
+        job.state = 'SUBMITTED'
+        job.submitted_at = time.monotonic()
+        await self.client.wait_for(self.READY)
+        return job
+
+    async def status(self, jobs: List[Job]) -> Dict[str, str]:
+        """
+        Query several jobs with as few STATUS commands as fit the command line.
+
+        Returns:
+            Map of job id to Job.state wording
+        """
+        states: Dict[str, str] = {}
+        width = self.command_width
+        batch: List[str] = []
+
+        async def flush():
+            text = await self.command(f"STATUS ({','.join(batch)})")
+            for _, job_id, state in re.findall(self.STATUS_MESSAGE, text):
+                states[job_id] = self.STATES[state]
+            batch.clear()
+
+        for job in jobs:
+            if batch and len(f"STATUS ({','.join(batch + [job.reference])})") > width:
+                await flush()
+            batch.append(job.reference)
+        if batch:
+            await flush()
+        return states
+
+    async def logoff(self):
+        try:
+            if self.connected and not self.client.screen.keyboard_locked:
+                await self.command('LOGOFF', expect=self.LOGON_PROMPT)
+        except TN3270Error:
+            pass
+        finally:
+            await self.client.close()
+
+
+class SessionPool:
+    """
+    A fixed set of logged-on TSO sessions.
+
+    At most `size` jobs are entered at once; tasks wait for a free session.
+    A session that fails is closed and replaced by a fresh logon.
+    """
+
+    def __init__(self, host: str, port: int, userid: str, password: str, size: int = 4,
+                 ssl_context: Optional[ssl.SSLContext] = None, timeout: float = 30.0):
+        """
+        Initialize pool.
+
+        Args:
+            host: TN3270 host
+            port: TN3270 port
+            userid: TSO userid
+            password: TSO password
+            size: Number of concurrent sessions
+            ssl_context: TLS context, or None for a plain connection
+            timeout: Seconds to wait for any one screen
+        """
+        self.host = host
+        self.port = port
+        self.userid = userid
+        self.password = password
+        self.size = size
+        self.ssl_context = ssl_context
+        self.timeout = timeout
+        self.sessions: List[TSOSession] = []
+        self.retired_round_trips = 0
+        self._idle: asyncio.Queue = asyncio.Queue()
+
+    async def _open(self) -> TSOSession:
+        session = TSOSession(self.host, self.port, self.ssl_context, self.timeout)
+        try:
+            await session.login(self.userid, self.password)
+        except BaseException:
+            await session.client.close()
+            raise
+        return session
+
+    async def start(self):
+        """Log on every session concurrently."""
+        results = await asyncio.gather(*(self._open() for _ in range(self.size)),
+                                       return_exceptions=True)
+        failures = [r for r in results if isinstance(r, BaseException)]
+        for session in results:
+            if isinstance(session, TSOSession):
+                self.sessions.append(session)
+                self._idle.put_nowait(session)
+        if failures:
+            await self.close()
+            raise failures[0]
+
+    async def close(self):
+        """Log off every session."""
+        await asyncio.gather(*(s.logoff() for s in self.sessions))
+        self.sessions = []
+
+    async def __aenter__(self) -> 'SessionPool':
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    @property
+    def round_trips(self) -> int:
+        return self.retired_round_trips + sum(s.round_trips for s in self.sessions)
+
+    @asynccontextmanager
+    async def session(self):
+        """Borrow an idle session, replacing it if it breaks while in use."""
+        session = await self._idle.get()
+        try:
+            if not session.connected:
+                session = await self._replace(session)
+            yield session
+        except TN3270Error:
+            # Leave the screen state behind: the next user gets a fresh logon
+            if session.client.screen.keyboard_locked or not session.connected:
+                session = await self._replace(session)
+            raise
+        finally:
+            self._idle.put_nowait(session)
+
+    async def _replace(self, session: TSOSession) -> TSOSession:
+        self.retired_round_trips += session.round_trips
+        await session.client.close()
+        fresh = await self._open()
+        self.sessions[self.sessions.index(session)] = fresh
+        return fresh
+
+
+class JobTracker:
+    """
+    Follows submitted jobs until they reach the output queue.
+
+    All jobs in flight are checked together with one batched STATUS on a
+    pooled session per poll interval, so tracking does not hold a session
+    per job. A job still in flight after max_wait seconds is marked FAILED,
+    and if polling stops on an unexpected error every waiting future gets
+    that error, so callers never wait on a poller that is gone.
+    """
+
+    def __init__(self, pool: SessionPool, interval: float = 2.0, max_wait: float = 3600.0):
+        """
+        Initialize tracker.
+
+        Args:
+            pool: Session pool to borrow the STATUS session from
+            interval: Seconds between polls
+            max_wait: Seconds a job may take to reach the output queue
+        """
+        self.pool = pool
+        self.interval = interval
+        self.max_wait = max_wait
+        self.polls = 0
+        self._waiting: Dict[str, asyncio.Future] = {}
+        self._jobs: Dict[str, Job] = {}
+        self._deadlines: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def track(self, job: Job) -> asyncio.Future:
+        """Start following a submitted job; the future resolves to the job when done."""
+        future = asyncio.get_running_loop().create_future()
+        self._jobs[job.job_id] = job
+        self._waiting[job.job_id] = future
+        self._deadlines[job.job_id] = time.monotonic() + self.max_wait
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._poll())
+        return future
+
+    def _finish(self, job: Job):
+        job.finished_at = time.monotonic()
+        future = self._waiting.pop(job.job_id)
+        self._jobs.pop(job.job_id, None)
+        self._deadlines.pop(job.job_id, None)
+        if not future.done():
+            future.set_result(job)
+
+    async def _poll(self):
+        try:
+            while self._waiting:
+                await asyncio.sleep(self.interval)
+                now = time.monotonic()
+                for job_id in [job_id for job_id in self._waiting if self._deadlines[job_id] <= now]:
+                    job = self._jobs[job_id]
+                    job.error = f"No output after {self.max_wait:g}s (last state {job.state})"
+                    job.state = 'FAILED'
+                    self._finish(job)
+                if not self._waiting:
+                    break
+
+                jobs = [self._jobs[job_id] for job_id in self._waiting]
+                try:
+                    async with self.pool.session() as session:
+                        states = await session.status(jobs)
+                except (TN3270Error, OSError):
+                    continue  # The pool replaced the session; try again next poll
+                self.polls += 1
+
+                for job in jobs:
+                    state = states.get(job.job_id)
+                    if state is None:
+                        continue
+                    job.state = state
+                    if job.done:
+                        if state == 'NOT FOUND':
+                            job.error = 'Job no longer known to the host'
+                        self._finish(job)
+        except Exception as e:
+            for future in self._waiting.values():
+                if not future.done():
+                    future.set_exception(e)
+            self._waiting.clear()
+            self._jobs.clear()
+            self._deadlines.clear()
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        for future in self._waiting.values():
+            future.cancel()
+        self._waiting.clear()
+        self._jobs.clear()
+        self._deadlines.clear()
+
+
+async def submit_all(pool: SessionPool, jobs: Iterable[Job],
+                     tracker: Optional[JobTracker] = None) -> List[Job]:
+    """
+    Submit jobs across the pool and, with a tracker, wait for them to finish.
+
+    A job that fails to submit, or whose tracking fails, is marked FAILED;
+    the rest carry on.
+
+    Returns:
+        The jobs, in the order given
+    """
+    jobs = list(jobs)
+
+    async def run(job: Job):
+        try:
+            async with pool.session() as session:
+                await session.submit(job)
+        except (TN3270Error, OSError) as e:
+            job.state = 'FAILED'
+            job.error = job.error or str(e)
+            return
+        if tracker is not None:
+            try:
+                await tracker.track(job)
+            except Exception as e:
+                job.state = 'FAILED'
+                job.error = f"Tracking failed: {e}"
+
+    await asyncio.gather(*(run(job) for job in jobs))
+    return jobs
@@ -0,0 +1,106 @@
+"""
+Submit JCL over a pool of TSO sessions
+
+Usage:
+    python submit_jcl.py /app/hello.jcl extract/*.jcl --sessions 4
+    python submit_jcl.py hello.jcl --mock --copies 20
+
+Connection settings default to the TK4- emulator on the docker network;
+credentials come from TSO_USER / TSO_PASSWORD.
+"""
+
+import argparse
+import asyncio
+import os
+import ssl
+import sys
+import time
+from typing import List, Optional
+
+from session_pool import Job, JobTracker, SessionPool, submit_all
+
+
+def tls_context(insecure: bool) -> ssl.SSLContext:
+    context = ssl.create_default_context()
+    if insecure:
+        # The emulator's stunnel certificate is self-signed
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+async def run(args) -> List[Job]:
+    jobs = [Job.from_file(path) for path in args.jcl for _ in range(args.copies)]
+    host, port, context = args.host, args.port, tls_context(args.insecure) if args.tls else None
+
+    mock = None
+    if args.mock:
+        from mock_host import MockHost
+        mock = MockHost(users={args.user.upper(): args.password.upper()}, latency=args.latency)
+        host, port, context = '127.0.0.1', await mock.start(), None
+
+    print(f"🔌 Logging on {args.sessions} session(s) to {host}:{port}...")
+    start = time.monotonic()
+    try:
+        async with SessionPool(host, port, args.user, args.password, size=args.sessions,
+                               ssl_context=context, timeout=args.timeout) as pool:
+            logged_on = time.monotonic()
+            print(f"  ✓ Logged on in {logged_on - start:.2f}s")
+
+            tracker = JobTracker(pool, interval=args.poll, max_wait=args.max_wait) if args.wait else None
+            print(f"📤 Submitting {len(jobs)} job(s)...")
+            try:
+                await submit_all(pool, jobs, tracker)
+            finally:
+                if tracker is not None:
+                    await tracker.close()
+            elapsed = time.monotonic() - logged_on
+
+            print(f"\n{'Source':<30} {'Job':<20} {'State':<12} {'Seconds':>8}")
+            print("-" * 73)
+            for job in jobs:
+                reference = job.reference if job.job_id else '-'
+                seconds = (f"{job.finished_at - job.submitted_at:8.2f}"
+                           if job.finished_at and job.submitted_at else f"{'-':>8}")
+                print(f"{os.path.basename(job.source):<30} {reference:<20} {job.state:<12} {seconds}")
+                if job.error:
+                    print(f"  ⚠️  {job.error}")
+
+            failed = sum(1 for job in jobs if job.state in ('FAILED', 'NOT FOUND'))
+            print(f"\n✅ {len(jobs) - failed}/{len(jobs)} job(s) in {elapsed:.2f}s "
+                  f"({pool.round_trips} round trips"
+                  f"{f', {tracker.polls} status polls' if tracker else ''})")
+    finally:
+        if mock is not None:
+            await mock.stop()
+    return jobs
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Parse arguments and submit the jobs."""
+    parser = argparse.ArgumentParser(description="Submit JCL to TSO over TN3270")
+    parser.add_argument('jcl', nargs='+', help="JCL files")
+    parser.add_argument('--host', default=os.getenv('TN3270_HOST', 'tk4-emulator'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('TN3270_PORT', '10443')))
+    parser.add_argument('--tls', action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument('--insecure', action='store_true', help="Skip certificate verification")
+    parser.add_argument('--user', default=os.getenv('TSO_USER', 'HERC01'))
+    parser.add_argument('--password', default=os.getenv('TSO_PASSWORD', 'CUL8TR'))
+    parser.add_argument('--sessions', type=int, default=4, help="Concurrent TSO sessions")
+    parser.add_argument('--copies', type=int, default=1, help="Submit each file this many times")
+    parser.add_argument('--wait', action=argparse.BooleanOptionalAction, default=True,
+                        help="Track jobs until they reach the output queue")
+    parser.add_argument('--poll', type=float, default=2.0, help="Seconds between STATUS polls")
+    parser.add_argument('--max-wait', type=float, default=3600.0,
+                        help="Seconds a job may take before it is marked FAILED")
+    parser.add_argument('--timeout', type=float, default=30.0, help="Seconds to wait for a screen")
+    parser.add_argument('--mock', action='store_true', help="Run against an in-process mock host")
+    parser.add_argument('--latency', type=float, default=0.0, help="Mock host reply delay")
+    args = parser.parse_args(argv)
+
+    jobs = asyncio.run(run(args))
+    return 0 if all(job.state == 'OUTPUT' or (not args.wait and job.job_id) for job in jobs) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,236 @@
+"""
+Session pool tests against the mock host
+
+Validates:
+- Logon succeeds for a known user and is rejected for a bad userid or
+  password
+- A job longer than one JCL panel is entered page by page and tracked
+  to the output queue
+- A card wider than its field fails that job only, leaving the session
+  at READY
+- Broken sessions are replaced by a fresh logon
+- Tracking gives up on jobs past max_wait and never leaves callers
+  waiting when polling fails
+"""
+
+import asyncio
+import sys
+
+from mock_host import JCL_FIELDS, MockHost
+from session_pool import Job, JobTracker, SessionPool, TSOSession, submit_all
+from tn3270 import TN3270Error
+
+
+USER, PASSWORD = 'HERC01', 'CUL8TR'
+
+
+def jcl(name: str, steps: int = 1) -> Job:
+    lines = [f"//{name} JOB (ACCT),'TEST',CLASS=A,MSGCLASS=X"]
+    for n in range(steps):
+        lines += [f"//STEP{n:03d} EXEC PGM=IEFBR14", f"//DD{n:03d} DD DUMMY"]
+    return Job(f"{name.lower()}.jcl", lines)
+
+
+async def with_host(test, **options):
+    """Run test(mock, port) against a fresh mock host."""
+    mock = MockHost(users={USER: PASSWORD}, **{'queue_seconds': 0.05, 'run_seconds': 0.05, **options})
+    port = await mock.start()
+    try:
+        return await asyncio.wait_for(test(mock, port), 30)
+    finally:
+        await mock.stop()
+
+
+def test_logon():
+    """Test logon success and rejection."""
+    print("\n🧪 Testing Logon...")
+
+    async def test(mock, port):
+        rejected = []
+        for userid, password in ((USER, 'WRONG'), ('NOBODY', PASSWORD)):
+            session = TSOSession('127.0.0.1', port, timeout=5)
+            try:
+                await session.login(userid, password)
+            except TN3270Error as e:
+                rejected.append(str(e))
+            finally:
+                await session.client.close()
+
+        async with SessionPool('127.0.0.1', port, USER, PASSWORD, size=3, timeout=5) as pool:
+            ready = [session.userid for session in pool.sessions]
+            concurrent = mock.max_sessions
+        return rejected, ready, concurrent
+
+    rejected, ready, concurrent = asyncio.run(with_host(test))
+
+    assert len(rejected) == 2, rejected
+    assert 'IKJ56421I' in rejected[0] and 'IKJ56420I' in rejected[1], rejected
+    assert ready == [USER] * 3 and concurrent == 3, (ready, concurrent)
+    print(f"  ✅ Bad password and userid rejected; 3 sessions logged on")
+
+
+def test_multipage_submit():
+    """Test a job spanning several JCL panels, tracked to the output queue."""
+    print("\n🧪 Testing Multipage Submit...")
+
+    job = jcl('BIGJOB', steps=JCL_FIELDS + 5)
+
+    async def test(mock, port):
+        async with SessionPool('127.0.0.1', port, USER, PASSWORD, size=1, timeout=5) as pool:
+            tracker = JobTracker(pool, interval=0.05)
+            try:
+                await submit_all(pool, [job], tracker)
+            finally:
+                await tracker.close()
+            return mock.jobs[job.job_id].lines, pool.round_trips
+
+    received, round_trips = asyncio.run(with_host(test))
+    pages = -(-len(job.lines) // JCL_FIELDS)
+
+    assert pages >= 3, pages
+    assert received == job.lines, f"Host received {len(received)} of {len(job.lines)} cards"
+    assert job.state == 'OUTPUT' and job.name == 'BIGJOB', job
+    assert job.finished_at >= job.submitted_at
+    print(f"  ✅ {len(job.lines)} cards over {pages} panels reached the output queue "
+          f"({round_trips} round trips)")
+
+
+def test_overlong_card():
+    """Test that a card wider than its field fails only that job."""
+    print("\n🧪 Testing Over-Long Card...")
+
+    wide = jcl('WIDEJOB')
+    wide.lines.append('//SYSIN DD *  ' + 'X' * 80)
+    good = jcl('GOODJOB')
+
+    async def test(mock, port):
+        async with SessionPool('127.0.0.1', port, USER, PASSWORD, size=1, timeout=5) as pool:
+            session = pool.sessions[0]
+            await submit_all(pool, [wide, good])
+            # The session was cancelled back to READY, not replaced
+            return pool.sessions[0] is session, [job.name for job in mock.jobs.values()]
+
+    kept, submitted = asyncio.run(with_host(test))
+
+    assert wide.state == 'FAILED' and 'longer than 80 columns' in wide.error, wide.error
+    assert wide.job_id is None and good.state == 'SUBMITTED', (wide, good)
+    assert submitted == ['GOODJOB'], submitted
+    assert kept, "Session was replaced after a clean cancel"
+    print(f"  ✅ {wide.source} failed ({wide.error[:32]}...), {good.reference} submitted")
+
+
+def test_session_replacement():
+    """Test that dropped and stuck sessions are replaced by a fresh logon."""
+    print("\n🧪 Testing Session Replacement...")
+
+    async def test(mock, port):
+        async with SessionPool('127.0.0.1', port, USER, PASSWORD, size=1, timeout=5) as pool:
+            first = pool.sessions[0]
+
+            # Connection dropped while idle
+            first.client.stream.writer.close()
+            await first.client._reader_task
+            async with pool.session() as session:
+                await session.submit(jcl('AFTERDROP'))
+            second = pool.sessions[0]
+
+            # Failure that leaves the keyboard locked
+            try:
+                async with pool.session() as session:
+                    session.client.screen.keyboard_locked = True
+                    raise TN3270Error("simulated stuck screen")
+            except TN3270Error:
+                pass
+            third = pool.sessions[0]
+            async with pool.session() as session:
+                await session.submit(jcl('AFTERSTUCK'))
+            connected = (first.connected, third.connected)
+            return first, second, third, connected, len(pool.sessions), mock.max_sessions
+
+    first, second, third, connected, size, concurrent = asyncio.run(with_host(test))
+
+    assert len({id(first), id(second), id(third)}) == 3, "A broken session was reused"
+    assert connected == (False, True) and size == 1, (connected, size)
+    assert concurrent <= 2, concurrent
+    print(f"  ✅ Dropped and stuck sessions replaced; pool stayed at {size}")
+
+
+def test_tracker_failures():
+    """Test the per-job deadline and a polling error."""
+    print("\n🧪 Testing Tracker Failures...")
+
+    async def slow(mock, port):
+        async with SessionPool('127.0.0.1', port, USER, PASSWORD, size=1, timeout=5) as pool:
+            tracker = JobTracker(pool, interval=0.05, max_wait=0.3)
+            job = jcl('SLOWJOB')
+            try:
+                await submit_all(pool, [job], tracker)
+            finally:
+                await tracker.close()
+            return job
+
+    async def broken(mock, port):
+        async with SessionPool('127.0.0.1', port, USER, PASSWORD, size=1, timeout=5) as pool:
+            async def unexpected(jobs):
+                raise ValueError("unparseable status")
+            pool.sessions[0].status = unexpected
+            tracker = JobTracker(pool, interval=0.05)
+            jobs = [jcl('POLLJOB1'), jcl('POLLJOB2')]
+            try:
+                await submit_all(pool, jobs, tracker)
+            finally:
+                await tracker.close()
+            return jobs
+
+    timed_out = asyncio.run(with_host(slow, run_seconds=60))
+    failed = asyncio.run(with_host(broken))
+
+    assert timed_out.state == 'FAILED' and 'No output after 0.3s' in timed_out.error, timed_out.error
+    assert 'EXECUTING' in timed_out.error or 'QUEUED' in timed_out.error, timed_out.error
+    assert all(job.state == 'FAILED' and 'unparseable status' in job.error for job in failed), failed
+    print(f"  ✅ Deadline marks jobs FAILED; a polling error fails {len(failed)} waiting jobs")
+
+
+def run_all_tests():
+    """Run all session pool tests."""
+    print("=" * 60)
+    print("TSO Session Pool - Tests")
+    print("=" * 60)
+
+    tests = [
+        ("Logon", test_logon),
+        ("Multipage Submit", test_multipage_submit),
+        ("Over-Long Card", test_overlong_card),
+        ("Session Replacement", test_session_replacement),
+        ("Tracker Failures", test_tracker_failures),
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test_name, test_func in tests:
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"\n❌ {test_name} FAILED: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"\n❌ {test_name} ERROR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"Test Results: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed == 0:
+        print("✅ All tests passed! The session pool is working correctly.")
+    else:
+        print(f"❌ {failed} test(s) failed. Please review errors above.")
+
+    return failed == 0
+
+
+if __name__ == '__main__':
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,562 @@
+"""
+TN3270 protocol support
+
+A small asyncio TN3270 implementation shared by the connector (client
+side) and the mock host (server side):
+
+- Telnet option negotiation (TERMINAL-TYPE, EOR, BINARY) and record framing
+- 3270 buffer addressing and the outbound orders hosts use to draw panels
+  (SF, SBA, IC, RA, EUA, SFE, SA)
+- A Screen model with fields, modified data tags and the keyboard lock
+- TN3270Client: fill fields, press AID keys and wait for the host to
+  unlock the keyboard or show an expected screen
+
+Text is EBCDIC code page 037. Only the 24x80 model 2 screen is supported.
+"""
+
+import asyncio
+import re
+import ssl
+from typing import Dict, List, Optional, Pattern, Tuple, Union
+
+
+ROWS = 24
+COLS = 80
+BUFFER_SIZE = ROWS * COLS
+CODEC = 'cp037'
+
+# Telnet
+IAC, DONT, DO, WONT, WILL, SB, SE, EOR = 255, 254, 253, 252, 251, 250, 240, 239
+OPT_BINARY, OPT_TTYPE, OPT_EOR, OPT_TN3270E = 0, 24, 25, 40
+TTYPE_IS, TTYPE_SEND = 0, 1
+
+# Outbound commands (local and SNA encodings)
+CMD_WRITE = {0xF1, 0x01}
+CMD_ERASE_WRITE = {0xF5, 0x05, 0x7E, 0x0D}
+CMD_READ_BUFFER = {0xF2, 0x02}
+CMD_READ_MODIFIED = {0xF6, 0x06}
+
+# Orders
+ORDER_PT, ORDER_SBA, ORDER_EUA, ORDER_IC = 0x05, 0x11, 0x12, 0x13
+ORDER_SF, ORDER_SA, ORDER_SFE, ORDER_MF, ORDER_RA = 0x1D, 0x28, 0x29, 0x2C, 0x3C
+
+# Write control character bits
+WCC_RESET_MDT = 0x01
+WCC_KEYBOARD_RESTORE = 0x02
+
+# Field attribute bits
+ATTR_PROTECTED = 0x20
+ATTR_NUMERIC = 0x10
+ATTR_NONDISPLAY = 0x0C
+ATTR_INTENSE = 0x08
+ATTR_MDT = 0x01
+
+# Attention identifiers
+AID_ENTER = 0x7D
+AID_CLEAR = 0x6D
+AID_PA1, AID_PA2 = 0x6C, 0x6E
+AID_PF = {
+    1: 0xF1, 2: 0xF2, 3: 0xF3, 4: 0xF4, 5: 0xF5, 6: 0xF6,
+    7: 0xF7, 8: 0xF8, 9: 0xF9, 10: 0x7A, 11: 0x7B, 12: 0x7C,
+}
+SHORT_READ_AIDS = {AID_CLEAR, AID_PA1, AID_PA2}
+
+# 6-bit values to their graphic encodings (buffer addresses, attributes, WCC)
+CODES = bytes([
+    0x40, 0xC1, 0xC2, 0xC3, 0xC4, 0xC5, 0xC6, 0xC7, 0xC8, 0xC9, 0x4A, 0x4B, 0x4C, 0x4D, 0x4E, 0x4F,
+    0x50, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7, 0xD8, 0xD9, 0x5A, 0x5B, 0x5C, 0x5D, 0x5E, 0x5F,
+    0x60, 0x61, 0xE2, 0xE3, 0xE4, 0xE5, 0xE6, 0xE7, 0xE8, 0xE9, 0x6A, 0x6B, 0x6C, 0x6D, 0x6E, 0x6F,
+    0xF0, 0xF1, 0xF2, 0xF3, 0xF4, 0xF5, 0xF6, 0xF7, 0xF8, 0xF9, 0x7A, 0x7B, 0x7C, 0x7D, 0x7E, 0x7F,
+])
+
+
+class TN3270Error(Exception):
+    """Protocol failure or unexpected host screen."""
+
+
+def encode_address(address: int) -> bytes:
+    """12-bit encoded buffer address."""
+    return bytes([CODES[(address >> 6) & 0x3F], CODES[address & 0x3F]])
+
+
+def decode_address(high: int, low: int) -> int:
+    """Decode a 12-bit or 14-bit buffer address."""
+    if high & 0xC0 == 0:
+        return ((high & 0x3F) << 8) | low
+    return ((high & 0x3F) << 6) | (low & 0x3F)
+
+
+def address(row: int, col: int) -> int:
+    """Buffer address of a 1-based row and column."""
+    return (row - 1) * COLS + (col - 1)
+
+
+def escape_iac(data: bytes) -> bytes:
+    return data.replace(bytes([IAC]), bytes([IAC, IAC]))
+
+
+# ----------------------------------------------------------------------
+# Telnet framing
+# ----------------------------------------------------------------------
+
+class TelnetStream:
+    """
+    Telnet layer over asyncio streams, yielding 3270 records.
+
+    Option commands and subnegotiations received while reading are passed
+    to the handlers; data bytes accumulate until IAC EOR ends a record.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.on_option = None       # callable(command, option)
+        self.on_subnegotiation = None  # callable(bytes)
+
+    async def send_command(self, command: int, option: int):
+        self.writer.write(bytes([IAC, command, option]))
+        await self.writer.drain()
+
+    async def send_subnegotiation(self, payload: bytes):
+        self.writer.write(bytes([IAC, SB]) + escape_iac(payload) + bytes([IAC, SE]))
+        await self.writer.drain()
+
+    async def send_record(self, record: bytes):
+        self.writer.write(escape_iac(record) + bytes([IAC, EOR]))
+        await self.writer.drain()
+
+    async def _byte(self) -> int:
+        data = await self.reader.readexactly(1)
+        return data[0]
+
+    async def read_record(self) -> bytes:
+        """Read until IAC EOR, handling negotiation in between."""
+        record = bytearray()
+        while True:
+            byte = await self._byte()
+            if byte != IAC:
+                record.append(byte)
+                continue
+
+            command = await self._byte()
+            if command == IAC:
+                record.append(IAC)
+            elif command == EOR:
+                return bytes(record)
+            elif command in (DO, DONT, WILL, WONT):
+                option = await self._byte()
+                if self.on_option:
+                    await self.on_option(command, option)
+            elif command == SB:
+                payload = bytearray()
+                while True:
+                    byte = await self._byte()
+                    if byte == IAC:
+                        following = await self._byte()
+                        if following == SE:
+                            break
+                        payload.append(following)
+                    else:
+                        payload.append(byte)
+                if self.on_subnegotiation:
+                    await self.on_subnegotiation(bytes(payload))
+            # Other telnet commands (NOP, GA, ...) carry no 3270 meaning
+
+    async def close(self):
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except (ConnectionError, ssl.SSLError):
+            pass
+
+
+# ----------------------------------------------------------------------
+# Screen model
+# ----------------------------------------------------------------------
+
+class Field:
+    """An attribute position and the data positions it governs."""
+
+    def __init__(self, screen: 'Screen', attr_address: int, end: int):
+        self.screen = screen
+        self.attr_address = attr_address
+        self.start = (attr_address + 1) % BUFFER_SIZE
+        self.length = (end - self.start) % BUFFER_SIZE
+
+    @property
+    def attribute(self) -> int:
+        return self.screen.attributes[self.attr_address]
+
+    @property
+    def protected(self) -> bool:
+        return bool(self.attribute & ATTR_PROTECTED)
+
+    @property
+    def hidden(self) -> bool:
+        return self.attribute & ATTR_NONDISPLAY == ATTR_NONDISPLAY
+
+    @property
+    def modified(self) -> bool:
+        return bool(self.attribute & ATTR_MDT)
+
+    @property
+    def row(self) -> int:
+        return self.start // COLS + 1
+
+    @property
+    def col(self) -> int:
+        return self.start % COLS + 1
+
+    def positions(self) -> List[int]:
+        return [(self.start + i) % BUFFER_SIZE for i in range(self.length)]
+
+    @property
+    def value(self) -> str:
+        return ''.join(self.screen.buffer[p] for p in self.positions()).rstrip('\0')
+
+    def __repr__(self):
+        kind = 'protected' if self.protected else 'input'
+        return f"<Field {kind} ({self.row},{self.col}) len={self.length} {self.value!r}>"
+
+
+class Screen:
+    """3270 presentation space: characters, field attributes and cursor."""
+
+    def __init__(self):
+        self.buffer = ['\0'] * BUFFER_SIZE
+        self.attributes: Dict[int, int] = {}
+        self.cursor = 0
+        self.keyboard_locked = True
+
+    def erase(self):
+        self.buffer = ['\0'] * BUFFER_SIZE
+        self.attributes = {}
+        self.cursor = 0
+
+    def apply(self, record: bytes) -> Optional[int]:
+        """
+        Apply one outbound record from the host.
+
+        Returns:
+            The command byte, or None for an empty record
+        """
+        if not record:
+            return None
+        command = record[0]
+        if command in CMD_READ_BUFFER or command in CMD_READ_MODIFIED:
+            return command
+        if command not in CMD_WRITE and command not in CMD_ERASE_WRITE:
+            # Structured fields (0xF3 / 0x11) and others are not drawn
+            return command
+        if command in CMD_ERASE_WRITE:
+            self.erase()
+        if len(record) < 2:
+            return command
+
+        wcc = record[1]
+        if wcc & WCC_RESET_MDT:
+            for addr in self.attributes:
+                self.attributes[addr] &= ~ATTR_MDT
+
+        pos = self.cursor
+        i = 2
+        while i < len(record):
+            byte = record[i]
+            if byte == ORDER_SBA:
+                pos = decode_address(record[i + 1], record[i + 2])
+                i += 3
+            elif byte == ORDER_SF:
+                self.attributes[pos] = record[i + 1] & 0x3F
+                self.buffer[pos] = '\0'
+                pos = (pos + 1) % BUFFER_SIZE
+                i += 2
+            elif byte == ORDER_SFE:
+                count = record[i + 1]
+                attr = 0
+                for pair in range(count):
+                    kind, value = record[i + 2 + pair * 2], record[i + 3 + pair * 2]
+                    if kind == 0xC0:
+                        attr = value & 0x3F
+                self.attributes[pos] = attr
+                self.buffer[pos] = '\0'
+                pos = (pos + 1) % BUFFER_SIZE
+                i += 2 + count * 2
+            elif byte == ORDER_IC:
+                self.cursor = pos
+                i += 1
+            elif byte == ORDER_RA:
+                stop = decode_address(record[i + 1], record[i + 2])
+                char = bytes([record[i + 3]]).decode(CODEC) if record[i + 3] else '\0'
+                while True:
+                    self.attributes.pop(pos, None)
+                    self.buffer[pos] = char
+                    pos = (pos + 1) % BUFFER_SIZE
+                    if pos == stop:
+                        break
+                i += 4
+            elif byte == ORDER_EUA:
+                stop = decode_address(record[i + 1], record[i + 2])
+                while pos != stop:
+                    field = self.field_at(pos)
+                    if field and not field.protected and pos not in self.attributes:
+                        self.buffer[pos] = '\0'
+                    pos = (pos + 1) % BUFFER_SIZE
+                i += 3
+            elif byte == ORDER_SA:
+                i += 3
+            elif byte == ORDER_MF:
+                i += 2 + record[i + 1] * 2
+            elif byte == ORDER_PT:
+                i += 1
+            else:
+                self.attributes.pop(pos, None)
+                self.buffer[pos] = bytes([byte]).decode(CODEC) if byte else '\0'
+                pos = (pos + 1) % BUFFER_SIZE
+                i += 1
+
+        if wcc & WCC_KEYBOARD_RESTORE:
+            self.keyboard_locked = False
+        return command
+
+    def fields(self) -> List[Field]:
+        """Fields in buffer order."""
+        starts = sorted(self.attributes)
+        return [
+            Field(self, start, starts[(n + 1) % len(starts)])
+            for n, start in enumerate(starts)
+        ]
+
+    def input_fields(self) -> List[Field]:
+        return [f for f in self.fields() if not f.protected and f.length > 0]
+
+    def field_at(self, pos: int) -> Optional[Field]:
+        """Field containing buffer position pos (None on unformatted screens)."""
+        if not self.attributes:
+            return None
+        starts = sorted(self.attributes)
+        owner = starts[-1]
+        for start in starts:
+            if start <= pos:
+                owner = start
+            else:
+                break
+        for field in self.fields():
+            if field.attr_address == owner:
+                return field
+        return None
+
+    def fill(self, field: Field, text: str):
+        """Type text into an input field, padding the rest with nulls."""
+        if field.protected:
+            raise TN3270Error(f"Field at ({field.row},{field.col}) is protected")
+        if len(text) > field.length:
+            raise TN3270Error(f"{len(text)} characters do not fit a {field.length}-character field")
+        for offset, pos in enumerate(field.positions()):
+            self.buffer[pos] = text[offset] if offset < len(text) else '\0'
+        self.attributes[field.attr_address] |= ATTR_MDT
+
+    def read_modified(self, aid: int) -> bytes:
+        """Inbound record for an AID: modified fields with nulls suppressed."""
+        if aid in SHORT_READ_AIDS:
+            return bytes([aid])
+        out = bytearray([aid]) + encode_address(self.cursor)
+        for field in self.fields():
+            if field.modified:
+                data = ''.join(self.buffer[p] for p in field.positions()).replace('\0', '')
+                out += bytes([ORDER_SBA]) + encode_address(field.start) + data.encode(CODEC)
+        return bytes(out)
+
+    def text(self) -> str:
+        """Screen contents as 24 lines, hiding attributes and nondisplay fields."""
+        chars = [' ' if c == '\0' else c for c in self.buffer]
+        for field in self.fields():
+            chars[field.attr_address] = ' '
+            if field.hidden:
+                for pos in field.positions():
+                    chars[pos] = ' '
+        return '\n'.join(''.join(chars[r * COLS:(r + 1) * COLS]).rstrip() for r in range(ROWS))
+
+
+def parse_inbound(record: bytes) -> Tuple[int, int, Dict[int, str]]:
+    """
+    Parse a client's inbound read.
+
+    Returns:
+        Tuple of (aid, cursor_address, {field_start_address: text})
+    """
+    aid = record[0]
+    if len(record) < 3:
+        return aid, 0, {}
+    cursor = decode_address(record[1], record[2])
+    fields: Dict[int, str] = {}
+    i = 3
+    current = None
+    data = bytearray()
+    while i < len(record):
+        if record[i] == ORDER_SBA:
+            if current is not None:
+                fields[current] = data.decode(CODEC)
+            current = decode_address(record[i + 1], record[i + 2])
+            data = bytearray()
+            i += 3
+        else:
+            data.append(record[i])
+            i += 1
+    if current is not None:
+        fields[current] = data.decode(CODEC)
+    return aid, cursor, fields
+
+
+# ----------------------------------------------------------------------
+# Client
+# ----------------------------------------------------------------------
+
+class TN3270Client:
+    """
+    Asyncio TN3270 terminal.
+
+    Pressing an AID key locks the keyboard; it unlocks when the host sends
+    a write with keyboard restore. Callers pace input on that screen state
+    (wait_for) instead of sleeping between keystrokes.
+    """
+
+    def __init__(self, terminal_type: str = 'IBM-3278-2', timeout: float = 30.0):
+        """
+        Initialize client.
+
+        Args:
+            terminal_type: Terminal type reported to the host
+            timeout: Default seconds to wait for the host
+        """
+        self.terminal_type = terminal_type
+        self.timeout = timeout
+        self.screen = Screen()
+        self.stream: Optional[TelnetStream] = None
+        self.round_trips = 0
+        self._changed = asyncio.Event()
+        self._reader_task: Optional[asyncio.Task] = None
+        self._error: Optional[BaseException] = None
+
+    async def connect(self, host: str, port: int, ssl_context: Optional[ssl.SSLContext] = None):
+        """Open the connection and wait for the host's first unlocked screen."""
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=ssl_context,
+                                    server_hostname=host if ssl_context else None),
+            self.timeout,
+        )
+        self.stream = TelnetStream(reader, writer)
+        self.stream.on_option = self._negotiate
+        self.stream.on_subnegotiation = self._subnegotiate
+        self._reader_task = asyncio.create_task(self._read_loop())
+        await self.wait_for()
+
+    async def _negotiate(self, command: int, option: int):
+        supported = (OPT_BINARY, OPT_TTYPE, OPT_EOR)
+        if command == DO:
+            await self.stream.send_command(WILL if option in supported else WONT, option)
+        elif command == WILL:
+            await self.stream.send_command(DO if option in supported else DONT, option)
+
+    async def _subnegotiate(self, payload: bytes):
+        if payload[:2] == bytes([OPT_TTYPE, TTYPE_SEND]):
+            await self.stream.send_subnegotiation(
+                bytes([OPT_TTYPE, TTYPE_IS]) + self.terminal_type.encode('ascii')
+            )
+
+    async def _read_loop(self):
+        try:
+            while True:
+                record = await self.stream.read_record()
+                command = self.screen.apply(record)
+                if command in CMD_READ_MODIFIED:
+                    await self.stream.send_record(self.screen.read_modified(AID_ENTER))
+                self._changed.set()
+        except (asyncio.IncompleteReadError, ConnectionError, ssl.SSLError) as e:
+            self._error = e
+            self._changed.set()
+
+    @property
+    def connected(self) -> bool:
+        return self._reader_task is not None and not self._reader_task.done()
+
+    async def wait_for(self, pattern: Union[str, Pattern, None] = None,
+                       timeout: Optional[float] = None) -> Optional[re.Match]:
+        """
+        Wait until the keyboard is unlocked and, if given, pattern is on screen.
+
+        Args:
+            pattern: Regex searched in screen text
+            timeout: Seconds (defaults to the client timeout)
+
+        Returns:
+            The pattern match, or None when no pattern was given
+
+        Raises:
+            TN3270Error: On timeout or a dropped connection
+        """
+        if isinstance(pattern, str):
+            pattern = re.compile(pattern, re.MULTILINE)
+        deadline = asyncio.get_running_loop().time() + (timeout or self.timeout)
+
+        while True:
+            if not self.screen.keyboard_locked:
+                if pattern is None:
+                    return None
+                match = pattern.search(self.screen.text())
+                if match:
+                    return match
+            if self._error is not None:
+                raise TN3270Error(f"Connection lost: {self._error!r}")
+
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                expected = f" for {pattern.pattern!r}" if pattern else ''
+                raise TN3270Error(f"Timed out waiting{expected}; screen:\n{self.screen.text()}")
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    def fields(self) -> List[Field]:
+        return self.screen.fields()
+
+    def input_fields(self) -> List[Field]:
+        return self.screen.input_fields()
+
+    def fill(self, field: Field, text: str):
+        self.screen.fill(field, text)
+
+    def text(self) -> str:
+        return self.screen.text()
+
+    async def send_aid(self, aid: int):
+        """Send modified fields with an AID key and lock the keyboard."""
+        if self.screen.keyboard_locked:
+            raise TN3270Error("Keyboard is locked")
+        if self._error is not None:
+            raise TN3270Error(f"Connection lost: {self._error!r}")
+        self.screen.keyboard_locked = True
+        self.round_trips += 1
+        await self.stream.send_record(self.screen.read_modified(aid))
+
+    async def enter(self):
+        await self.send_aid(AID_ENTER)
+
+    async def pf(self, number: int):
+        await self.send_aid(AID_PF[number])
+
+    async def clear(self):
+        await self.send_aid(AID_CLEAR)
+
+    async def close(self):
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except asyncio.CancelledError:
+                pass
+            self._reader_task = None
+        if self.stream is not None:
+            await self.stream.close()
+            self.stream = None